@@ -35,6 +35,40 @@ class MemoryAdapter:
             logger.warning("memory history failed: %s", type(e).__name__)
             return ""
 
+    async def compacted_history(self, conversation_id: str, user_id: Optional[str]) -> str:
+        """長對話：滾動摘要 + 最近 N 輪；尚無摘要（或壓縮關閉 / 失敗）→ 最近 5 輪原文。"""
+        from backend.conversation_compactor import acompacted_history, compaction_enabled
+
+        if compaction_enabled() and getattr(self.ms, "supabase", None) is not None:
+            try:
+                text = await acompacted_history(
+                    self.ms.supabase, self.ms.memories_table, conversation_id, user_id
+                )
+                if text is not None:
+                    return text
+            except Exception as e:
+                logger.warning("compacted history failed: %s", type(e).__name__)
+        return self.history(conversation_id, limit=5)
+
+    def schedule_compaction(self, conversation_id: str, user_id: Optional[str]) -> None:
+        from backend.conversation_compactor import schedule_compaction
+
+        if getattr(self.ms, "supabase", None) is None:
+            return
+        schedule_compaction(self.ms.supabase, self.ms.memories_table, conversation_id, user_id)
+
+    async def client_history(
+        self, conversation_id: str, messages: List[Dict[str, str]], user_message: str
+    ) -> str:
+        from backend.client_history import aresolve_client_history
+
+        return await aresolve_client_history(
+            conversation_id,
+            messages,
+            getattr(self.ms, "redis", None),
+            current_message=user_message,
+        )
+
     async def save(
         self,
         conversation_id: str,
@@ -63,28 +97,43 @@ class FileContextAdapter:
         try:
             if not self.redis or not getattr(self.redis, "redis", None):
                 return ""
-            if hasattr(self.redis, "scan_keys"):
-                keys = self.redis.scan_keys(f"upload:{conversation_id}:*")
-            else:
-                keys = self.redis.redis.keys(f"upload:{conversation_id}:*")
+            if hasattr(self.redis, "latest_upload"):
+                _key, raw = self.redis.latest_upload(conversation_id)
+                return self._format(raw)
+            keys = self.redis.redis.keys(f"upload:{conversation_id}:*")
             if not keys:
                 return ""
-            latest_key = sorted(keys)[-1]
-            file_data_json = self.redis.redis.get(latest_key)
-            if not file_data_json:
+            return self._format(self.redis.redis.get(sorted(keys)[-1]))
+        except Exception as e:
+            logger.warning("file context failed: %s", type(e).__name__)
+            return ""
+
+    async def aget_file_content(self, conversation_id: str) -> str:
+        """Non-blocking variant (async Redis pool when the interface has one)."""
+        if not hasattr(self.redis, "alatest_upload"):
+            return self.get_file_content(conversation_id)
+        try:
+            if not getattr(self.redis, "redis", None):
                 return ""
-            file_data = json.loads(file_data_json)
-            file_content = (
-                file_data.get("vision_analysis") or file_data.get("content") or ""
-            )
-            if file_data.get("is_image"):
-                fname = file_data.get("file_name") or "image"
-                file_content = f"【使用者上傳圖片：{fname}】\n視覺分析：\n{file_content}"
-            return file_content
+            _key, raw = await self.redis.alatest_upload(conversation_id)
+            return self._format(raw)
         except Exception as e:
             logger.warning("file context failed: %s", type(e).__name__)
             return ""
 
+    @staticmethod
+    def _format(file_data_json) -> str:
+        if not file_data_json:
+            return ""
+        file_data = json.loads(file_data_json)
+        file_content = (
+            file_data.get("vision_analysis") or file_data.get("content") or ""
+        )
+        if file_data.get("is_image"):
+            fname = file_data.get("file_name") or "image"
+            file_content = f"【使用者上傳圖片：{fname}】\n視覺分析：\n{file_content}"
+        return file_content
+
 
 class PromptAdapter:
     def __init__(self, prompt_engine):
@@ -209,6 +258,7 @@ class ToolExecutorAdapter:
                     "error_code": tr.error_code,
                     "tool_call_id": tr.tool_call_id,
                     "content": tr.content,
+                    "cached": tr.cached,
                 }
             )
         return out
@@ -253,6 +303,13 @@ class PostProcessAdapter:
             )
 
         await run_post_process(jobs, memory_save_fn=save, shadow=False)
+        # 存檔後於背景更新滾動摘要（不等待）
+        for job in jobs:
+            if job.operation == "save_memory" and not job.skip_side_effects:
+                try:
+                    self.memory.schedule_compaction(job.conversation_id, job.user_id)
+                except Exception as e:
+                    logger.warning("compaction schedule failed: %s", type(e).__name__)
 
 
 def build_default_deps(
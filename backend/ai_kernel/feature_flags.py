@@ -30,6 +30,7 @@ class KernelFlags:
     max_tool_output_chars: int = 12000
     context_token_budget: int = 12000
     fallback_to_legacy_on_fatal: bool = True
+    stream_tool_round: bool = True
 
 
 def get_kernel_flags() -> KernelFlags:
@@ -47,4 +48,5 @@ def get_kernel_flags() -> KernelFlags:
         fallback_to_legacy_on_fatal=_bool_env(
             "KERNEL_FALLBACK_TO_LEGACY", True
         ),
+        stream_tool_round=_bool_env("STREAM_TOOL_ROUND_ENABLED", True),
     )
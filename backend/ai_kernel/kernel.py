@@ -4,8 +4,9 @@ AIKernel 主入口 — 協調 Pipeline / Planner / AgentLoop / PostProcess。
 """
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, AsyncIterator, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from backend.ai_kernel.context import assemble_context
 from backend.ai_kernel.errors import (
@@ -28,6 +29,12 @@ from backend.ai_kernel.post_process import build_post_process_jobs, should_skip_
 from backend.ai_kernel.strategies import select_response_strategy
 from backend.ai_kernel.tool_policy import AgentLoop, ToolPolicy
 from backend.ai_kernel.tracing import KernelTrace, store_trace
+from backend.async_tasks import discard_task
+from backend.output_moderation import (
+    OUTPUT_BLOCK_MESSAGE,
+    IncrementalModerator,
+    output_moderation_enabled,
+)
 
 logger = logging.getLogger("ai_kernel")
 
@@ -44,6 +51,12 @@ class AIKernel:
     def _policy(self, request: KernelRequest) -> ToolPolicy:
         return ToolPolicy(self.flags, shadow=self._is_shadow(request))
 
+    def _stream_tool_round(self) -> bool:
+        """gateway 支援串流工具回合且 flag 開啟時，工具判斷與最終答案合併成一次串流。"""
+        return self.flags.stream_tool_round and bool(
+            getattr(self.deps.model, "supports_tool_streaming", False)
+        )
+
     async def run(self, request: KernelRequest) -> KernelResult:
         """非串流完整執行。"""
         shadow = self._is_shadow(request)
@@ -141,6 +154,12 @@ class AIKernel:
         usage_acc = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
         full = ""
         final_messages = list(ctx.messages)
+        output_blocked = None
+        out_moderator = (
+            IncrementalModerator(self.deps.moderation.check)
+            if output_moderation_enabled()
+            else None
+        )
 
         try:
             policy = self._policy(request)
@@ -150,30 +169,66 @@ class AIKernel:
                 policy,
                 trace=trace,
             )
-            # 多輪工具（非串流）；最終答案一定走 stream
-            rounds = await loop.run_tool_rounds(
-                ctx, user_id=request.user_id, request=request
-            )
-            for ev in rounds.get("events") or []:
-                yield KernelEvent(
-                    type="tool_status",
-                    status=ev.get("status") or "",
-                    text=ev.get("message") or "",
-                    data=ev,
+            if self._stream_tool_round():
+                # 串流工具回合：模型直接回答時 token 即時送出，省下第二次呼叫
+                rounds: dict = {}
+                agen = loop.stream_tool_rounds(
+                    ctx, user_id=request.user_id, request=request
                 )
-            tools_used = rounds.get("tools_used") or []
-            usage_acc = rounds.get("usage") or usage_acc
-            final_messages = rounds.get("messages") or final_messages
-
-            # 若 tool rounds 已帶 early_content 且不需要再生成，仍用 stream 重播可選；
-            # 規格要求工具後最終答案 token streaming → 一律 stream 生成
-            need_gen = rounds.get("needs_final_generation", True)
-            early = (rounds.get("early_content") or "").strip()
-
-            # 工具後最終答案必須 token streaming（即使模型已給 early_content）
-            must_stream_final = bool(tools_used) or need_gen or not early
-
-            if tools_used:
+                try:
+                    async for ev in agen:
+                        etype = ev.get("type")
+                        if etype == "content":
+                            if out_moderator and out_moderator.blocked:
+                                break
+                            t = ev.get("text") or ""
+                            full += t
+                            if out_moderator:
+                                out_moderator.feed(t)
+                            yield KernelEvent(type="content", text=t)
+                        elif etype == "tool_status":
+                            yield KernelEvent(
+                                type="tool_status",
+                                status=ev.get("status") or "",
+                                text=ev.get("message") or "",
+                                data=ev,
+                            )
+                        elif etype == "rounds_done":
+                            rounds = ev
+                finally:
+                    await agen.aclose()
+                tools_used = rounds.get("tools_used") or []
+                usage_acc = rounds.get("usage") or usage_acc
+                final_messages = rounds.get("messages") or final_messages
+                early = ""
+                must_stream_final = bool(rounds) and rounds.get(
+                    "needs_final_generation", True
+                )
+            else:
+                # 多輪工具（非串流）；最終答案一定走 stream
+                rounds = await loop.run_tool_rounds(
+                    ctx, user_id=request.user_id, request=request
+                )
+                for ev in rounds.get("events") or []:
+                    yield KernelEvent(
+                        type="tool_status",
+                        status=ev.get("status") or "",
+                        text=ev.get("message") or "",
+                        data=ev,
+                    )
+                tools_used = rounds.get("tools_used") or []
+                usage_acc = rounds.get("usage") or usage_acc
+                final_messages = rounds.get("messages") or final_messages
+
+                # 若 tool rounds 已帶 early_content 且不需要再生成，仍用 stream 重播可選；
+                # 規格要求工具後最終答案 token streaming → 一律 stream 生成
+                need_gen = rounds.get("needs_final_generation", True)
+                early = (rounds.get("early_content") or "").strip()
+
+                # 工具後最終答案必須 token streaming（即使模型已給 early_content）
+                must_stream_final = bool(tools_used) or need_gen or not early
+
+            if tools_used and must_stream_final:
                 yield KernelEvent(
                     type="tool_status",
                     status="done",
@@ -181,16 +236,22 @@ class AIKernel:
                     data={"status": "done", "tools": [], "message": "streaming final"},
                 )
 
-            if must_stream_final:
+            if out_moderator and out_moderator.blocked:
+                pass
+            elif must_stream_final:
                 async for event in self.deps.model.stream(
                     final_messages,
                     model=ctx.model_config_obj.model,
                     temperature=ctx.strategy.temperature,
                     max_tokens=ctx.strategy.max_tokens,
                 ):
+                    if out_moderator and out_moderator.blocked:
+                        break
                     if event.get("type") == "content":
                         t = event.get("text") or ""
                         full += t
+                        if out_moderator:
+                            out_moderator.feed(t)
                         yield KernelEvent(type="content", text=t)
                     elif event.get("type") == "usage":
                         u = event.get("usage") or {}
@@ -204,16 +265,28 @@ class AIKernel:
                             "total_tokens": int(usage_acc.get("total_tokens") or 0)
                             + int(u.get("total_tokens") or 0),
                         }
-            else:
+            elif early:
                 # 無工具且模型已給完整文字：分塊 yield 維持串流協議
                 full = early
                 chunk = 24
                 for i in range(0, len(full), chunk):
+                    if out_moderator and out_moderator.blocked:
+                        break
+                    if out_moderator:
+                        out_moderator.feed(full[i : i + chunk])
                     yield KernelEvent(type="content", text=full[i : i + chunk])
+            if out_moderator:
+                output_blocked = await out_moderator.finish()
+                if output_blocked:
+                    yield KernelEvent(type="content", text="\n\n" + OUTPUT_BLOCK_MESSAGE)
+                    full = OUTPUT_BLOCK_MESSAGE
         except Exception as e:
             err = f"[ERROR] Streaming 失敗: {type(e).__name__}"
             full = err
             yield KernelEvent(type="content", text=err)
+        finally:
+            if out_moderator:
+                out_moderator.cancel()
 
         # usage record — shadow 禁止
         usage_payload: dict = {}
@@ -245,7 +318,7 @@ class AIKernel:
             speech_text=speech,
             plan=ctx.plan,
             used_kernel=True,
-            blocked=False,
+            blocked=bool(output_blocked),
             trace_id=trace.trace_id,
         )
         result.post_process_jobs = build_post_process_jobs(
@@ -260,7 +333,7 @@ class AIKernel:
         yield KernelEvent(
             type="usage",
             data={
-                "blocked": False,
+                "blocked": bool(output_blocked),
                 "usage": usage_payload,
                 "tools_used": tools_used,
                 "speech_text": speech,
@@ -297,17 +370,24 @@ class AIKernel:
         return state
 
     async def _stage_moderation(self, state: dict) -> dict:
+        """審核與 load_context_sources 並行：先啟動讀取 task，攔截時取消。"""
         req: KernelRequest = state["request"]
-        mod = await self.deps.moderation.check(req.user_message)
+        sources = asyncio.create_task(self._load_sources(req))
+        try:
+            mod = await self.deps.moderation.check(req.user_message)
+        except BaseException:
+            discard_task(sources)
+            raise
         if mod.get("blocked"):
+            discard_task(sources)
             from backend.moderation import format_block_message
 
             raise ModerationBlockedError(format_block_message(mod))
         state["moderation"] = mod
+        state["_sources_task"] = sources
         return state
 
-    async def _stage_load_sources(self, state: dict) -> dict:
-        req: KernelRequest = state["request"]
+    async def _load_sources(self, req: KernelRequest) -> Dict[str, str]:
         try:
             memories = await self.deps.memory.recall(
                 req.user_message, req.conversation_id, req.user_id
@@ -315,16 +395,48 @@ class AIKernel:
         except Exception:
             memories = ""
         try:
-            history = self.deps.memory.history(req.conversation_id, limit=5)
+            if req.client_history is not None:
+                history = await self._client_history(req)
+            elif hasattr(self.deps.memory, "compacted_history"):
+                history = await self.deps.memory.compacted_history(
+                    req.conversation_id, req.user_id
+                )
+            else:
+                history = self.deps.memory.history(req.conversation_id, limit=5)
         except Exception:
             history = ""
         try:
-            files = self.deps.files.get_file_content(req.conversation_id)
+            aget = getattr(self.deps.files, "aget_file_content", None)
+            if aget is not None:
+                files = await aget(req.conversation_id)
+            else:
+                files = self.deps.files.get_file_content(req.conversation_id)
         except Exception:
             files = ""
-        state["recalled_memories"] = memories or ""
-        state["conversation_history"] = history or ""
-        state["file_content"] = files or ""
+        return {
+            "recalled_memories": memories or "",
+            "conversation_history": history or "",
+            "file_content": files or "",
+        }
+
+    async def _client_history(self, req: KernelRequest) -> str:
+        """OpenAI 相容入口：用 client 歷史（adapter 可再以 Redis 補差異）。"""
+        resolve = getattr(self.deps.memory, "client_history", None)
+        if resolve is not None:
+            return await resolve(
+                req.conversation_id, req.client_history or [], req.user_message
+            )
+        from backend.client_history import format_history
+
+        return format_history(req.client_history or [])
+
+    async def _stage_load_sources(self, state: dict) -> dict:
+        task = state.pop("_sources_task", None)
+        if task is not None:
+            sources = await task
+        else:
+            sources = await self._load_sources(state["request"])
+        state.update(sources)
         return state
 
     async def _stage_build_prompt(self, state: dict) -> dict:
@@ -345,7 +457,19 @@ class AIKernel:
 
     async def _stage_plan(self, state: dict) -> dict:
         req: KernelRequest = state["request"]
-        state["plan"] = plan_request(req, use_tools=req.use_tools)
+        plan = plan_request(req, use_tools=req.use_tools)
+        state["plan"] = plan
+        trace = state.get("trace")
+        if trace:
+            trace.annotate(
+                "plan",
+                counts={"predicted_tools": len(plan.tools or [])},
+                detail={
+                    "action": plan.action.value,
+                    "reason": plan.reason,
+                    "tools": ",".join(plan.tools) if plan.tools is not None else "*",
+                },
+            )
         return state
 
     async def _stage_strategy(self, state: dict) -> dict:
@@ -381,6 +505,60 @@ class AIKernel:
         state["context"] = ctx
         return state
 
+    async def _generate_moderated(
+        self, loop: AgentLoop, ctx: Any, req: KernelRequest
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        非串流 + 輸出審核：最終回答內部改走 model.stream，句子一完成就送
+        IncrementalModerator 視窗，審核與生成重疊（攔截即停止生成）。
+        工具回合已給完整回答時沒有生成可重疊，改單次審核全文。
+        """
+        out = await loop.run(ctx, user_id=req.user_id, request=req, stream_final=True)
+        usage = dict(out.get("usage") or {})
+        content = (out.get("content") or "").strip()
+        blocked = None
+        if out.get("needs_final_generation"):
+            moderator = IncrementalModerator(self.deps.moderation.check)
+            parts = []
+            try:
+                async for event in self.deps.model.stream(
+                    out.get("messages") or ctx.messages,
+                    model=ctx.model_config_obj.model,
+                    temperature=ctx.strategy.temperature,
+                    max_tokens=ctx.strategy.max_tokens,
+                ):
+                    if event.get("type") == "content":
+                        text = event.get("text") or ""
+                        if text.startswith("[ERROR]"):
+                            # openai_handler 串流以內容回報錯誤；非串流維持丟例外
+                            raise ModelGatewayError(text)
+                        parts.append(text)
+                        moderator.feed(text)
+                        if moderator.blocked:
+                            break
+                    elif event.get("type") == "usage":
+                        for k, v in (event.get("usage") or {}).items():
+                            if k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                                usage[k] = int(usage.get(k) or 0) + int(v or 0)
+                blocked = await moderator.finish()
+            finally:
+                moderator.cancel()
+            content = "".join(parts) or content
+        elif content:
+            verdict = await self.deps.moderation.check(content)
+            blocked = verdict if verdict and verdict.get("blocked") else None
+        events = list(out.get("events") or [])
+        if out.get("tools_used"):
+            events.append(
+                {
+                    "type": "tool_status",
+                    "status": "done",
+                    "message": "工具階段完成，已產生回覆",
+                    "tools": [],
+                }
+            )
+        return {**out, "content": content, "usage": usage, "events": events}, blocked
+
     async def _stage_generate(self, state: dict) -> dict:
         req: KernelRequest = state["request"]
         ctx = state["context"]
@@ -391,8 +569,14 @@ class AIKernel:
             self._policy(req),
             trace=state.get("trace"),
         )
-        out = await loop.run(ctx, user_id=req.user_id, request=req, stream_final=False)
+        output_blocked = None
+        if output_moderation_enabled():
+            out, output_blocked = await self._generate_moderated(loop, ctx, req)
+        else:
+            out = await loop.run(ctx, user_id=req.user_id, request=req, stream_final=False)
         content = out.get("content") or ""
+        if output_blocked:
+            content = OUTPUT_BLOCK_MESSAGE
         usage = out.get("usage") or {}
         tools_used = out.get("tools_used") or []
 
@@ -435,6 +619,7 @@ class AIKernel:
             events=events,
             plan=ctx.plan,
             used_kernel=True,
+            blocked=bool(output_blocked),
         )
         state["result"] = result
         return state
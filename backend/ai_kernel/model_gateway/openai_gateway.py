@@ -21,16 +21,25 @@ class OpenAIModelGateway:
         complete_fn=None,
         complete_tools_fn=None,
         stream_fn=None,
+        stream_tools_fn=None,
     ):
         self._complete_fn = complete_fn
         self._complete_tools_fn = complete_tools_fn
         self._stream_fn = stream_fn
+        self._stream_tools_fn = stream_tools_fn
+        # 注入 mock 但未提供 stream_tools_fn → 沿用非串流工具回合
+        self._default_fns = complete_fn is None
+
+    @property
+    def supports_tool_streaming(self) -> bool:
+        return self._stream_tools_fn is not None or self._default_fns
 
     def _ensure_fns(self):
         if self._complete_fn is None:
             from backend.openai_handler import (
                 generate_response,
                 generate_response_stream,
+                generate_response_stream_with_tools,
                 generate_response_with_tools,
                 get_openai_client,
             )
@@ -50,6 +59,8 @@ class OpenAIModelGateway:
             self._complete_fn = _complete
             self._complete_tools_fn = generate_response_with_tools
             self._stream_fn = generate_response_stream
+            if self._stream_tools_fn is None:
+                self._stream_tools_fn = generate_response_stream_with_tools
 
     async def complete(
         self,
@@ -117,6 +128,14 @@ class OpenAIModelGateway:
         max_tokens: int,
     ) -> AsyncIterator[Dict[str, Any]]:
         self._ensure_fns()
+        if self._stream_fn is None:
+            # 注入 mock 但未提供 stream_fn → 以 complete 結果當單一 chunk
+            result = await self.complete(
+                messages, model=model, temperature=temperature, max_tokens=max_tokens
+            )
+            yield {"type": "content", "text": result.get("content") or ""}
+            yield {"type": "usage", "usage": result.get("usage") or {}, "model": model}
+            return
         try:
             async for event in self._stream_fn(
                 messages,
@@ -132,3 +151,28 @@ class OpenAIModelGateway:
             raise ModelTimeoutError(str(e)) from e
         except Exception as e:
             raise ModelGatewayError(type(e).__name__) from e
+
+    async def stream_with_tools(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        *,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """串流工具回合：content delta 即時轉出，tool_calls 於結尾整批交出。"""
+        self._ensure_fns()
+        try:
+            async for event in self._stream_tools_fn(
+                messages,
+                tools=tools,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            ):
+                yield event
+        except TimeoutError as e:
+            raise ModelTimeoutError(str(e)) from e
+        except Exception as e:
+            raise ModelGatewayError(type(e).__name__) from e
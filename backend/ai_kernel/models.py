@@ -30,6 +30,8 @@ class KernelRequest(BaseModel):
     stream: bool = True
     request_id: str = ""
     shadow: bool = False  # shadow 模式禁止副作用
+    # OpenAI 相容入口帶來的歷史（user/assistant）；非 None 時不讀 Supabase 歷史
+    client_history: Optional[List[Dict[str, str]]] = None
 
 
 class ModelConfig(BaseModel):
@@ -58,6 +60,8 @@ class Plan(BaseModel):
     steps: List[PlanStep] = Field(default_factory=list)
     allow_tools: bool = False
     reason: str = "default"
+    # 預測相關的工具名稱；None = 不裁剪（暴露全部允許的工具）
+    tools: Optional[List[str]] = None
 
 
 class ContextBlock(BaseModel):
@@ -1,3 +1,15 @@
-from backend.ai_kernel.planner.rule_planner import RulePlanner, plan_request
+from backend.ai_kernel.planner.rule_planner import (
+    RulePlanner,
+    plan_request,
+    predict_tools,
+    select_tool_definitions,
+    tool_planner_enabled,
+)
 
-__all__ = ["RulePlanner", "plan_request"]
+__all__ = [
+    "RulePlanner",
+    "plan_request",
+    "predict_tools",
+    "select_tool_definitions",
+    "tool_planner_enabled",
+]
@@ -1,19 +1,50 @@
 """RulePlanner — 一般聊天不增加額外 LLM 呼叫。"""
 from __future__ import annotations
 
+import os
 import re
-from typing import Optional
+from typing import Dict, List, Optional
 
 from pydantic import ValidationError
 
 from backend.ai_kernel.models import KernelRequest, Plan, PlanAction, PlanStep
 
 
-# 觸發工具的簡易規則（中英）
-_TOOL_HINTS = re.compile(
-    r"(搜尋|查一下|天氣|幾點|現在時間|計算|算一下|換算|提醒|新聞|latest|search|weather|calculate|convert)",
-    re.I,
-)
+# 各工具的相關性規則（中英）；順序即暴露順序
+TOOL_RULES: Dict[str, "re.Pattern[str]"] = {
+    "web_search": re.compile(
+        r"(搜尋|搜一下|查一下|查查|上網|新聞|最新|時事|股價|匯率|比分|latest|search|google|news)",
+        re.I,
+    ),
+    "get_current_time": re.compile(
+        r"(幾點|現在時間|今天幾號|幾月幾號|星期幾|禮拜幾|時差|日期|what time|timezone|time zone)",
+        re.I,
+    ),
+    "calculate": re.compile(
+        r"(計算|算一下|幫我算|等於多少|\d\s*[-+*/×÷^%]\s*\d|sqrt|calculate)",
+        re.I,
+    ),
+    "get_weather": re.compile(
+        r"(天氣|氣溫|溫度|下雨|下雪|帶傘|颱風|weather|forecast|rain)",
+        re.I,
+    ),
+    "manage_reminder": re.compile(r"(提醒|記得叫我|鬧鐘|待辦|remind)", re.I),
+    "convert_units": re.compile(
+        r"(換算|轉換成|公里|英里|公斤|磅|華氏|攝氏|convert|\bkm\b|\bmiles?\b|\blbs?\b)",
+        re.I,
+    ),
+}
+
+
+def tool_planner_enabled() -> bool:
+    """TOOL_PLANNER_ENABLED=false → 不裁剪 tools 陣列（仍以規則決定是否走工具）。"""
+    return os.getenv("TOOL_PLANNER_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def predict_tools(message: str) -> List[str]:
+    """訊息 → 可能相關的工具名稱（純規則，無 LLM）。"""
+    text = message or ""
+    return [name for name, rule in TOOL_RULES.items() if rule.search(text)]
 
 
 class RulePlanner:
@@ -28,35 +59,43 @@ class RulePlanner:
                     reason="tools_disabled",
                     steps=[PlanStep(action="answer", rationale="no tools")],
                 )
+            tools = predict_tools(request.user_message)
+            exposed = tools if tool_planner_enabled() else None
+            tool_steps = [
+                PlanStep(action="tool", tool_name=name, rationale="rule matched")
+                for name in tools
+            ]
             if request.car_mode or request.voice_mode:
                 # 車載/語音：仍可工具，但標記 short
-                if _TOOL_HINTS.search(request.user_message or ""):
+                if tools:
                     return Plan(
                         action=PlanAction.USE_TOOLS,
                         allow_tools=True,
                         reason="voice_or_car_with_tool_hint",
-                        steps=[
-                            PlanStep(action="tool", rationale="hint matched"),
-                            PlanStep(action="answer", rationale="summarize short"),
-                        ],
+                        tools=exposed,
+                        steps=tool_steps
+                        + [PlanStep(action="answer", rationale="summarize short")],
                     )
                 return Plan(
                     action=PlanAction.SHORT_VOICE,
                     allow_tools=False,
                     reason="voice_direct",
+                    tools=[],
                     steps=[PlanStep(action="answer", rationale="short voice reply")],
                 )
-            if _TOOL_HINTS.search(request.user_message or ""):
+            if tools:
                 return Plan(
                     action=PlanAction.USE_TOOLS,
                     allow_tools=True,
                     reason="rule_tool_hint",
-                    steps=[PlanStep(action="tool", rationale="keyword")],
+                    tools=exposed,
+                    steps=tool_steps,
                 )
             return Plan(
                 action=PlanAction.DIRECT_ANSWER,
                 allow_tools=False,
                 reason="default_chat",
+                tools=[],
                 steps=[PlanStep(action="answer", rationale="direct")],
             )
         except Exception:
@@ -79,3 +118,17 @@ def plan_request(request: KernelRequest, *, use_tools: bool = True) -> Plan:
         return Plan.model_validate(raw.model_dump())
     except ValidationError:
         return _fallback_plan()
+
+
+def select_tool_definitions(
+    definitions: List[dict], tools: Optional[List[str]]
+) -> List[dict]:
+    """依 Plan.tools 裁剪 tools 陣列；tools=None 不裁剪。"""
+    if tools is None:
+        return list(definitions or [])
+    wanted = set(tools)
+    return [
+        d
+        for d in definitions or []
+        if ((d.get("function") or {}).get("name") if isinstance(d, dict) else None) in wanted
+    ]
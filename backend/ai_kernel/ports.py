@@ -85,6 +85,17 @@ class ModelGatewayPort(Protocol):
         max_tokens: int,
     ) -> AsyncIterator[Dict[str, Any]]: ...
 
+    # 選用：supports_tool_streaming 為 True 時才會被呼叫
+    def stream_with_tools(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        *,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+    ) -> AsyncIterator[Dict[str, Any]]: ...
+
 
 class ToolExecutorPort(Protocol):
     def openai_definitions(self) -> List[Dict[str, Any]]: ...
@@ -9,14 +9,19 @@
   回傳 messages / tools_used / events；可選 content（非串流時）
 
 串流最終答案由 Kernel.run_stream 在 tools 結束後呼叫 model.stream(messages)。
+gateway 支援 stream_with_tools 時改走 stream_tool_rounds()：每輪直接串流，
+模型不用工具的回答即是最終答案，不再多一次呼叫。
 """
 from __future__ import annotations
 
+import json
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+from backend.ai_kernel.context import _est_tokens
 from backend.ai_kernel.errors import AgentLoopLimitError
 from backend.ai_kernel.models import KernelContext, KernelRequest
+from backend.ai_kernel.planner import select_tool_definitions
 from backend.ai_kernel.ports import ModelGatewayPort, ToolExecutorPort
 from backend.ai_kernel.tool_policy.policy import ToolPolicy
 from backend.ai_kernel.tracing import KernelTrace
@@ -59,24 +64,10 @@ class AgentLoop:
         events: List[Dict[str, Any]] = []
         usage_acc = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
 
-        allow_plan = bool(ctx.plan and ctx.plan.allow_tools and (req.use_tools if req else True))
-        raw_defs = self.tools.openai_definitions() if allow_plan else []
-        decision = self.policy.decide_exposure(
-            raw_defs, req, allow_tools=allow_plan
-        )
-        defs = decision.filtered_definitions
+        defs, skip_event = self._exposed_definitions(ctx, req, messages)
 
-        if not decision.allowed or not defs:
-            events.append(
-                {
-                    "type": "tool_status",
-                    "status": "skipped",
-                    "message": decision.reason
-                    if decision.reason != "ok"
-                    else "本次無需使用工具",
-                    "tools": [],
-                }
-            )
+        if skip_event:
+            events.append(skip_event)
             return {
                 "messages": messages,
                 "tools_used": tools_used,
@@ -199,129 +190,26 @@ class AgentLoop:
                 }
 
             # --- 執行本輪工具（policy 逐一檢查）---
-            if tool_resp.get("raw_message") is not None:
-                messages.append(tool_resp["raw_message"])
-            else:
-                messages.append(
-                    {
-                        "role": "assistant",
-                        "content": tool_resp.get("content") or "",
-                        "tool_calls": tool_calls,
-                    }
-                )
-
-            # 截斷單輪數量
-            limited_calls = list(tool_calls)[: self.policy.max_tools()]
-            # 過濾被 policy 拒絕的 call（仍需回 tool message 以免 API 報錯）
-            allowed_calls = []
-            denied_results = []
-            for tc in limited_calls:
-                name = ""
-                try:
-                    name = tc.function.name
-                except Exception:
-                    name = getattr(getattr(tc, "function", None), "name", "") or "unknown"
-                dec = self.policy.may_execute(name)
-                if not dec.allowed:
-                    denied_results.append(
-                        {
-                            "name": name,
-                            "display_name": name,
-                            "icon": "🚫",
-                            "ok": False,
-                            "tool_call_id": getattr(tc, "id", "unknown"),
-                            "content": f"[TOOL_DENIED] {dec.reason}",
-                            "error": dec.reason,
-                            "error_code": "policy_denied",
-                        }
-                    )
-                else:
-                    allowed_calls.append(tc)
-
-            events.append(
-                {
-                    "type": "tool_status",
-                    "status": "running",
-                    "message": f"正在執行工具（第 {iterations} 輪）…",
-                    "tools": [
-                        {
-                            "name": getattr(getattr(c, "function", None), "name", "?"),
-                            "phase": "running",
-                        }
-                        for c in allowed_calls
-                    ],
-                    "step": iterations,
-                    "total": max_iter,
-                }
-            )
-
-            exec_results: List[Dict[str, Any]] = []
-            if allowed_calls and not self.policy.shadow:
-                exec_results = await self.tools.execute_calls(
-                    allowed_calls,
-                    context={"user_id": user_id},
-                    max_calls=self.policy.max_tools(),
-                )
-            elif allowed_calls and self.policy.shadow:
-                # Shadow：不執行，回傳 dry-run
-                for c in allowed_calls:
-                    name = getattr(getattr(c, "function", None), "name", "unknown")
-                    exec_results.append(
-                        {
-                            "name": name,
-                            "display_name": name,
-                            "icon": "🌑",
-                            "ok": True,
-                            "tool_call_id": getattr(c, "id", "unknown"),
-                            "content": "[SHADOW] tool not executed",
-                            "error": None,
-                            "error_code": None,
-                        }
-                    )
-
-            all_results = denied_results + exec_results
-            live = []
-            for r in all_results:
-                # 截斷輸出
-                content = str(r.get("content") or "")
-                max_out = self.policy.max_tool_output_chars()
-                if len(content) > max_out:
-                    content = content[:max_out] + "\n...(truncated)"
-                    r = {**r, "content": content}
-                tools_used.append(r)
-                total_tool_calls += 1
-                live.append(
-                    {
-                        "name": r.get("name"),
-                        "display_name": r.get("display_name") or r.get("name"),
-                        "icon": r.get("icon") or "🔧",
-                        "ok": r.get("ok"),
-                        "phase": "done" if r.get("ok") else "error",
-                    }
-                )
-                messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": r.get("tool_call_id") or "unknown",
-                        "content": r.get("content") or "",
-                    }
-                )
-
-            events.append(
-                {
-                    "type": "tool_status",
-                    "status": "progress",
-                    "message": f"第 {iterations} 輪工具完成",
-                    "tools": live,
-                    "step": iterations,
-                    "total": max_iter,
-                }
+            round_events, all_results = await self._execute_round(
+                tool_calls,
+                tool_resp.get("raw_message"),
+                tool_resp.get("content") or "",
+                messages,
+                tools_used,
+                user_id=user_id,
+                iterations=iterations,
+                max_iter=max_iter,
             )
+            events.extend(round_events)
+            total_tool_calls += len(all_results)
             if self.trace:
                 self.trace.end(
                     f"agent_iter_{iterations}",
                     status="ok",
-                    counts={"tools": len(all_results)},
+                    counts={
+                        "tools": len(all_results),
+                        "cache_hits": sum(1 for r in all_results if r.get("cached")),
+                    },
                 )
             # 繼續 while：讓模型看 tool 結果再決定是否再呼叫工具
 
@@ -346,6 +234,165 @@ class AgentLoop:
             "limit_hit": "max_iterations",
         }
 
+    async def stream_tool_rounds(
+        self,
+        ctx: KernelContext,
+        *,
+        user_id: str,
+        request: Optional[KernelRequest] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        串流版工具多輪：每輪以 model.stream_with_tools 呼叫。
+        模型直接回答時 content 立即轉出（不再多一次非串流判斷回合）；
+        回傳 tool_calls 時執行工具後進入下一輪。
+
+        yield:
+          {"type": "content", "text": ...}
+          {"type": "tool_status", ...}       # 與 run_tool_rounds events 相同
+          {"type": "rounds_done", messages, tools_used, usage,
+           needs_final_generation, streamed_content[, limit_hit]}  # 最後一個
+        """
+        req = request or ctx.request
+        messages = list(ctx.messages)
+        model = ctx.model_config_obj.model
+        temperature = ctx.strategy.temperature
+        tools_used: List[Dict[str, Any]] = []
+        usage_acc = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+        def _done(needs_final: bool, streamed: str = "", **extra) -> Dict[str, Any]:
+            return {
+                "type": "rounds_done",
+                "messages": messages,
+                "tools_used": tools_used,
+                "usage": usage_acc,
+                "needs_final_generation": needs_final,
+                "streamed_content": streamed,
+                **extra,
+            }
+
+        defs, skip_event = self._exposed_definitions(ctx, req, messages)
+        if skip_event:
+            yield skip_event
+            yield _done(True)
+            return
+
+        yield {
+            "type": "tool_status",
+            "status": "planning",
+            "message": "正在判斷是否需要使用工具…",
+            "tools": [],
+        }
+
+        t0 = time.perf_counter()
+        iterations = 0
+        max_iter = self.policy.max_iterations()
+        while iterations < max_iter:
+            iterations += 1
+            if time.perf_counter() - t0 > self.policy.max_tool_seconds():
+                yield {
+                    "type": "tool_status",
+                    "status": "error",
+                    "message": "工具總時限已到，改為直接回答",
+                    "tools": [],
+                }
+                yield _done(True, limit_hit="max_total_tool_seconds")
+                return
+
+            if self.trace:
+                self.trace.start(f"agent_iter_{iterations}")
+
+            streamed = ""
+            tool_event: Optional[Dict[str, Any]] = None
+            failed = False
+            async for ev in self.model.stream_with_tools(
+                messages,
+                tools=defs,
+                model=model,
+                temperature=temperature,
+                max_tokens=ctx.strategy.max_tokens,
+            ):
+                etype = ev.get("type")
+                if etype == "content":
+                    text = ev.get("text") or ""
+                    if not text:
+                        continue
+                    if not streamed:
+                        # 第一個 delta 是文字：以中性狀態清掉前端「判斷中」後直接轉出。
+                        # 文字可能只是呼叫工具前的開場白，不能先宣告「無需使用工具」
+                        yield {
+                            "type": "tool_status",
+                            "status": "responding",
+                            "message": "正在產生回覆…",
+                            "tools": [],
+                        }
+                    streamed += text
+                    yield {"type": "content", "text": text}
+                elif etype == "tool_calls":
+                    tool_event = ev
+                elif etype == "usage":
+                    self._merge_usage(usage_acc, ev.get("usage") or {})
+                elif etype == "error":
+                    failed = True
+
+            tool_calls = (tool_event or {}).get("tool_calls") or []
+            if failed and not streamed and not tool_calls:
+                yield {
+                    "type": "tool_status",
+                    "status": "error",
+                    "message": "工具階段失敗，改為直接回答",
+                    "tools": [],
+                }
+                if self.trace:
+                    self.trace.end(
+                        f"agent_iter_{iterations}",
+                        status="error",
+                        error_code="tool_calling_error",
+                    )
+                yield _done(True)
+                return
+
+            if not tool_calls:
+                if self.trace:
+                    self.trace.end(
+                        f"agent_iter_{iterations}",
+                        status="ok",
+                        counts={"tools": 0, "streamed": 1 if streamed else 0},
+                    )
+                yield _done(not streamed.strip(), streamed)
+                return
+
+            round_events, all_results = await self._execute_round(
+                tool_calls,
+                tool_event.get("raw_message"),
+                streamed,
+                messages,
+                tools_used,
+                user_id=user_id,
+                iterations=iterations,
+                max_iter=max_iter,
+            )
+            for ev in round_events:
+                yield ev
+            if self.trace:
+                self.trace.end(
+                    f"agent_iter_{iterations}",
+                    status="ok",
+                    counts={
+                        "tools": len(all_results),
+                        "cache_hits": sum(1 for r in all_results if r.get("cached")),
+                    },
+                )
+
+        yield {
+            "type": "tool_status",
+            "status": "done",
+            "message": f"已達 Agent 迭代上限（{max_iter}），產生最終回答",
+            "tools": [],
+            "step": max_iter,
+            "total": max_iter,
+        }
+        yield _done(True, limit_hit="max_iterations")
+
     async def run(
         self,
         ctx: KernelContext,
@@ -405,6 +452,198 @@ class AgentLoop:
             "needs_final_generation": False,
         }
 
+    def _exposed_definitions(
+        self,
+        ctx: KernelContext,
+        req: Optional[KernelRequest],
+        messages: List[Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """本次暴露給模型的 tools；不需工具回合時回傳 ([], skipped 事件)。"""
+        tools_requested = req.use_tools if req else True
+        allow_plan = bool(ctx.plan and ctx.plan.allow_tools and tools_requested)
+        all_defs = self.tools.openai_definitions() if tools_requested else []
+        # Planner 預測的工具子集；plan.tools=None 時不裁剪
+        raw_defs = (
+            select_tool_definitions(all_defs, ctx.plan.tools) if allow_plan else []
+        )
+        decision = self.policy.decide_exposure(
+            raw_defs, req, allow_tools=allow_plan
+        )
+        defs = decision.filtered_definitions
+        skip_round = not decision.allowed or not defs
+        self._record_tool_schema(all_defs, defs, messages, skipped=skip_round)
+        if not skip_round:
+            return defs, None
+        return [], {
+            "type": "tool_status",
+            "status": "skipped",
+            "message": decision.reason
+            if decision.reason != "ok"
+            else "本次無需使用工具",
+            "tools": [],
+        }
+
+    async def _execute_round(
+        self,
+        tool_calls: list,
+        raw_message: Any,
+        assistant_content: str,
+        messages: List[Dict[str, Any]],
+        tools_used: List[Dict[str, Any]],
+        *,
+        user_id: str,
+        iterations: int,
+        max_iter: int,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """執行一輪 tool_calls：寫回 messages / tools_used，回傳 (events, results)。"""
+        events: List[Dict[str, Any]] = []
+        if raw_message is not None:
+            messages.append(raw_message)
+        else:
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": assistant_content,
+                    "tool_calls": tool_calls,
+                }
+            )
+
+        # 截斷單輪數量
+        limited_calls = list(tool_calls)[: self.policy.max_tools()]
+        # 過濾被 policy 拒絕的 call（仍需回 tool message 以免 API 報錯）
+        allowed_calls = []
+        denied_results = []
+        for tc in limited_calls:
+            name = ""
+            try:
+                name = tc.function.name
+            except Exception:
+                name = getattr(getattr(tc, "function", None), "name", "") or "unknown"
+            dec = self.policy.may_execute(name)
+            if not dec.allowed:
+                denied_results.append(
+                    {
+                        "name": name,
+                        "display_name": name,
+                        "icon": "🚫",
+                        "ok": False,
+                        "tool_call_id": getattr(tc, "id", "unknown"),
+                        "content": f"[TOOL_DENIED] {dec.reason}",
+                        "error": dec.reason,
+                        "error_code": "policy_denied",
+                    }
+                )
+            else:
+                allowed_calls.append(tc)
+
+        events.append(
+            {
+                "type": "tool_status",
+                "status": "running",
+                "message": f"正在執行工具（第 {iterations} 輪）…",
+                "tools": [
+                    {
+                        "name": getattr(getattr(c, "function", None), "name", "?"),
+                        "phase": "running",
+                    }
+                    for c in allowed_calls
+                ],
+                "step": iterations,
+                "total": max_iter,
+            }
+        )
+
+        exec_results: List[Dict[str, Any]] = []
+        if allowed_calls and not self.policy.shadow:
+            exec_results = await self.tools.execute_calls(
+                allowed_calls,
+                context={"user_id": user_id},
+                max_calls=self.policy.max_tools(),
+            )
+        elif allowed_calls and self.policy.shadow:
+            # Shadow：不執行，回傳 dry-run
+            for c in allowed_calls:
+                name = getattr(getattr(c, "function", None), "name", "unknown")
+                exec_results.append(
+                    {
+                        "name": name,
+                        "display_name": name,
+                        "icon": "🌑",
+                        "ok": True,
+                        "tool_call_id": getattr(c, "id", "unknown"),
+                        "content": "[SHADOW] tool not executed",
+                        "error": None,
+                        "error_code": None,
+                    }
+                )
+
+        all_results = denied_results + exec_results
+        live = []
+        for r in all_results:
+            # 截斷輸出
+            content = str(r.get("content") or "")
+            max_out = self.policy.max_tool_output_chars()
+            if len(content) > max_out:
+                content = content[:max_out] + "\n...(truncated)"
+                r = {**r, "content": content}
+            tools_used.append(r)
+            live.append(
+                {
+                    "name": r.get("name"),
+                    "display_name": r.get("display_name") or r.get("name"),
+                    "icon": r.get("icon") or "🔧",
+                    "ok": r.get("ok"),
+                    "phase": "done" if r.get("ok") else "error",
+                    "cached": bool(r.get("cached")),
+                }
+            )
+            messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": r.get("tool_call_id") or "unknown",
+                    "content": r.get("content") or "",
+                }
+            )
+
+        events.append(
+            {
+                "type": "tool_status",
+                "status": "progress",
+                "message": f"第 {iterations} 輪工具完成",
+                "tools": live,
+                "step": iterations,
+                "total": max_iter,
+            }
+        )
+        return events, all_results
+
+    def _record_tool_schema(
+        self,
+        all_defs: List[Dict[str, Any]],
+        exposed: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        *,
+        skipped: bool,
+    ) -> None:
+        """記錄 tools 裁剪結果與估計省下的 prompt tokens（trace 關閉時不做事）。"""
+        if not self.trace or not self.trace.enabled or not all_defs:
+            return
+        saved = _schema_tokens(all_defs) - _schema_tokens(exposed)
+        if skipped:
+            # 整輪 complete_with_tools 未送出：連同對話 messages 一併省下
+            saved += sum(_est_tokens(str(m.get("content") or "")) for m in messages)
+        self.trace.start("tool_schema")
+        self.trace.end(
+            "tool_schema",
+            status="skipped" if skipped else "ok",
+            counts={
+                "available": len(all_defs),
+                "exposed": len(exposed),
+                "pruned": len(all_defs) - len(exposed),
+                "prompt_tokens_saved": max(0, saved),
+            },
+        )
+
     def _merge_usage(self, acc: dict, u: dict) -> None:
         if not u:
             return
@@ -417,3 +656,9 @@ class AgentLoop:
                 + int(u.get("completion_tokens") or 0)
             )
         )
+
+
+def _schema_tokens(defs: List[Dict[str, Any]]) -> int:
+    if not defs:
+        return 0
+    return _est_tokens(json.dumps(defs, ensure_ascii=False, separators=(",", ":")))
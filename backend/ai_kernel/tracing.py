@@ -14,6 +14,8 @@ class TraceSpan:
     duration_ms: int = 0
     counts: Dict[str, int] = field(default_factory=dict)
     error_code: Optional[str] = None
+    # 短字串決策（如 plan action/reason/tools）；不放 prompt 或記憶內容
+    detail: Dict[str, str] = field(default_factory=dict)
 
 
 class KernelTrace:
@@ -23,10 +25,25 @@ class KernelTrace:
         self.enabled = enabled
         self.spans: List[TraceSpan] = []
         self._starts: Dict[str, float] = {}
+        self._notes: Dict[str, Dict[str, Any]] = {}
 
     def start(self, stage: str) -> None:
         self._starts[stage] = time.perf_counter()
 
+    def annotate(
+        self,
+        stage: str,
+        *,
+        counts: Optional[Dict[str, int]] = None,
+        detail: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """stage 執行中附加 counts / detail，於 end() 時併入該 span。"""
+        if not self.enabled:
+            return
+        note = self._notes.setdefault(stage, {"counts": {}, "detail": {}})
+        note["counts"].update(counts or {})
+        note["detail"].update({k: str(v)[:120] for k, v in (detail or {}).items()})
+
     def end(
         self,
         stage: str,
@@ -37,6 +54,7 @@ class KernelTrace:
     ) -> None:
         started = self._starts.pop(stage, None)
         ms = int((time.perf_counter() - started) * 1000) if started else 0
+        note = self._notes.pop(stage, None) or {}
         if not self.enabled:
             return
         self.spans.append(
@@ -44,8 +62,9 @@ class KernelTrace:
                 stage=stage,
                 status=status,
                 duration_ms=ms,
-                counts=dict(counts or {}),
+                counts={**note.get("counts", {}), **(counts or {})},
                 error_code=error_code,
+                detail=dict(note.get("detail") or {}),
             )
         )
 
@@ -60,6 +79,7 @@ class KernelTrace:
                     "duration_ms": s.duration_ms,
                     "counts": s.counts,
                     "error_code": s.error_code,
+                    "detail": s.detail,
                 }
                 for s in self.spans
             ],
@@ -0,0 +1,13 @@
+"""
+背景 asyncio task 小工具（chat_router 與 ai_kernel 共用）
+"""
+from __future__ import annotations
+
+import asyncio
+
+
+def discard_task(task: "asyncio.Task") -> None:
+    """取消 task 並吞掉其結果／例外（避免 'exception was never retrieved'）。"""
+    if not task.done():
+        task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
@@ -0,0 +1,214 @@
+"""
+Open WebUI 輔助任務回應快取（title / tags / follow-up / query ...）
+
+Open WebUI 對同一段對話會反覆送出相同的輔助任務；內容相同時結果可重用。
+key = sha256(task + model + 正規化 messages)，只存成功且非空的回覆文字：
+
+- 程序內有界 LRU（AUX_TASK_CACHE_SIZE，TTL = AUX_TASK_CACHE_TTL_SECONDS）
+- 可選 Redis 層 `auxtask:v1:{hash}`（AUX_TASK_CACHE_REDIS），跨 worker 共用
+- single-flight：同一 key 進行中的呼叫只送一次 LLM，其餘等待同一結果
+
+快取以內容定址，不含 user / conversation id；命中者本身已持有相同 messages。
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger("aux_task_cache")
+
+REDIS_KEY_PREFIX = "auxtask:v1:"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def aux_cache_enabled() -> bool:
+    return os.getenv("AUX_TASK_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def _cache_ttl() -> int:
+    return _env_int("AUX_TASK_CACHE_TTL_SECONDS", 3600)
+
+
+def _cache_size() -> int:
+    return _env_int("AUX_TASK_CACHE_SIZE", 1024)
+
+
+def _redis_cache_enabled() -> bool:
+    return os.getenv("AUX_TASK_CACHE_REDIS", "true").lower() not in ("0", "false", "no")
+
+
+def aux_cache_key(task: str, model: str, messages: Iterable[Tuple[str, str]]) -> str:
+    """(task, model, 正規化 messages) → sha256；內容壓縮空白、角色小寫。"""
+    normalized = [
+        [(role or "").lower(), " ".join((text or "").split())]
+        for role, text in messages
+        if (text or "").strip()
+    ]
+    raw = json.dumps(
+        [(task or "").lower(), (model or "").lower(), normalized],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AuxResponseCache:
+    """有界 LRU（含 TTL）+ single-flight；只存回覆文字。"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.redis_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, text = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        size, ttl = _cache_size(), _cache_ttl()
+        if size <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.time() + ttl, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > size:
+            self._entries.popitem(last=False)
+
+    def _inflight_for(self, key: str) -> Optional[asyncio.Future]:
+        fut = self._inflight.get(key)
+        if fut is None or fut.done():
+            return None
+        try:
+            if fut.get_loop() is not asyncio.get_running_loop():
+                return None
+        except RuntimeError:
+            return None
+        return fut
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Optional[str]]]
+    ) -> Tuple[Optional[str], bool]:
+        """
+        回傳 (text, cached)。compute() 回傳 None / 空字串 → 不快取（錯誤、被擋）。
+        compute() 拋例外時原樣拋出，等待中的呼叫改為各自 compute。
+        """
+        text = self.get(key)
+        if text is not None:
+            self.hits += 1
+            return text, True
+
+        flight = self._inflight_for(key)
+        if flight is not None:
+            shared = await asyncio.shield(flight)
+            if shared:
+                self.coalesced += 1
+                return shared, True
+
+        text = await _redis_get(key)
+        if text:
+            self.redis_hits += 1
+            self.put(key, text)
+            return text, True
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        result: Optional[str] = None
+        try:
+            result = await compute()
+            if result:
+                self.put(key, result)
+                await _redis_put(key, result)
+            return result, False
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+            if not fut.done():
+                fut.set_result(result)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.redis_hits = self.coalesced = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+        }
+
+
+def _shared_redis():
+    if not _redis_cache_enabled() or _cache_ttl() <= 0:
+        return None
+    try:
+        from backend.redis_interface import get_shared_redis_interface
+
+        ri = get_shared_redis_interface()
+        return ri if getattr(ri, "redis", None) else None
+    except Exception:
+        return None
+
+
+async def _redis_get(key: str) -> Optional[str]:
+    ri = _shared_redis()
+    if ri is None:
+        return None
+    try:
+        raw = await ri.acall("get", REDIS_KEY_PREFIX + key)
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return raw or None
+    except Exception as e:
+        logger.warning(f"⚠️ 輔助任務快取讀取失敗: {e}")
+        return None
+
+
+async def _redis_put(key: str, text: str) -> None:
+    ri = _shared_redis()
+    if ri is None:
+        return
+    try:
+        await ri.acall("setex", REDIS_KEY_PREFIX + key, _cache_ttl(), text)
+    except Exception as e:
+        logger.warning(f"⚠️ 輔助任務快取寫入失敗: {e}")
+
+
+_cache = AuxResponseCache()
+
+
+def get_aux_cache() -> AuxResponseCache:
+    return _cache
+
+
+def clear_aux_cache() -> None:
+    """清空程序內快取與統計（測試用）。"""
+    _cache.clear()
+
+
+def aux_cache_stats() -> Dict[str, int]:
+    return _cache.stats()
@@ -2,7 +2,7 @@ import asyncio # ✅ 新增匯入，用於後台任務
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Query # ✅ 匯入 BackgroundTasks, Query
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import os
 import logging
 import json
@@ -11,14 +11,42 @@ import traceback # 確保 traceback 也在
 # *** 請確保這些模組在你的 backend/ 目錄中可被正確匯入 ***
 from backend.supabase_handler import get_supabase
 supabase = get_supabase()
-from backend.openai_handler import get_openai_client, generate_response, generate_response_stream, generate_response_with_tools
+from backend.openai_handler import (
+    get_openai_client,
+    generate_response,
+    generate_response_stream,
+    generate_response_stream_with_tools,
+    generate_response_with_tools,
+    stream_tool_round_enabled,
+)
 from backend.prompt_engine import PromptEngine
 from modules.memory_system import MemorySystem
 from backend.redis_interface import get_shared_redis_interface
 from backend.core_controller import get_core_controller
 from backend.tools import get_tool_registry, get_openai_tool_definitions
+from backend.ai_kernel.planner import (
+    predict_tools,
+    select_tool_definitions,
+    tool_planner_enabled,
+)
 from backend.token_tracker import get_token_tracker, estimate_cost_usd
 from backend.moderation import moderate_text, format_block_message
+from backend.async_tasks import discard_task
+from backend.client_history import aresolve_client_history
+from backend.conversation_compactor import acompact, acompacted_history, compaction_enabled
+from backend.stream_coalescer import coalesce_policy
+from backend.stream_protocol import (
+    TOOL_EVENT_PREFIX,
+    USAGE_META_PREFIX,
+    EventStreamingResponse,
+    StreamEvent,
+    encode_plain,
+)
+from backend.output_moderation import (
+    OUTPUT_BLOCK_MESSAGE,
+    IncrementalModerator,
+    output_moderation_enabled,
+)
 
 router = APIRouter()
 logger = logging.getLogger("chat_router")
@@ -46,9 +74,6 @@ def _build_memory_system(openai_client, memories_table: str):
         logger.warning("Memory V2 factory failed, fallback V1: %s", e)
     return MemorySystem(supabase, openai_client, memories_table)
 
-# 串流事件 / 用量 meta 標記（前端可解析）
-USAGE_META_PREFIX = "\n__XCG_META__"
-TOOL_EVENT_PREFIX = "__XCG_EVENT__"
 
 _reflection_storage = None
 
@@ -93,6 +118,9 @@ class ChatRequest(BaseModel):
     car_mode: bool = False  # 車載：更短、重點前置
     input_method: str = "text"  # text | voice
     speak_response: bool = False  # 前端是否會朗讀（供後端日誌/策略）
+    # OpenAI 相容入口：client 帶來的歷史（已裁切/清理的 user/assistant 訊息）。
+    # 非 None 時以此組 conversation_history，不讀 Supabase 歷史。
+    client_history: Optional[List[Dict[str, str]]] = None
     
 class ChatResponse(BaseModel):
     assistant_message: str
@@ -107,7 +135,55 @@ class ChatResponse(BaseModel):
     speech_text: Optional[str] = None  # TTS 友善純文字
 
 
-def _tool_event_payload(
+def _planned_tool_definitions(message: str) -> list:
+    """依 RulePlanner 預測只暴露相關工具；無相關工具 → []（跳過 tool round）。"""
+    all_defs = get_openai_tool_definitions()
+    if not all_defs or not tool_planner_enabled():
+        return all_defs
+    names = predict_tools(message)
+    defs = select_tool_definitions(all_defs, names)
+    logger.info(
+        f"🧭 tool plan: exposed={len(defs)}/{len(all_defs)} "
+        f"tools={','.join(names) or '-'}"
+    )
+    return defs
+
+
+async def _tool_round_events(messages, *, tools, model, temperature, max_tokens):
+    """STREAM_TOOL_ROUND_ENABLED=false：非串流工具回合包成與串流版相同的事件。
+
+    文字回答不轉出（由後續 generate_response_stream 重新串流）。
+    """
+    tool_response = await generate_response_with_tools(
+        messages,
+        tools=tools,
+        model=model,
+        temperature=temperature,
+        max_tokens=min(1000, max_tokens),
+    )
+    if tool_response.get("finish_reason") == "error":
+        yield {"type": "error", "error": tool_response.get("error") or "error"}
+    elif (
+        tool_response.get("finish_reason") == "tool_calls"
+        and tool_response.get("tool_calls")
+    ):
+        yield {
+            "type": "tool_calls",
+            "tool_calls": tool_response["tool_calls"],
+            "raw_message": tool_response.get("raw_message"),
+        }
+    yield {"type": "usage", "usage": tool_response.get("usage")}
+
+
+def _coalesce_policy_for(request: "ChatRequest"):
+    """串流輸出合併：依 client_id / 語音模式決定時間窗（首段立即送出）。"""
+    return coalesce_policy(
+        client_id=request.client_id,
+        voice=bool(request.voice_mode or request.car_mode),
+    )
+
+
+def _tool_event(
     status: str,
     results_or_calls=None,
     *,
@@ -115,8 +191,8 @@ def _tool_event_payload(
     total: Optional[int] = None,
     message: str = "",
     tools: Optional[list] = None,
-) -> str:
-    """產生前端可解析的工具狀態事件行。"""
+) -> StreamEvent:
+    """工具狀態事件（型別化；text/plain 出口編成 __XCG_EVENT__ 行）。"""
     tool_list = list(tools or [])
     if not tool_list:
         for item in results_or_calls or []:
@@ -165,7 +241,12 @@ def _tool_event_payload(
         "total": total if total is not None else len(tool_list),
         "message": message,
     }
-    return TOOL_EVENT_PREFIX + json.dumps(payload, ensure_ascii=False)
+    return StreamEvent("tool_status", payload)
+
+
+def _tool_event_payload(*args, **kwargs) -> str:
+    """產生前端可解析的工具狀態事件行（不含結尾換行）。"""
+    return encode_plain(_tool_event(*args, **kwargs)).rstrip("\n")
 
 
 def _merge_usage(*usages: Optional[Dict[str, Any]]) -> Dict[str, int]:
@@ -325,6 +406,164 @@ async def run_post_chat_tasks(
     except Exception as e:
         logger.warning(f"⚠️ 背景任務處理失敗: {e}", exc_info=True)
 
+    # === 階段4：滾動摘要（最近 N 輪視窗外的輪次併入摘要）===
+    try:
+        await acompact(
+            memory_system.supabase,
+            memories_table,
+            request.conversation_id,
+            request.user_id,
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ 背景：對話壓縮失敗: {e}")
+
+
+async def _generate_non_stream(
+    openai_client,
+    messages,
+    *,
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    moderator: Optional[IncrementalModerator] = None,
+) -> Dict[str, Any]:
+    """
+    非串流最終回答（回傳格式同 generate_response(return_usage=True)）。
+
+    有 moderator 時內部改走串流：句子一完成就送審核視窗，與生成重疊；
+    視窗被攔截即停止生成。串流錯誤事件轉成例外，沿用原本的降級流程。
+    """
+    if moderator is None:
+        return await generate_response(
+            openai_client,
+            messages,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            return_usage=True,
+        )
+    parts: List[str] = []
+    usage: Dict[str, Any] = {}
+    agen = generate_response_stream(
+        messages, model=model, temperature=temperature, max_tokens=max_tokens
+    )
+    try:
+        async for event in agen:
+            if event.get("type") == "content":
+                text = event.get("text") or ""
+                if text.startswith("[ERROR]"):
+                    raise RuntimeError(text)
+                parts.append(text)
+                moderator.feed(text)
+                if moderator.blocked:
+                    break
+            elif event.get("type") == "usage":
+                usage = event.get("usage") or {}
+    finally:
+        await agen.aclose()
+    return {"content": "".join(parts), "usage": usage, "model": model}
+
+
+async def _client_conversation_history(request: "ChatRequest") -> str:
+    """OpenAI 相容入口：client 歷史 + Redis 最後一輪差異（不讀 Supabase）。"""
+    return await aresolve_client_history(
+        request.conversation_id,
+        request.client_history or [],
+        redis_interface if redis_interface.redis else None,
+        current_message=request.user_message,
+    )
+
+
+async def _conversation_history(request: "ChatRequest", memory_system) -> str:
+    """Supabase 歷史：長對話用「滾動摘要 + 最近 N 輪」；尚無摘要時照舊取最近 5 輪原文。"""
+    if compaction_enabled():
+        try:
+            text = await acompacted_history(
+                memory_system.supabase,
+                memory_system.memories_table,
+                request.conversation_id,
+                request.user_id,
+            )
+            if text is not None:
+                return text
+        except Exception as e:
+            logger.warning(f"⚠️ 讀取滾動摘要失敗，改用原始歷史: {e}")
+    return memory_system.get_conversation_history(
+        request.conversation_id,
+        limit=5,
+    )
+
+
+async def _load_chat_context(request: "ChatRequest", memory_system, _req_timer):
+    """
+    Legacy /chat 讀取階段：記憶召回、Supabase 歷史、最新 upload。
+    與輸入審核並行執行；審核攔截時由呼叫端 cancel。
+    回傳 (recalled_memories, conversation_history, file_content)。
+    """
+    # Task007: ephemeral (aux task / untrusted identity) => no persistent recall/history read
+    if getattr(request, "suppress_memory", False):
+        recalled_memories = ""
+        conversation_history = ""
+    elif _req_timer:
+        with _req_timer.stage("memory_recall"):
+            recalled_memories = await memory_system.recall_memories(
+                request.user_message,
+                request.conversation_id,
+                user_id=request.user_id,
+                ai_id=getattr(request, "ai_id", None),
+            )
+        if request.client_history is not None:
+            with _req_timer.stage("client_history"):
+                conversation_history = await _client_conversation_history(request)
+        else:
+            with _req_timer.stage("supabase_history"):
+                conversation_history = await _conversation_history(request, memory_system)
+    else:
+        recalled_memories = await memory_system.recall_memories(
+            request.user_message,
+            request.conversation_id,
+            user_id=request.user_id,
+            ai_id=getattr(request, "ai_id", None),
+        )
+        if request.client_history is not None:
+            conversation_history = await _client_conversation_history(request)
+        else:
+            conversation_history = await _conversation_history(request, memory_system)
+
+    # Retrieve file / vision content from Redis
+    file_content = ""
+    try:
+        async def _load_upload():
+            nonlocal file_content
+            if redis_interface.redis:
+                latest_key, file_data_json = await redis_interface.alatest_upload(
+                    request.conversation_id
+                )
+                if file_data_json:
+                    file_data = json.loads(file_data_json)
+                    file_content = (
+                        file_data.get("vision_analysis")
+                        or file_data.get("content")
+                        or ""
+                    )
+                    if file_data.get("is_image"):
+                        fname = file_data.get("file_name") or "image"
+                        file_content = (
+                            f"【使用者上傳圖片：{fname}】\n"
+                            f"視覺分析：\n{file_content}"
+                        )
+                    logger.info(f"📄 成功從 Redis 檢索檔案內容: {latest_key}")
+
+        if _req_timer:
+            with _req_timer.stage("redis_upload_read"):
+                await _load_upload()
+        else:
+            await _load_upload()
+    except Exception as e:
+        logger.warning(f"⚠️ 從 Redis 檢索檔案內容失敗: {e}")
+
+    return recalled_memories, conversation_history, file_content
+
 
 async def _try_kernel_chat(
     request: ChatRequest,
@@ -380,6 +619,7 @@ async def _try_kernel_chat(
         car_mode=request.car_mode,
         input_method=request.input_method,
         speak_response=request.speak_response,
+        client_history=request.client_history,
         use_tools=use_tools,
         stream=stream,
         request_id=get_request_id() or "",
@@ -421,21 +661,14 @@ async def _try_kernel_chat(
                                 "total": ev.data.get("total"),
                                 "message": ev.text or ev.data.get("message") or "",
                             }
-                            yield TOOL_EVENT_PREFIX + json.dumps(
-                                payload, ensure_ascii=False
-                            ) + "\n"
+                            yield StreamEvent("tool_status", payload)
                         elif ev.type == "usage":
-                            meta = dict(ev.data or {})
-                            yield USAGE_META_PREFIX + json.dumps(
-                                meta, ensure_ascii=False
-                            )
+                            yield StreamEvent("usage", dict(ev.data or {}))
                 except BudgetExceededError as be:
                     yield f"[ERROR] budget_exceeded: {be.message}"
                 except ModerationBlockedError as me:
                     yield me.message or "內容未通過安全審核"
-                    yield USAGE_META_PREFIX + json.dumps(
-                        {"blocked": True, "usage": {}}, ensure_ascii=False
-                    )
+                    yield StreamEvent("usage", {"blocked": True, "usage": {}})
                 except Exception as ex:
                     if flags.fallback_to_legacy_on_fatal:
                         logger.warning(
@@ -444,9 +677,9 @@ async def _try_kernel_chat(
                         )
                     yield f"[ERROR] Kernel: {type(ex).__name__}"
 
-            return StreamingResponse(
+            return EventStreamingResponse(
                 stream_gen(),
-                media_type="text/plain; charset=utf-8",
+                policy=_coalesce_policy_for(request),
                 headers={
                     "Cache-Control": "no-cache, no-transform",
                     "X-Accel-Buffering": "no",
@@ -549,9 +782,29 @@ async def chat(
                 },
             )
 
-        # --- 內容安全審核（輸入）---
-        moderation = await moderate_text(request.user_message, client=openai_client)
+        # --- 內容安全審核（輸入）與讀取任務並行：審核不再阻塞召回 ---
+        moderation_task = asyncio.create_task(
+            moderate_text(request.user_message, client=openai_client)
+        )
+        try:
+            memory_system = _build_memory_system(openai_client, memories_table)
+            prompt_engine = PromptEngine(
+                request.conversation_id, memories_table, user_id=request.user_id
+            )
+            load_task = asyncio.create_task(
+                _load_chat_context(request, memory_system, _req_timer)
+            )
+        except BaseException:
+            discard_task(moderation_task)
+            raise
+        try:
+            moderation = await moderation_task
+        except BaseException:
+            discard_task(load_task)
+            raise
         if moderation.get("blocked"):
+            # 被攔截：取消尚未完成的召回 / 歷史 / upload 讀取
+            discard_task(load_task)
             msg = format_block_message(moderation)
             logger.warning(
                 f"🚫 使用者訊息被審核攔截 conv={request.conversation_id[:8]}..."
@@ -573,11 +826,10 @@ async def chat(
                             "model": "none",
                         },
                     }
-                    yield USAGE_META_PREFIX + json.dumps(meta, ensure_ascii=False)
+                    yield StreamEvent("usage", meta)
 
-                return StreamingResponse(
+                return EventStreamingResponse(
                     blocked_stream(),
-                    media_type="text/plain; charset=utf-8",
                     headers={
                         "Cache-Control": "no-cache, no-transform",
                         "X-Content-Moderation": "blocked",
@@ -595,75 +847,8 @@ async def chat(
                 },
             )
 
-        memory_system = _build_memory_system(openai_client, memories_table)
-        prompt_engine = PromptEngine(
-            request.conversation_id, memories_table, user_id=request.user_id
-        )
-
-        # 1. 執行所有「讀取」任務（必須在串流前完成）
-        # Task007: ephemeral (aux task / untrusted identity) => no persistent recall/history read
-        if getattr(request, "suppress_memory", False):
-            recalled_memories = ""
-            conversation_history = ""
-        elif _req_timer:
-            with _req_timer.stage("memory_recall"):
-                recalled_memories = await memory_system.recall_memories(
-                    request.user_message,
-                    request.conversation_id,
-                    user_id=request.user_id,
-                    ai_id=getattr(request, "ai_id", None),
-                )
-            with _req_timer.stage("supabase_history"):
-                conversation_history = memory_system.get_conversation_history(
-                    request.conversation_id,
-                    limit=5,
-                )
-        else:
-            recalled_memories = await memory_system.recall_memories(
-                request.user_message,
-                request.conversation_id,
-                user_id=request.user_id,
-                ai_id=getattr(request, "ai_id", None),
-            )
-            conversation_history = memory_system.get_conversation_history(
-                request.conversation_id,
-                limit=5,
-            )
-
-        # Retrieve file / vision content from Redis
-        file_content = ""
-        try:
-            def _load_upload():
-                nonlocal file_content
-                if redis_interface.redis:
-                    keys = redis_interface.scan_keys(
-                        f"upload:{request.conversation_id}:*"
-                    )
-                    if keys:
-                        latest_key = sorted(keys)[-1]
-                        file_data_json = redis_interface.redis.get(latest_key)
-                        if file_data_json:
-                            file_data = json.loads(file_data_json)
-                            file_content = (
-                                file_data.get("vision_analysis")
-                                or file_data.get("content")
-                                or ""
-                            )
-                            if file_data.get("is_image"):
-                                fname = file_data.get("file_name") or "image"
-                                file_content = (
-                                    f"【使用者上傳圖片：{fname}】\n"
-                                    f"視覺分析：\n{file_content}"
-                                )
-                            logger.info(f"📄 成功從 Redis 檢索檔案內容: {latest_key}")
-
-            if _req_timer:
-                with _req_timer.stage("redis_upload_read"):
-                    _load_upload()
-            else:
-                _load_upload()
-        except Exception as e:
-            logger.warning(f"⚠️ 從 Redis 檢索檔案內容失敗: {e}")
+        # 1. 所有「讀取」任務（必須在串流前完成；已與審核並行啟動）
+        recalled_memories, conversation_history, file_content = await load_task
 
         messages, emotion_analysis = await prompt_engine.build_prompt(
             request.user_message,
@@ -761,56 +946,102 @@ async def chat(
 
             async def stream_generator():
                 full_response = ""
+                output_blocked = None
+                out_moderator = (
+                    IncrementalModerator(
+                        lambda window: moderate_text(window, client=openai_client)
+                    )
+                    if output_moderation_enabled()
+                    else None
+                )
                 stream_usage = None
                 tool_usage = None
                 tools_used_meta = []
                 final_messages = messages
+                answer_streamed = False
                 try:
                     # --- Tool calling 階段（逐步推送狀態）---
                     if use_tools:
                         try:
                             registry = get_tool_registry()
-                            tool_defs = get_openai_tool_definitions()
+                            tool_defs = _planned_tool_definitions(request.user_message)
                             if tool_defs:
-                                yield _tool_event_payload(
+                                yield _tool_event(
                                     "planning",
                                     message="正在判斷是否需要使用工具…",
                                     tools=[],
-                                ) + "\n"
+                                )
 
                                 import time as _time_mod
 
                                 _t_tool = _time_mod.perf_counter()
                                 _tool_err = ""
+                                tool_response = {}
+                                # 串流工具回合：模型直接回答時 token 立即送出（不再第二次呼叫）
+                                tool_round = (
+                                    generate_response_stream_with_tools
+                                    if stream_tool_round_enabled()
+                                    else _tool_round_events
+                                )(
+                                    messages,
+                                    tools=tool_defs,
+                                    model=selected_model,
+                                    temperature=selected_temperature,
+                                    max_tokens=stream_max_tokens,
+                                )
                                 try:
-                                    tool_response = await generate_response_with_tools(
-                                        messages,
-                                        tools=tool_defs,
-                                        model=selected_model,
-                                        temperature=selected_temperature,
-                                        max_tokens=1000,
-                                    )
+                                    async for ev in tool_round:
+                                        ev_type = ev.get("type")
+                                        if ev_type == "content":
+                                            if out_moderator and out_moderator.blocked:
+                                                break
+                                            text = ev.get("text") or ""
+                                            if not text:
+                                                continue
+                                            if not answer_streamed:
+                                                # 可能只是工具呼叫前的開場白：送中性狀態，不先宣告「無需使用工具」
+                                                yield _tool_event(
+                                                    "responding",
+                                                    message="正在產生回覆…",
+                                                    tools=[],
+                                                )
+                                                answer_streamed = True
+                                            full_response += text
+                                            if out_moderator:
+                                                out_moderator.feed(text)
+                                            if _req_timer and text.strip():
+                                                _req_timer.note_displayable_text(
+                                                    text,
+                                                    tool_prefix=TOOL_EVENT_PREFIX,
+                                                    meta_prefix=USAGE_META_PREFIX,
+                                                )
+                                            yield text
+                                        elif ev_type == "tool_calls":
+                                            tool_response = ev
+                                        elif ev_type == "usage":
+                                            tool_usage = ev.get("usage")
+                                        elif ev_type == "error":
+                                            _tool_err = "tool_round_error"
                                 except Exception as _te:
                                     _tool_err = type(_te).__name__
                                     raise
                                 finally:
+                                    await tool_round.aclose()
                                     if _req_timer:
                                         _req_timer.record_stage(
                                             "llm_tool_call",
                                             int((_time_mod.perf_counter() - _t_tool) * 1000),
                                             error_type=_tool_err,
                                         )
-                                tool_usage = tool_response.get("usage")
 
-                                if (
-                                    tool_response.get("finish_reason") == "tool_calls"
-                                    and tool_response.get("tool_calls")
-                                ):
+                                if tool_response.get("tool_calls"):
                                     logger.info(
                                         f"🔧 [Streaming] 工具呼叫 x{len(tool_response['tool_calls'])}"
                                     )
                                     final_messages = list(messages)
                                     final_messages.append(tool_response["raw_message"])
+                                    # 工具前的文字已送出；最終答案仍需再串流一次
+                                    answer_streamed = False
 
                                     live_tools = []
                                     tool_results = []
@@ -834,34 +1065,28 @@ async def chat(
                                                     "total": step.get("total"),
                                                 }
                                             )
-                                            yield _tool_event_payload(
+                                            yield _tool_event(
                                                 "running",
                                                 tools=live_tools,
                                                 step=(step.get("index") or 0) + 1,
                                                 total=step.get("total"),
                                                 message=f"正在執行：{step.get('display_name') or step.get('name')}",
-                                            ) + "\n"
+                                            )
                                         elif step.get("type") == "result":
                                             tr = step["result"]
                                             tool_results.append(tr)
-                                            # 更新 live 列表對應項目
+                                            # 更新 live 列表對應項目（並行執行：以 index 對應）
                                             for t in live_tools:
-                                                if t.get("name") == tr.name and t.get("phase") == "running":
+                                                if t.get("index") == tr.index and t.get("phase") == "running":
                                                     t["ok"] = tr.ok
                                                     t["phase"] = "done" if tr.ok else "error"
                                                     t["duration_ms"] = tr.duration_ms
+                                                    t["cached"] = tr.cached
                                                     t["error"] = tr.error
                                                     t["display_name"] = tr.display_name or t.get("display_name")
                                                     t["icon"] = tr.icon or t.get("icon")
                                                     break
-                                            final_messages.append(
-                                                {
-                                                    "role": "tool",
-                                                    "tool_call_id": tr.tool_call_id,
-                                                    "content": tr.content,
-                                                }
-                                            )
-                                            yield _tool_event_payload(
+                                            yield _tool_event(
                                                 "progress",
                                                 tools=live_tools,
                                                 step=len(tool_results),
@@ -869,8 +1094,18 @@ async def chat(
                                                 message=(
                                                     f"{'完成' if tr.ok else '失敗'}：{tr.display_name or tr.name}"
                                                 ),
-                                            ) + "\n"
+                                            )
 
+                                    # 結果依完成順序到達；寫回 messages 時還原原始順序
+                                    tool_results.sort(key=lambda r: r.index)
+                                    for tr in tool_results:
+                                        final_messages.append(
+                                            {
+                                                "role": "tool",
+                                                "tool_call_id": tr.tool_call_id,
+                                                "content": tr.content,
+                                            }
+                                        )
                                     tools_used_meta = [
                                         {
                                             "name": r.name,
@@ -881,83 +1116,104 @@ async def chat(
                                             "arguments": r.arguments,
                                             "error": r.error,
                                             "error_code": r.error_code,
+                                            "cached": r.cached,
                                         }
                                         for r in tool_results
                                     ]
-                                    yield _tool_event_payload(
+                                    yield _tool_event(
                                         "done",
                                         tools=live_tools,
                                         step=len(tool_results),
                                         total=len(tool_results),
                                         message="工具階段完成，正在產生回覆…",
-                                    ) + "\n"
-                                else:
-                                    yield _tool_event_payload(
+                                    )
+                                elif not answer_streamed:
+                                    yield _tool_event(
                                         "skipped",
                                         message="本次無需使用工具",
                                         tools=[],
-                                    ) + "\n"
-                        except Exception as e:
-                            logger.warning(f"⚠️ [Streaming] Tool 階段失敗，改直接串流: {e}")
-                            yield _tool_event_payload(
-                                "error",
-                                message=f"工具階段發生問題，改為直接回答（{type(e).__name__}）",
-                                tools=[],
-                            ) + "\n"
-                            final_messages = messages
-
-                    # 真實 OpenAI stream=True：逐 token 推給前端
-                    import time as _time_mod
-
-                    _t_stream = _time_mod.perf_counter()
-                    _stream_err = ""
-                    try:
-                        async for event in generate_response_stream(
-                            final_messages,
-                            model=selected_model,
-                            temperature=selected_temperature,
-                            max_tokens=stream_max_tokens,
-                        ):
-                            if not isinstance(event, dict):
-                                # 相容舊字串
-                                text = str(event)
-                                full_response += text
-                                if _req_timer:
-                                    _req_timer.note_displayable_text(
-                                        text,
-                                        tool_prefix=TOOL_EVENT_PREFIX,
-                                        meta_prefix=USAGE_META_PREFIX,
-                                    )
-                                yield text
-                                continue
-                            if event.get("type") == "content":
-                                text = event.get("text") or ""
-                                full_response += text
-                                if _req_timer and text.strip():
-                                    _req_timer.note_displayable_text(
-                                        text,
-                                        tool_prefix=TOOL_EVENT_PREFIX,
-                                        meta_prefix=USAGE_META_PREFIX,
                                     )
-                                yield text
-                            elif event.get("type") == "usage":
-                                stream_usage = event.get("usage")
-                    except Exception as _se:
-                        _stream_err = type(_se).__name__
-                        raise
-                    finally:
-                        if _req_timer:
-                            _req_timer.record_stage(
-                                "llm_stream",
-                                int((_time_mod.perf_counter() - _t_stream) * 1000),
-                                error_type=_stream_err,
-                            )
+                        except Exception as e:
+                            if answer_streamed:
+                                # 回答已在串流中途：保留已送出的內容，不重來
+                                logger.warning(f"⚠️ [Streaming] 工具回合串流中斷: {e}")
+                            else:
+                                logger.warning(f"⚠️ [Streaming] Tool 階段失敗，改直接串流: {e}")
+                                yield _tool_event(
+                                    "error",
+                                    message=f"工具階段發生問題，改為直接回答（{type(e).__name__}）",
+                                    tools=[],
+                                )
+                                final_messages = messages
+
+                    # 工具回合已串流出完整回答時不再呼叫第二次
+                    if not answer_streamed:
+                        # 真實 OpenAI stream=True：逐 token 推給前端
+                        import time as _time_mod
+
+                        _t_stream = _time_mod.perf_counter()
+                        _stream_err = ""
+                        try:
+                            async for event in generate_response_stream(
+                                final_messages,
+                                model=selected_model,
+                                temperature=selected_temperature,
+                                max_tokens=stream_max_tokens,
+                            ):
+                                if out_moderator and out_moderator.blocked:
+                                    # 背景視窗已判定違規：不再送出後續 token
+                                    break
+                                if not isinstance(event, dict):
+                                    # 相容舊字串
+                                    text = str(event)
+                                    full_response += text
+                                    if out_moderator:
+                                        out_moderator.feed(text)
+                                    if _req_timer:
+                                        _req_timer.note_displayable_text(
+                                            text,
+                                            tool_prefix=TOOL_EVENT_PREFIX,
+                                            meta_prefix=USAGE_META_PREFIX,
+                                        )
+                                    yield text
+                                    continue
+                                if event.get("type") == "content":
+                                    text = event.get("text") or ""
+                                    full_response += text
+                                    if out_moderator:
+                                        out_moderator.feed(text)
+                                    if _req_timer and text.strip():
+                                        _req_timer.note_displayable_text(
+                                            text,
+                                            tool_prefix=TOOL_EVENT_PREFIX,
+                                            meta_prefix=USAGE_META_PREFIX,
+                                        )
+                                    yield text
+                                elif event.get("type") == "usage":
+                                    stream_usage = event.get("usage")
+                        except Exception as _se:
+                            _stream_err = type(_se).__name__
+                            raise
+                        finally:
+                            if _req_timer:
+                                _req_timer.record_stage(
+                                    "llm_stream",
+                                    int((_time_mod.perf_counter() - _t_stream) * 1000),
+                                    error_type=_stream_err,
+                                )
+                    if out_moderator:
+                        output_blocked = await out_moderator.finish()
+                        if output_blocked:
+                            yield "\n\n" + OUTPUT_BLOCK_MESSAGE
+                            full_response = OUTPUT_BLOCK_MESSAGE
                 except Exception as e:
                     err = f"[ERROR] Streaming 失敗: {e}"
                     logger.error(err, exc_info=True)
                     full_response = err
                     yield err
                 finally:
+                    if out_moderator:
+                        out_moderator.cancel()
                     # 合併 tool + stream usage 並記錄
                     merged = _merge_usage(tool_usage, stream_usage)
                     usage_payload = None
@@ -1005,15 +1261,21 @@ async def chat(
                             speech_text = full_response
 
                     meta = {
-                        "blocked": False,
+                        "blocked": bool(output_blocked),
                         "usage": usage_payload,
                         "tools_used": tools_used_meta,
                         "speech_text": speech_text,
                         "voice_mode": request.voice_mode,
                         "car_mode": request.car_mode,
                     }
+                    if output_blocked:
+                        meta["moderation"] = {
+                            "stage": "output",
+                            "flagged": output_blocked.get("flagged"),
+                            "flagged_categories": output_blocked.get("flagged_categories"),
+                        }
                     try:
-                        yield USAGE_META_PREFIX + json.dumps(meta, ensure_ascii=False)
+                        yield StreamEvent("usage", meta)
                     except Exception:
                         pass
 
@@ -1025,9 +1287,9 @@ async def chat(
                         _req_timer.mark_complete()
                         _req_timer.log_summary()
 
-            return StreamingResponse(
+            return EventStreamingResponse(
                 stream_generator(),
-                media_type="text/plain; charset=utf-8",
+                policy=_coalesce_policy_for(request),
                 headers={
                     "Cache-Control": "no-cache, no-transform",
                     "X-Accel-Buffering": "no",
@@ -1043,9 +1305,19 @@ async def chat(
         tools_used = []
         import time as _time_mod
 
+        def _output_check(window: str):
+            return moderate_text(window, client=openai_client)
+
+        # 輸出端審核（可選，預設開啟）：生成時邊產生邊送審核視窗
+        out_moderator = (
+            IncrementalModerator(_output_check) if output_moderation_enabled() else None
+        )
+        # 回答來自工具回合（已完整生成）時沒有生成可重疊，改單次審核全文
+        generated = False
+
         try:
             registry = get_tool_registry()
-            tool_defs = get_openai_tool_definitions() if use_tools else []
+            tool_defs = _planned_tool_definitions(request.user_message) if use_tools else []
             if not tool_defs:
                 raise ValueError("tools_disabled")
 
@@ -1107,6 +1379,7 @@ async def chat(
                             "arguments": tr.arguments,
                             "error": tr.error,
                             "error_code": tr.error_code,
+                            "cached": tr.cached,
                         }
                     )
                     logger.info(
@@ -1118,14 +1391,15 @@ async def chat(
                 _t_ns = _time_mod.perf_counter()
                 _ns_err = ""
                 try:
-                    final_result = await generate_response(
+                    final_result = await _generate_non_stream(
                         openai_client,
                         messages,
                         model=selected_model,
                         max_tokens=voice_max_tokens if request.voice_mode or request.car_mode else 1000,
                         temperature=selected_temperature,
-                        return_usage=True,
+                        moderator=out_moderator,
                     )
+                    generated = True
                 except Exception as _ne:
                     _ns_err = type(_ne).__name__
                     raise
@@ -1153,17 +1427,22 @@ async def chat(
         except Exception as tool_err:
             # 任何工具流程失敗，降級為不帶工具的普通呼叫
             logger.warning(f"⚠️ Tool calling 流程失敗（{tool_err}），降級為普通 generate_response")
+            if out_moderator is not None:
+                # 失敗的生成可能已送出視窗：降級重新生成用新的審核器
+                out_moderator.cancel()
+                out_moderator = IncrementalModerator(_output_check)
             _t_ns = _time_mod.perf_counter()
             _ns_err = ""
             try:
-                final_result = await generate_response(
+                final_result = await _generate_non_stream(
                     openai_client,
                     messages,
                     model=selected_model,
                     max_tokens=voice_max_tokens if request.voice_mode or request.car_mode else 1000,
                     temperature=selected_temperature,
-                    return_usage=True,
+                    moderator=out_moderator,
                 )
+                generated = True
             except Exception as _ne:
                 _ns_err = type(_ne).__name__
                 raise
@@ -1183,13 +1462,14 @@ async def chat(
                     meta_prefix=USAGE_META_PREFIX,
                 )
 
-        # 輸出端審核（可選，預設開啟）
-        if os.getenv("MODERATION_CHECK_OUTPUT", "true").lower() not in ("0", "false", "no"):
-            out_mod = await moderate_text(assistant_message or "", client=openai_client)
-            if out_mod.get("blocked"):
-                assistant_message = (
-                    "抱歉，這次回覆未通過內容安全審核，我換個溫柔的方式陪你聊好嗎？✨"
-                )
+        if out_moderator is not None:
+            if generated:
+                out_mod = await out_moderator.finish()
+            else:
+                out_mod = await _output_check(assistant_message) if assistant_message else None
+                out_mod = out_mod if out_mod and out_mod.get("blocked") else None
+            if out_mod:
+                assistant_message = OUTPUT_BLOCK_MESSAGE
 
         merged_usage = _merge_usage(*collected_usages)
         usage_payload = _record_usage(
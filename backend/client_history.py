@@ -0,0 +1,145 @@
+"""
+Client 提供的對話歷史（OpenAI 相容入口）
+
+Open WebUI 每次請求都在 body.messages 帶上完整對話；可信任的 compat 請求
+直接用這份歷史組 conversation_history，不再讀 Supabase（get_conversation_history）。
+
+- bounded：只保留最後 N 輪（user/assistant 對），每則訊息截斷至 max_chars
+- sanitized：只收 user / assistant 角色；內部協定標記由呼叫端先移除
+- reconcile：以 Redis 短期記憶（conv:{id}:latest）補上 client 缺少的最後一輪
+  （例如其他裝置剛寫入、client 端已裁切）；Redis 失敗時照用 client 歷史
+
+Env:
+  OPENAI_COMPAT_CLIENT_HISTORY=true|false   (default true)
+  OPENAI_COMPAT_HISTORY_TURNS=5             最多保留輪數（與 Supabase limit=5 一致）
+  OPENAI_COMPAT_HISTORY_MAX_CHARS=2000      每則訊息字元上限
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("client_history")
+
+_ROLES = ("user", "assistant")
+_LABELS = {"user": "用戶", "assistant": "小宸光"}
+
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def client_history_enabled() -> bool:
+    return os.getenv("OPENAI_COMPAT_CLIENT_HISTORY", "true").lower() not in (
+        "0",
+        "false",
+        "no",
+    )
+
+
+def client_history_limits() -> Tuple[int, int]:
+    """(max_turns, max_chars)"""
+    return (
+        _env_int("OPENAI_COMPAT_HISTORY_TURNS", 5),
+        _env_int("OPENAI_COMPAT_HISTORY_MAX_CHARS", 2000, minimum=1),
+    )
+
+
+def bound_messages(
+    messages: Iterable[Tuple[str, str]],
+    *,
+    max_turns: int,
+    max_chars: int,
+) -> List[Dict[str, str]]:
+    """(role, text) 序列 → 只含 user/assistant、最後 max_turns 輪、逐則截斷。"""
+    out: List[Dict[str, str]] = []
+    for role, text in messages:
+        role = (role or "").lower()
+        text = (text or "").strip()
+        if role not in _ROLES or not text:
+            continue
+        if len(text) > max_chars:
+            text = text[:max_chars].rstrip() + "…"
+        out.append({"role": role, "content": text})
+    if max_turns <= 0:
+        return []
+    # 一輪 = 一則 user + 其後回覆；從尾端數回 max_turns 個 user 訊息
+    users = [i for i, m in enumerate(out) if m["role"] == "user"]
+    if len(users) > max_turns:
+        out = out[users[-max_turns]:]
+    return out
+
+
+def format_history(messages: List[Dict[str, str]]) -> str:
+    """與 memory_system.get_conversation_history 相同格式（舊→新）。"""
+    return "\n".join(
+        f"{_LABELS[m['role']]}: {m['content']}"
+        for m in messages
+        if m.get("role") in _LABELS and m.get("content")
+    )
+
+
+def _latest_exchange(latest: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    if not latest:
+        return "", ""
+    return (
+        str(latest.get("user_msg") or "").strip(),
+        str(latest.get("assistant_msg") or "").strip(),
+    )
+
+
+def reconcile_latest(
+    messages: List[Dict[str, str]],
+    latest: Optional[Dict[str, Any]],
+    *,
+    current_message: str = "",
+    max_chars: int = 2000,
+) -> List[Dict[str, str]]:
+    """
+    Redis 最後一輪不在 client 歷史中 → 補在尾端。
+    最後一輪的 user 訊息等於本次訊息（regenerate）時不補。
+    """
+    user_msg, asst_msg = _latest_exchange(latest)
+    if not user_msg or not asst_msg:
+        return messages
+    if user_msg == (current_message or "").strip():
+        return messages
+    # client 端訊息可能已被截斷（結尾 "…"），以截斷後前綴比對
+    key = user_msg[:max_chars].rstrip()
+    if any(m["content"].startswith(key) for m in messages if m["role"] == "user"):
+        return messages
+    extra = bound_messages(
+        [("user", user_msg), ("assistant", asst_msg)],
+        max_turns=1,
+        max_chars=max_chars,
+    )
+    return list(messages) + extra
+
+
+async def aresolve_client_history(
+    conversation_id: str,
+    messages: List[Dict[str, str]],
+    redis: Any = None,
+    *,
+    current_message: str = "",
+) -> str:
+    """client 歷史 + Redis 差異 → conversation_history 字串（不讀 Supabase）。"""
+    latest = None
+    if redis is not None:
+        try:
+            aload = getattr(redis, "aload_recent_context", None)
+            if aload is not None:
+                latest = await aload(conversation_id)
+            else:
+                latest = redis.load_recent_context(conversation_id)
+        except Exception as e:
+            logger.warning("client_history_reconcile_failed type=%s", type(e).__name__)
+    _, max_chars = client_history_limits()
+    merged = reconcile_latest(
+        messages or [], latest, current_message=current_message, max_chars=max_chars
+    )
+    return format_history(merged)
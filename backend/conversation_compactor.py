@@ -0,0 +1,299 @@
+"""
+對話滾動壓縮（compaction）
+
+長對話原本每輪帶最近 5 輪原文，再由 context 截到 4000 字元：較早的脈絡遺失，
+而冗長的原文仍占掉最多 prompt token。改為每段對話維護一份滾動摘要：
+
+- 每輪存檔後於背景執行 acompact：把「最近 N 輪原文視窗」之外、尚未併入的輪次
+  以 rolling update 併入摘要（RollingSummaryStore kind="compaction"，
+  Redis 熱副本 + Supabase conversation_rolling_summaries 持久副本）
+- 組 prompt 時 acompacted_history 回傳「摘要 + 最近 N 輪（預設 2）」，並在
+  CONVERSATION_COMPACTION_TOKEN_BUDGET 內裁切；尚無摘要（短對話）回傳 None，
+  呼叫端照舊取最近 5 輪原文
+
+輸出沿用 get_conversation_history 的「用戶: / 小宸光:」格式。全部 fail-open。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from backend.rolling_summary import RollingSummaryStore, rolling_summarize, turn_lines
+
+logger = logging.getLogger("conversation_compactor")
+
+STORE_KIND = "compaction"
+
+# 背景 task 強參照（避免被 GC 中途回收）
+_tasks: Set["asyncio.Task"] = set()
+_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _env_int(name: str, default: int, minimum: int = 1) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def compaction_enabled() -> bool:
+    return os.getenv("CONVERSATION_COMPACTION_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def recent_turns() -> int:
+    return _env_int("CONVERSATION_COMPACTION_RECENT_TURNS", 2)
+
+
+def min_turns() -> int:
+    """對話超過此輪數才開始壓縮（短對話維持原本的最近 5 輪原文）。"""
+    return _env_int("CONVERSATION_COMPACTION_MIN_TURNS", 5)
+
+
+def batch_turns() -> int:
+    """視窗外累積幾輪才更新一次摘要（攤平背景 LLM 呼叫）。"""
+    return _env_int("CONVERSATION_COMPACTION_BATCH_TURNS", 2)
+
+
+def token_budget() -> int:
+    """歷史區塊 token 預算（粗估 2 字元/token，與 ai_kernel.context 相同）。"""
+    return _env_int("CONVERSATION_COMPACTION_TOKEN_BUDGET", 800, minimum=50)
+
+
+def _max_summary_chars() -> int:
+    return _env_int("CONVERSATION_COMPACTION_MAX_SUMMARY_CHARS", 800, minimum=100)
+
+
+def _store(supabase: Any) -> RollingSummaryStore:
+    return RollingSummaryStore(STORE_KIND, supabase=supabase)
+
+
+def compaction_lock(user_id: str, conversation_id: str) -> asyncio.Lock:
+    """同一對話的壓縮串行化；刪除對話時也持有，避免壓縮在刪除後把摘要寫回。"""
+    key = (user_id, conversation_id)
+    lock = _locks.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[key] = lock
+    return lock
+
+
+def _turn_query(supabase: Any, table: str, conversation_id: str, user_id: Optional[str]):
+    q = (
+        supabase.table(table)
+        .select("user_message, assistant_message, created_at")
+        .eq("conversation_id", conversation_id)
+        .eq("memory_type", "conversation")
+    )
+    if user_id and user_id != "default_user":
+        q = q.eq("user_id", user_id)
+    return q
+
+
+def format_compacted(summary: str, turns: Sequence[Dict[str, Any]], budget: int) -> str:
+    """「摘要 + 最近輪次」裁到 budget（token 粗估）內：原文保留結尾，摘要保留較新的後段。"""
+    lines: List[str] = []
+    for r in turns:
+        lines.append(f"用戶: {r.get('user_message') or ''}")
+        lines.append(f"小宸光: {r.get('assistant_message') or ''}")
+    recent = "\n".join(lines)
+    head, mid = "【先前對話摘要】\n", "\n\n【最近對話】\n"
+    max_chars = budget * 2 - len(head) - len(mid)
+    # 摘要至少保留 200 字（或全文），其餘給最近原文
+    recent_room = max(0, max_chars - min(len(summary), 200))
+    if len(recent) > recent_room:
+        recent = recent[-recent_room:] if recent_room else ""
+    summary_room = max(1, max_chars - len(recent))
+    if len(summary) > summary_room:
+        summary = "…" + summary[-(summary_room - 1):] if summary_room > 1 else "…"
+    return f"{head}{summary}{mid}{recent}" if recent else f"{head}{summary}"
+
+
+async def acompacted_history(
+    supabase: Any,
+    table: str,
+    conversation_id: str,
+    user_id: Optional[str],
+    *,
+    store: Optional[RollingSummaryStore] = None,
+) -> Optional[str]:
+    """摘要 + 最近 N 輪（含摘要尚未涵蓋的輪次）；尚無摘要回傳 None。"""
+    uid = user_id or "default_user"
+    state = await (store or _store(supabase)).load(uid, conversation_id)
+    summary = (state or {}).get("summary") or ""
+    if not summary:
+        return None
+    n = recent_turns()
+    rows = (
+        _turn_query(supabase, table, conversation_id, user_id)
+        .order("created_at", desc=True)
+        .limit(n + batch_turns() + 2)
+        .execute()
+        .data
+        or []
+    )
+    rows = list(reversed(rows))
+    watermark = str(state.get("watermark") or "")
+    uncovered = [r for r in rows if str(r.get("created_at") or "") > watermark]
+    turns = uncovered if len(uncovered) >= n else rows[-n:]
+    return format_compacted(summary, turns, token_budget())
+
+
+def _final_messages(prior: str, material: str) -> List[Dict[str, str]]:
+    limit = _max_summary_chars()
+    if prior:
+        task = f"""以下是這段對話目前的滾動摘要，以及之後新增的對話（或其重點）。
+請輸出更新後的摘要：保留仍然有用的事實、使用者偏好、正在進行的話題與約定，
+併入新內容，刪除已過時或重複的細節。依時間順序書寫，{limit} 字以內，只輸出摘要本身。
+
+目前摘要：
+{prior}
+
+新增內容：
+{material}
+"""
+    else:
+        task = f"""請把以下對話壓縮成滾動摘要，供之後的對話延續脈絡使用：
+保留具體事實（人名、日期、數字）、使用者偏好與情緒、正在進行的話題與約定。
+依時間順序書寫，{limit} 字以內，只輸出摘要本身。
+
+對話：
+{material}
+"""
+    return [
+        {"role": "system", "content": "你是對話記錄員，負責為小宸光維護精簡、忠實的對話摘要。"},
+        {"role": "user", "content": task},
+    ]
+
+
+def _note_messages(text: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "你是對話記錄員，負責為小宸光維護精簡、忠實的對話摘要。"},
+        {
+            "role": "user",
+            "content": f"請把以下對話片段整理成條列重點，保留具體事實與使用者偏好，300 字以內：\n\n{text}",
+        },
+    ]
+
+
+async def _default_complete(messages: List[Dict[str, str]]):
+    from backend.openai_handler import call_openai_async, get_openai_client
+
+    model = os.getenv("CONVERSATION_COMPACTION_MODEL", "gpt-4o-mini")
+    response = await call_openai_async(
+        get_openai_client(),
+        "chat.completions.create",
+        model=model,
+        messages=messages,
+        max_tokens=600,
+        temperature=0.2,
+    )
+    usage = getattr(response, "usage", None)
+    return response.choices[0].message.content or "", {
+        "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+        "total_tokens": int(getattr(usage, "total_tokens", 0) or 0),
+    }
+
+
+async def acompact(
+    supabase: Any,
+    table: str,
+    conversation_id: str,
+    user_id: Optional[str],
+    *,
+    complete=None,
+    store: Optional[RollingSummaryStore] = None,
+) -> bool:
+    """把最近 N 輪視窗外、尚未併入的輪次併進摘要；有更新回傳 True。"""
+    if not compaction_enabled() or not conversation_id:
+        return False
+    uid = user_id or "default_user"
+    lock = compaction_lock(uid, conversation_id)
+    if lock.locked():
+        return False  # 同一對話已有壓縮在跑；下一輪會接續
+    async with lock:
+        store = store or _store(supabase)
+        state = await store.load(uid, conversation_id) or {}
+        watermark = state.get("watermark") if state.get("summary") else None
+        cap = _env_int("CONVERSATION_COMPACTION_MAX_ROWS", 200)
+        q = _turn_query(supabase, table, conversation_id, user_id)
+        if watermark:
+            q = q.gt("created_at", watermark)
+        rows = q.order("created_at", desc=False).limit(cap).execute().data or []
+
+        if not watermark and len(rows) <= min_turns():
+            return False
+        # 讀滿上限代表還有更新的輪次：全部都在視窗外
+        pending = rows if len(rows) >= cap else rows[: max(0, len(rows) - recent_turns())]
+        if len(pending) < batch_turns():
+            return False
+
+        model = os.getenv("CONVERSATION_COMPACTION_MODEL", "gpt-4o-mini")
+        summary, usage, _calls = await rolling_summarize(
+            complete or _default_complete,
+            turn_lines(pending),
+            prior=state.get("summary") or "",
+            final_messages=_final_messages,
+            note_messages=_note_messages,
+            max_turns=20,
+            max_chars=_env_int("HISTORY_SUMMARY_CHUNK_CHARS", 12000),
+            concurrency=_env_int("HISTORY_SUMMARY_MAP_CONCURRENCY", 4),
+        )
+        if not summary:
+            return False
+        # 摘要依時間順序：超長時保留較新的後段（與 format_compacted 一致）
+        summary = summary[-_max_summary_chars() * 2 :]
+        # 摘要期間對話可能已被刪除（其他 worker 不共用 lock）：列已不在就不寫回
+        alive = _turn_query(supabase, table, conversation_id, user_id).limit(1).execute().data
+        if not alive:
+            return False
+        await store.save(
+            uid,
+            conversation_id,
+            {
+                "summary": summary,
+                "watermark": pending[-1].get("created_at"),
+                "message_count": int(state.get("message_count") or 0) + len(pending),
+                "model": model,
+            },
+        )
+
+    try:
+        from backend.token_tracker import get_token_tracker
+
+        get_token_tracker().record(
+            user_id=uid,
+            conversation_id=conversation_id,
+            model=model,
+            prompt_tokens=usage["prompt_tokens"],
+            completion_tokens=usage["completion_tokens"],
+            total_tokens=usage["total_tokens"],
+            endpoint="conversation_compaction",
+        )
+    except Exception:
+        pass
+    return True
+
+
+async def _safe_compact(*args, **kwargs) -> None:
+    try:
+        await acompact(*args, **kwargs)
+    except Exception as e:
+        logger.warning(f"⚠️ 對話壓縮失敗（不影響對話）: {e}")
+
+
+def schedule_compaction(supabase: Any, table: str, conversation_id: str, user_id: Optional[str]) -> None:
+    """非同步排程一次壓縮（不等待）；無 event loop 時略過。"""
+    if not compaction_enabled():
+        return
+    try:
+        task = asyncio.get_running_loop().create_task(
+            _safe_compact(supabase, table, conversation_id, user_id)
+        )
+    except RuntimeError:
+        return
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
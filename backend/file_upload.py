@@ -1,6 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 from backend.supabase_handler import get_supabase
-from backend.openai_handler import get_openai_client
+from backend.openai_handler import call_openai_async, get_openai_client
 from backend.redis_interface import get_shared_redis_interface
 from backend.vision import (
     analyze_image,
@@ -218,24 +218,20 @@ async def vision_analyze(
     redis_key = None
     try:
         if conversation_id and redis_interface.redis:
-            redis_key = f"upload:{conversation_id}:{filename}"
-            redis_interface.redis.setex(
-                redis_key,
-                172800,
-                json.dumps(
-                    {
-                        "file_name": filename,
-                        "file_type": result.get("ext") or "",
-                        "summary": result.get("summary", ""),
-                        "content": (result.get("content") or "")[:5000],
-                        "vision_analysis": result.get("vision_analysis") or "",
-                        "is_image": True,
-                        "mime": result.get("mime"),
-                        "uploaded_at": datetime.utcnow().isoformat(),
-                        "parsed": result.get("parsed", False),
-                    },
-                    ensure_ascii=False,
-                ),
+            redis_key = await redis_interface.astore_upload(
+                conversation_id,
+                filename,
+                {
+                    "file_name": filename,
+                    "file_type": result.get("ext") or "",
+                    "summary": result.get("summary", ""),
+                    "content": (result.get("content") or "")[:5000],
+                    "vision_analysis": result.get("vision_analysis") or "",
+                    "is_image": True,
+                    "mime": result.get("mime"),
+                    "uploaded_at": datetime.utcnow().isoformat(),
+                    "parsed": result.get("parsed", False),
+                },
             )
     except Exception as e:
         logger.warning(f"⚠️ Vision Redis 暫存失敗: {e}")
@@ -365,11 +361,7 @@ async def upload_file(
         
         try:
             if redis_interface.redis:
-                redis_interface.redis.setex(
-                    redis_key,
-                    172800,
-                    json.dumps(redis_data, ensure_ascii=False)
-                )
+                await redis_interface.astore_upload(conversation_id, filename, redis_data)
                 logger.info(f"✅ 檔案資訊已暫存到 Redis (2天): {redis_key}")
         except Exception as e:
             logger.warning(f"⚠️ Redis 暫存失敗: {e}")
@@ -397,7 +389,9 @@ async def upload_file(
 
 請用繁體中文簡短分析這個檔案的內容，告訴我主要重點和你的想法（不超過150字）。"""
                 
-                    response = openai_client.chat.completions.create(
+                    response = await call_openai_async(
+                        openai_client,
+                        "chat.completions.create",
                         model="gpt-4o-mini",
                         messages=[
                             {
@@ -118,6 +118,12 @@ async def detailed_health_check():
     except Exception as e:
         modules_health = {"error": str(e)}
     
+    try:
+        from backend.tools.http_client import tool_http_stats
+        tool_http = tool_http_stats()
+    except Exception as e:
+        tool_http = {"error": str(e)}
+    
     return JSONResponse(content={
         "status": "healthy",
         "system": {
@@ -126,5 +132,6 @@ async def detailed_health_check():
             "phase": "Phase 2 - Modular Architecture"
         },
         "environment": env_status,
-        "modules": modules_health
+        "modules": modules_health,
+        "tool_http": tool_http
     })
@@ -7,17 +7,35 @@
 """
 from __future__ import annotations
 
+import asyncio
 import os
 import logging
+import weakref
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
+from backend.conversation_compactor import compaction_lock
+from backend.history_search import (
+    BigramIndex,
+    build_snippet,
+    decode_cursor,
+    encode_cursor,
+    prefilter_terms,
+    query_terms,
+    sort_key,
+)
 from backend.supabase_handler import get_supabase
-from backend.openai_handler import get_openai_client
+from backend.openai_handler import call_openai_async, get_openai_client
 from backend.redis_interface import get_shared_redis_interface
+from backend.rolling_summary import (
+    RollingSummaryStore,
+    empty_usage,
+    rolling_summarize,
+    turn_lines,
+)
 
 router = APIRouter()
 logger = logging.getLogger("history_router")
@@ -80,13 +98,81 @@ def _title_from_first(user_msg: str) -> str:
     return (t[:28] + "…") if len(t) > 28 else t
 
 
+def _summaries_enabled() -> bool:
+    return os.getenv("HISTORY_SUMMARIES_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def _keyset(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    try:
+        return decode_cursor(cursor, size)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cursor 格式錯誤")
+
+
+def _list_from_summaries(
+    user_id: str, limit: int, offset: int, cursor: Optional[List[Any]]
+) -> Dict[str, Any]:
+    """conversation_summaries 投影（trigger 維護），依 (last_at, conversation_id) keyset 分頁。"""
+    params: Dict[str, Any] = {
+        "p_user_id": user_id,
+        "p_limit": limit + 1,  # 多取一筆判斷是否還有下一頁
+        "p_offset": 0 if cursor else offset,
+    }
+    if cursor:
+        params["p_cursor_last_at"], params["p_cursor_conversation_id"] = cursor
+    rows = _supabase().rpc("list_conversation_summaries", params).execute().data or []
+    page = rows[:limit]
+    items = [
+        ConversationSummaryItem(
+            conversation_id=row.get("conversation_id") or "",
+            user_id=row.get("user_id") or user_id,
+            message_count=int(row.get("message_count") or 0),
+            first_at=row.get("first_at"),
+            last_at=row.get("last_at"),
+            preview=row.get("preview") or "",
+            title=row.get("title") or "",
+        ).model_dump()
+        for row in page
+    ]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_cursor(page[-1].get("last_at"), page[-1].get("conversation_id"))
+    if rows:
+        total = int(rows[0].get("total_count") or 0)
+    else:
+        total = None if (cursor or offset) else 0
+    return {
+        "user_id": user_id,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "conversations": items,
+        "next_cursor": next_cursor,
+    }
+
+
 @router.get("/history/conversations")
 async def list_conversations(
     user_id: str = Query(..., description="使用者 ID"),
     limit: int = Query(default=30, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    cursor: Optional[str] = Query(default=None, description="上一頁回傳的 next_cursor"),
 ):
-    """列出使用者的對話串（依最後活動時間排序）。"""
+    """列出使用者的對話串（依最後活動時間排序；cursor 為 keyset 分頁）。"""
+    keyset = _keyset(cursor, 2)
+    if _summaries_enabled():
+        try:
+            return _list_from_summaries(user_id, limit, offset, keyset)
+        except Exception as e:
+            # migration 尚未套用 / RPC 失敗 → 回退原始列掃描
+            logger.warning(f"⚠️ conversation_summaries 讀取失敗，改用原始列聚合: {e}")
+    return _list_from_memory_rows(user_id, limit, offset, keyset)
+
+
+def _list_from_memory_rows(
+    user_id: str, limit: int, offset: int, cursor: Optional[List[Any]]
+) -> Dict[str, Any]:
+    """舊路徑：抓原始記憶列在 Python 聚合（投影不可用時）。"""
     try:
         table = _memories_table()
         # 抓取足夠筆數後在記憶體聚合（Supabase 無 group by 時的穩健做法）
@@ -139,15 +225,35 @@ async def list_conversations(
         items = list(buckets.values())
         for it in items:
             it["title"] = _title_from_first(it.pop("_first_user", "") or it.get("preview", ""))
-        items.sort(key=lambda x: x.get("last_at") or "", reverse=True)
+        items.sort(
+            key=lambda x: (x.get("last_at") or "", x.get("conversation_id") or ""),
+            reverse=True,
+        )
         total = len(items)
-        page = items[offset : offset + limit]
+        if cursor:
+            key = (cursor[0] or "", cursor[1] or "")
+            items = [
+                it
+                for it in items
+                if (it.get("last_at") or "", it.get("conversation_id") or "") < key
+            ]
+            page = items[:limit]
+            has_more = len(items) > limit
+        else:
+            page = items[offset : offset + limit]
+            has_more = len(items) > offset + limit
+        next_cursor = (
+            encode_cursor(page[-1]["last_at"], page[-1]["conversation_id"])
+            if has_more and page
+            else None
+        )
         return {
             "user_id": user_id,
             "total": total,
             "limit": limit,
             "offset": offset,
             "conversations": page,
+            "next_cursor": next_cursor,
         }
     except Exception as e:
         logger.exception("❌ 列出對話失敗")
@@ -211,70 +317,118 @@ async def get_conversation_detail(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _search_enabled() -> bool:
+    return os.getenv("HISTORY_SEARCH_RPC_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def _search_rpc(
+    user_id: str, query: str, limit: int, cursor: Optional[List[Any]]
+) -> List[Dict[str, Any]]:
+    """search_conversation_memories：bigram tsvector GIN 索引，一次查兩欄並排序。"""
+    params: Dict[str, Any] = {"p_user_id": user_id, "p_query": query, "p_limit": limit + 1}
+    if cursor:
+        params["p_cursor_rank"], params["p_cursor_created_at"], params["p_cursor_id"] = cursor
+    rows = _supabase().rpc("search_conversation_memories", params).execute().data or []
+    for row in rows:
+        row["score"] = float(row.get("rank") or 0.0)
+        row["matched_field"] = "user_message" if row.get("user_hit") else "assistant_message"
+    return rows
+
+
+def _search_scan(
+    user_id: str, query: str, terms: List[str], limit: int, cursor: Optional[List[Any]]
+) -> List[Dict[str, Any]]:
+    """RPC 不可用時：ilike 取候選列（子字串語意），再以程序內 bigram 倒排索引排序。"""
+    table = _memories_table()
+    sb = _supabase()
+    scan_limit = max(limit + 1, int(os.getenv("HISTORY_SEARCH_SCAN_LIMIT", "500")))
+    rows: Dict[Any, Dict[str, Any]] = {}
+    for col in ("user_message", "assistant_message"):
+        try:
+            res = (
+                sb.table(table)
+                .select("id, conversation_id, user_message, assistant_message, created_at")
+                .eq("user_id", user_id)
+                .eq("memory_type", "conversation")
+                .ilike(col, f"%{query}%")
+                .order("created_at", desc=True)
+                .limit(scan_limit)
+                .execute()
+            )
+            for row in res.data or []:
+                rows[row.get("id") or f"{row.get('conversation_id')}|{row.get('created_at')}"] = row
+        except Exception as e:
+            logger.warning(f"⚠️ 搜尋欄位 {col} 失敗: {e}")
+
+    index = BigramIndex()
+    for doc_id, row in rows.items():
+        index.add(doc_id, row)
+
+    ranked = []
+    # ilike 已是子字串命中：只排序、不以索引 AND 過濾（英數 term 對不到字中子字串）
+    for doc_id, row in rows.items():
+        hit = index.match(doc_id, query, terms)
+        if hit is None:
+            continue
+        score, field = hit
+        key = sort_key(score, row.get("created_at"), row.get("id"))
+        if cursor and key >= sort_key(*cursor):
+            continue
+        ranked.append((key, {**row, "score": key[0], "matched_field": field}))
+    ranked.sort(key=lambda x: x[0], reverse=True)
+    return [row for _, row in ranked[: limit + 1]]
+
+
 @router.get("/history/search")
 async def search_history(
     user_id: str = Query(...),
     q: str = Query(..., min_length=1, description="搜尋關鍵字"),
     limit: int = Query(default=30, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="上一頁回傳的 next_cursor"),
 ):
-    """搜尋歷史對話（使用者訊息 / 助理訊息）。"""
+    """搜尋歷史對話（使用者訊息 / 助理訊息）：CJK bigram 全文索引、相關度排序。"""
     query = (q or "").strip()
     if not query:
         raise HTTPException(status_code=400, detail="搜尋關鍵字不可為空")
+    keyset = _keyset(cursor, 3)
+    terms = query_terms(query)
 
     try:
-        table = _memories_table()
-        # PostgREST or 過濾：user_message / assistant_message ilike
-        # 使用兩次查詢合併，相容性較好
-        sb = _supabase()
-        pattern = f"%{query}%"
-
-        def _run(column: str):
-            return (
-                sb.table(table)
-                .select(
-                    "conversation_id, user_message, assistant_message, created_at"
-                )
-                .eq("user_id", user_id)
-                .eq("memory_type", "conversation")
-                .ilike(column, pattern)
-                .order("created_at", desc=True)
-                .limit(limit)
-                .execute()
-            )
-
-        hits_map: Dict[str, Dict[str, Any]] = {}
-        for col in ("user_message", "assistant_message"):
+        rows: Optional[List[Dict[str, Any]]] = None
+        if _search_enabled():
             try:
-                res = _run(col)
-                for row in res.data or []:
-                    key = f"{row.get('conversation_id')}|{row.get('created_at')}|{col}"
-                    um = row.get("user_message") or ""
-                    am = row.get("assistant_message") or ""
-                    snippet_src = um if col == "user_message" else am
-                    idx = snippet_src.lower().find(query.lower())
-                    if idx >= 0:
-                        start = max(0, idx - 20)
-                        end = min(len(snippet_src), idx + len(query) + 40)
-                        snippet = ("…" if start > 0 else "") + snippet_src[start:end] + (
-                            "…" if end < len(snippet_src) else ""
-                        )
-                    else:
-                        snippet = (snippet_src or "")[:60]
-                    hits_map[key] = {
-                        "conversation_id": row.get("conversation_id"),
-                        "user_message": um,
-                        "assistant_message": am,
-                        "created_at": row.get("created_at"),
-                        "snippet": snippet,
-                        "matched_field": col,
-                    }
+                rows = _search_rpc(user_id, query, limit, keyset)
             except Exception as e:
-                logger.warning(f"⚠️ 搜尋欄位 {col} 失敗: {e}")
-
-        hits = list(hits_map.values())
-        hits.sort(key=lambda x: x.get("created_at") or "", reverse=True)
-        hits = hits[:limit]
+                # migration 尚未套用 / RPC 失敗 → 程序內索引
+                logger.warning(f"⚠️ search_conversation_memories 失敗，改用本地索引: {e}")
+        if rows is None:
+            rows = _search_scan(user_id, query, prefilter_terms(query), limit, keyset)
+
+        page = rows[:limit]
+        hits = []
+        for row in page:
+            um = row.get("user_message") or ""
+            am = row.get("assistant_message") or ""
+            field = row["matched_field"]
+            snippet, highlights = build_snippet(
+                um if field == "user_message" else am, query, terms
+            )
+            hits.append(
+                {
+                    "conversation_id": row.get("conversation_id"),
+                    "user_message": um,
+                    "assistant_message": am,
+                    "created_at": row.get("created_at"),
+                    "snippet": snippet,
+                    "highlights": highlights,
+                    "matched_field": field,
+                    "score": row["score"],
+                }
+            )
+        next_cursor = None
+        if len(rows) > limit and page:
+            last = page[-1]
+            next_cursor = encode_cursor(last["score"], last.get("created_at"), last.get("id"))
 
         # 也回傳涉及的 conversation 聚合
         conv_ids = []
@@ -291,6 +445,7 @@ async def search_history(
             "total_hits": len(hits),
             "hits": hits,
             "conversation_ids": conv_ids,
+            "next_cursor": next_cursor,
         }
     except HTTPException:
         raise
@@ -299,73 +454,99 @@ async def search_history(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/history/summarize")
-async def summarize_conversation(request: SummarizeRequest):
-    """AI 總結指定對話。"""
+def _summary_env_int(name: str, default: int) -> int:
     try:
-        table = _memories_table()
-        q = (
-            _supabase()
-            .table(table)
-            .select("user_message, assistant_message, created_at")
-            .eq("conversation_id", request.conversation_id)
-            .eq("memory_type", "conversation")
-            .order("created_at", desc=False)
-            .limit(request.max_messages)
-        )
-        if request.user_id and request.user_id != "default_user":
-            q = q.eq("user_id", request.user_id)
-        result = q.execute()
-        rows = result.data or []
-        if not rows:
-            raise HTTPException(status_code=404, detail="找不到此對話或沒有訊息")
+        return max(1, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
 
-        lines = []
-        for row in rows:
-            if row.get("user_message"):
-                lines.append(f"使用者：{row['user_message'][:500]}")
-            if row.get("assistant_message"):
-                lines.append(f"小宸光：{row['assistant_message'][:500]}")
-        transcript = "\n".join(lines)
-        if len(transcript) > 12000:
-            transcript = transcript[:12000] + "\n…(截斷)"
 
-        client = get_openai_client()
-        model = os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
-        prompt = f"""請用繁體中文總結以下對話，輸出結構化重點：
+# 同一對話的摘要請求串行化：後到者直接拿到前一個寫好的 watermark / 摘要
+_summary_locks: "weakref.WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _summary_lock(user_id: str, conversation_id: str) -> asyncio.Lock:
+    key = (user_id, conversation_id)
+    lock = _summary_locks.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _summary_locks[key] = lock
+    return lock
+
 
-1. **一句話摘要**
+def _usage_dict(response: Any) -> Dict[str, int]:
+    usage = getattr(response, "usage", None)
+    return {
+        "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
+        "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
+        "total_tokens": int(getattr(usage, "total_tokens", 0) or 0),
+    }
+
+
+_SUMMARY_SYSTEM = "你是對話整理助手，擅長溫暖、清楚的繁中摘要。"
+_SUMMARY_FORMAT = """1. **一句話摘要**
 2. **主要話題**（條列 2-5 點）
 3. **使用者情緒 / 需求**
 4. **重要結論或待辦**（若有）
-5. **可延續的話題建議**
+5. **可延續的話題建議**"""
+
+
+def _summary_final_messages(prior: str, material: str) -> List[Dict[str, str]]:
+    if prior:
+        prompt = f"""以下是這段對話既有的摘要，以及之後新增的對話內容（或其重點）。
+請更新摘要：保留仍然成立的內容，併入新的話題、情緒與結論，過時的待辦改為最新狀態。
+用繁體中文輸出，維持相同結構：
+
+{_SUMMARY_FORMAT}
+
+既有摘要：
+{prior}
+
+新增內容：
+{material}
+"""
+    else:
+        prompt = f"""請用繁體中文總結以下對話，輸出結構化重點：
+
+{_SUMMARY_FORMAT}
 
 對話內容：
-{transcript}
+{material}
 """
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "你是對話整理助手，擅長溫暖、清楚的繁中摘要。",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=800,
-            temperature=0.4,
-        )
-        summary = (response.choices[0].message.content or "").strip()
-        usage = getattr(response, "usage", None)
-        usage_dict = {
-            "prompt_tokens": int(getattr(usage, "prompt_tokens", 0) or 0),
-            "completion_tokens": int(getattr(usage, "completion_tokens", 0) or 0),
-            "total_tokens": int(getattr(usage, "total_tokens", 0) or 0),
-        }
+    return [
+        {"role": "system", "content": _SUMMARY_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
 
-        # 可選：把摘要寫回 memories（memory_type=summary）
-        saved = False
-        try:
+
+def _summary_note_messages(text: str) -> List[Dict[str, str]]:
+    prompt = f"""請把以下對話片段整理成條列重點（話題、使用者情緒 / 需求、結論或待辦），
+保留人名、日期、數字等具體細節，300 字以內：
+
+{text}
+"""
+    return [
+        {"role": "system", "content": _SUMMARY_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _save_summary_row(table: str, request: SummarizeRequest, summary: str) -> bool:
+    """每段對話只保留一筆 conversation_summary 記憶列：有則更新、無則新增。"""
+    now = datetime.utcnow().isoformat()
+    try:
+        updated = (
+            _supabase()
+            .table(table)
+            .update({"assistant_message": summary, "document_content": summary, "created_at": now})
+            .eq("conversation_id", request.conversation_id)
+            .eq("user_id", request.user_id)
+            .eq("memory_type", "conversation_summary")
+            .execute()
+        )
+        if not (updated.data or []):
             _supabase().table(table).insert(
                 {
                     "conversation_id": request.conversation_id,
@@ -374,13 +555,104 @@ async def summarize_conversation(request: SummarizeRequest):
                     "user_message": "對話總結請求",
                     "assistant_message": summary,
                     "document_content": summary,
-                    "created_at": datetime.utcnow().isoformat(),
+                    "created_at": now,
                     "platform": "Web",
                 }
             ).execute()
-            saved = True
-        except Exception as e:
-            logger.warning(f"⚠️ 摘要寫入 Supabase 失敗（不影響回傳）: {e}")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ 摘要寫入 Supabase 失敗（不影響回傳）: {e}")
+        return False
+
+
+@router.post("/history/summarize")
+async def summarize_conversation(request: SummarizeRequest):
+    """
+    AI 總結指定對話（增量）。
+
+    摘要與 watermark 存於 RollingSummaryStore(kind="report")；只讀 watermark 之後的新輪次，
+    以 rolling update 併入既有摘要。沒有新輪次時直接回傳快取（不呼叫 LLM）。
+    新輪次過長時 map-reduce：每個 chunk 最多 max_messages 輪 / HISTORY_SUMMARY_CHUNK_CHARS 字元。
+    """
+    try:
+        table = _memories_table()
+        store = RollingSummaryStore("report", supabase=_supabase())
+        async with _summary_lock(request.user_id, request.conversation_id):
+            state = await store.load(request.user_id, request.conversation_id) or {}
+            watermark = state.get("watermark")
+            max_rows = _summary_env_int("HISTORY_SUMMARY_MAX_NEW_ROWS", 1000)
+
+            q = (
+                _supabase()
+                .table(table)
+                .select("user_message, assistant_message, created_at")
+                .eq("conversation_id", request.conversation_id)
+                .eq("memory_type", "conversation")
+            )
+            if request.user_id and request.user_id != "default_user":
+                q = q.eq("user_id", request.user_id)
+            if watermark and state.get("summary"):
+                q = q.gt("created_at", watermark)
+            rows = q.order("created_at", desc=False).limit(max_rows).execute().data or []
+
+            prior = (state.get("summary") or "") if watermark else ""
+            if not rows:
+                if prior:
+                    return {
+                        "conversation_id": request.conversation_id,
+                        "summary": prior,
+                        "message_count": int(state.get("message_count") or 0),
+                        "new_messages": 0,
+                        "model": state.get("model"),
+                        "usage": empty_usage(),
+                        "saved": True,
+                        "cached": True,
+                        "watermark": watermark,
+                        "has_more": False,
+                        "llm_calls": 0,
+                    }
+                raise HTTPException(status_code=404, detail="找不到此對話或沒有訊息")
+
+            client = get_openai_client()
+            model = os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+
+            async def _complete(messages: List[Dict[str, str]]):
+                response = await call_openai_async(
+                    client,
+                    "chat.completions.create",
+                    model=model,
+                    messages=messages,
+                    max_tokens=800,
+                    temperature=0.4,
+                )
+                return response.choices[0].message.content or "", _usage_dict(response)
+
+            summary, usage_dict, calls = await rolling_summarize(
+                _complete,
+                turn_lines(rows),
+                prior=prior,
+                final_messages=_summary_final_messages,
+                note_messages=_summary_note_messages,
+                max_turns=request.max_messages,
+                max_chars=_summary_env_int("HISTORY_SUMMARY_CHUNK_CHARS", 12000),
+                concurrency=_summary_env_int("HISTORY_SUMMARY_MAP_CONCURRENCY", 4),
+            )
+            if not summary:
+                raise HTTPException(status_code=502, detail="摘要產生失敗，請稍後再試")
+
+            new_watermark = rows[-1].get("created_at")
+            message_count = (int(state.get("message_count") or 0) if prior else 0) + len(rows)
+            await store.save(
+                request.user_id,
+                request.conversation_id,
+                {
+                    "summary": summary,
+                    "watermark": new_watermark,
+                    "message_count": message_count,
+                    "model": model,
+                },
+            )
+            saved = _save_summary_row(table, request, summary)
 
         try:
             from backend.token_tracker import get_token_tracker
@@ -400,10 +672,16 @@ async def summarize_conversation(request: SummarizeRequest):
         return {
             "conversation_id": request.conversation_id,
             "summary": summary,
-            "message_count": len(rows),
+            "message_count": message_count,
+            "new_messages": len(rows),
             "model": model,
             "usage": usage_dict,
             "saved": saved,
+            "cached": False,
+            "watermark": new_watermark,
+            # 新輪次超過 HISTORY_SUMMARY_MAX_NEW_ROWS：下一次請求會接著併入
+            "has_more": len(rows) >= max_rows,
+            "llm_calls": calls,
         }
     except HTTPException:
         raise
@@ -448,37 +726,42 @@ async def delete_conversation(
                 raise HTTPException(status_code=404, detail="找不到此對話")
 
         if hard:
-            (
-                _supabase()
-                .table(table)
-                .delete()
-                .eq("conversation_id", conversation_id)
-                .eq("user_id", user_id)
-                .execute()
-            )
-            # 一併刪 summary 類型
-            try:
+            # 等進行中的壓縮 / 報告摘要寫完再刪，避免它們在刪除後把摘要寫回
+            async with compaction_lock(user_id, conversation_id), _summary_lock(
+                user_id, conversation_id
+            ):
                 (
                     _supabase()
                     .table(table)
                     .delete()
                     .eq("conversation_id", conversation_id)
                     .eq("user_id", user_id)
-                    .eq("memory_type", "conversation_summary")
                     .execute()
                 )
-            except Exception:
-                pass
+                # 一併刪 summary 類型
+                try:
+                    (
+                        _supabase()
+                        .table(table)
+                        .delete()
+                        .eq("conversation_id", conversation_id)
+                        .eq("user_id", user_id)
+                        .eq("memory_type", "conversation_summary")
+                        .execute()
+                    )
+                except Exception:
+                    pass
+                # 滾動摘要（報告 / prompt 壓縮）：Supabase 列由 trigger 清除，這裡清 Redis 熱副本
+                for kind in ("report", "compaction"):
+                    await RollingSummaryStore(kind, supabase=_supabase()).clear(user_id, conversation_id)
         deleted_count = count
 
         redis_cleared = False
         try:
             if redis_interface.redis:
                 # 清除短期對話與上傳暫存
-                redis_interface.clear_conversation(conversation_id)
-                keys = redis_interface.scan_keys(f"upload:{conversation_id}:*")
-                if keys:
-                    redis_interface.redis.delete(*keys)
+                await redis_interface.aclear_conversation(conversation_id)
+                await redis_interface.aclear_uploads(conversation_id)
                 redis_cleared = True
         except Exception as e:
             logger.warning(f"⚠️ Redis 清除失敗: {e}")
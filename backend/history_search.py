@@ -0,0 +1,195 @@
+"""
+對話歷史全文搜尋（CJK 友善）
+
+中文沒有空白斷詞，改用字元 n-gram：CJK 連續字串切成 unigram + bigram，
+英數字串整段小寫為一個 term。資料庫端（20261019_history_search migration）
+以相同規則產生 search_tsv（user_message 權重 A、assistant_message 權重 B）
+並建 GIN 索引；search_conversation_memories RPC 一次查兩個欄位、依 ts_rank_cd 排序。
+
+RPC 不可用（migration 未套用 / 離線 mock）時，BigramIndex 在程序內對有界的
+候選列建倒排索引，使用同一套 term 規則與近似排序。
+
+查詢 term：CJK 長度 1 → unigram；≥2 → 相鄰 bigram（全部需命中，AND）。
+索引只用 CJK term 預篩（prefilter_terms）：英數在索引裡是整段 term，對不到
+字中子字串（"ython" ⊂ "python"），最後一律以不分大小寫的子字串複查兩個欄位，
+與原本 ilike '%q%' 的語意一致。
+"""
+from __future__ import annotations
+
+import base64
+import json
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 與 migration 中 public.history_search_terms 的 regex 一致
+_CJK_CLASS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(rf"[{_CJK_CLASS}]+|[a-z0-9]+")
+_CJK_RE = re.compile(rf"^[{_CJK_CLASS}]+$")
+
+# 欄位權重（對應 tsvector A / B）
+FIELD_WEIGHTS = {"user_message": 1.0, "assistant_message": 0.4}
+
+
+def index_terms(text: str) -> List[str]:
+    """索引用 term：CJK unigram + bigram、英數整段。"""
+    out: List[str] = []
+    for tok in _TOKEN_RE.findall((text or "").lower()):
+        if _CJK_RE.match(tok):
+            out.extend(tok)
+            out.extend(tok[i : i + 2] for i in range(len(tok) - 1))
+        else:
+            out.append(tok)
+    return out
+
+
+def query_terms(query: str) -> List[str]:
+    """查詢 term（去重、保序）：單字 CJK 用 unigram，其餘用 bigram。"""
+    out: List[str] = []
+    for tok in _TOKEN_RE.findall((query or "").lower()):
+        if _CJK_RE.match(tok) and len(tok) > 1:
+            terms = [tok[i : i + 2] for i in range(len(tok) - 1)]
+        else:
+            terms = [tok]
+        for t in terms:
+            if t not in out:
+                out.append(t)
+    return out
+
+
+def prefilter_terms(query: str) -> List[str]:
+    """索引預篩用 term：只取 CJK（英數交給子字串複查）。"""
+    return [t for t in query_terms(query) if _CJK_RE.match(t)]
+
+
+def substring_field(row: Dict[str, Any], query: str) -> Optional[str]:
+    """查詢字串（不分大小寫）出現的欄位，user_message 優先；都沒有回傳 None。"""
+    needle = (query or "").strip().lower()
+    if not needle:
+        return None
+    for field in FIELD_WEIGHTS:
+        if needle in (row.get(field) or "").lower():
+            return field
+    return None
+
+
+def highlight_spans(text: str, query: str, terms: Sequence[str]) -> List[Tuple[int, int]]:
+    """text 中查詢字串 / term 出現位置（合併重疊），供前端標示。"""
+    low = (text or "").lower()
+    needles = [n for n in [(query or "").strip().lower(), *terms] if n]
+    spans: List[Tuple[int, int]] = []
+    for needle in needles:
+        start = low.find(needle)
+        while start >= 0:
+            spans.append((start, start + len(needle)))
+            start = low.find(needle, start + 1)
+    spans.sort()
+    merged: List[Tuple[int, int]] = []
+    for s, e in spans:
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+
+def build_snippet(
+    text: str, query: str, terms: Sequence[str], *, before: int = 20, after: int = 40
+) -> Tuple[str, List[List[int]]]:
+    """以第一個命中為中心擷取片段；回傳 (snippet, 片段內 highlight [start, end])。"""
+    text = text or ""
+    spans = highlight_spans(text, query, terms)
+    if not spans:
+        return text[:60], []
+    first_s, first_e = spans[0]
+    start = max(0, first_s - before)
+    end = min(len(text), first_e + after)
+    prefix = "…" if start > 0 else ""
+    snippet = prefix + text[start:end] + ("…" if end < len(text) else "")
+    shift = len(prefix) - start
+    marks = [
+        [max(s, start) + shift, min(e, end) + shift]
+        for s, e in spans
+        if s < end and e > start
+    ]
+    return snippet, marks
+
+
+def encode_cursor(*parts: Any) -> str:
+    raw = json.dumps(list(parts), ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """格式錯誤回傳 ValueError（由 router 轉 400）。"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(parts, list) or len(parts) != size:
+        raise ValueError("invalid cursor")
+    return parts
+
+
+def sort_key(score: float, created_at: Any, row_id: Any) -> Tuple[float, str, str]:
+    """排序 / 游標共用 key（score 取 6 位小數，避免浮點誤差造成游標漂移）。"""
+    return (round(float(score or 0.0), 6), str(created_at or ""), str(row_id or ""))
+
+
+class BigramIndex:
+    """程序內倒排索引：term → {doc_id: {field: tf}}。"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[Any, Dict[str, int]]] = defaultdict(dict)
+        self.docs: Dict[Any, Dict[str, Any]] = {}
+
+    def add(self, doc_id: Any, row: Dict[str, Any]) -> None:
+        self.docs[doc_id] = row
+        for field in FIELD_WEIGHTS:
+            for term in index_terms(row.get(field) or ""):
+                fields = self._postings[term].setdefault(doc_id, {})
+                fields[field] = fields.get(field, 0) + 1
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "BigramIndex":
+        idx = cls()
+        for i, row in enumerate(rows):
+            idx.add(row.get("id", i), row)
+        return idx
+
+    def search(self, terms: Sequence[str]) -> List[Tuple[float, Any]]:
+        """全部 term 命中的文件 → [(score, doc_id)]；score 近似 ts_rank（tf 飽和 × 欄位權重）。"""
+        if not terms:
+            return []
+        candidates: Optional[set] = None
+        for term in terms:
+            docs = set(self._postings.get(term, {}))
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return []
+        return [(self.score(doc_id, terms), doc_id) for doc_id in candidates or ()]
+
+    def score(self, doc_id: Any, terms: Sequence[str]) -> float:
+        """近似 ts_rank（tf 飽和 × 欄位權重，依 term 平均）；未命中的 term 記 0。"""
+        if not terms:
+            return 0.0
+        score = 0.0
+        for term in terms:
+            for field, tf in self._postings.get(term, {}).get(doc_id, {}).items():
+                score += FIELD_WEIGHTS[field] * tf / (tf + 1.0)
+        return score / len(terms)
+
+    def match(self, doc_id: Any, query: str, terms: Sequence[str]) -> Optional[Tuple[float, str]]:
+        """
+        子字串複查 + 排序分數 → (score, matched_field)；查詢字串不在任一欄位回傳 None。
+
+        terms 為 prefilter_terms：有 CJK term 時用近似 ts_rank，否則用命中欄位的權重
+        （與 search_conversation_memories 相同）。
+        """
+        field = substring_field(self.docs[doc_id], query)
+        if field is None:
+            return None
+        return (self.score(doc_id, terms) if terms else FIELD_WEIGHTS[field]), field
@@ -135,6 +135,15 @@ _PAGE_TEMPLATE = r"""<!DOCTYPE html>
         <label for="type">類型</label>
         <select id="type"></select>
       </div>
+      <div style="flex:1 1 120px;">
+        <label for="importance">重要性</label>
+        <select id="importance">
+          <option value="">不限</option>
+          <option value="0.3">≥ 0.3</option>
+          <option value="0.5">≥ 0.5</option>
+          <option value="0.7">≥ 0.7</option>
+        </select>
+      </div>
       <div style="flex:1 1 150px;">
         <label for="from">起始日期</label>
         <input id="from" type="date" />
@@ -172,11 +181,19 @@ _PAGE_TEMPLATE = r"""<!DOCTYPE html>
   var TOKEN_KEY = "xcg_mc_token";
   var PAGE_LIMIT = 20;
 
+  // keyset 分頁：cursors[i] 為第 i 頁的游標（第一頁為 null）；total 只在第一頁回傳
   var state = {
-    offset: 0,
-    applied: { q: "", memory_type: "", created_from: "", created_to: "" },
+    cursors: [null],
+    page: 0,
+    next: null,
+    total: null,
+    applied: { q: "", memory_type: "", min_importance: "", created_from: "", created_to: "" },
   };
 
+  function resetPaging() {
+    state.cursors = [null]; state.page = 0; state.next = null; state.total = null;
+  }
+
   function $(id) { return document.getElementById(id); }
   function show(el) { el.classList.remove("hidden"); }
   function hide(el) { el.classList.add("hidden"); }
@@ -244,8 +261,8 @@ _PAGE_TEMPLATE = r"""<!DOCTYPE html>
   function enterViewer() {
     hide($("loginCard"));
     show($("viewer"));
-    state.offset = 0;
-    state.applied = { q: "", memory_type: "", created_from: "", created_to: "" };
+    resetPaging();
+    state.applied = { q: "", memory_type: "", min_importance: "", created_from: "", created_to: "" };
     loadPage();
   }
 
@@ -254,20 +271,21 @@ _PAGE_TEMPLATE = r"""<!DOCTYPE html>
     clearError($("filterError"));
     var q = $("q").value.trim();
     var type = $("type").value;
+    var importance = $("importance").value;
     var from = $("from").value;
     var to = $("to").value;
     if (q.length > 100) { setError($("filterError"), "搜尋字數過長，請縮短至 100 字以內。"); return; }
     if (from && to && from > to) { setError($("filterError"), "起始日期不可晚於結束日期。"); return; }
-    state.applied = { q: q, memory_type: type, created_from: from, created_to: to };
-    state.offset = 0;
+    state.applied = { q: q, memory_type: type, min_importance: importance, created_from: from, created_to: to };
+    resetPaging();
     loadPage();
   }
 
   function resetFilters() {
-    $("q").value = ""; $("type").value = ""; $("from").value = ""; $("to").value = "";
+    $("q").value = ""; $("type").value = ""; $("importance").value = ""; $("from").value = ""; $("to").value = "";
     clearError($("filterError"));
-    state.applied = { q: "", memory_type: "", created_from: "", created_to: "" };
-    state.offset = 0;
+    state.applied = { q: "", memory_type: "", min_importance: "", created_from: "", created_to: "" };
+    resetPaging();
     loadPage();
   }
 
@@ -324,9 +342,11 @@ _PAGE_TEMPLATE = r"""<!DOCTYPE html>
     var a = state.applied;
     var params = [];
     params.push("limit=" + PAGE_LIMIT);
-    params.push("offset=" + state.offset);
+    var cursor = state.cursors[state.page];
+    if (cursor) params.push("cursor=" + encodeURIComponent(cursor));
     if (a.q) params.push("q=" + encodeURIComponent(a.q));
     if (a.memory_type) params.push("memory_type=" + encodeURIComponent(a.memory_type));
+    if (a.min_importance) params.push("min_importance=" + encodeURIComponent(a.min_importance));
     if (a.created_from) params.push("created_from=" + encodeURIComponent(a.created_from));
     if (a.created_to) params.push("created_to=" + encodeURIComponent(a.created_to));
     return params.join("&");
@@ -355,10 +375,14 @@ _PAGE_TEMPLATE = r"""<!DOCTYPE html>
       renderItems(items);
       if (!items.length) { show($("empty")); }
       if (data && data.search_scope) { show($("scopeNotice")); }
-      $("pageInfo").textContent = "第 " + (Math.floor(state.offset / PAGE_LIMIT) + 1) + " 頁";
-      $("prevBtn").disabled = state.offset <= 0;
-      // 少於整頁代表沒有下一頁
-      $("nextBtn").disabled = items.length < PAGE_LIMIT;
+      if (data && data.total_estimate != null) {
+        state.total = data.total_exact === false ? data.total_estimate + "+" : String(data.total_estimate);
+      }
+      state.next = (data && data.next_cursor) || null;
+      $("pageInfo").textContent = "第 " + (state.page + 1) + " 頁" + (state.total != null ? "（共 " + state.total + " 筆）" : "");
+      $("prevBtn").disabled = state.page <= 0;
+      // 沒有游標代表沒有下一頁
+      $("nextBtn").disabled = !state.next;
     }).catch(function (err) {
       renderItems([]);
       var text = (err && err.fixed) || "無法連線伺服器，請檢查網路後再試。";
@@ -370,12 +394,14 @@ _PAGE_TEMPLATE = r"""<!DOCTYPE html>
   }
 
   function prevPage() {
-    if (state.offset <= 0) return;
-    state.offset = Math.max(0, state.offset - PAGE_LIMIT);
+    if (state.page <= 0) return;
+    state.page -= 1;
     loadPage();
   }
   function nextPage() {
-    state.offset += PAGE_LIMIT;
+    if (!state.next) return;
+    state.cursors = state.cursors.slice(0, state.page + 1).concat([state.next]);
+    state.page += 1;
     loadPage();
   }
 
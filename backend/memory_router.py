@@ -15,6 +15,7 @@ from modules.memory_system import MemorySystem
 from backend.modules.reflection_storage import ReflectionStorage
 from backend.redis_interface import get_shared_redis_interface
 from backend.modules.pinecone_handler import PineconeHandler
+from backend.history_search import decode_cursor, encode_cursor
 
 try:
     from backend.logging_utils import get_request_id
@@ -167,6 +168,78 @@ class MemoryCenterResponse(BaseModel):
     count: int
     # 誠實揭露：使用 q 搜尋時，範圍為「最近 N 筆 owner-scoped rows 的 deterministic 過濾」。
     search_scope: Optional[str] = None
+    # keyset 游標（不透明字串）；None 代表沒有下一頁
+    next_cursor: Optional[str] = None
+    # 僅第一頁提供：符合條件的筆數（上限 MEMORY_CENTER_COUNT_CAP）；total_exact=False 代表「至少」
+    total_estimate: Optional[int] = None
+    total_exact: Optional[bool] = None
+
+
+def _center_rpc_enabled() -> bool:
+    return os.getenv("MEMORY_CENTER_RPC_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def _center_count_cap() -> int:
+    try:
+        return max(1, int(os.getenv("MEMORY_CENTER_COUNT_CAP", "1000")))
+    except ValueError:
+        return 1000
+
+
+def _center_cursor(cursor: Optional[str]):
+    """解碼 (created_at, id) 游標；created_at 需符合日期 grammar（會進 PostgREST 過濾值）。"""
+    try:
+        parts = decode_cursor(cursor, 2)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="cursor 格式錯誤")
+    if parts is None:
+        return None
+    created_at, row_id = parts
+    if (
+        not isinstance(created_at, str)
+        or not (_ISO_DATETIME_RE.match(created_at) or _ISO_DATE_ONLY_RE.match(created_at))
+        or not isinstance(row_id, int)
+        or isinstance(row_id, bool)
+    ):
+        raise HTTPException(status_code=422, detail="cursor 格式錯誤")
+    return created_at, row_id
+
+
+def _center_page_rpc(
+    principal: str,
+    ai_id: str,
+    *,
+    memory_type: Optional[str],
+    min_importance: Optional[float],
+    created_from: Optional[str],
+    created_to: Optional[str],
+    query: Optional[str],
+    limit: int,
+    cursor,
+):
+    """memory_center_page：所有篩選進同一條 owner-scoped 索引查詢，keyset 分頁 + 有上限的筆數估計。"""
+    params = {
+        "p_user_id": principal,
+        "p_ai_id": ai_id,
+        "p_memory_type": memory_type,
+        "p_min_importance": min_importance,
+        "p_created_from": created_from,
+        "p_created_to": created_to,
+        "p_query": query,
+        "p_limit": limit + 1,  # 多取一筆判斷是否還有下一頁
+        "p_count_cap": _center_count_cap(),
+    }
+    if cursor:
+        params["p_cursor_created_at"], params["p_cursor_id"] = cursor
+    rows = supabase.rpc("memory_center_page", params).execute().data or []
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_cursor(page[-1].get("created_at"), page[-1].get("id"))
+    total = None
+    if not cursor:
+        total = int(rows[0].get("total_estimate") or 0) if rows else 0
+    return page, next_cursor, total
 
 
 @router.get("/memory-center", response_model=MemoryCenterResponse)
@@ -176,16 +249,21 @@ async def memory_center(
     created_from: Optional[str] = Query(default=None),
     created_to: Optional[str] = Query(default=None),
     q: Optional[str] = Query(default=None, max_length=SEARCH_MAX_LEN),
+    min_importance: Optional[float] = Query(default=None, ge=0),
     limit: int = Query(20, ge=1, le=50),
     offset: int = Query(0, ge=0, le=1000),
+    cursor: Optional[str] = Query(default=None, max_length=200),
 ):
     """登入者唯讀記憶中心：owner + 目前 ai_id 綁定的列表／篩選／安全搜尋。
 
     - 所有 query 先套 exact user_id + ai_id，filter 只能再縮小、不放寬 owner scope。
     - memory_type 必須在 allowlist；未知 → 422。
     - created_from/to 僅允許 ISO 安全字元；非法 → 422。
-    - 搜尋 q 不拼入 SQL／PostgREST：抓有界 owner-scoped rows 後 deterministic in-Python 子字串過濾。
+    - 搜尋 q 不拼入 SQL／PostgREST：memory_center_page RPC 以綁定參數查 search_tsv 索引並做
+      子字串複驗；RPC 不可用時退回抓有界 owner-scoped rows 後 deterministic in-Python 過濾。
     - deterministic 分頁（created_at desc, id desc）與固定 sort；不接受 client 送任意欄名／SQL。
+      提供 cursor 時走 (created_at, id) keyset、忽略 offset；offset 僅為舊前端相容保留。
+    - 第一頁回傳 total_estimate（有上限的計數，不另做整表 COUNT）。
     - 回傳欄位 allowlist；無 embedding／owner id／ai id／metadata／token。
     """
     rid = get_request_id() or ""
@@ -201,12 +279,43 @@ async def memory_center(
     cf = cf_parsed[0] if cf_parsed else None
     ct = ct_parsed[0] if ct_parsed else None
 
+    keyset = _center_cursor(cursor)
+
     needle = None
     if q is not None:
         q_stripped = q.strip()
         if q_stripped:
             needle = q_stripped.casefold()
 
+    if _center_rpc_enabled() and (keyset or offset == 0):
+        try:
+            items, next_cursor, total = _center_page_rpc(
+                principal,
+                ai_id,
+                memory_type=memory_type,
+                min_importance=min_importance,
+                created_from=cf,
+                created_to=ct,
+                query=q.strip() if needle else None,
+                limit=limit,
+                cursor=keyset,
+            )
+            logger.info("memory_center ok request_id=%s count=%d source=rpc", rid, len(items))
+            return MemoryCenterResponse(
+                items=items,
+                limit=limit,
+                offset=0 if keyset else offset,
+                count=len(items),
+                next_cursor=next_cursor,
+                total_estimate=total,
+                total_exact=None if total is None else total < _center_count_cap(),
+            )
+        except Exception as e:
+            # migration 未套用或 RPC 失敗 → 退回 PostgREST 路徑（不記 raw detail）
+            logger.warning(
+                "memory_center rpc_unavailable request_id=%s error=%s", rid, type(e).__name__
+            )
+
     def _scoped():
         b = (
             supabase.table(_memories_table())
@@ -216,15 +325,24 @@ async def memory_center(
         )
         if memory_type is not None:
             b = b.eq("memory_type", memory_type)
+        if min_importance is not None:
+            b = b.gte("importance_score", min_importance)
         if cf is not None:
             b = b.gte("created_at", cf)
         if ct is not None:
             b = b.lte("created_at", ct)
+        if keyset:
+            # 游標值已通過日期 grammar / int 驗證，不含逗號／括號
+            c_at, c_id = keyset
+            b = b.or_(f"created_at.lt.{c_at},and(created_at.eq.{c_at},id.lt.{c_id})")
         return b.order("created_at", desc=True).order("id", desc=True)
 
     try:
         if needle is None:
-            result = _scoped().range(offset, offset + limit - 1).execute()
+            if keyset:
+                result = _scoped().limit(limit).execute()
+            else:
+                result = _scoped().range(offset, offset + limit - 1).execute()
             items = result.data or []
             scope = None
         else:
@@ -237,7 +355,7 @@ async def memory_center(
                     ((r.get("user_message") or "") + "\n" + (r.get("assistant_message") or "")).casefold()
                 )
             ]
-            items = matched[offset: offset + limit]
+            items = matched[:limit] if keyset else matched[offset: offset + limit]
             scope = f"recent_{SEARCH_SCAN_CAP}_owner_rows"
     except HTTPException:
         raise
@@ -245,13 +363,19 @@ async def memory_center(
         logger.error("memory_center read_error request_id=%s", rid)
         raise HTTPException(status_code=502, detail="記憶服務暫時無法使用，請稍後再試")
 
+    # 無額外查詢可判斷是否還有下一頁：整頁即給游標（最後一頁可能為空頁）
+    next_cursor = None
+    if len(items) == limit and items[-1].get("id") is not None:
+        next_cursor = encode_cursor(items[-1].get("created_at"), items[-1].get("id"))
+
     logger.info("memory_center ok request_id=%s count=%d", rid, len(items))
     return MemoryCenterResponse(
         items=items,
         limit=limit,
-        offset=offset,
+        offset=0 if keyset else offset,
         count=len(items),
         search_scope=scope,
+        next_cursor=next_cursor,
     )
 
 
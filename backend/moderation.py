@@ -2,12 +2,24 @@
 內容安全審核（OpenAI Moderation API）
 
 擋住不適當內容；失敗時採 fail-open 或 fail-closed 由環境變數控制。
+
+審核結果快取（以 sha256(model + 正規化文字) 為 key）：
+- 程序內有界 LRU（MODERATION_CACHE_SIZE，TTL = MODERATION_CACHE_TTL_SECONDS）
+- 可選 Redis 層 `moderation:v1:{hash}`（MODERATION_CACHE_REDIS），跨 worker 共用
+只快取 API 成功的原始判定（flagged/categories/scores）；blocked 於讀取時依當下
+MODERATION_BLOCK_CATEGORIES 重算。錯誤結果一律不快取。
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 logger = logging.getLogger("moderation")
 
@@ -36,6 +48,142 @@ def _parse_block_categories() -> set:
     return {c.strip() for c in raw.split(",") if c.strip()}
 
 
+REDIS_KEY_PREFIX = "moderation:v1:"
+
+_cache_lock = threading.Lock()
+_verdict_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_cache_stats = {"hits": 0, "redis_hits": 0, "misses": 0}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def _cache_size() -> int:
+    return _env_int("MODERATION_CACHE_SIZE", 2048)
+
+
+def _cache_ttl() -> int:
+    return _env_int("MODERATION_CACHE_TTL_SECONDS", 86400)
+
+
+def _redis_cache_enabled() -> bool:
+    return os.getenv("MODERATION_CACHE_REDIS", "true").lower() not in ("0", "false", "no")
+
+
+def verdict_cache_key(text: str, model: str) -> str:
+    """sha256(model + 空白正規化後文字)；不保存原文。"""
+    normalized = " ".join((text or "").split())
+    return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        entry = _verdict_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, verdict = entry
+        if expires_at <= time.time():
+            del _verdict_cache[key]
+            return None
+        _verdict_cache.move_to_end(key)
+        return verdict
+
+
+def _cache_put(key: str, verdict: Dict[str, Any]) -> None:
+    size, ttl = _cache_size(), _cache_ttl()
+    if size <= 0 or ttl <= 0:
+        return
+    with _cache_lock:
+        _verdict_cache[key] = (time.time() + ttl, verdict)
+        _verdict_cache.move_to_end(key)
+        while len(_verdict_cache) > size:
+            _verdict_cache.popitem(last=False)
+
+
+def _shared_redis():
+    if not _redis_cache_enabled() or _cache_ttl() <= 0:
+        return None
+    try:
+        from backend.redis_interface import get_shared_redis_interface
+
+        ri = get_shared_redis_interface()
+        return ri if getattr(ri, "redis", None) else None
+    except Exception:
+        return None
+
+
+async def _redis_get(key: str) -> Optional[Dict[str, Any]]:
+    ri = _shared_redis()
+    if ri is None:
+        return None
+    try:
+        raw = await ri.acall("get", REDIS_KEY_PREFIX + key)
+        if not raw:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        data = json.loads(raw)
+        return data if isinstance(data, dict) else None
+    except Exception as e:
+        logger.warning(f"⚠️ 審核快取讀取失敗: {e}")
+        return None
+
+
+async def _redis_put(key: str, verdict: Dict[str, Any]) -> None:
+    ri = _shared_redis()
+    if ri is None:
+        return
+    try:
+        await ri.acall(
+            "setex",
+            REDIS_KEY_PREFIX + key,
+            _cache_ttl(),
+            json.dumps(verdict, ensure_ascii=False, separators=(",", ":")),
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ 審核快取寫入失敗: {e}")
+
+
+def clear_verdict_cache() -> None:
+    """清空程序內快取與統計（測試 / 調整分類後使用）。"""
+    with _cache_lock:
+        _verdict_cache.clear()
+        for k in _cache_stats:
+            _cache_stats[k] = 0
+
+
+def verdict_cache_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return {**_cache_stats, "size": len(_verdict_cache)}
+
+
+def _bump(stat: str) -> None:
+    with _cache_lock:
+        _cache_stats[stat] += 1
+
+
+def _build_result(verdict: Dict[str, Any], model_name: str, block_cats: set) -> Dict[str, Any]:
+    categories = verdict.get("categories") or {}
+    flagged = bool(verdict.get("flagged"))
+    flagged_categories = [k for k, v in categories.items() if v]
+    # 僅在命中需阻擋分類時 blocked
+    blocked = any(categories.get(c, False) for c in block_cats) or (
+        flagged and not categories
+    )
+    return {
+        "flagged": flagged,
+        "blocked": blocked,
+        "categories": dict(categories),
+        "category_scores": dict(verdict.get("category_scores") or {}),
+        "flagged_categories": flagged_categories,
+        "model": model_name,
+    }
+
+
 async def moderate_text(
     text: str,
     *,
@@ -54,6 +202,7 @@ async def moderate_text(
         "flagged_categories": [str],
         "model": str,
         "error": optional str,
+        "cached": optional bool（命中判定快取時為 True）,
       }
     """
     text = (text or "").strip()
@@ -86,6 +235,20 @@ async def moderate_text(
     model_name = model or os.getenv("MODERATION_MODEL", "omni-moderation-latest")
     block_cats = _parse_block_categories()
 
+    cache_key = verdict_cache_key(text, model_name)
+    verdict = _cache_get(cache_key)
+    if verdict is not None:
+        _bump("hits")
+    else:
+        verdict = await _redis_get(cache_key)
+        if verdict is not None:
+            _bump("redis_hits")
+            _cache_put(cache_key, verdict)
+    if verdict is not None:
+        out = _build_result(verdict, model_name, block_cats)
+        out["cached"] = True
+        return out
+
     try:
         if client is None:
             from backend.openai_handler import get_openai_client
@@ -93,8 +256,6 @@ async def moderate_text(
             client = get_openai_client()
 
         # 同步 client 用 to_thread；若有 async 則直接 await
-        import asyncio
-
         def _call():
             return client.moderations.create(model=model_name, input=text)
 
@@ -139,24 +300,19 @@ async def moderate_text(
             elif isinstance(scores_obj, dict):
                 category_scores = {k: float(v) for k, v in scores_obj.items()}
 
-        flagged = bool(getattr(item, "flagged", False))
-        flagged_categories = [k for k, v in categories.items() if v]
-        # 僅在命中需阻擋分類時 blocked
-        blocked = any(categories.get(c, False) for c in block_cats) or (
-            flagged and not categories
-        )
-
-        out = {
-            "flagged": flagged,
-            "blocked": blocked,
+        verdict = {
+            "flagged": bool(getattr(item, "flagged", False)),
             "categories": categories,
             "category_scores": category_scores,
-            "flagged_categories": flagged_categories,
-            "model": model_name,
         }
-        if blocked:
+        _bump("misses")
+        _cache_put(cache_key, verdict)
+        await _redis_put(cache_key, verdict)
+
+        out = _build_result(verdict, model_name, block_cats)
+        if out["blocked"]:
             logger.warning(
-                f"🚫 內容審核攔截 categories={flagged_categories}"
+                f"🚫 內容審核攔截 categories={out['flagged_categories']}"
             )
         return out
     except Exception as e:
@@ -0,0 +1,210 @@
+"""
+Graph integrity engine — streaming, batched checks for large per-user graphs.
+
+- edges are streamed one at a time (no normalized copy of the whole graph)
+- memory existence is checked against keyset-paginated id pages
+  (id > cursor ORDER BY id LIMIT n), stopping as soon as every endpoint is found
+- reports exact counts plus bounded samples per finding type
+- incremental mode checks only edges created after the last run's watermark
+  (stored in <graph log dir>/<user>.integrity.json)
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from backend.modules.graph_manager import GraphManager, _is_valid_memory_node, _safe
+from backend.modules.memory_types import GRAPH_RELATIONS
+
+logger = logging.getLogger("memory.graph_integrity")
+
+SAMPLE_LIMIT = 20
+ID_PAGE_SIZE = 500
+
+# (after_cursor, limit) -> memory ids in ascending id order; empty list = done
+IdPager = Callable[[Optional[Any], int], List[Any]]
+
+
+def supabase_memory_id_pager(client, table: str, user_id: str) -> IdPager:
+    """Keyset pager over one user's memory ids (never OFFSET)."""
+
+    def fetch(after: Optional[Any], limit: int) -> List[Any]:
+        q = client.table(table).select("id").eq("user_id", user_id)
+        if after is not None:
+            q = q.gt("id", after)
+        rows = q.order("id").limit(limit).execute().data or []
+        return [r.get("id") for r in rows if r.get("id") is not None]
+
+    return fetch
+
+
+class _Sample:
+    """Exact count + first N items."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.count = 0
+        self.items: List[Any] = []
+
+    def add(self, item: Any) -> None:
+        self.count += 1
+        if len(self.items) < self.limit:
+            self.items.append(item)
+
+
+def _edge_ts(e: Dict[str, Any]) -> float:
+    try:
+        return float(e.get("timestamp") or e.get("ts") or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class GraphIntegrityChecker:
+    def __init__(
+        self,
+        graph: GraphManager,
+        *,
+        sample_limit: int = SAMPLE_LIMIT,
+        page_size: int = ID_PAGE_SIZE,
+        state_dir: Optional[str] = None,
+    ):
+        self.graph = graph
+        self.sample_limit = max(1, int(sample_limit))
+        self.page_size = max(1, int(page_size))
+        self.state_dir = Path(state_dir) if state_dir else Path(graph.log_dir)
+
+    def _state_path(self) -> Path:
+        return self.state_dir / f"{_safe(self.graph.user_id)}.integrity.json"
+
+    def load_watermark(self) -> float:
+        try:
+            path = self._state_path()
+            if path.exists():
+                data = json.loads(path.read_text(encoding="utf-8"))
+                return float(data.get("watermark") or 0.0)
+        except Exception as e:
+            logger.warning("integrity watermark load failed: %s", e)
+        return 0.0
+
+    def save_watermark(self, watermark: float) -> None:
+        path = self._state_path()
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps({"watermark": watermark}), encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning("integrity watermark save failed: %s", e)
+
+    def run(
+        self,
+        *,
+        id_pager: Optional[IdPager] = None,
+        known_memory_ids: Optional[Set[str]] = None,
+        incremental: bool = False,
+        commit_watermark: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Check live edges of graph.user_id.
+
+        Existence is checked with known_memory_ids when given, else by paging
+        id_pager; with neither, missing ids are not checked.
+        """
+        since = self.load_watermark() if incremental else 0.0
+        orphan = _Sample(self.sample_limit)
+        invalid_nodes = _Sample(self.sample_limit)
+        invalid_relations = _Sample(self.sample_limit)
+        duplicates = _Sample(self.sample_limit)
+        dup_counts: Dict[tuple, int] = {}
+        seen_keys: Set[tuple] = set()
+        nodes: Set[str] = set()
+        pending: Set[str] = set()
+        check_existence = known_memory_ids is not None or id_pager is not None
+        total_edges = 0
+        checked = 0
+        watermark = since
+
+        for e in self.graph.iter_edges():
+            total_edges += 1
+            src, tgt, rel = GraphManager._edge_key(e)
+            key = (src, tgt, rel)
+            if src:
+                nodes.add(src)
+            if tgt:
+                nodes.add(tgt)
+            ts = _edge_ts(e)
+            in_scope = not incremental or ts > since
+            if key in seen_keys and in_scope:
+                dup_counts[key] = dup_counts.get(key, 1) + 1
+            seen_keys.add(key)
+            if not in_scope:
+                continue
+            checked += 1
+            watermark = max(watermark, ts)
+            eid = e.get("id")
+            if not src or not tgt:
+                orphan.add({"edge_id": eid, "reason": "empty_endpoint"})
+            if not _is_valid_memory_node(src) or not _is_valid_memory_node(tgt):
+                invalid_nodes.add({"edge_id": eid, "src": src, "tgt": tgt})
+            if rel not in GRAPH_RELATIONS:
+                invalid_relations.add({"edge_id": eid, "relation": rel})
+            if check_existence:
+                for node in (src, tgt):
+                    if node and _is_valid_memory_node(node):
+                        pending.add(node)
+
+        for key, count in dup_counts.items():
+            duplicates.add({"key": "|".join(str(k) for k in key), "count": count})
+
+        pages = 0
+        if known_memory_ids is not None:
+            pending = {m for m in pending if m not in known_memory_ids}
+        elif id_pager is not None:
+            after: Optional[Any] = None
+            while pending:
+                ids = id_pager(after, self.page_size)
+                pages += 1
+                if not ids:
+                    break
+                for mid in ids:
+                    pending.discard(str(mid))
+                after = ids[-1]
+                if len(ids) < self.page_size:
+                    break
+        missing = _Sample(self.sample_limit)
+        for mid in sorted(pending):
+            missing.add(mid)
+
+        if commit_watermark and checked:
+            self.save_watermark(watermark)
+
+        return {
+            "user_id": self.graph.user_id,
+            "mode": "incremental" if incremental else "full",
+            "watermark_from": since,
+            "watermark_to": watermark,
+            "edges_checked": checked,
+            "id_pages_fetched": pages,
+            "sample_limit": self.sample_limit,
+            "total_nodes": len(nodes),
+            "total_edges": total_edges,
+            "orphan_edges": orphan.items,
+            "orphan_edge_count": orphan.count,
+            "invalid_relations": invalid_relations.items,
+            "invalid_relation_count": invalid_relations.count,
+            "invalid_nodes": invalid_nodes.items,
+            "invalid_node_count": invalid_nodes.count,
+            "missing_memory_ids": missing.items,
+            "missing_memory_id_count": missing.count,
+            "duplicate_edges": duplicates.items,
+            "duplicate_edge_count": duplicates.count,
+            "ok": (
+                orphan.count == 0
+                and invalid_relations.count == 0
+                and invalid_nodes.count == 0
+                and duplicates.count == 0
+            ),
+        }
@@ -7,6 +7,21 @@ Forbidden as node ids: bare labels like "reflection", "document", "emotion".
 Edge schema:
   source_memory_id, target_memory_id, relation, confidence,
   created_at, created_by, metadata (+ timestamp for legacy)
+
+Persistence:
+  - per-user append-only op log  <MEMORY_GRAPH_DIR>/<user>.jsonl
+    (add / archive / remove / clear); every mutation appends one line under
+    an exclusive file lock, so concurrent writers never overwrite each other
+  - compaction rewrites the log as a snapshot via tmp file + atomic rename
+  - Redis copy: hash memory_graph:{user}:edge_map (field = edge id), updated
+    per edge with HSET/HDEL instead of one monolithic JSON string
+  - legacy MEMORY_GRAPH_FILE / memory_graph:{user}:edges are read once and
+    migrated into the log; they are no longer written
+
+Proximity:
+  per-seed top-K weighted 2-hop table (hop-1 confidence, hop-2 decayed
+  product), built lazily or nightly by Night Growth and patched for the
+  affected neighbourhood on each mutation; retrieval reads it in one lookup.
 """
 from __future__ import annotations
 
@@ -15,9 +30,15 @@ import logging
 import os
 import time
 import uuid
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+try:  # POSIX advisory locks; best-effort (no locking) elsewhere
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None  # type: ignore[assignment]
 
 from backend.modules.memory_types import GRAPH_RELATIONS
 
@@ -56,6 +77,27 @@ def _iso_now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def _safe(uid: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in (uid or "default"))[:80]
+
+
+def _compact_min_ops() -> int:
+    try:
+        return max(10, int(os.getenv("MEMORY_GRAPH_COMPACT_MIN_OPS", "500")))
+    except (TypeError, ValueError):
+        return 500
+
+
+# alias fields rebuilt by _normalize_edge; never stored
+_EDGE_ALIAS_FIELDS = ("source_id", "target_id", "ts", "meta")
+
+MAX_EDGES_PER_USER = 5000
+
+# weighted 2-hop proximity table (retrieval graph expansion)
+PROXIMITY_TOP_K = 12
+PROXIMITY_HOP_DECAY = 0.5
+
+
 class GraphManager:
     def __init__(
         self,
@@ -63,37 +105,127 @@ class GraphManager:
         *,
         user_id: str = "default_user",
         storage_path: Optional[str] = None,
+        log_dir: Optional[str] = None,
     ):
         self.redis = redis_interface
-        self.user_id = user_id or "default_user"
+        self._user_id = user_id or "default_user"
         default_path = (
             Path(__file__).resolve().parents[2] / "data" / "memory_graph.json"
         )
+        # legacy monolithic file: read for one-time migration only
         self.storage_path = Path(
             storage_path or os.getenv("MEMORY_GRAPH_FILE", str(default_path))
         )
+        self.log_dir = Path(
+            log_dir
+            or os.getenv("MEMORY_GRAPH_DIR")
+            or (self.storage_path.parent / f"{self.storage_path.stem}.d")
+        )
         self._local_edges: List[Dict[str, Any]] = []
         self._loaded = False
+        self._log_offset = 0
+        self._log_ino: Optional[int] = None
+        self._log_ops = 0
+        self._proximity: Optional[Dict[str, List[list]]] = None
+
+    @property
+    def user_id(self) -> str:
+        return self._user_id
+
+    @user_id.setter
+    def user_id(self, value: str) -> None:
+        value = value or "default_user"
+        if value != self._user_id:
+            # shared managers re-scope per request: drop the other user's edges
+            self._user_id = value
+            self._local_edges = []
+            self._loaded = False
+            self._log_offset = 0
+            self._log_ino = None
+            self._log_ops = 0
+            self._proximity = None
 
     def _redis_key(self) -> str:
+        return f"memory_graph:{self.user_id}:edge_map"
+
+    def _legacy_redis_key(self) -> str:
         return f"memory_graph:{self.user_id}:edges"
 
+    def _log_path(self) -> Path:
+        return self.log_dir / f"{_safe(self.user_id)}.jsonl"
+
+    def _redis_client(self):
+        if self.redis is None:
+            return None
+        return getattr(self.redis, "redis", None)
+
+    # ------------------------------------------------------------------
+    # Load
+    # ------------------------------------------------------------------
     def _ensure_loaded(self) -> None:
         if self._loaded:
             return
         self._loaded = True
+        if self._load_from_log():
+            return
+        edges = self._load_from_redis()
+        if edges is None:
+            edges = self._load_legacy_file()
+        if edges:
+            # seed the per-user log so later appends build on this snapshot
+            with self._log_session() as fh:
+                if not self._local_edges:
+                    self._local_edges = edges
+                self._commit(fh, [], force_snapshot=True)
+
+    def _load_from_log(self) -> bool:
+        path = self._log_path()
         try:
-            if self.redis and getattr(self.redis, "redis", None):
-                raw = self.redis.redis.get(self._redis_key())
-                if raw:
+            if not path.exists():
+                return False
+            with path.open("rb") as fh:
+                self._local_edges = []
+                self._log_offset = 0
+                self._log_ops = 0
+                self._log_ino = os.fstat(fh.fileno()).st_ino
+                self._read_log_tail(fh)
+            return True
+        except Exception as e:
+            logger.warning("graph log load failed: %s", e)
+            self._local_edges = []
+            return False
+
+    def _load_from_redis(self) -> Optional[List[Dict[str, Any]]]:
+        client = self._redis_client()
+        if client is None:
+            return None
+        try:
+            raw_map = client.hgetall(self._redis_key())
+            if isinstance(raw_map, dict) and raw_map:
+                edges = []
+                for raw in raw_map.values():
                     if isinstance(raw, bytes):
                         raw = raw.decode("utf-8")
-                    data = json.loads(raw)
-                    if isinstance(data, list):
-                        self._local_edges = [self._normalize_edge(e) for e in data if e]
-                        return
+                    edges.append(self._normalize_edge(json.loads(raw)))
+                edges.sort(key=lambda e: float(e.get("timestamp") or 0))
+                return edges
         except Exception as e:
             logger.warning("graph redis load failed: %s", e)
+        try:
+            raw = client.get(self._legacy_redis_key())
+            if raw:
+                if isinstance(raw, bytes):
+                    raw = raw.decode("utf-8")
+                data = json.loads(raw)
+                if isinstance(data, list):
+                    edges = [self._normalize_edge(e) for e in data if e]
+                    self._redis_write(upsert=edges)
+                    return edges
+        except Exception as e:
+            logger.warning("graph redis load failed: %s", e)
+        return None
+
+    def _load_legacy_file(self) -> Optional[List[Dict[str, Any]]]:
         try:
             if self.storage_path.exists():
                 all_data = json.loads(self.storage_path.read_text(encoding="utf-8"))
@@ -103,9 +235,45 @@ class GraphManager:
                     raw_list = all_data
                 else:
                     raw_list = []
-                self._local_edges = [self._normalize_edge(e) for e in raw_list if e]
+                return [self._normalize_edge(e) for e in raw_list if e]
         except Exception as e:
             logger.warning("graph file load failed: %s", e)
+        return None
+
+    def _read_log_tail(self, fh) -> None:
+        """Apply complete op lines from self._log_offset to EOF."""
+        fh.seek(self._log_offset)
+        data = fh.read()
+        end = data.rfind(b"\n")
+        if end < 0:
+            return
+        for line in data[: end + 1].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply_op(json.loads(line))
+            except Exception as e:
+                logger.warning("graph log line skipped: %s", e)
+            self._log_ops += 1
+        self._log_offset += end + 1
+        # ops from another writer: rebuild lazily on next lookup
+        self._proximity = None
+
+    def _apply_op(self, op: Dict[str, Any]) -> None:
+        kind = op.get("op")
+        if kind == "add":
+            self._local_edges.append(self._normalize_edge(op.get("edge") or {}))
+        elif kind == "archive":
+            ids = set(op.get("ids") or [])
+            for e in self._local_edges:
+                if e.get("id") in ids:
+                    e["archived"] = True
+                    e["archived_at"] = op.get("at") or _iso_now()
+        elif kind == "remove":
+            ids = set(op.get("ids") or [])
+            self._local_edges = [e for e in self._local_edges if e.get("id") not in ids]
+        elif kind == "clear":
+            self._local_edges = []
 
     def _normalize_edge(self, e: Dict[str, Any]) -> Dict[str, Any]:
         e = dict(e or {})
@@ -137,32 +305,154 @@ class GraphManager:
             e["id"] = str(uuid.uuid4())
         return e
 
-    def _persist(self) -> None:
+    # ------------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _log_session(self) -> Iterator[Any]:
+        """
+        Exclusive access to this user's log for one mutation.
+
+        Ops appended by other writers since our last read are applied first,
+        so duplicate checks and compaction see the current log state.
+        Yields None (in-memory only) when the data volume is unavailable.
+        """
+        fh = None
         try:
-            if self.redis and getattr(self.redis, "redis", None):
-                self.redis.redis.set(
-                    self._redis_key(),
-                    json.dumps(self._local_edges, ensure_ascii=False),
-                )
+            path = self._log_path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            while True:
+                fh = path.open("a+b")
+                if fcntl is not None:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+                ino = os.fstat(fh.fileno()).st_ino
+                if path.exists() and os.stat(path).st_ino == ino:
+                    break
+                # compacted (renamed over) while we waited for the lock
+                fh.close()
+            if ino != self._log_ino:
+                self._local_edges = []
+                self._log_offset = 0
+                self._log_ops = 0
+                self._log_ino = ino
+                self._proximity = None
+            self._read_log_tail(fh)
+            self._drop_partial_tail(fh)
         except Exception as e:
-            logger.warning("graph redis save failed: %s", e)
+            logger.warning("graph log open failed: %s", e)
+            if fh is not None:
+                fh.close()
+            fh = None
         try:
-            self.storage_path.parent.mkdir(parents=True, exist_ok=True)
-            existing: Dict[str, Any] = {}
-            if self.storage_path.exists():
-                try:
-                    raw = json.loads(self.storage_path.read_text(encoding="utf-8"))
-                    if isinstance(raw, dict):
-                        existing = raw
-                except Exception:
-                    existing = {}
-            existing[self.user_id] = self._local_edges
-            self.storage_path.write_text(
-                json.dumps(existing, ensure_ascii=False, indent=2),
-                encoding="utf-8",
-            )
+            yield fh
+        finally:
+            if fh is not None:
+                fh.close()
+
+    def _drop_partial_tail(self, fh) -> None:
+        """
+        Bytes past the last complete line are a crashed writer's partial op.
+
+        Under the exclusive lock nobody else can be mid-write, so truncate them;
+        otherwise the next append would be glued onto that line and lost on replay.
+        Without flock we cannot tell, so only terminate the line instead.
+        """
+        size = os.fstat(fh.fileno()).st_size
+        if size <= self._log_offset:
+            return
+        logger.warning("graph log: dropping %d-byte partial trailing op", size - self._log_offset)
+        if fcntl is not None:
+            fh.truncate(self._log_offset)
+        else:
+            fh.write(b"\n")
+            fh.flush()
+            self._log_offset = fh.tell()
+
+    def _append_ops(self, fh, ops: List[Dict[str, Any]]) -> None:
+        if fh is None or not ops:
+            return
+        try:
+            data = "".join(
+                json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n"
+                for op in ops
+            ).encode("utf-8")
+            fh.write(data)
+            fh.flush()
+            self._log_offset = fh.tell()
+            self._log_ops += len(ops)
+        except Exception as e:
+            logger.warning("graph log append failed: %s", e)
+
+    def _needs_compaction(self) -> bool:
+        return self._log_ops > max(_compact_min_ops(), 2 * len(self._local_edges))
+
+    def _write_snapshot(self) -> None:
+        """Rewrite the log as one add op per edge (tmp file + atomic rename)."""
+        path = self._log_path()
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp.open("wb") as out:
+                for e in self._local_edges:
+                    line = json.dumps(
+                        {"op": "add", "edge": self._compact_edge(e)},
+                        ensure_ascii=False,
+                        separators=(",", ":"),
+                    )
+                    out.write(line.encode("utf-8") + b"\n")
+                out.flush()
+                os.fsync(out.fileno())
+                size = out.tell()
+            os.replace(tmp, path)
+            self._log_ino = os.stat(path).st_ino
+            self._log_offset = size
+            self._log_ops = len(self._local_edges)
         except Exception as e:
-            logger.warning("graph file save failed: %s", e)
+            logger.warning("graph log compaction failed: %s", e)
+            try:
+                tmp.unlink()
+            except Exception:
+                pass
+
+    def compact(self) -> None:
+        """Collapse the op log into a snapshot of the current edges."""
+        self._ensure_loaded()
+        with self._log_session() as fh:
+            self._commit(fh, [], force_snapshot=True)
+
+    def _redis_write(
+        self,
+        *,
+        upsert: Optional[List[Dict[str, Any]]] = None,
+        delete_ids: Optional[List[str]] = None,
+        clear: bool = False,
+    ) -> None:
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            key = self._redis_key()
+            if clear:
+                client.delete(key)
+                client.delete(self._legacy_redis_key())
+            if upsert:
+                client.hset(
+                    key,
+                    mapping={
+                        str(e.get("id")): json.dumps(
+                            self._compact_edge(e), ensure_ascii=False, separators=(",", ":")
+                        )
+                        for e in upsert
+                    },
+                )
+            if delete_ids:
+                client.hdel(key, *delete_ids)
+        except Exception as e:
+            logger.warning("graph redis save failed: %s", e)
+
+    @staticmethod
+    def _compact_edge(e: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in e.items() if k not in _EDGE_ALIAS_FIELDS}
 
     def add_edge(
         self,
@@ -178,53 +468,144 @@ class GraphManager:
         target_id: Optional[str] = None,
         allow_duplicate: bool = False,
     ) -> Dict[str, Any]:
+        return self.add_edges(
+            [
+                {
+                    "source_memory_id": source_memory_id or source_id,
+                    "target_memory_id": target_memory_id or target_id,
+                    "relation": relation,
+                    "confidence": confidence,
+                    "metadata": metadata or meta,
+                    "created_by": created_by,
+                }
+            ],
+            allow_duplicate=allow_duplicate,
+        )[0]
+
+    def add_edges(
+        self,
+        specs: List[Dict[str, Any]],
+        *,
+        allow_duplicate: bool = False,
+        skip_invalid: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate, dedupe and persist many edges with one log append + one Redis write.
+
+        specs: dicts with add_edge fields (source_memory_id/source_id,
+        target_memory_id/target_id, relation, confidence, metadata/meta, created_by).
+        Invalid specs raise ValueError before anything is written, unless
+        skip_invalid=True. Returns one edge per accepted spec (the existing
+        edge when deduplicated), in spec order.
+        """
         self._ensure_loaded()
-        src = str(source_memory_id or source_id or "").strip()
-        tgt = str(target_memory_id or target_id or "").strip()
+        validated = []
+        for spec in specs or []:
+            try:
+                validated.append(self._validate_edge_spec(spec))
+            except ValueError:
+                if skip_invalid:
+                    continue
+                raise
+        if not validated:
+            return []
+
+        out: List[Dict[str, Any]] = []
+        added: List[Dict[str, Any]] = []
+        trimmed: List[Dict[str, Any]] = []
+        with self._log_session() as fh:
+            for src, tgt, rel, conf, md, created_by in validated:
+                if not allow_duplicate:
+                    found = self._find_active_edge(src, tgt, rel)
+                    if found is not None:
+                        out.append(self._normalize_edge(found))
+                        continue
+                ts = time.time()
+                edge = {
+                    "id": str(uuid.uuid4()),
+                    "source_memory_id": src,
+                    "target_memory_id": tgt,
+                    "source_id": src,
+                    "target_id": tgt,
+                    "relation": rel,
+                    "confidence": conf,
+                    "timestamp": ts,
+                    "ts": ts,
+                    "created_at": _iso_now(),
+                    "created_by": created_by or "system",
+                    "metadata": md,
+                    "meta": md,
+                    "user_id": self.user_id,
+                    "archived": False,
+                }
+                self._local_edges.append(edge)
+                added.append(edge)
+                out.append(edge)
+            if len(self._local_edges) > MAX_EDGES_PER_USER:
+                trimmed = self._local_edges[:-MAX_EDGES_PER_USER]
+                self._local_edges = self._local_edges[-MAX_EDGES_PER_USER:]
+            if added:
+                self._commit(
+                    fh,
+                    [{"op": "add", "edge": self._compact_edge(e)} for e in added],
+                    force_snapshot=bool(trimmed),
+                )
+        if added:
+            self._redis_write(
+                upsert=added,
+                delete_ids=[str(e.get("id")) for e in trimmed if e.get("id")],
+            )
+            if trimmed:
+                self._proximity = None
+            else:
+                self._refresh_proximity(added)
+        return out
+
+    @staticmethod
+    def _validate_edge_spec(spec: Dict[str, Any]) -> tuple:
+        src = str(spec.get("source_memory_id") or spec.get("source_id") or "").strip()
+        tgt = str(spec.get("target_memory_id") or spec.get("target_id") or "").strip()
         if not _is_valid_memory_node(src) or not _is_valid_memory_node(tgt):
             raise ValueError(
                 f"nodes must be memory_id, not labels: {src!r} -> {tgt!r}"
             )
         if not src or not tgt:
             raise ValueError("source_memory_id and target_memory_id required")
+        relation = spec.get("relation")
         rel = (relation or "").strip().lower()
         if rel not in GRAPH_RELATIONS:
             raise ValueError(f"invalid relation: {relation}")
-        conf = max(0.0, min(1.0, float(confidence)))
-        md = dict(metadata or meta or {})
-        if not allow_duplicate:
-            for existing in self._local_edges:
-                en = self._normalize_edge(existing)
-                if (
-                    en.get("source_memory_id") == src
-                    and en.get("target_memory_id") == tgt
-                    and en.get("relation") == rel
-                    and not en.get("archived")
-                ):
-                    return en
-        ts = time.time()
-        edge = {
-            "id": str(uuid.uuid4()),
-            "source_memory_id": src,
-            "target_memory_id": tgt,
-            "source_id": src,
-            "target_id": tgt,
-            "relation": rel,
-            "confidence": conf,
-            "timestamp": ts,
-            "ts": ts,
-            "created_at": _iso_now(),
-            "created_by": created_by or "system",
-            "metadata": md,
-            "meta": md,
-            "user_id": self.user_id,
-            "archived": False,
-        }
-        self._local_edges.append(edge)
-        if len(self._local_edges) > 5000:
-            self._local_edges = self._local_edges[-5000:]
-        self._persist()
-        return edge
+        confidence = spec.get("confidence")
+        conf = max(0.0, min(1.0, float(0.5 if confidence is None else confidence)))
+        md = dict(spec.get("metadata") or spec.get("meta") or {})
+        return src, tgt, rel, conf, md, spec.get("created_by") or "system"
+
+    @staticmethod
+    def _edge_key(e: Dict[str, Any]) -> tuple:
+        src = e.get("source_memory_id") or e.get("source_id")
+        tgt = e.get("target_memory_id") or e.get("target_id")
+        return (
+            str(src) if src is not None else "",
+            str(tgt) if tgt is not None else "",
+            e.get("relation"),
+        )
+
+    def _find_active_edge(self, src: str, tgt: str, rel: str) -> Optional[Dict[str, Any]]:
+        for existing in self._local_edges:
+            if self._edge_key(existing) == (src, tgt, rel) and not existing.get("archived"):
+                return existing
+        return None
+
+    def _commit(self, fh, ops: List[Dict[str, Any]], *, force_snapshot: bool = False) -> None:
+        """Append ops inside a log session; compact when the log has grown stale."""
+        if fh is None:
+            return
+        if force_snapshot:
+            self._write_snapshot()
+            return
+        self._append_ops(fh, ops)
+        if self._needs_compaction():
+            self._write_snapshot()
 
     def get_neighbors(
         self,
@@ -260,33 +641,158 @@ class GraphManager:
         """Soft-archive edges involving memory_id so they are not orphan live edges."""
         self._ensure_loaded()
         mid = str(memory_id)
-        n = 0
-        for e in self._local_edges:
-            en = self._normalize_edge(e)
-            if en.get("source_memory_id") == mid or en.get("target_memory_id") == mid:
-                if not e.get("archived"):
+        changed: List[Dict[str, Any]] = []
+        with self._log_session() as fh:
+            at = _iso_now()
+            for e in self._local_edges:
+                src, tgt, _rel = self._edge_key(e)
+                if (src == mid or tgt == mid) and not e.get("archived"):
+                    e.setdefault("id", str(uuid.uuid4()))
                     e["archived"] = True
-                    e["archived_at"] = _iso_now()
-                    n += 1
-        if n:
-            self._persist()
-        return n
+                    e["archived_at"] = at
+                    changed.append(e)
+            if changed:
+                self._commit(
+                    fh,
+                    [{"op": "archive", "ids": [str(e["id"]) for e in changed], "at": at}],
+                )
+        if changed:
+            self._redis_write(upsert=changed)
+            self._refresh_proximity(changed)
+        return len(changed)
 
     def remove_edges_for_memory(self, memory_id: str) -> int:
         """Hard-remove edges involving memory_id."""
         self._ensure_loaded()
         mid = str(memory_id)
-        before = len(self._local_edges)
-        self._local_edges = [
-            e
-            for e in self._local_edges
-            if self._normalize_edge(e).get("source_memory_id") != mid
-            and self._normalize_edge(e).get("target_memory_id") != mid
-        ]
-        removed = before - len(self._local_edges)
+        removed: List[Dict[str, Any]] = []
+        with self._log_session() as fh:
+            kept = []
+            for e in self._local_edges:
+                src, tgt, _rel = self._edge_key(e)
+                (removed if src == mid or tgt == mid else kept).append(e)
+            if removed:
+                self._local_edges = kept
+                ids = [str(e.get("id")) for e in removed if e.get("id")]
+                self._commit(fh, [{"op": "remove", "ids": ids}])
         if removed:
-            self._persist()
-        return removed
+            self._redis_write(
+                delete_ids=[str(e.get("id")) for e in removed if e.get("id")]
+            )
+            self._refresh_proximity(removed)
+        return len(removed)
+
+    # ------------------------------------------------------------------
+    # Proximity (precomputed graph relevance)
+    # ------------------------------------------------------------------
+    def _adjacency(self) -> Dict[str, Dict[str, tuple]]:
+        """Undirected live adjacency: node -> {neighbor: (confidence, relation)}."""
+        adj: Dict[str, Dict[str, tuple]] = {}
+        for e in self._local_edges:
+            if e.get("archived"):
+                continue
+            src, tgt, rel = self._edge_key(e)
+            if not src or not tgt or src == tgt:
+                continue
+            try:
+                conf = float(e.get("confidence") or 0.5)
+            except (TypeError, ValueError):
+                conf = 0.5
+            for a, b in ((src, tgt), (tgt, src)):
+                row = adj.setdefault(a, {})
+                # strongest edge per neighbor pair
+                if b not in row or conf > row[b][0]:
+                    row[b] = (conf, rel)
+        return adj
+
+    @staticmethod
+    def _proximity_row(adj: Dict[str, Dict[str, tuple]], seed: str) -> List[list]:
+        """Top-K [memory_id, score, relation, hops] reachable within two hops."""
+        first = adj.get(seed) or {}
+        best: Dict[str, list] = {
+            mid: [mid, round(c1, 4), r1, 1] for mid, (c1, r1) in first.items()
+        }
+        for mid, (c1, r1) in first.items():
+            for far, (c2, _r2) in (adj.get(mid) or {}).items():
+                if far == seed:
+                    continue
+                score = round(PROXIMITY_HOP_DECAY * c1 * c2, 4)
+                if far not in best or score > best[far][1]:
+                    best[far] = [far, score, r1, 2]
+        rows = sorted(best.values(), key=lambda r: r[1], reverse=True)
+        return rows[:PROXIMITY_TOP_K]
+
+    def build_proximity(self) -> Dict[str, Any]:
+        """Full rebuild of the per-seed proximity table (Night Growth)."""
+        self._ensure_loaded()
+        adj = self._adjacency()
+        self._proximity = {n: self._proximity_row(adj, n) for n in adj}
+        return {
+            "nodes": len(self._proximity),
+            "entries": sum(len(r) for r in self._proximity.values()),
+        }
+
+    def _refresh_proximity(self, edges: List[Dict[str, Any]]) -> None:
+        """Recompute rows whose 2-hop neighbourhood touches the changed edges."""
+        if self._proximity is None:
+            return
+        adj = self._adjacency()
+        affected: Set[str] = set()
+        for e in edges:
+            for node in self._edge_key(e)[:2]:
+                if node:
+                    affected.add(node)
+                    affected.update(adj.get(node) or {})
+        for node in affected:
+            row = self._proximity_row(adj, node)
+            if row:
+                self._proximity[node] = row
+            else:
+                self._proximity.pop(node, None)
+
+    def related_for_seeds(
+        self,
+        seed_ids: List[str],
+        *,
+        limit: int = PROXIMITY_TOP_K,
+        exclude_seeds: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Top related memories for a seed set from the proximity table.
+
+        Scores from several seeds combine as noisy-or, so memories reachable
+        from more seeds rank higher. A seed is never related to itself.
+        """
+        self._ensure_loaded()
+        if self._proximity is None:
+            self.build_proximity()
+        table = self._proximity or {}
+        seeds = [str(s) for s in seed_ids or []]
+        seed_set = set(seeds)
+        merged: Dict[str, Dict[str, Any]] = {}
+        for seed in seeds:
+            for mid, score, rel, hops in table.get(seed) or []:
+                if mid == seed or (exclude_seeds and mid in seed_set):
+                    continue
+                cur = merged.get(mid)
+                if cur is None:
+                    merged[mid] = {
+                        "memory_id": mid,
+                        "score": score,
+                        "relation": rel,
+                        "hops": hops,
+                        "via_memory_id": seed,
+                        "_best": score,
+                    }
+                    continue
+                cur["score"] = 1.0 - (1.0 - cur["score"]) * (1.0 - score)
+                if score > cur["_best"]:
+                    cur.update(relation=rel, hops=hops, via_memory_id=seed, _best=score)
+        out = sorted(merged.values(), key=lambda r: r["score"], reverse=True)[:limit]
+        for r in out:
+            r.pop("_best", None)
+            r["score"] = round(min(1.0, r["score"]), 4)
+        return out
 
     def apply_classification_relations(
         self,
@@ -295,13 +801,13 @@ class GraphManager:
         *,
         related_memory_ids: Optional[List[str]] = None,
     ) -> List[Dict[str, Any]]:
-        created = []
         mid = str(memory_id)
         if not _is_valid_memory_node(mid):
-            return created
+            return []
         related = [
             str(x) for x in (related_memory_ids or []) if _is_valid_memory_node(str(x))
         ]
+        specs: List[Dict[str, Any]] = []
         for rel in relations or []:
             name = (rel.get("relation") or "").lower()
             if name not in GRAPH_RELATIONS:
@@ -309,40 +815,43 @@ class GraphManager:
             src = rel.get("source_memory_id") or rel.get("source_id")
             tgt = rel.get("target_memory_id") or rel.get("target_id") or mid
             if src and _is_valid_memory_node(str(src)) and _is_valid_memory_node(str(tgt)):
-                try:
-                    created.append(
-                        self.add_edge(
-                            str(src),
-                            str(tgt),
-                            name,
-                            confidence=float(rel.get("confidence") or 0.5),
-                            created_by="classifier",
-                            meta={
-                                "memory_id": mid,
-                                **{k: v for k, v in rel.items() if k != "relation"},
-                            },
-                        )
-                    )
-                except ValueError:
-                    continue
+                specs.append(
+                    {
+                        "source_memory_id": str(src),
+                        "target_memory_id": str(tgt),
+                        "relation": name,
+                        "confidence": float(rel.get("confidence") or 0.5),
+                        "created_by": "classifier",
+                        "metadata": {
+                            "memory_id": mid,
+                            **{k: v for k, v in rel.items() if k != "relation"},
+                        },
+                    }
+                )
                 continue
             for other in related:
                 if other == mid:
                     continue
-                try:
-                    created.append(
-                        self.add_edge(
-                            mid,
-                            other,
-                            name,
-                            confidence=float(rel.get("confidence") or 0.4),
-                            created_by="classifier",
-                            meta={"via": "classification"},
-                        )
-                    )
-                except ValueError:
-                    continue
-        return created
+                specs.append(
+                    {
+                        "source_memory_id": mid,
+                        "target_memory_id": other,
+                        "relation": name,
+                        "confidence": float(rel.get("confidence") or 0.4),
+                        "created_by": "classifier",
+                        "metadata": {"via": "classification"},
+                    }
+                )
+        # one validation/dedupe pass and a single persist for the whole save
+        return self.add_edges(specs, skip_invalid=True)
+
+    def iter_edges(self, *, include_archived: bool = False) -> Iterator[Dict[str, Any]]:
+        """Stream stored edges without copying the graph (read-only; do not mutate)."""
+        self._ensure_loaded()
+        for e in self._local_edges:
+            if e.get("archived") and not include_archived:
+                continue
+            yield e
 
     def integrity_check(
         self,
@@ -352,70 +861,18 @@ class GraphManager:
         """
         Check graph integrity for current user.
         known_memory_ids: optional set of valid memory ids; if provided, missing ids reported.
+        Finding lists are bounded samples; *_count fields are exact.
         """
-        self._ensure_loaded()
-        nodes: Set[str] = set()
-        orphan_edges = []
-        invalid_relations = []
-        missing_memory_ids = []
-        invalid_nodes = []
-        duplicate_keys: Dict[str, int] = {}
-        duplicates = []
-        active_edges = []
-
-        for raw in self._local_edges:
-            e = self._normalize_edge(raw)
-            if e.get("archived"):
-                continue
-            active_edges.append(e)
-            src = e.get("source_memory_id") or ""
-            tgt = e.get("target_memory_id") or ""
-            rel = e.get("relation") or ""
-            if src:
-                nodes.add(src)
-            if tgt:
-                nodes.add(tgt)
-            if not src or not tgt:
-                orphan_edges.append({"edge_id": e.get("id"), "reason": "empty_endpoint"})
-            if not _is_valid_memory_node(src) or not _is_valid_memory_node(tgt):
-                invalid_nodes.append({"edge_id": e.get("id"), "src": src, "tgt": tgt})
-            if rel not in GRAPH_RELATIONS:
-                invalid_relations.append({"edge_id": e.get("id"), "relation": rel})
-            if known_memory_ids is not None:
-                if src and src not in known_memory_ids:
-                    missing_memory_ids.append(src)
-                if tgt and tgt not in known_memory_ids:
-                    missing_memory_ids.append(tgt)
-            key = f"{src}|{tgt}|{rel}"
-            duplicate_keys[key] = duplicate_keys.get(key, 0) + 1
-
-        for key, count in duplicate_keys.items():
-            if count > 1:
-                duplicates.append({"key": key, "count": count})
+        from backend.modules.graph_integrity import GraphIntegrityChecker
 
-        return {
-            "user_id": self.user_id,
-            "total_nodes": len(nodes),
-            "total_edges": len(active_edges),
-            "orphan_edges": orphan_edges,
-            "orphan_edge_count": len(orphan_edges),
-            "invalid_relations": invalid_relations,
-            "invalid_relation_count": len(invalid_relations),
-            "invalid_nodes": invalid_nodes,
-            "invalid_node_count": len(invalid_nodes),
-            "missing_memory_ids": sorted(set(missing_memory_ids)),
-            "missing_memory_id_count": len(set(missing_memory_ids)),
-            "duplicate_edges": duplicates,
-            "duplicate_edge_count": len(duplicates),
-            "ok": (
-                len(orphan_edges) == 0
-                and len(invalid_relations) == 0
-                and len(invalid_nodes) == 0
-                and len(duplicates) == 0
-            ),
-        }
+        return GraphIntegrityChecker(self).run(
+            known_memory_ids=known_memory_ids, commit_watermark=False
+        )
 
     def clear(self) -> None:
-        self._local_edges = []
         self._loaded = True
-        self._persist()
+        with self._log_session() as fh:
+            self._local_edges = []
+            self._commit(fh, [], force_snapshot=True)
+        self._proximity = None
+        self._redis_write(clear=True)
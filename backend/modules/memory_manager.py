@@ -436,6 +436,9 @@ class LegacyMemoryAdapter:
     def _cache_short_term(self, *args, **kwargs):
         return self.v1._cache_short_term(*args, **kwargs)
 
+    async def _acache_short_term(self, *args, **kwargs):
+        return await self.v1._acache_short_term(*args, **kwargs)
+
 
 def build_memory_backend(
     supabase_client,
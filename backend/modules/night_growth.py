@@ -236,6 +236,8 @@ class NightGrowth:
         knowledge_saves = 0
         graph_edge_ids: List[str] = []
         graph_edges = 0
+        pending_edges: List[Dict[str, Any]] = []
+        pending_archives: List[str] = []
 
         # load turns
         s_load = new_step("load_turns")
@@ -409,31 +411,26 @@ class NightGrowth:
                     related_ids.append(str(rec["id"]))
                     transform_saves += 1
 
-            if getattr(self.manager, "graph", None) and len(related_ids) >= 2:
-                g = self.manager.graph
-                g.user_id = user_id
-                try:
-                    e = g.add_edge(
-                        related_ids[0],
-                        related_ids[1],
-                        "derived_from",
-                        confidence=0.6,
-                        created_by="night_growth",
-                        meta={"pipeline": "night_growth_v2", "execution_id": execution_id},
-                    )
-                    if e:
-                        graph_edges += 1
-                        if e.get("id"):
-                            graph_edge_ids.append(str(e["id"]))
-                except Exception as e:
-                    logger.warning("graph edge failed: %s", e)
+            if len(related_ids) >= 2:
+                # written in one batch at graph_update (single validate + persist)
+                pending_edges.append(
+                    {
+                        "source_memory_id": related_ids[0],
+                        "target_memory_id": related_ids[1],
+                        "relation": "derived_from",
+                        "confidence": 0.6,
+                        "created_by": "night_growth",
+                        "metadata": {
+                            "pipeline": "night_growth_v2",
+                            "execution_id": execution_id,
+                        },
+                    }
+                )
 
             if decision.archive and related_ids:
-                try:
-                    await self.manager.archive(related_ids[0])
-                    archived_ids.append(related_ids[0])
-                except Exception as e:
-                    logger.warning("archive failed: %s", e)
+                # archived after graph_update writes pending_edges, so its
+                # derived_from edge exists when archive() soft-archives edges
+                pending_archives.append(related_ids[0])
 
         s_sem = new_step("semantic_builder")
         finish_step(s_sem, status="ok", saved_memory_ids=[])
@@ -475,9 +472,43 @@ class NightGrowth:
         steps_summary["transformation_update"] = {"status": "ok", "saves": transform_saves}
 
         s_g = new_step("graph_update")
+        proximity: Dict[str, Any] = {}
+        if not dry_run and getattr(self.manager, "graph", None):
+            g = self.manager.graph
+            g.user_id = user_id
+            if pending_edges:
+                try:
+                    for e in g.add_edges(pending_edges, skip_invalid=True):
+                        graph_edges += 1
+                        if e.get("id"):
+                            graph_edge_ids.append(str(e["id"]))
+                except Exception as e:
+                    logger.warning("graph edge failed: %s", e)
+        for memory_id in pending_archives:
+            try:
+                await self.manager.archive(memory_id)
+                archived_ids.append(memory_id)
+            except Exception as e:
+                logger.warning("archive failed: %s", e)
+        if not dry_run and getattr(self.manager, "graph", None):
+            g = self.manager.graph
+            # nightly compaction keeps the per-user edge log bounded
+            try:
+                g.compact()
+            except Exception as e:
+                logger.warning("graph compaction failed: %s", e)
+            # refresh precomputed 2-hop proximity used by retrieval
+            try:
+                proximity = g.build_proximity()
+            except Exception as e:
+                logger.warning("graph proximity build failed: %s", e)
         finish_step(s_g, status="ok", graph_edge_ids=graph_edge_ids)
         step_details.append(s_g)
-        steps_summary["graph_update"] = {"status": "ok", "edges": graph_edges}
+        steps_summary["graph_update"] = {
+            "status": "ok",
+            "edges": graph_edges,
+            "proximity_nodes": int(proximity.get("nodes") or 0),
+        }
 
         s_ar = new_step("archive")
         finish_step(s_ar, status="ok", saved_memory_ids=archived_ids)
@@ -219,9 +219,17 @@ class ReflectionStorage:
             
             if not hasattr(self.redis, "redis") or self.redis.redis is None:
                 return False
-            self.redis.redis.lpush(redis_key, json.dumps(simplified_record, ensure_ascii=False))
-            self.redis.redis.ltrim(redis_key, 0, self.redis_max_items - 1)
-            self.redis.redis.expire(redis_key, self.redis_ttl)
+            ops = [
+                ("lpush", redis_key, json.dumps(simplified_record, ensure_ascii=False)),
+                ("ltrim", redis_key, 0, self.redis_max_items - 1),
+                ("expire", redis_key, self.redis_ttl),
+            ]
+            if hasattr(self.redis, "aexecute_pipeline"):
+                # 單一 MULTI/EXEC 往返，不阻塞 event loop
+                await self.redis.aexecute_pipeline(ops)
+            else:
+                for name, *args in ops:
+                    getattr(self.redis.redis, name)(*args)
             
             print(f"✅ 反思已儲存到 Redis: {redis_key}")
             return True
@@ -375,7 +383,10 @@ class ReflectionStorage:
             return []
 
         try:
-            items = self.redis.redis.lrange(redis_key, 0, limit - 1)
+            if hasattr(self.redis, "acall"):
+                items = await self.redis.acall("lrange", redis_key, 0, limit - 1)
+            else:
+                items = self.redis.redis.lrange(redis_key, 0, limit - 1)
 
             reflections = []
             for item in items:
@@ -4,6 +4,9 @@ RetrievalEngine — type-aware + embedding retrieval (Phase 2 + Fix ranking).
 Flow:
   Intent → Memory Type → Embedding Search → Graph Expansion → Rank → Response
 
+Graph expansion reads GraphManager's precomputed 2-hop proximity table
+(one lookup per seed set); graphs without it fall back to per-seed neighbors.
+
 Ranking considers:
   vector similarity, memory_type match, importance, recency, graph relation confidence
 """
@@ -217,6 +220,32 @@ class RetrievalEngine:
             ]
             neighbor_ids: List[str] = []
             edge_by_neighbor: Dict[str, Dict[str, Any]] = {}
+            if seed_ids and hasattr(self.graph, "related_for_seeds"):
+                # precomputed 2-hop proximity: one lookup for the whole seed set
+                try:
+                    # seeds linked to each other still get a graph_expansion boost
+                    for rel_hit in self.graph.related_for_seeds(
+                        seed_ids, limit=12, exclude_seeds=False
+                    ):
+                        other = str(rel_hit["memory_id"])
+                        edge = {
+                            "source_memory_id": str(rel_hit.get("via_memory_id")),
+                            "target_memory_id": other,
+                            "relation": rel_hit.get("relation"),
+                            "confidence": float(rel_hit.get("score") or 0.0),
+                            "hops": rel_hit.get("hops"),
+                        }
+                        graph_hits.append(edge)
+                        edge_by_neighbor[other] = edge
+                        neighbor_ids.append(other)
+                except Exception as e:
+                    # fall back to per-seed neighbor lookups below
+                    logger.warning("graph proximity lookup failed: %s", e)
+                    graph_hits.clear()
+                    neighbor_ids.clear()
+                    edge_by_neighbor.clear()
+                else:
+                    seed_ids = []
             for mid in seed_ids:
                 try:
                     for edge in self.graph.get_neighbors(str(mid), limit=6):
@@ -24,9 +24,21 @@ logger = logging.getLogger("openai_compat")
 
 router = APIRouter(tags=["openai-compat"])
 
+from backend.aux_task_cache import aux_cache_enabled, aux_cache_key, get_aux_cache
+from backend.client_history import (
+    bound_messages,
+    client_history_enabled,
+    client_history_limits,
+)
+from backend.stream_protocol import (
+    TOOL_EVENT_PREFIX,
+    USAGE_META_PREFIX,
+    EventStreamingResponse,
+    StreamEvent,
+    StreamItem,
+)
+
 MODEL_ID = "xiaochenguang"
-USAGE_META_PREFIX = "\n__XCG_META__"
-TOOL_EVENT_PREFIX = "__XCG_EVENT__"
 
 # Headers Open WebUI / proxies may send for stable conversation mapping
 _CONV_HEADERS = (
@@ -146,6 +158,32 @@ def extract_user_message(messages: List[ChatMessage]) -> str:
     return ""
 
 
+def extract_client_history(messages: List[ChatMessage]) -> List[Dict[str, str]]:
+    """
+    本次 user 訊息之前的對話 → 有界、已清理的 user/assistant 訊息。
+    system / tool 訊息與內部協定標記不納入；上限見 backend.client_history。
+    """
+    msgs = list(messages or [])
+    last_user = None
+    for i in range(len(msgs) - 1, -1, -1):
+        if (msgs[i].role or "").lower() == "user" and _content_to_text(msgs[i].content).strip():
+            last_user = i
+            break
+    prior = msgs[:last_user] if last_user is not None else msgs[:-1]
+    max_turns, max_chars = client_history_limits()
+    return bound_messages(
+        (
+            (
+                (m.role or "").lower(),
+                strip_internal_protocol(_content_to_text(m.content)),
+            )
+            for m in prior
+        ),
+        max_turns=max_turns,
+        max_chars=max_chars,
+    )
+
+
 def resolve_user_id(http_request: Request, body: OpenAIChatCompletionRequest) -> str:
     for h in _USER_HEADERS:
         val = (http_request.headers.get(h) or "").strip()
@@ -288,6 +326,102 @@ async def _iter_stream_text(response: StreamingResponse) -> AsyncIterator[str]:
             yield str(chunk)
 
 
+class _SseEncoder:
+    """
+    單次 completion 的 SSE 編碼器：id / created / model 固定，content chunk 以
+    預先組好的 JSON 前後綴包住，每個 chunk 只需 json.dumps 一次文字本身。
+    """
+
+    def __init__(self, completion_id: str, model: str):
+        self._base = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+        }
+        head = json.dumps(self._base, ensure_ascii=False)[:-1]
+        self._content_prefix = (
+            "data: " + head + ',"choices":[{"index":0,"delta":{"content":'
+        )
+        self._content_suffix = '},"finish_reason":null}]}\n\n'
+
+    def content(self, text: str) -> str:
+        return (
+            self._content_prefix
+            + json.dumps(text, ensure_ascii=False)
+            + self._content_suffix
+        )
+
+    def chunk(
+        self,
+        delta: Dict[str, Any],
+        finish_reason: Optional[str] = None,
+        usage: Optional[Dict[str, int]] = None,
+    ) -> str:
+        payload = {
+            **self._base,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if usage is not None:
+            payload["usage"] = usage
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _openai_usage(meta: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """__XCG_META__ 內容 → OpenAI usage（只取三個 token 欄位）。"""
+    usage = meta.get("usage") if isinstance(meta, dict) else None
+    if not isinstance(usage, dict):
+        return None
+    try:
+        prompt = int(usage.get("prompt_tokens") or 0)
+        completion = int(usage.get("completion_tokens") or 0)
+        total = int(usage.get("total_tokens") or (prompt + completion))
+    except (TypeError, ValueError):
+        return None
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": total,
+    }
+
+
+async def openai_sse_from_events(
+    events: AsyncIterator[StreamItem],
+    *,
+    model: str = MODEL_ID,
+) -> AsyncIterator[str]:
+    """
+    型別化串流事件 → OpenAI SSE。
+    文字直接編成 content chunk；tool_status 不外送；usage 放進結尾 chunk。
+    """
+    enc = _SseEncoder(_openai_completion_id(), model)
+    yield enc.chunk({"role": "assistant", "content": ""})
+    usage: Optional[Dict[str, int]] = None
+    async for item in events:
+        if isinstance(item, str):
+            if item:
+                yield enc.content(item)
+        elif isinstance(item, StreamEvent) and item.type == "usage":
+            usage = _openai_usage(item.data) or usage
+    yield enc.chunk({}, finish_reason="stop", usage=usage)
+    yield "data: [DONE]\n\n"
+
+
+_MARKER_HEAD = "__XCG_"
+
+
+def _held_marker_start(tail: str) -> int:
+    """未完成行中可能是協定標記的起點；無則回傳 len(tail)。"""
+    idx = tail.find(_MARKER_HEAD)
+    if idx >= 0:
+        return idx
+    # 結尾可能是被切開的標記開頭（例如 "__XC"）
+    for k in range(min(len(_MARKER_HEAD) - 1, len(tail)), 0, -1):
+        if _MARKER_HEAD.startswith(tail[-k:]):
+            return len(tail) - k
+    return len(tail)
+
+
 async def openai_sse_from_xcg_stream(
     response: StreamingResponse,
     *,
@@ -295,6 +429,11 @@ async def openai_sse_from_xcg_stream(
 ) -> AsyncIterator[str]:
     """
     Convert XiaoChenGuang plain stream (+ internal markers) to OpenAI SSE.
+
+    後備路徑：chat() 回傳的不是 EventStreamingResponse 時才解析文字。
+    每個上游片段至多一個 SSE chunk；未完成的行
+    立即轉出，只保留可能是 __XCG_EVENT__ / __XCG_META__ 標記的尾端；
+    換行延後到下一段文字前再送，讓結尾 meta 前的換行不會外漏。
     """
     completion_id = _openai_completion_id()
     yield _sse_chunk(
@@ -304,40 +443,46 @@ async def openai_sse_from_xcg_stream(
     )
 
     buffer = ""
+    pending_newlines = ""
     async for piece in _iter_stream_text(response):
         buffer += piece
-        # Process complete lines; keep incomplete tail in buffer
-        while "\n" in buffer:
-            line, buffer = buffer.split("\n", 1)
-            line_full = line  # without newline
-            if _is_internal_marker_line(line_full) or line_full.startswith("__XCG_META__"):
+        out: List[str] = []
+        # Complete lines: drop marker lines, keep text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if _is_internal_marker_line(line) or line.startswith("__XCG_META__"):
                 continue
             # Meta may appear mid-line glued after text
-            if "__XCG_META__" in line_full:
-                line_full = line_full.split("__XCG_META__", 1)[0]
-            if not line_full and piece:
-                # empty line from split — skip pure empties unless intentional
-                continue
-            if line_full:
-                # re-add newline as content boundary between lines (except first)
-                text = line_full
-                yield _sse_chunk(
-                    completion_id=completion_id,
-                    model=model,
-                    delta={"content": text + "\n"},
-                )
+            if "__XCG_META__" in line:
+                line = line.split("__XCG_META__", 1)[0]
+            if line:
+                out.append(pending_newlines + line)
+                pending_newlines = ""
+            pending_newlines += "\n"
+        # Incomplete tail: forward now unless it may be a marker
+        cut = _held_marker_start(buffer)
+        if cut:
+            out.append(pending_newlines + buffer[:cut])
+            pending_newlines = ""
+            buffer = buffer[cut:]
+        text = "".join(out)
+        if text:
+            yield _sse_chunk(
+                completion_id=completion_id,
+                model=model,
+                delta={"content": text},
+            )
 
     # Remainder (no trailing newline)
-    if buffer:
-        if not _is_internal_marker_line(buffer) and not buffer.startswith("__XCG_META__"):
-            if "__XCG_META__" in buffer:
-                buffer = buffer.split("__XCG_META__", 1)[0]
-            if buffer:
-                yield _sse_chunk(
-                    completion_id=completion_id,
-                    model=model,
-                    delta={"content": buffer},
-                )
+    if buffer and not _is_internal_marker_line(buffer):
+        if "__XCG_META__" in buffer:
+            buffer = buffer.split("__XCG_META__", 1)[0]
+        if buffer:
+            yield _sse_chunk(
+                completion_id=completion_id,
+                model=model,
+                delta={"content": pending_newlines + buffer},
+            )
 
     yield _sse_chunk(
         completion_id=completion_id,
@@ -462,6 +607,13 @@ async def chat_completions(
         user_id = f"owui_ephemeral_{uuid.uuid4().hex[:16]}"
         conversation_id = f"owui_ephemeral_{uuid.uuid4().hex[:16]}"
 
+    # 可信任的一般對話：歷史取自 body.messages，不再回頭讀 Supabase
+    client_history = (
+        extract_client_history(body.messages)
+        if not ephemeral and client_history_enabled()
+        else None
+    )
+
     chat_req = ChatRequest(
         user_message=user_message,
         conversation_id=conversation_id,
@@ -472,13 +624,26 @@ async def chat_completions(
         input_method="text",
         speak_response=False,
         suppress_memory=ephemeral,
+        client_history=client_history,
     )
 
     logger.info(
-        "OpenAI-compat chat stream=%s aux=%s trusted=%s ephemeral=%s",
+        "OpenAI-compat chat stream=%s aux=%s trusted=%s ephemeral=%s client_history=%s",
         stream, aux, trustworthy, ephemeral,
+        len(client_history) if client_history is not None else None,
     )
 
+    if aux and aux_cache_enabled():
+        return await _aux_task_completion(
+            chat,
+            chat_req,
+            background_tasks,
+            task=task,
+            messages=body.messages,
+            model_name=model_name,
+            stream=stream,
+        )
+
     try:
         result = await chat(
             request=chat_req,
@@ -487,29 +652,111 @@ async def chat_completions(
             use_tools=not ephemeral,
         )
     except HTTPException as exc:
-        # Map to OpenAI-ish error body while keeping status
-        detail = exc.detail
-        if isinstance(detail, dict):
-            message = detail.get("message") or detail.get("error") or str(detail)
-        else:
-            message = str(detail)
-        return JSONResponse(
-            status_code=exc.status_code,
-            content={
+        return _chat_error_response(exc)
+    except Exception as exc:
+        logger.exception("OpenAI-compat chat failed: %s", exc)
+        raise HTTPException(
+            status_code=500,
+            detail={
                 "error": {
-                    "message": message,
-                    "type": "api_error",
-                    "code": (
-                        detail.get("error")
-                        if isinstance(detail, dict)
-                        else None
-                    ),
-                    "param": None,
+                    "message": "Internal server error",
+                    "type": "server_error",
                 }
             },
+        ) from exc
+
+    return await _render_chat_result(result, stream=stream, model_name=model_name)
+
+
+def _chat_error_response(exc: HTTPException) -> JSONResponse:
+    # Map to OpenAI-ish error body while keeping status
+    detail = exc.detail
+    if isinstance(detail, dict):
+        message = detail.get("message") or detail.get("error") or str(detail)
+    else:
+        message = str(detail)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "error": {
+                "message": message,
+                "type": "api_error",
+                "code": (
+                    detail.get("error")
+                    if isinstance(detail, dict)
+                    else None
+                ),
+                "param": None,
+            }
+        },
+    )
+
+
+def _one_shot_sse(text: str, model_name: str) -> StreamingResponse:
+    async def one_shot():
+        cid = _openai_completion_id()
+        yield _sse_chunk(
+            completion_id=cid,
+            model=model_name,
+            delta={"role": "assistant", "content": ""},
         )
+        if text:
+            yield _sse_chunk(
+                completion_id=cid,
+                model=model_name,
+                delta={"content": text},
+            )
+        yield _sse_chunk(
+            completion_id=cid,
+            model=model_name,
+            delta={},
+            finish_reason="stop",
+        )
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        one_shot(),
+        media_type="text/event-stream; charset=utf-8",
+    )
+
+
+async def _aux_task_completion(
+    chat,
+    chat_req,
+    background_tasks: BackgroundTasks,
+    *,
+    task: str,
+    messages: List[ChatMessage],
+    model_name: str,
+    stream: bool,
+):
+    """
+    Open WebUI 輔助任務：以 (task, model, messages) 內容定址快取回覆文字。
+    未命中時以非串流呼叫 chat()（single-flight）；stream=true 時一次送出 SSE。
+    """
+    key = aux_cache_key(
+        task, model_name, ((m.role, _content_to_text(m.content)) for m in messages or [])
+    )
+    computed: Dict[str, Any] = {}
+
+    async def compute() -> Optional[str]:
+        result = await chat(
+            request=chat_req,
+            background_tasks=background_tasks,
+            stream=False,
+            use_tools=False,
+        )
+        computed["result"] = result
+        if isinstance(result, (JSONResponse, StreamingResponse)):
+            return None  # 被擋 / 錯誤 / 非預期型別：不快取
+        return _text_from_chat_result(result) or None
+
+    try:
+        text, cached = await get_aux_cache().get_or_compute(key, compute)
+    except HTTPException as exc:
+        return _chat_error_response(exc)
     except Exception as exc:
-        logger.exception("OpenAI-compat chat failed: %s", exc)
+        logger.exception("OpenAI-compat aux task failed: %s", exc)
         raise HTTPException(
             status_code=500,
             detail={
@@ -520,7 +767,31 @@ async def chat_completions(
             },
         ) from exc
 
+    logger.info("OpenAI-compat aux task=%s cache=%s", task, "hit" if cached else "miss")
+    if text is None:
+        return await _render_chat_result(
+            computed.get("result"), stream=stream, model_name=model_name
+        )
+    if stream:
+        return _one_shot_sse(text, model_name)
+    usage = {} if cached else _usage_from_chat_response(computed.get("result"))
+    return build_completion_response(content=text, model=model_name, usage=usage)
+
+
+async def _render_chat_result(result: Any, *, stream: bool, model_name: str):
+    """chat() 回傳值 → OpenAI 相容回應（SSE 或 chat.completion）。"""
     if stream:
+        if isinstance(result, EventStreamingResponse):
+            # 直接消費型別化事件：不經 text/plain 編碼再解析
+            return StreamingResponse(
+                openai_sse_from_events(result.typed_events(), model=model_name),
+                media_type="text/event-stream; charset=utf-8",
+                headers={
+                    "Cache-Control": "no-cache, no-transform",
+                    "Connection": "keep-alive",
+                    "X-Accel-Buffering": "no",
+                },
+            )
         if isinstance(result, StreamingResponse):
             return StreamingResponse(
                 openai_sse_from_xcg_stream(result, model=model_name),
@@ -532,33 +803,7 @@ async def chat_completions(
                 },
             )
         # Unexpected non-stream result while stream=true
-        text = _text_from_chat_result(result)
-
-        async def one_shot():
-            cid = _openai_completion_id()
-            yield _sse_chunk(
-                completion_id=cid,
-                model=model_name,
-                delta={"role": "assistant", "content": ""},
-            )
-            if text:
-                yield _sse_chunk(
-                    completion_id=cid,
-                    model=model_name,
-                    delta={"content": text},
-                )
-            yield _sse_chunk(
-                completion_id=cid,
-                model=model_name,
-                delta={},
-                finish_reason="stop",
-            )
-            yield "data: [DONE]\n\n"
-
-        return StreamingResponse(
-            one_shot(),
-            media_type="text/event-stream; charset=utf-8",
-        )
+        return _one_shot_sse(_text_from_chat_result(result), model_name)
 
     # Non-streaming
     if isinstance(result, StreamingResponse):
@@ -1,7 +1,13 @@
+import asyncio
 import os
 import json
-from openai import OpenAI, AsyncOpenAI
-from typing import AsyncGenerator, Optional, List, Dict, Any, Union
+import threading
+import time
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+from types import SimpleNamespace
+from typing import AsyncGenerator, Optional, List, Dict, Any, Tuple, Union
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Request
 
@@ -18,26 +24,186 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID")
 OPENAI_PROJECT_ID = os.getenv("OPENAI_PROJECT_ID")
 
+# 進程共用 client：同一組憑證只建一個連線池（keep-alive / HTTP/2）。
+# async client 依 event loop 快取（httpx 連線綁定建立時的 loop）：loop 被回收時一併釋放；
+# 沒有 running loop 的呼叫端共用另一份快取，不再每次重建。
+_clients_lock = threading.Lock()
+_sync_clients: Dict[Tuple[Any, ...], OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Any, ...], AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+_loopless_async_clients: Dict[Tuple[Any, ...], AsyncOpenAI] = {}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(_env_float("OPENAI_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(_env_float("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=_env_float("OPENAI_KEEPALIVE_EXPIRY_SECONDS", 60.0),
+    )
+
+
+def _http2_enabled() -> bool:
+    if (os.getenv("OPENAI_HTTP2") or "true").strip().lower() in ("0", "false", "no", "off"):
+        return False
+    try:
+        import h2  # noqa: F401  (httpx[http2])
+    except ImportError:
+        return False
+    return True
+
+
+def _client_key(api_key=None, organization=None, base_url=None) -> Tuple[Any, ...]:
+    base = str(base_url or "").rstrip("/")
+    default = (os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+    return (api_key or OPENAI_API_KEY, organization or OPENAI_ORG_ID or None, base if base and base != default else None)
+
+
+def _client_kwargs(key: Tuple[Any, ...]) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"api_key": key[0]}
+    if key[1]:
+        kwargs["organization"] = key[1]
+    if key[2]:
+        kwargs["base_url"] = key[2]
+    return kwargs
+
 
 def get_openai_client() -> OpenAI:
+    """進程共用的同步 client（首次呼叫建立，之後重用連線池）"""
     if not OPENAI_API_KEY:
         raise ValueError("❌ 缺少 OPENAI_API_KEY 環境變數")
 
-    if OPENAI_ORG_ID:
-        client = OpenAI(api_key=OPENAI_API_KEY, organization=OPENAI_ORG_ID)
-    else:
-        client = OpenAI(api_key=OPENAI_API_KEY)
-
-    print("✅ OpenAI 客戶端初始化成功")
+    key = _client_key()
+    with _clients_lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = OpenAI(
+                **_client_kwargs(key),
+                http_client=DefaultHttpxClient(limits=_http_limits(), http2=_http2_enabled()),
+            )
+            _sync_clients[key] = client
+            print("✅ OpenAI 客戶端初始化成功")
     return client
 
 
-def _build_async_openai_client() -> AsyncOpenAI:
-    """建立 AsyncOpenAI 客戶端（支援 org）"""
-    kwargs = {"api_key": OPENAI_API_KEY}
-    if OPENAI_ORG_ID:
-        kwargs["organization"] = OPENAI_ORG_ID
-    return AsyncOpenAI(**kwargs)
+def _build_async_openai_client(key: Optional[Tuple[Any, ...]] = None) -> AsyncOpenAI:
+    """建立 AsyncOpenAI 客戶端（支援 org；共用連線池設定）"""
+    return AsyncOpenAI(
+        **_client_kwargs(key or _client_key()),
+        http_client=DefaultAsyncHttpxClient(limits=_http_limits(), http2=_http2_enabled()),
+    )
+
+
+def get_async_openai_client(
+    *, api_key: Optional[str] = None, organization: Optional[str] = None, base_url: Any = None
+) -> AsyncOpenAI:
+    """目前 event loop 的共用 AsyncOpenAI（同憑證只建一次）"""
+    key = _client_key(api_key, organization, base_url)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _clients_lock:
+        if loop is None:
+            per_loop = _loopless_async_clients
+        else:
+            per_loop = _async_clients.setdefault(loop, {})
+        client = per_loop.get(key)
+        if client is None:
+            client = _build_async_openai_client(key)
+            per_loop[key] = client
+            # 已關閉的 loop 上的 client 不能再用，也無法在原 loop 上 close：直接釋放
+            for dead in [lp for lp in _async_clients if lp.is_closed()]:
+                _async_clients.pop(dead, None)
+        return client
+
+
+def _resolve_attr(obj: Any, path: str) -> Any:
+    for part in path.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+async def call_openai_async(client: Any, path: str, **kwargs) -> Any:
+    """
+    非阻塞呼叫 OpenAI 端點（path 例：chat.completions.create）。
+    - 同步 OpenAI → 改用同憑證的共用 AsyncOpenAI
+    - AsyncOpenAI / async create → 直接 await
+    - 其他（測試替身等）→ worker thread
+    """
+    if isinstance(client, OpenAI):
+        client = get_async_openai_client(
+            api_key=client.api_key, organization=client.organization, base_url=client.base_url
+        )
+    fn = _resolve_attr(client, path)
+    if isinstance(client, AsyncOpenAI) or asyncio.iscoroutinefunction(fn):
+        return await fn(**kwargs)
+    result = await asyncio.to_thread(fn, **kwargs)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+def _warmup_enabled() -> bool:
+    return (os.getenv("OPENAI_WARMUP_ENABLED") or "true").strip().lower() not in (
+        "0",
+        "false",
+        "no",
+        "off",
+    )
+
+
+async def warm_up_openai_clients() -> Dict[str, Any]:
+    """
+    lifespan 啟動時預先完成 DNS + TLS（+ HTTP/2）握手，首個請求不用付握手成本。
+    以 GET /models 開連線；失敗只回報，不影響啟動。
+    """
+    if not OPENAI_API_KEY or not _warmup_enabled():
+        return {"ok": False, "skipped": True}
+    timeout = _env_float("OPENAI_WARMUP_TIMEOUT_SECONDS", 5.0)
+    conns = max(1, int(_env_float("OPENAI_WARMUP_CONNECTIONS", 1)))
+    t0 = time.perf_counter()
+    aclient = get_async_openai_client().with_options(timeout=timeout, max_retries=0)
+    sclient = get_openai_client().with_options(timeout=timeout, max_retries=0)
+    jobs = [aclient.models.list() for _ in range(conns)]
+    jobs.append(asyncio.to_thread(sclient.models.list))
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    errors = [type(r).__name__ for r in results if isinstance(r, BaseException)]
+    return {
+        "ok": not errors,
+        "connections": conns,
+        "http2": _http2_enabled(),
+        "ms": int((time.perf_counter() - t0) * 1000),
+        "errors": errors,
+    }
+
+
+async def aclose_openai_clients() -> None:
+    """關閉共用連線池（lifespan 結束時）"""
+    with _clients_lock:
+        async_clients = [c for per_loop in _async_clients.values() for c in per_loop.values()]
+        async_clients.extend(_loopless_async_clients.values())
+        sync_clients = list(_sync_clients.values())
+        _async_clients.clear()
+        _loopless_async_clients.clear()
+        _sync_clients.clear()
+    for c in async_clients:
+        try:
+            await c.close()
+        except Exception:
+            pass
+    for c in sync_clients:
+        try:
+            c.close()
+        except Exception:
+            pass
 
 
 async def generate_response(
@@ -53,7 +219,9 @@ async def generate_response(
     return_usage=True 時回傳 {"content": str, "usage": {...}, "model": str}
     """
     try:
-        response = client.chat.completions.create(
+        response = await call_openai_async(
+            client,
+            "chat.completions.create",
             model=model,
             messages=messages,
             max_tokens=max_tokens,
@@ -87,7 +255,7 @@ async def generate_response_stream(
         yield {"type": "content", "text": "[ERROR] 缺少 OPENAI_API_KEY"}
         return
 
-    client = _build_async_openai_client()
+    client = get_async_openai_client()
     usage_data = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
     try:
         create_kwargs = {
@@ -144,7 +312,7 @@ async def generate_response_with_tools(
             "model": model,
         }
 
-    client = _build_async_openai_client()
+    client = get_async_openai_client()
     try:
         response = await client.chat.completions.create(
             model=model,
@@ -189,6 +357,137 @@ async def generate_response_with_tools(
         }
 
 
+def stream_tool_round_enabled() -> bool:
+    """STREAM_TOOL_ROUND_ENABLED=false → 工具判斷回合改回非串流 + 第二次串流。"""
+    return os.getenv("STREAM_TOOL_ROUND_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def _accumulate_tool_call_deltas(acc: Dict[int, Dict[str, Any]], deltas: Any) -> None:
+    """串流 tool_calls delta 依 index 累積：id / name 取首次出現，arguments 逐段串接。"""
+    for d in deltas or []:
+        idx = getattr(d, "index", None)
+        if idx is None:
+            idx = len(acc)
+        slot = acc.setdefault(idx, {"id": "", "name": "", "arguments": ""})
+        if getattr(d, "id", None):
+            slot["id"] = d.id
+        fn = getattr(d, "function", None)
+        if fn is not None:
+            if getattr(fn, "name", None):
+                slot["name"] = fn.name
+            if getattr(fn, "arguments", None):
+                slot["arguments"] += fn.arguments
+
+
+def _finalize_tool_calls(acc: Dict[int, Dict[str, Any]]) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """累積結果 → (供 registry 執行的物件, 寫回 messages 的 dict)。"""
+    objs, dicts = [], []
+    for idx in sorted(acc):
+        slot = acc[idx]
+        call_id = slot["id"] or f"call_{idx}"
+        arguments = slot["arguments"] or "{}"
+        objs.append(
+            SimpleNamespace(
+                id=call_id,
+                type="function",
+                function=SimpleNamespace(name=slot["name"], arguments=arguments),
+            )
+        )
+        dicts.append(
+            {
+                "id": call_id,
+                "type": "function",
+                "function": {"name": slot["name"], "arguments": arguments},
+            }
+        )
+    return objs, dicts
+
+
+async def generate_response_stream_with_tools(
+    messages: List[Dict[str, Any]],
+    tools: List[Dict[str, Any]],
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.8,
+    max_tokens: int = 1000,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    可呼叫工具的串流回合：模型直接回答時 content delta 立即轉出，
+    決定用工具時累積 tool_calls 於結尾一次交出。
+    yield:
+      {"type": "content", "text": "..."}
+      {"type": "tool_calls", "tool_calls": [...], "raw_message": {...}}
+      {"type": "error", "error": "..."}          # 上層降級處理
+      {"type": "usage", "usage": {...}, "model": model, "finish_reason": "..."}
+    """
+    usage_data = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    if not OPENAI_API_KEY:
+        yield {"type": "error", "error": "missing_api_key"}
+        yield {"type": "usage", "usage": usage_data, "model": model, "finish_reason": "error"}
+        return
+
+    client = get_async_openai_client()
+    content_parts: List[str] = []
+    acc: Dict[int, Dict[str, Any]] = {}
+    finish_reason = None
+    try:
+        create_kwargs = {
+            "model": model,
+            "messages": messages,
+            "tools": tools,
+            "tool_choice": "auto",
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+        try:
+            create_kwargs["stream_options"] = {"include_usage": True}
+            stream = await client.chat.completions.create(**create_kwargs)
+        except Exception:
+            create_kwargs.pop("stream_options", None)
+            stream = await client.chat.completions.create(**create_kwargs)
+
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage_data = usage_from_openai(chunk.usage)
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+            content = getattr(delta, "content", None)
+            if content:
+                content_parts.append(content)
+                yield {"type": "content", "text": content}
+            if getattr(delta, "tool_calls", None):
+                _accumulate_tool_call_deltas(acc, delta.tool_calls)
+            if getattr(choice, "finish_reason", None):
+                finish_reason = choice.finish_reason
+    except Exception as e:
+        err_msg = str(e)
+        print(f"❌ generate_response_stream_with_tools 錯誤: {e}")
+        yield {"type": "error", "error": err_msg}
+        yield {"type": "usage", "usage": usage_data, "model": model, "finish_reason": "error"}
+        return
+
+    if acc:
+        objs, dicts = _finalize_tool_calls(acc)
+        yield {
+            "type": "tool_calls",
+            "tool_calls": objs,
+            "raw_message": {
+                "role": "assistant",
+                "content": "".join(content_parts) or None,
+                "tool_calls": dicts,
+            },
+        }
+        finish_reason = "tool_calls"
+    yield {
+        "type": "usage",
+        "usage": usage_data,
+        "model": model,
+        "finish_reason": finish_reason or "stop",
+    }
+
+
 # ✅ 新增一個 POST API 路由：/api/openai/chat
 @router.post("/openai/chat")
 async def chat_with_openai(request: Request):
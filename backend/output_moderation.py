@@ -0,0 +1,137 @@
+"""
+輸出端增量審核（串流 / 非串流共用）
+
+- 依句界累積「已完成句子」，滿 OUTPUT_MODERATION_WINDOW_CHARS 字即送出一個視窗
+- 視窗帶上一視窗尾端 OUTPUT_MODERATION_OVERLAP_CHARS 字，避免跨界內容漏判
+- 審核在背景 task 執行，不阻塞 token 輸出；任一視窗 blocked 後 `blocked` 即有值，
+  呼叫端在下一個 token 前切斷串流
+- 進行中的視窗達 OUTPUT_MODERATION_MAX_INFLIGHT 時不等待，改把句子併入下一個視窗
+- 非串流：最終回答內部改走串流餵同一個 IncrementalModerator，審核與生成重疊；
+  回答已完整存在（工具回合直接回答）時改單次審核全文
+
+審核函式 check(text) -> dict 與 moderate_text 回傳格式相同；是否啟用沿用
+MODERATION_CHECK_OUTPUT。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger("moderation.output")
+
+CheckFn = Callable[[str], Awaitable[Dict[str, Any]]]
+
+OUTPUT_BLOCK_MESSAGE = "抱歉，這次回覆未通過內容安全審核，我換個溫柔的方式陪你聊好嗎？✨"
+
+# 句界：中英文終止符、換行；英文句點需後接空白才算
+_SENTENCE_END = re.compile(r"[。！？!?；;…\n]|\.(?=\s)")
+
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def output_moderation_enabled() -> bool:
+    return os.getenv("MODERATION_CHECK_OUTPUT", "true").lower() not in ("0", "false", "no")
+
+
+def _window_chars() -> int:
+    return _env_int("OUTPUT_MODERATION_WINDOW_CHARS", 400, minimum=1)
+
+
+def _overlap_chars() -> int:
+    return _env_int("OUTPUT_MODERATION_OVERLAP_CHARS", 40)
+
+
+def _max_inflight() -> int:
+    return _env_int("OUTPUT_MODERATION_MAX_INFLIGHT", 2, minimum=1)
+
+
+def _last_boundary(text: str) -> int:
+    """最後一個句界之後的位置；無句界回傳 0。"""
+    end = 0
+    for m in _SENTENCE_END.finditer(text):
+        end = m.end()
+    return end
+
+
+class IncrementalModerator:
+    """串流輸出的背景視窗審核。feed() 只排程，不等待。"""
+
+    def __init__(
+        self,
+        check: CheckFn,
+        *,
+        window_chars: Optional[int] = None,
+        overlap_chars: Optional[int] = None,
+        max_inflight: Optional[int] = None,
+    ):
+        self.check = check
+        self.window_chars = window_chars or _window_chars()
+        self.overlap_chars = _overlap_chars() if overlap_chars is None else overlap_chars
+        self.max_inflight = max_inflight or _max_inflight()
+        self._buffer = ""
+        self._tail = ""
+        self._pending: Set[asyncio.Task] = set()
+        self._blocked: Optional[Dict[str, Any]] = None
+        self.windows_sent = 0
+
+    @property
+    def blocked(self) -> Optional[Dict[str, Any]]:
+        """第一個 blocked 視窗的審核結果；尚未攔截為 None。"""
+        return self._blocked
+
+    def feed(self, text: str) -> None:
+        if not text or self._blocked is not None:
+            return
+        self._buffer += text
+        if len(self._pending) >= self.max_inflight:
+            return
+        cut = _last_boundary(self._buffer)
+        if cut >= self.window_chars:
+            self._dispatch(cut)
+        elif len(self._buffer) >= self.window_chars * 2:
+            # 長段無句界：不再等待
+            self._dispatch(len(self._buffer))
+
+    def _dispatch(self, cut: int) -> None:
+        chunk, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        if not chunk.strip():
+            return
+        window = self._tail + chunk
+        self._tail = chunk[-self.overlap_chars :] if self.overlap_chars else ""
+        self.windows_sent += 1
+        task = asyncio.create_task(self._run(window))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _run(self, window: str) -> None:
+        try:
+            verdict = await self.check(window)
+        except Exception as e:
+            logger.warning(f"⚠️ 輸出審核視窗失敗: {e}")
+            return
+        if verdict and verdict.get("blocked") and self._blocked is None:
+            self._blocked = verdict
+            logger.warning(
+                f"🚫 輸出審核攔截 categories={verdict.get('flagged_categories')}"
+            )
+
+    async def finish(self) -> Optional[Dict[str, Any]]:
+        """送出剩餘文字並等待所有視窗；回傳 blocked 結果或 None。"""
+        if self._blocked is None and self._buffer.strip():
+            self._dispatch(len(self._buffer))
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        return self._blocked
+
+    def cancel(self) -> None:
+        for task in list(self._pending):
+            task.cancel()
+        self._pending.clear()
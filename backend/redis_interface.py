@@ -6,18 +6,24 @@ Redis 短期記憶接口（Railway-safe）
 - 單一共用 client（get_shared_redis_interface）
 - 模式：real | mock | none
 - 日誌只記狀態與錯誤類型，不記密鑰／完整 URL
+- async 模式（real 時）：redis.asyncio + 有上限的 BlockingConnectionPool，
+  a* 方法不阻塞 event loop；多指令寫入走單一 pipeline（MULTI/EXEC）
 """
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
 import threading
 import time
+import weakref
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
+from backend import short_term_codec
+
 logger = logging.getLogger("redis_interface")
 
 # ---------------------------------------------------------------------------
@@ -29,6 +35,9 @@ _redis_mode: str = "none"  # real | mock | none
 _last_error_type: Optional[str] = None
 _last_error_msg: str = ""
 _last_reconnect_attempt: float = 0.0
+UPLOAD_TTL_SECONDS = 172800  # upload:{conv}:{file} 暫存 2 天
+# sync client -> connection settings used to build its redis.asyncio twin
+_async_specs: "weakref.WeakKeyDictionary[Any, Dict[str, Any]]" = weakref.WeakKeyDictionary()
 
 
 def _reconnect_cooldown_seconds() -> float:
@@ -67,6 +76,82 @@ def _timeouts() -> Tuple[float, float]:
     return max(0.2, connect), max(0.2, read)
 
 
+def _async_enabled() -> bool:
+    return (os.getenv("REDIS_ASYNC_ENABLED") or "true").strip().lower() not in (
+        "0",
+        "false",
+        "no",
+        "off",
+    )
+
+
+def _pool_limits() -> Tuple[int, float]:
+    """(max_connections, seconds to wait for a free pooled connection)."""
+    try:
+        size = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+    except (TypeError, ValueError):
+        size = 20
+    try:
+        wait = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS") or _timeouts()[1])
+    except (TypeError, ValueError):
+        wait = _timeouts()[1]
+    return max(1, size), max(0.1, wait)
+
+
+def _remember_async_spec(client: Any, spec: Dict[str, Any]) -> None:
+    try:
+        _async_specs[client] = spec
+    except TypeError:
+        pass
+
+
+def create_async_redis_client(spec: Optional[Dict[str, Any]]) -> Any:
+    """
+    Build a redis.asyncio client over a bounded BlockingConnectionPool from the
+    settings that produced a working sync client. Returns None when unavailable.
+    Callers waiting for a connection block at most REDIS_POOL_TIMEOUT_SECONDS.
+    """
+    if not spec or not _async_enabled():
+        return None
+    try:
+        import redis.asyncio as aredis
+        from redis.asyncio.connection import Connection, SSLConnection
+
+        max_conn, wait = _pool_limits()
+        opts = dict(spec)
+        url = opts.pop("url", None)
+        if url:
+            pool = aredis.BlockingConnectionPool.from_url(
+                url, max_connections=max_conn, timeout=wait, **opts
+            )
+        else:
+            use_ssl = bool(opts.pop("ssl", False))
+            if use_ssl:
+                opts["ssl_cert_reqs"] = None
+            pool = aredis.BlockingConnectionPool(
+                max_connections=max_conn,
+                timeout=wait,
+                connection_class=SSLConnection if use_ssl else Connection,
+                **opts,
+            )
+        return aredis.Redis(connection_pool=pool)
+    except Exception as e:
+        logger.warning("redis_async_client_failed type=%s", type(e).__name__)
+        return None
+
+
+async def _close_async_client(client: Any) -> None:
+    try:
+        close = getattr(client, "aclose", None) or getattr(client, "close", None)
+        if close is not None:
+            await close()
+        pool = getattr(client, "connection_pool", None)
+        if pool is not None:
+            await pool.disconnect()
+    except Exception as e:
+        logger.debug("redis_async_close_failed type=%s", type(e).__name__)
+
+
 def _want_ssl(url: str) -> bool:
     """TLS only when scheme is rediss:// or REDIS_SSL explicitly true."""
     flag = (os.getenv("REDIS_SSL") or "").strip().lower()
@@ -113,6 +198,16 @@ def _scan_keys(client, match: str, count: int = 100) -> List[str]:
     return []
 
 
+def _run_pipeline(client, ops: List[Tuple[Any, ...]], *, transaction: bool = True) -> List[Any]:
+    factory = getattr(client, "pipeline", None)
+    if callable(factory):
+        pipe = factory(transaction=transaction)
+        for name, *args in ops:
+            getattr(pipe, name)(*args)
+        return list(pipe.execute())
+    return [getattr(client, name)(*args) for name, *args in ops]
+
+
 def create_redis_client() -> Tuple[Any, str, Optional[str]]:
     """
     Create underlying redis client.
@@ -141,6 +236,7 @@ def create_redis_client() -> Tuple[Any, str, Optional[str]]:
             # redis-py from_url respects scheme; optional health_check
             client = redis.from_url(redis_url, **kwargs)
             client.ping()
+            _remember_async_spec(client, {"url": redis_url, **kwargs})
             _last_error_type = None
             _last_error_msg = ""
             logger.info(
@@ -201,6 +297,19 @@ def create_redis_client() -> Tuple[Any, str, Optional[str]]:
                 retry_on_timeout=False,
             )
             client.ping()
+            _remember_async_spec(
+                client,
+                {
+                    "host": host,
+                    "port": port,
+                    "password": redis_token,
+                    "ssl": use_ssl,
+                    "decode_responses": True,
+                    "socket_connect_timeout": connect_t,
+                    "socket_timeout": socket_t,
+                    "retry_on_timeout": False,
+                },
+            )
             _last_error_type = None
             _last_error_msg = ""
             logger.info(
@@ -431,66 +540,222 @@ class RedisInterface:
         self._client_lock = threading.RLock()
         self.mode: str = "none"
         self.redis = redis_client
+        self._async_spec: Optional[Dict[str, Any]] = None
+        # one redis.asyncio client per event loop (pool connections are loop-bound);
+        # entries go away with their loop, like tools/http_client.py
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = (
+            weakref.WeakKeyDictionary()
+        )
         if self.redis is not None:
             if mode in ("real", "mock", "none"):
                 self.mode = mode
             else:
                 name = type(self.redis).__name__
                 self.mode = "mock" if name == "RedisMock" else "real"
+            self._async_spec = self._spec_for(self.redis, self.mode)
             return
         client, mode_auto, _err = create_redis_client()
         self.redis = client
         self.mode = mode_auto
+        self._async_spec = self._spec_for(client, mode_auto)
+
+    @staticmethod
+    def _spec_for(client: Any, mode: str) -> Optional[Dict[str, Any]]:
+        if mode != "real" or client is None:
+            return None
+        try:
+            return _async_specs.get(client)
+        except TypeError:
+            return None
 
     def adopt_backend(self, client: Any, mode: str) -> None:
         """Thread-safe in-place client swap (preserves object identity)."""
         with self._client_lock:
+            old = list(self._async_clients.items())
             self.redis = client
             self.mode = mode if mode in ("real", "mock", "none") else "none"
+            self._async_spec = self._spec_for(client, self.mode)
+            self._async_clients.clear()
+        for old_loop, old_async in old:
+            self._close_on_loop(old_loop, old_async)
+
+    @staticmethod
+    def _close_on_loop(loop: asyncio.AbstractEventLoop, client: Any) -> None:
+        if loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(lambda: loop.create_task(_close_async_client(client)))
+        except RuntimeError:
+            pass
 
     def get_client(self) -> Any:
         """Current underlying client (may change after adopt_backend)."""
         with self._client_lock:
             return self.redis
 
+    async def get_async_client(self) -> Any:
+        """
+        redis.asyncio twin of the current real client (lazy, per event loop).
+        None in mock/none mode, when REDIS_ASYNC_ENABLED=false, or when the
+        client was not built by create_redis_client — callers then use _offload.
+        """
+        loop = asyncio.get_running_loop()
+        with self._client_lock:
+            if self.mode != "real" or self._async_spec is None:
+                return None
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = create_async_redis_client(self._async_spec)
+                if client is None:
+                    self._async_spec = None  # do not retry on every call
+                    return None
+                self._async_clients[loop] = client
+                # clients of loops that already closed can no longer be used
+                for dead in [lp for lp in self._async_clients if lp.is_closed()]:
+                    self._async_clients.pop(dead, None)
+            return client
+
+    async def _offload(self, fn, *args, **kwargs):
+        """
+        Sync fallback: real sockets go to a worker thread; mock stays inline
+        unless it injects latency (its time.sleep would block the event loop).
+        """
+        if self.mode == "real" or self._mock_sleeps():
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    def _mock_sleeps(self) -> bool:
+        if self.mode != "mock":
+            return False
+        probe = getattr(self.get_client(), "latency_injected", None)
+        try:
+            return bool(probe()) if callable(probe) else False
+        except Exception:
+            return False
+
     def scan_keys(self, match: str, count: int = 100) -> List[str]:
         return _scan_keys(self.get_client(), match, count=count)
 
+    async def ascan_keys(self, match: str, count: int = 100) -> List[str]:
+        aclient = await self.get_async_client()
+        if aclient is None:
+            return await self._offload(self.scan_keys, match, count)
+        try:
+            return [
+                k.decode("utf-8") if isinstance(k, bytes) else str(k)
+                async for k in aclient.scan_iter(match=match, count=count)
+            ]
+        except Exception as e:
+            logger.warning("redis_scan_failed type=%s", type(e).__name__)
+            return []
+
+    async def acall(self, command: str, *args: Any) -> Any:
+        """Single command on the async client (or offloaded sync client)."""
+        aclient = await self.get_async_client()
+        if aclient is not None:
+            return await getattr(aclient, command)(*args)
+        client = self.get_client()
+        if not client:
+            return None
+        return await self._offload(getattr(client, command), *args)
+
+    async def aget(self, key: str) -> Any:
+        return await self.acall("get", key)
+
+    def execute_pipeline(
+        self, ops: List[Tuple[Any, ...]], *, transaction: bool = True
+    ) -> List[Any]:
+        """
+        Run (command, *args) tuples in one round trip (MULTI/EXEC when
+        transaction=True). Clients without pipeline() run them in order.
+        """
+        client = self.get_client()
+        if not client:
+            return []
+        return _run_pipeline(client, ops, transaction=transaction)
+
+    async def aexecute_pipeline(
+        self, ops: List[Tuple[Any, ...]], *, transaction: bool = True
+    ) -> List[Any]:
+        aclient = await self.get_async_client()
+        if aclient is None:
+            return await self._offload(
+                self.execute_pipeline, ops, transaction=transaction
+            )
+        async with aclient.pipeline(transaction=transaction) as pipe:
+            for name, *args in ops:
+                getattr(pipe, name)(*args)
+            return list(await pipe.execute())
+
+    def _encode_short_term(self, data: Dict[str, Any]) -> str:
+        return short_term_codec.encode(self.normalize_latest_payload(data))
+
+    def _decode_short_term(self, value: Any) -> Optional[Dict[str, Any]]:
+        raw = short_term_codec.decode(value)
+        if raw is None:
+            return None
+        return self.normalize_latest_payload(raw)
+
     def store_short_term(self, conversation_id: str, data: Dict[str, Any]) -> bool:
         client = self.get_client()
         if not client:
             return False
         try:
-            payload = self.normalize_latest_payload(data)
             key = self._get_conversation_key(conversation_id)
-            client.set(key, json.dumps(payload, ensure_ascii=False))
-            client.expire(key, self.ttl_seconds)
+            # SET ... EX: value + TTL in one command
+            client.set(key, self._encode_short_term(data), ex=self.ttl_seconds)
             return True
         except Exception as e:
             logger.warning("redis_store_failed type=%s", type(e).__name__)
             print(f"❌ Redis 儲存失敗 type={type(e).__name__}")
             return False
 
+    async def astore_short_term(
+        self, conversation_id: str, data: Dict[str, Any]
+    ) -> bool:
+        aclient = await self.get_async_client()
+        if aclient is None:
+            return await self._offload(self.store_short_term, conversation_id, data)
+        try:
+            key = self._get_conversation_key(conversation_id)
+            await aclient.set(key, self._encode_short_term(data), ex=self.ttl_seconds)
+            return True
+        except Exception as e:
+            logger.warning("redis_store_failed type=%s", type(e).__name__)
+            return False
+
     def load_recent_context(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         client = self.get_client()
         if not client:
             return None
         try:
-            key = self._get_conversation_key(conversation_id)
-            value = client.get(key)
-            if not value:
-                return None
-            if isinstance(value, bytes):
-                value = value.decode("utf-8")
-            raw = json.loads(value)
-            return self.normalize_latest_payload(raw)
+            return self._decode_short_term(
+                client.get(self._get_conversation_key(conversation_id))
+            )
         except Exception as e:
             logger.warning("redis_load_failed type=%s", type(e).__name__)
             print(f"❌ Redis 讀取失敗 type={type(e).__name__}")
             return None
 
+    async def aload_recent_context(
+        self, conversation_id: str
+    ) -> Optional[Dict[str, Any]]:
+        aclient = await self.get_async_client()
+        if aclient is None:
+            return await self._offload(self.load_recent_context, conversation_id)
+        try:
+            return self._decode_short_term(
+                await aclient.get(self._get_conversation_key(conversation_id))
+            )
+        except Exception as e:
+            logger.warning("redis_load_failed type=%s", type(e).__name__)
+            return None
+
     @staticmethod
-    def normalize_latest_payload(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    def normalize_latest_payload(data: Any) -> Dict[str, Any]:
+        """Accepts legacy dicts, compact v2 dicts, or raw stored strings/bytes."""
+        if isinstance(data, (str, bytes)) or short_term_codec.is_compact(data):
+            data = short_term_codec.decode(data)
         data = dict(data or {})
         messages = data.get("messages")
         if not isinstance(messages, list):
@@ -567,6 +832,97 @@ class RedisInterface:
             print(f"❌ 清除對話記憶失敗 type={type(e).__name__}")
             return False
 
+    # -- uploads: upload:{conv}:{file} + per-conversation sorted-set index ---
+
+    def _upload_key(self, conversation_id: str, filename: str) -> str:
+        return f"upload:{conversation_id}:{filename}"
+
+    def _upload_index_key(self, conversation_id: str) -> str:
+        return f"upload_index:{conversation_id}"
+
+    def _upload_write_ops(
+        self, conversation_id: str, filename: str, value: str, ttl: int
+    ) -> Tuple[str, List[Tuple[Any, ...]]]:
+        key = self._upload_key(conversation_id, filename)
+        index = self._upload_index_key(conversation_id)
+        now = time.time()
+        return key, [
+            ("setex", key, ttl, value),
+            ("zadd", index, {key: now}),
+            # members whose payload TTL has lapsed
+            ("zremrangebyscore", index, "-inf", now - ttl),
+            ("expire", index, ttl),
+        ]
+
+    def store_upload(
+        self,
+        conversation_id: str,
+        filename: str,
+        data: Dict[str, Any],
+        ttl: int = UPLOAD_TTL_SECONDS,
+    ) -> Optional[str]:
+        """Write upload payload + index in one MULTI/EXEC; returns the key."""
+        value = json.dumps(data, ensure_ascii=False)
+        key, ops = self._upload_write_ops(conversation_id, filename, value, ttl)
+        self.execute_pipeline(ops)
+        return key
+
+    async def astore_upload(
+        self,
+        conversation_id: str,
+        filename: str,
+        data: Dict[str, Any],
+        ttl: int = UPLOAD_TTL_SECONDS,
+    ) -> Optional[str]:
+        value = json.dumps(data, ensure_ascii=False)
+        key, ops = self._upload_write_ops(conversation_id, filename, value, ttl)
+        await self.aexecute_pipeline(ops)
+        return key
+
+    def latest_upload(self, conversation_id: str) -> Tuple[Optional[str], Any]:
+        """Most recent upload by upload time: ZREVRANGE 0 0 + GET → (key, raw)."""
+        client = self.get_client()
+        if not client:
+            return None, None
+        members = client.zrevrange(self._upload_index_key(conversation_id), 0, 0)
+        if not members:
+            return None, None
+        key = members[0].decode("utf-8") if isinstance(members[0], bytes) else str(members[0])
+        return key, client.get(key)
+
+    async def alatest_upload(self, conversation_id: str) -> Tuple[Optional[str], Any]:
+        members = await self.acall("zrevrange", self._upload_index_key(conversation_id), 0, 0)
+        if not members:
+            return None, None
+        key = members[0].decode("utf-8") if isinstance(members[0], bytes) else str(members[0])
+        return key, await self.acall("get", key)
+
+    async def aclear_uploads(self, conversation_id: str) -> int:
+        """
+        Delete every upload of a conversation plus the index.
+
+        Also SCANs upload:{conv}:* so uploads written before the index existed
+        (or that missed the ZADD) are removed too — this runs only on
+        conversation delete, where completeness matters more than the SCAN.
+        """
+        index = self._upload_index_key(conversation_id)
+        members = await self.acall("zrange", index, 0, -1) or []
+        keys = {m.decode("utf-8") if isinstance(m, bytes) else str(m) for m in members}
+        keys.update(await self.ascan_keys(f"{self._upload_key(conversation_id, '')}*"))
+        res = await self.aexecute_pipeline([("delete", index, *sorted(keys))])
+        return int(res[0] or 0) if res else 0
+
+    async def aclear_conversation(self, conversation_id: str) -> bool:
+        aclient = await self.get_async_client()
+        if aclient is None:
+            return await self._offload(self.clear_conversation, conversation_id)
+        try:
+            await aclient.delete(self._get_conversation_key(conversation_id))
+            return True
+        except Exception as e:
+            logger.warning("redis_clear_failed type=%s", type(e).__name__)
+            return False
+
     def _get_conversation_key(self, conversation_id: str) -> str:
         return f"conv:{conversation_id}:latest"
 
@@ -580,6 +936,8 @@ class RedisInterface:
                 "ttl_seconds": self.ttl_seconds,
                 "mode": self.mode,
                 "client": type(client).__name__,
+                "async": self.mode == "real" and self._async_spec is not None,
+                "max_connections": _pool_limits()[0],
             }
         except Exception as e:
             return {"status": "error", "error_type": type(e).__name__, "mode": self.mode}
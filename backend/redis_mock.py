@@ -1,266 +1,615 @@
 """
 Redis 記憶體模擬接口
 提供與 Redis 類似的緩存功能，日後可直接替換為 Upstash Redis
+
+行為盡量貼近真實 Redis，讓未配置 Redis 的 staging / 離線壓測有參考價值：
+- 過期：讀取時惰性檢查 + 每個命令前以 heap 主動清除（每輪最多
+  ACTIVE_EXPIRE_BUDGET 個，類似 Redis activeExpireCycle）
+- SCAN：游標式、glob 比對（fnmatch），每次只檢查 count 個鍵；
+  整個迭代期間持續存在的鍵保證恰好回傳一次
+- pipeline() / transaction()：一次往返、在鎖內原子執行
+- 有序集合：zadd / zrange / zrevrange / zrangebyscore / zrem / zscore …
+- 延遲注入：每次往返 sleep(base + uniform(0, jitter))，可依命令覆寫
+  （REDIS_MOCK_LATENCY_MS / REDIS_MOCK_JITTER_MS 或 configure_latency()）
 """
+import bisect
+import fnmatch
+import functools
+import heapq
 import json
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+import os
+import random
 import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ACTIVE_EXPIRE_BUDGET = 20
+
+
+def _env_ms(name: str) -> float:
+    try:
+        return max(0.0, float(os.getenv(name) or 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _score_bound(raw: Any) -> Tuple[float, bool]:
+    """ZSET 範圍參數 → (分數, 是否排除端點)；支援 -inf / +inf / (x"""
+    if isinstance(raw, (int, float)):
+        return float(raw), False
+    text = str(raw).strip()
+    exclusive = text.startswith("(")
+    if exclusive:
+        text = text[1:]
+    return float(text), exclusive
+
+
+def _in_range(score: float, lo: Tuple[float, bool], hi: Tuple[float, bool]) -> bool:
+    above = score > lo[0] if lo[1] else score >= lo[0]
+    below = score < hi[0] if hi[1] else score <= hi[0]
+    return above and below
+
+
+class _Latency:
+    """每次往返的延遲注入設定（類別共用）"""
+
+    def __init__(self):
+        self.base_ms = _env_ms("REDIS_MOCK_LATENCY_MS")
+        self.jitter_ms = _env_ms("REDIS_MOCK_JITTER_MS")
+        self.per_command: Dict[str, float] = {}
+        self.rng = random.Random()
+
+    def delay(self, command: str) -> float:
+        base = self.per_command.get(command, self.base_ms)
+        jitter = self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return (base + jitter) / 1000.0
+
+    def active(self) -> bool:
+        return bool(self.base_ms or self.jitter_ms or any(self.per_command.values()))
+
+
+def _command(fn: Callable) -> Callable:
+    """包裝公開命令：延遲注入（pipeline 內略過）+ 主動過期 + 加鎖 + 統計"""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        batched = getattr(RedisMock._ctx, "batched", False)
+        if not batched:
+            RedisMock._round_trip(name)
+        with self._lock:
+            RedisMock._stats["commands"] += 1
+            self._active_expire()
+            return fn(self, *args, **kwargs)
+
+    return wrapper
+
+
+class MockPipeline:
+    """
+    redis-py Pipeline 子集：命令先排隊，execute() 一次往返、在鎖內依序執行。
+    watch() 後、multi() 前的命令立即執行（同 redis-py）；由於 execute 持鎖，
+    被 watch 的鍵不會在 MULTI/EXEC 間被其他執行緒改動。
+    """
+
+    def __init__(self, client: "RedisMock", transaction: bool = True):
+        self._client = client
+        self.transaction = transaction
+        self._queue: List[Tuple[str, tuple, dict]] = []
+        self._immediate = False
+
+    def __enter__(self) -> "MockPipeline":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def watch(self, *keys: str) -> bool:
+        self._immediate = True
+        return True
+
+    def multi(self) -> None:
+        self._immediate = False
+
+    def unwatch(self) -> bool:
+        return True
+
+    def reset(self) -> None:
+        self._queue = []
+        self._immediate = False
+
+    def __getattr__(self, name: str):
+        target = getattr(self._client, name)
+        if name.startswith("_") or not callable(target):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs):
+            if self._immediate:
+                return target(*args, **kwargs)
+            self._queue.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        queued, self._queue = self._queue, []
+        if not queued:
+            return []
+        RedisMock._round_trip("exec" if self.transaction else "pipeline")
+        results: List[Any] = []
+        with self._client._lock:
+            RedisMock._ctx.batched = True
+            try:
+                for name, args, kwargs in queued:
+                    try:
+                        results.append(getattr(self._client, name)(*args, **kwargs))
+                    except Exception as e:
+                        results.append(e)
+            finally:
+                RedisMock._ctx.batched = False
+        if raise_on_error:
+            for r in results:
+                if isinstance(r, Exception):
+                    raise r
+        return results
+
 
 class RedisMock:
     """模擬 Redis 緩存接口"""
-    
+
     # 類別變數：所有實例共用同一個儲存空間，解決跨模組資料共享問題
     _storage: Dict[str, Dict[str, Any]] = {}
-    _lock = threading.Lock()
-    
+    _lock = threading.RLock()
+    _expiry_heap: List[Tuple[float, str]] = []
+    # SCAN 游標：鍵的建立序號（遞增）；_scan_index 依序號排序，刪除留墓碑
+    _key_seq: Dict[str, int] = {}
+    _scan_index: List[Tuple[int, str]] = []
+    _next_seq = 1
+    _latency = _Latency()
+    _stats: Dict[str, int] = {"commands": 0, "round_trips": 0}
+    _ctx = threading.local()
+
     def __init__(self):
         pass  # 儲存空間為類別共用，不需在 __init__ 初始化
-    
-    
+
+    # -- 延遲注入 / 統計 -------------------------------------------------
+
+    @classmethod
+    def configure_latency(
+        cls,
+        base_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        per_command: Optional[Dict[str, float]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """設定每次往返延遲（毫秒）；per_command 以命令名覆寫 base（pipeline 用 exec / pipeline）"""
+        cls._latency.base_ms = max(0.0, float(base_ms))
+        cls._latency.jitter_ms = max(0.0, float(jitter_ms))
+        cls._latency.per_command = dict(per_command or {})
+        if seed is not None:
+            cls._latency.rng.seed(seed)
+
+    @classmethod
+    def _round_trip(cls, command: str) -> None:
+        cls._stats["round_trips"] += 1
+        delay = cls._latency.delay(command)
+        if delay > 0:
+            time.sleep(delay)
+
+    @classmethod
+    def latency_injected(cls) -> bool:
+        """有設定延遲時為 True（延遲以 time.sleep 模擬，async 呼叫端需改走 worker thread）"""
+        return cls._latency.active()
+
+    @classmethod
+    def stats(cls) -> Dict[str, int]:
+        """累計命令數與往返數（pipeline 算一次往返）"""
+        return dict(cls._stats)
+
+    @classmethod
+    def reset_stats(cls) -> None:
+        cls._stats.update(commands=0, round_trips=0)
+
+    # -- 內部：鍵空間 / 過期 ---------------------------------------------
+
+    def _active_expire(self) -> None:
+        """呼叫端需持有 _lock；從 heap 取出到期鍵刪除（有預算上限）"""
+        now = time.time()
+        heap = self._expiry_heap
+        budget = ACTIVE_EXPIRE_BUDGET
+        while heap and budget > 0 and heap[0][0] <= now:
+            at, key = heapq.heappop(heap)
+            budget -= 1
+            item = self._storage.get(key)
+            # 過期時間已被改寫／移除的舊 heap 項目直接略過
+            if item is not None and item["expire_at"] == at:
+                self._drop(key)
+
+    def _set_expiry(self, key: str, expire_at: Optional[float]) -> None:
+        self._storage[key]["expire_at"] = expire_at
+        if expire_at is not None:
+            heapq.heappush(self._expiry_heap, (expire_at, key))
+
+    def _create(self, key: str, value: Any, kind: str) -> Dict[str, Any]:
+        """新建或覆寫鍵（覆寫保留 SCAN 序號，迭代中不會重複出現）"""
+        item = {"value": value, "type": kind, "expire_at": None, "created_at": time.time()}
+        if key not in self._key_seq:
+            seq = RedisMock._next_seq
+            RedisMock._next_seq += 1
+            self._key_seq[key] = seq
+            self._scan_index.append((seq, key))
+        self._storage[key] = item
+        return item
+
+    def _drop(self, key: str) -> bool:
+        if self._storage.pop(key, None) is None:
+            return False
+        self._key_seq.pop(key, None)
+        if len(self._scan_index) > 2 * len(self._storage) + 64:
+            RedisMock._scan_index = [
+                (s, k) for s, k in self._scan_index if self._key_seq.get(k) == s
+            ]
+        return True
+
+    def _live_item(self, key: str) -> Optional[Dict[str, Any]]:
+        """呼叫端需持有 _lock；過期即刪除（惰性過期）"""
+        item = self._storage.get(key)
+        if item is None:
+            return None
+        if item["expire_at"] is not None and time.time() >= item["expire_at"]:
+            self._drop(key)
+            return None
+        return item
+
+    def _typed(self, key: str, kind: str, create: bool = False) -> Optional[Dict[str, Any]]:
+        item = self._live_item(key)
+        if item is not None and item.get("type") != kind:
+            if not create:
+                return None
+            item = None
+        if item is None and create:
+            item = self._create(key, {} if kind in ("hash", "zset") else [], kind)
+        return item
+
+    # -- 通用 -------------------------------------------------------------
+
+    @_command
     def ping(self) -> bool:
         """測試連接"""
         return True
-    def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
-        """設置鍵值對，可選擇過期時間（秒）"""
-        with self._lock:
-            expire_at = None
-            if ex:
-                expire_at = datetime.now() + timedelta(seconds=ex)
-            
-            self._storage[key] = {
-                "value": value,
-                "expire_at": expire_at,
-                "created_at": datetime.now()
-            }
-            return True
+
+    @_command
+    def set(
+        self,
+        key: str,
+        value: str,
+        ex: Optional[int] = None,
+        px: Optional[int] = None,
+        nx: bool = False,
+        xx: bool = False,
+    ) -> Optional[bool]:
+        """設置鍵值對，可選擇過期時間（ex 秒 / px 毫秒）與 NX / XX 條件"""
+        exists = self._live_item(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._create(key, value, "string")
+        if ex:
+            self._set_expiry(key, time.time() + float(ex))
+        elif px:
+            self._set_expiry(key, time.time() + float(px) / 1000.0)
+        return True
 
     def setex(self, key: str, time: int, value: str) -> bool:
         """設置鍵值並指定過期秒數（與 redis-py 相容）"""
         return self.set(key, value, ex=time)
-    
+
+    @_command
     def get(self, key: str) -> Optional[str]:
         """獲取鍵值"""
-        with self._lock:
-            if key not in self._storage:
-                return None
-            
-            item = self._storage[key]
-            
-            # 檢查是否過期
-            if item["expire_at"] and datetime.now() > item["expire_at"]:
-                del self._storage[key]
-                return None
-            
-            return item["value"]
-    
-    def delete(self, key: str) -> int:
-        """刪除鍵"""
-        with self._lock:
-            if key in self._storage:
-                del self._storage[key]
-                return 1
-            return 0
-    
-    def exists(self, key: str) -> int:
-        """檢查鍵是否存在"""
-        value = self.get(key)
-        return 1 if value is not None else 0
-    
-    def hset(self, name: str, key: str, value: str) -> int:
-        """設置 Hash 欄位"""
-        with self._lock:
-            if name not in self._storage:
-                self._storage[name] = {"value": {}, "expire_at": None, "created_at": datetime.now()}
-            
-            if not isinstance(self._storage[name]["value"], dict):
-                self._storage[name]["value"] = {}
-            
-            self._storage[name]["value"][key] = value
-            return 1
-    
-    def hget(self, name: str, key: str) -> Optional[str]:
-        """獲取 Hash 欄位"""
-        with self._lock:
-            if name not in self._storage:
-                return None
-            
-            item = self._storage[name]
-            if item["expire_at"] and datetime.now() > item["expire_at"]:
-                del self._storage[name]
-                return None
-            
-            if not isinstance(item["value"], dict):
-                return None
-            
-            return item["value"].get(key)
-    
-    def hgetall(self, name: str) -> Dict[str, str]:
-        """獲取所有 Hash 欄位"""
-        with self._lock:
-            if name not in self._storage:
-                return {}
-            
-            item = self._storage[name]
-            if item["expire_at"] and datetime.now() > item["expire_at"]:
-                del self._storage[name]
-                return {}
-            
-            if not isinstance(item["value"], dict):
-                return {}
-            
-            return item["value"].copy()
-    
+        item = self._live_item(key)
+        return None if item is None else item["value"]
+
+    @_command
+    def mget(self, *keys: Any) -> List[Optional[str]]:
+        if len(keys) == 1 and isinstance(keys[0], (list, tuple)):
+            keys = tuple(keys[0])
+        out = []
+        for key in keys:
+            item = self._live_item(key)
+            out.append(item["value"] if item is not None and item["type"] == "string" else None)
+        return out
+
+    @_command
+    def incrby(self, key: str, amount: int = 1) -> int:
+        item = self._live_item(key)
+        current = int(item["value"]) if item is not None else 0
+        expire_at = item["expire_at"] if item is not None else None
+        self._create(key, str(current + amount), "string")
+        if expire_at is not None:
+            self._set_expiry(key, expire_at)
+        return current + amount
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, amount)
+
+    @_command
+    def delete(self, *keys: str) -> int:
+        """刪除鍵（可多個）"""
+        return sum(1 for key in keys if self._live_item(key) is not None and self._drop(key))
+
+    @_command
+    def exists(self, *keys: str) -> int:
+        """檢查鍵是否存在（回傳存在的個數）"""
+        return sum(1 for key in keys if self._live_item(key) is not None)
+
+    @_command
     def expire(self, key: str, seconds: int) -> int:
         """設置鍵的過期時間"""
-        with self._lock:
-            if key not in self._storage:
-                return 0
-            
-            self._storage[key]["expire_at"] = datetime.now() + timedelta(seconds=seconds)
-            return 1
-    
+        if self._live_item(key) is None:
+            return 0
+        self._set_expiry(key, time.time() + float(seconds))
+        return 1
+
+    @_command
+    def persist(self, key: str) -> int:
+        item = self._live_item(key)
+        if item is None or item["expire_at"] is None:
+            return 0
+        item["expire_at"] = None
+        return 1
+
+    @_command
     def ttl(self, key: str) -> int:
         """獲取鍵的剩餘生存時間（秒）"""
-        with self._lock:
-            if key not in self._storage:
-                return -2
-            
-            item = self._storage[key]
-            if not item["expire_at"]:
-                return -1
-            
-            remaining = (item["expire_at"] - datetime.now()).total_seconds()
-            return int(remaining) if remaining > 0 else -2
-    
+        item = self._live_item(key)
+        if item is None:
+            return -2
+        if item["expire_at"] is None:
+            return -1
+        remaining = item["expire_at"] - time.time()
+        return int(remaining) if remaining > 0 else -2
+
+    @_command
     def keys(self, pattern: str = "*") -> list:
-        """獲取符合模式的所有鍵"""
+        """獲取符合 glob 模式的所有鍵（O(N)，同真實 KEYS）"""
+        return [
+            key
+            for key in list(self._storage)
+            if fnmatch.fnmatchcase(key, pattern) and self._live_item(key) is not None
+        ]
+
+    @_command
+    def scan(self, cursor=0, match: Optional[str] = None, count: int = 10, _type: Optional[str] = None):
+        """
+        游標式 SCAN，回傳 (next_cursor, keys)。
+        每次檢查最多 count 個鍵（比對前），所以可能回傳空批次但游標非 0；
+        next_cursor == 0 表示迭代結束。
+        """
+        try:
+            after = int(cursor or 0)
+        except (TypeError, ValueError):
+            after = 0
+        index = self._scan_index
+        pos = bisect.bisect_right(index, (after, chr(0x10FFFF)))
+        examined = 0
+        found: List[str] = []
+        last = after
+        while pos < len(index) and examined < max(1, int(count or 10)):
+            seq, key = index[pos]
+            pos += 1
+            if self._key_seq.get(key) != seq:
+                continue  # 墓碑
+            examined += 1
+            last = seq
+            item = self._live_item(key)
+            if item is None:
+                continue
+            if match and not fnmatch.fnmatchcase(key, match):
+                continue
+            if _type and item.get("type") != _type:
+                continue
+            found.append(key)
+        return (last if pos < len(index) else 0), found
+
+    def scan_iter(self, match: Optional[str] = None, count: int = 10):
+        cursor = 0
+        while True:
+            cursor, batch = self.scan(cursor=cursor, match=match, count=count)
+            yield from batch
+            if cursor == 0:
+                break
+
+    @_command
+    def flushall(self) -> bool:
+        """清空所有數據"""
+        self._storage.clear()
+        self._expiry_heap.clear()
+        self._key_seq.clear()
+        self._scan_index.clear()
+        return True
+
+    def pipeline(self, transaction: bool = True) -> MockPipeline:
+        return MockPipeline(self, transaction=transaction)
+
+    def transaction(self, func: Callable[[MockPipeline], Any], *watches: str, value_from_callable: bool = False, **kwargs) -> Any:
+        """同 redis-py：func(pipe) 後 EXEC；持鎖期間 watch 的鍵不會被改動"""
         with self._lock:
-            if pattern == "*":
-                return list(self._storage.keys())
-            
-            # 簡單的模式匹配
-            import re
-            regex_pattern = pattern.replace("*", ".*")
-            return [key for key in self._storage.keys() if re.match(regex_pattern, key)]
-    
+            pipe = self.pipeline(transaction=True)
+            if watches:
+                pipe.watch(*watches)
+            func_value = func(pipe)
+            results = pipe.execute()
+        return func_value if value_from_callable else results
+
+    # -- Hash -------------------------------------------------------------
+
+    @_command
+    def hset(self, name: str, key: Optional[str] = None, value: Optional[str] = None, mapping: Optional[Dict[str, str]] = None) -> int:
+        """設置 Hash 欄位（支援 redis-py 的 mapping 批次寫入）"""
+        fields = self._typed(name, "hash", create=True)["value"]
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        added = sum(1 for k in items if k not in fields)
+        fields.update(items)
+        return added
+
+    @_command
+    def hget(self, name: str, key: str) -> Optional[str]:
+        """獲取 Hash 欄位"""
+        item = self._typed(name, "hash")
+        return None if item is None else item["value"].get(key)
+
+    @_command
+    def hdel(self, name: str, *keys: str) -> int:
+        """刪除 Hash 欄位"""
+        item = self._typed(name, "hash")
+        if item is None:
+            return 0
+        return sum(1 for key in keys if item["value"].pop(key, None) is not None)
+
+    @_command
+    def hgetall(self, name: str) -> Dict[str, str]:
+        """獲取所有 Hash 欄位"""
+        item = self._typed(name, "hash")
+        return {} if item is None else item["value"].copy()
+
+    # -- List -------------------------------------------------------------
+
+    @_command
     def lpush(self, key: str, *values: str) -> int:
         """將值推入列表頭部"""
-        with self._lock:
-            if key not in self._storage:
-                self._storage[key] = {
-                    "value": [],
-                    "expire_at": None,
-                    "created_at": datetime.now()
-                }
-            
-            item = self._storage[key]
-            if not isinstance(item["value"], list):
-                item["value"] = []
-            
-            # 將所有值推入列表頭部（逆序）
-            for value in reversed(values):
-                item["value"].insert(0, value)
-            
-            return len(item["value"])
-    
-    
+        items = self._typed(key, "list", create=True)["value"]
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    @_command
     def rpush(self, key: str, *values: str) -> int:
         """將值推入列表尾部"""
-        with self._lock:
-            if key not in self._storage:
-                self._storage[key] = {
-                    "value": [],
-                    "expire_at": None,
-                    "created_at": datetime.now()
-                }
-            
-            item = self._storage[key]
-            if not isinstance(item["value"], list):
-                item["value"] = []
-            
-            # 將所有值推入列表尾部
-            for value in values:
-                item["value"].append(value)
-            
-            return len(item["value"])
+        items = self._typed(key, "list", create=True)["value"]
+        items.extend(values)
+        return len(items)
+
+    @_command
     def lpop(self, key: str) -> Optional[str]:
         """從列表頭部彈出一個值"""
-        with self._lock:
-            if key not in self._storage:
-                return None
-            
-            item = self._storage[key]
-            
-            # 檢查是否過期
-            if item["expire_at"] and datetime.now() > item["expire_at"]:
-                del self._storage[key]
-                return None
-            
-            if not isinstance(item["value"], list) or len(item["value"]) == 0:
-                return None
-            
-            return item["value"].pop(0)
-    
+        item = self._typed(key, "list")
+        if item is None or not item["value"]:
+            return None
+        return item["value"].pop(0)
+
+    @_command
     def lrange(self, key: str, start: int, stop: int) -> list:
-        """獲取列表指定範圍的元素"""
-        with self._lock:
-            if key not in self._storage:
-                return []
-            
-            item = self._storage[key]
-            
-            # 檢查是否過期
-            if item["expire_at"] and datetime.now() > item["expire_at"]:
-                del self._storage[key]
-                return []
-            
-            if not isinstance(item["value"], list):
-                return []
-            
-            # Redis 的 lrange 支持負數索引
-            return item["value"][start:stop+1 if stop >= 0 else None]
+        """獲取列表指定範圍的元素（支援負數索引）"""
+        item = self._typed(key, "list")
+        if item is None:
+            return []
+        return item["value"][start:stop + 1 if stop >= 0 else (len(item["value"]) + stop + 1)]
 
+    @_command
     def ltrim(self, key: str, start: int, stop: int) -> bool:
         """修剪列表，只保留 [start, stop] 範圍"""
-        with self._lock:
-            if key not in self._storage:
-                return True
-            item = self._storage[key]
-            if not isinstance(item["value"], list):
-                return True
-            end = stop + 1 if stop >= 0 else None
-            item["value"] = item["value"][start:end]
+        item = self._typed(key, "list")
+        if item is None:
             return True
+        end = stop + 1 if stop >= 0 else (len(item["value"]) + stop + 1)
+        item["value"] = item["value"][start:end]
+        return True
 
-    def scan(self, cursor=0, match: str = None, count: int = 100):
-        """簡易 SCAN 實作，回傳 (next_cursor, keys)"""
-        keys = self.keys(match or "*")
-        return 0, keys
-    
+    @_command
     def llen(self, key: str) -> int:
         """獲取列表長度"""
-        with self._lock:
-            if key not in self._storage:
-                return 0
-            
-            item = self._storage[key]
-            
-            # 檢查是否過期
-            if item["expire_at"] and datetime.now() > item["expire_at"]:
-                del self._storage[key]
-                return 0
-            
-            if not isinstance(item["value"], list):
-                return 0
-            
-            return len(item["value"])
-    
-    def flushall(self) -> bool:
-        """清空所有數據"""
-        with self._lock:
-            self._storage.clear()
-            return True
+        item = self._typed(key, "list")
+        return 0 if item is None else len(item["value"])
+
+    # -- Sorted set ------------------------------------------------------
+
+    @_command
+    def zadd(self, name: str, mapping: Dict[str, float], nx: bool = False, xx: bool = False) -> int:
+        """有序集合：加入 / 更新成員分數，回傳新增數"""
+        members = self._typed(name, "zset", create=True)["value"]
+        added = 0
+        for member, score in mapping.items():
+            present = member in members
+            if (nx and present) or (xx and not present):
+                continue
+            added += 0 if present else 1
+            members[member] = float(score)
+        return added
+
+    def _zsorted(self, name: str, desc: bool) -> List[Tuple[str, float]]:
+        item = self._typed(name, "zset")
+        if item is None:
+            return []
+        return sorted(item["value"].items(), key=lambda kv: (kv[1], kv[0]), reverse=desc)
+
+    @staticmethod
+    def _zslice(pairs: list, start: int, stop: int, withscores: bool) -> list:
+        out = pairs[start:stop + 1 if stop >= 0 else (len(pairs) + stop + 1)]
+        return [(m, s) for m, s in out] if withscores else [m for m, _ in out]
+
+    @_command
+    def zrange(self, name: str, start: int, end: int, desc: bool = False, withscores: bool = False) -> list:
+        return self._zslice(self._zsorted(name, desc), start, end, withscores)
+
+    @_command
+    def zrevrange(self, name: str, start: int, end: int, withscores: bool = False) -> list:
+        return self._zslice(self._zsorted(name, True), start, end, withscores)
+
+    @_command
+    def zrangebyscore(
+        self,
+        name: str,
+        min: Any,
+        max: Any,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+        withscores: bool = False,
+    ) -> list:
+        lo, hi = _score_bound(min), _score_bound(max)
+        pairs = [(m, s) for m, s in self._zsorted(name, False) if _in_range(s, lo, hi)]
+        if start is not None and num is not None:
+            pairs = pairs[start:start + num] if num >= 0 else pairs[start:]
+        return pairs if withscores else [m for m, _ in pairs]
+
+    @_command
+    def zscore(self, name: str, member: str) -> Optional[float]:
+        item = self._typed(name, "zset")
+        return None if item is None else item["value"].get(member)
+
+    @_command
+    def zincrby(self, name: str, amount: float, member: str) -> float:
+        members = self._typed(name, "zset", create=True)["value"]
+        members[member] = members.get(member, 0.0) + float(amount)
+        return members[member]
+
+    @_command
+    def zrem(self, name: str, *members: str) -> int:
+        item = self._typed(name, "zset")
+        if item is None:
+            return 0
+        return sum(1 for m in members if item["value"].pop(m, None) is not None)
+
+    @_command
+    def zremrangebyscore(self, name: str, min: Any, max: Any) -> int:
+        """min / max 可為數字或 -inf / +inf / (x 字串"""
+        item = self._typed(name, "zset")
+        if item is None:
+            return 0
+        lo, hi = _score_bound(min), _score_bound(max)
+        doomed = [m for m, sc in item["value"].items() if _in_range(sc, lo, hi)]
+        for m in doomed:
+            del item["value"][m]
+        return len(doomed)
+
+    @_command
+    def zcard(self, name: str) -> int:
+        item = self._typed(name, "zset")
+        return 0 if item is None else len(item["value"])
 
 
 # 全局單例
@@ -0,0 +1,257 @@
+"""
+對話滾動摘要（incremental + map-reduce）
+
+摘要與 watermark（已併入的最後一輪 created_at）一起保存；之後只把 watermark
+之後的新輪次併入既有摘要（rolling update），不再每次重讀整段對話。
+
+新輪次依輪數 / 字元上限切 chunk：
+- 只有一個 chunk → 逐字稿直接進最後一次呼叫
+- 多個 chunk → 各自整理成重點（map，有並行上限），重點合併後仍超過上限就
+  逐層再整理（reduce），最後一次呼叫產生 / 更新摘要；長對話不再截掉結尾
+
+保存：Redis `rollsum:v1:{kind}:{user_id}:{conversation_id}`（熱資料）+
+Supabase `conversation_rolling_summaries`（20261021 migration，持久副本）。
+兩者皆 fail-open：讀寫失敗只記 warning，最差情況是重新摘要。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("rolling_summary")
+
+REDIS_KEY_PREFIX = "rollsum:v1:"
+SUMMARY_TABLE = "conversation_rolling_summaries"
+
+Messages = List[Dict[str, str]]
+# (messages) -> (text, usage)
+Completion = Callable[[Messages], Awaitable[Tuple[str, Dict[str, int]]]]
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def _redis_enabled() -> bool:
+    return os.getenv("ROLLING_SUMMARY_REDIS", "true").lower() not in ("0", "false", "no")
+
+
+def _cache_ttl() -> int:
+    return _env_int("ROLLING_SUMMARY_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+
+
+def empty_usage() -> Dict[str, int]:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+def add_usage(total: Dict[str, int], usage: Optional[Dict[str, int]]) -> Dict[str, int]:
+    for k in total:
+        total[k] += int((usage or {}).get(k) or 0)
+    return total
+
+
+def turn_lines(
+    rows: Sequence[Dict[str, Any]],
+    *,
+    per_message_chars: int = 500,
+    user_label: str = "使用者",
+    assistant_label: str = "小宸光",
+) -> List[str]:
+    """每輪一段文字（使用者 / 小宸光 各一行，單則訊息截到 per_message_chars）。"""
+    turns: List[str] = []
+    for row in rows:
+        lines = []
+        if row.get("user_message"):
+            lines.append(f"{user_label}：{row['user_message'][:per_message_chars]}")
+        if row.get("assistant_message"):
+            lines.append(f"{assistant_label}：{row['assistant_message'][:per_message_chars]}")
+        if lines:
+            turns.append("\n".join(lines))
+    return turns
+
+
+def chunk_turns(turns: Sequence[str], max_turns: int, max_chars: int) -> List[str]:
+    """依序切 chunk：每塊最多 max_turns 輪、max_chars 字元（單輪過長時截斷）。"""
+    max_turns = max(1, max_turns)
+    max_chars = max(1, max_chars)
+    chunks: List[str] = []
+    cur: List[str] = []
+    size = 0
+    for turn in turns:
+        turn = turn[:max_chars]
+        extra = len(turn) + (1 if cur else 0)
+        if cur and (len(cur) >= max_turns or size + extra > max_chars):
+            chunks.append("\n".join(cur))
+            cur, size = [], 0
+            extra = len(turn)
+        cur.append(turn)
+        size += extra
+    if cur:
+        chunks.append("\n".join(cur))
+    return chunks
+
+
+async def rolling_summarize(
+    complete: Completion,
+    turns: Sequence[str],
+    *,
+    prior: str,
+    final_messages: Callable[[str, str], Messages],
+    note_messages: Callable[[str], Messages],
+    max_turns: int,
+    max_chars: int,
+    concurrency: int = 4,
+) -> Tuple[str, Dict[str, int], int]:
+    """
+    把新輪次併入 prior，回傳 (summary, usage, llm_calls)。
+
+    final_messages(prior, material)：產生 / 更新最終摘要的 prompt。
+    note_messages(text)：把一段逐字稿或多段重點整理成重點（map / reduce 共用）。
+    """
+    usage = empty_usage()
+    calls = 0
+    chunks = chunk_turns(turns, max_turns, max_chars)
+    if not chunks:
+        return prior, usage, calls
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _note(text: str) -> str:
+        nonlocal calls
+        async with sem:
+            out, u = await complete(note_messages(text))
+        calls += 1
+        add_usage(usage, u)
+        return (out or "").strip()
+
+    material = chunks[0]
+    if len(chunks) > 1:
+        notes = list(await asyncio.gather(*(_note(c) for c in chunks)))
+        # reduce：重點合併後仍過長 → 以同樣規則再分組整理，直到一塊放得下
+        while len(notes) > 1 and len("\n\n".join(notes)) > max_chars:
+            groups = chunk_turns(notes, max_turns, max_chars)
+            if len(groups) >= len(notes):
+                # 每段重點本身已達上限：兩兩合併，保證收斂
+                groups = ["\n\n".join(notes[i : i + 2]) for i in range(0, len(notes), 2)]
+            notes = list(await asyncio.gather(*(_note(g) for g in groups)))
+        material = "\n\n".join(notes)
+
+    summary, u = await complete(final_messages(prior, material))
+    calls += 1
+    add_usage(usage, u)
+    return (summary or "").strip(), usage, calls
+
+
+def _shared_redis():
+    if not _redis_enabled() or _cache_ttl() <= 0:
+        return None
+    try:
+        from backend.redis_interface import get_shared_redis_interface
+
+        ri = get_shared_redis_interface()
+        return ri if getattr(ri, "redis", None) else None
+    except Exception:
+        return None
+
+
+class RollingSummaryStore:
+    """(user_id, conversation_id, kind) → {summary, watermark, message_count, model, updated_at}。"""
+
+    def __init__(self, kind: str, supabase: Any = None, redis: Any = None):
+        self.kind = kind
+        self._supabase = supabase
+        self._redis = redis
+
+    def _sb(self):
+        if self._supabase is not None:
+            return self._supabase
+        from backend.supabase_handler import get_supabase
+
+        return get_supabase()
+
+    def _ri(self):
+        return self._redis if self._redis is not None else _shared_redis()
+
+    def redis_key(self, user_id: str, conversation_id: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{self.kind}:{user_id}:{conversation_id}"
+
+    async def load(self, user_id: str, conversation_id: str) -> Optional[Dict[str, Any]]:
+        ri = self._ri()
+        if ri is not None:
+            try:
+                raw = await ri.acall("get", self.redis_key(user_id, conversation_id))
+                if isinstance(raw, bytes):
+                    raw = raw.decode("utf-8")
+                if raw:
+                    return json.loads(raw)
+            except Exception as e:
+                logger.warning(f"⚠️ 滾動摘要 Redis 讀取失敗: {e}")
+        try:
+            res = (
+                self._sb()
+                .table(SUMMARY_TABLE)
+                .select("summary, watermark, message_count, model, updated_at")
+                .eq("user_id", user_id)
+                .eq("conversation_id", conversation_id)
+                .eq("kind", self.kind)
+                .limit(1)
+                .execute()
+            )
+            rows = res.data or []
+        except Exception as e:
+            logger.warning(f"⚠️ 滾動摘要 Supabase 讀取失敗: {e}")
+            return None
+        if not rows:
+            return None
+        state = dict(rows[0])
+        await self._cache(user_id, conversation_id, state)
+        return state
+
+    async def save(self, user_id: str, conversation_id: str, state: Dict[str, Any]) -> bool:
+        """寫 Redis + upsert Supabase；回傳 Supabase 是否成功。"""
+        state = {**state, "updated_at": state.get("updated_at") or datetime.utcnow().isoformat()}
+        await self._cache(user_id, conversation_id, state)
+        try:
+            self._sb().table(SUMMARY_TABLE).upsert(
+                {
+                    "user_id": user_id,
+                    "conversation_id": conversation_id,
+                    "kind": self.kind,
+                    **state,
+                },
+                on_conflict="user_id,conversation_id,kind",
+            ).execute()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ 滾動摘要 Supabase 寫入失敗（Redis 副本仍在）: {e}")
+            return False
+
+    async def clear(self, user_id: str, conversation_id: str) -> None:
+        ri = self._ri()
+        if ri is None:
+            return
+        try:
+            await ri.acall("delete", self.redis_key(user_id, conversation_id))
+        except Exception as e:
+            logger.warning(f"⚠️ 滾動摘要 Redis 清除失敗: {e}")
+
+    async def _cache(self, user_id: str, conversation_id: str, state: Dict[str, Any]) -> None:
+        ri = self._ri()
+        if ri is None:
+            return
+        try:
+            await ri.acall(
+                "setex",
+                self.redis_key(user_id, conversation_id),
+                _cache_ttl(),
+                json.dumps(state, ensure_ascii=False, default=str),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 滾動摘要 Redis 寫入失敗: {e}")
@@ -0,0 +1,136 @@
+"""
+短期記憶（conv:{id}:latest）壓縮編碼
+
+v2 格式（字串，相容 decode_responses=True）：
+- "~2j" + 緊湊 JSON
+- "~2z" + base85(zlib(緊湊 JSON))，僅在 JSON 超過門檻時使用
+
+緊湊本體只存一份對話：
+  {"v": 2, "m": [["u", 內容], ["a", 內容]], "r": 反思, "u": updated_at,
+   "uid": user_id, "s": 摘要(與預設不同時), "t": timestamp(與 updated_at 不同時),
+   "tu": token_usage}
+user_msg / assistant_msg / 預設摘要於讀取時由 normalize_latest_payload 推導。
+舊格式（"{" 開頭的完整 JSON）照常讀取。
+
+環境變數：
+- REDIS_SHORT_TERM_CODEC：v2（預設）| json（寫回舊格式，供回滾）
+- REDIS_SHORT_TERM_COMPRESS_MIN_BYTES：超過才 zlib（預設 1024）
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+import zlib
+from typing import Any, Dict, Optional
+
+CODEC_VERSION = 2
+PREFIX_JSON = "~2j"
+PREFIX_ZLIB = "~2z"
+
+_ROLE_CODES = {"user": "u", "assistant": "a", "system": "s", "tool": "t"}
+_ROLE_NAMES = {v: k for k, v in _ROLE_CODES.items()}
+
+
+def _codec() -> str:
+    return (os.getenv("REDIS_SHORT_TERM_CODEC") or "v2").strip().lower()
+
+
+def _compress_min_bytes() -> int:
+    try:
+        return max(0, int(os.getenv("REDIS_SHORT_TERM_COMPRESS_MIN_BYTES", "1024")))
+    except (TypeError, ValueError):
+        return 1024
+
+
+def _default_summary(messages) -> str:
+    user = asst = ""
+    for m in messages:
+        if m.get("role") == "user" and not user:
+            user = str(m.get("content") or "")
+        if m.get("role") == "assistant" and not asst:
+            asst = str(m.get("content") or "")
+    return (asst or user or "")[:200]
+
+
+def compact_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """normalize_latest_payload 的輸出 → 緊湊 v2 dict（去除可推導欄位）"""
+    messages = [m for m in payload.get("messages") or [] if isinstance(m, dict)]
+    body: Dict[str, Any] = {
+        "v": CODEC_VERSION,
+        "m": [
+            [_ROLE_CODES.get(m.get("role"), m.get("role")), str(m.get("content") or "")]
+            for m in messages
+        ],
+        "u": payload.get("updated_at"),
+    }
+    if payload.get("reflection") is not None:
+        body["r"] = payload["reflection"]
+    if payload.get("user_id") is not None:
+        body["uid"] = payload["user_id"]
+    summary = payload.get("summary") or ""
+    if summary and summary != _default_summary(messages):
+        body["s"] = summary
+    if payload.get("timestamp") and payload["timestamp"] != payload.get("updated_at"):
+        body["t"] = payload["timestamp"]
+    if payload.get("token_usage"):
+        body["tu"] = payload["token_usage"]
+    return body
+
+
+def expand_payload(body: Dict[str, Any]) -> Dict[str, Any]:
+    """緊湊 v2 dict → normalize_latest_payload 可吃的 dict"""
+    messages = []
+    for item in body.get("m") or []:
+        try:
+            role, content = item[0], item[1]
+        except (TypeError, IndexError, KeyError):
+            continue
+        messages.append({"role": _ROLE_NAMES.get(role, role), "content": content})
+    data: Dict[str, Any] = {
+        "messages": messages,
+        "reflection": body.get("r"),
+        "updated_at": body.get("u"),
+        "user_id": body.get("uid"),
+    }
+    if body.get("s"):
+        data["summary"] = body["s"]
+    if body.get("t"):
+        data["timestamp"] = body["t"]
+    if body.get("tu"):
+        data["token_usage"] = body["tu"]
+    return data
+
+
+def is_compact(data: Any) -> bool:
+    return isinstance(data, dict) and data.get("v") == CODEC_VERSION and "m" in data
+
+
+def encode(payload: Dict[str, Any]) -> str:
+    """已正規化的 payload → Redis 字串值"""
+    if _codec() == "json":
+        return json.dumps(payload, ensure_ascii=False)
+    text = json.dumps(compact_payload(payload), ensure_ascii=False, separators=(",", ":"))
+    raw = text.encode("utf-8")
+    if len(raw) >= _compress_min_bytes():
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return PREFIX_ZLIB + base64.b85encode(packed).decode("ascii")
+    return PREFIX_JSON + text
+
+
+def decode(value: Any) -> Optional[Dict[str, Any]]:
+    """Redis 值（新舊格式皆可）→ dict；v2 會展開為舊欄位結構"""
+    if value is None or value == "" or value == b"":
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    if isinstance(value, dict):
+        return expand_payload(value) if is_compact(value) else value
+    if value.startswith(PREFIX_ZLIB):
+        text = zlib.decompress(base64.b85decode(value[len(PREFIX_ZLIB):])).decode("utf-8")
+        return expand_payload(json.loads(text))
+    if value.startswith(PREFIX_JSON):
+        return expand_payload(json.loads(value[len(PREFIX_JSON):]))
+    data = json.loads(value)
+    return expand_payload(data) if is_compact(data) else data
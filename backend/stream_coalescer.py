@@ -0,0 +1,176 @@
+"""
+串流輸出合併（token coalescing）
+
+OpenAI delta 常只有 1–2 個中文字；逐 delta 寫出時，syscall / proxy framing /
+JSON 編碼的成本會高過內容本身。coalesce_stream() 把純文字片段暫存，
+任一條件先成立即送出：
+
+- 距離緩衝區第一段已過 window_ms
+- 緩衝區達 max_bytes（UTF-8）
+- 片段結尾是句界（sentence=True；語音模式用來整句交給 TTS）
+
+第一個文字片段永遠立即送出（不影響 TTFB）。協定片段（__XCG_EVENT__ /
+__XCG_META__ 字串或 stream_protocol.StreamEvent）先 flush 已暫存文字，再原樣送出。
+
+Env:
+  STREAM_COALESCE_ENABLED=true|false        (default true)
+  STREAM_COALESCE_WINDOW_MS=20              一般文字的合併時間窗
+  STREAM_COALESCE_MAX_BYTES=512             緩衝區上限
+  STREAM_COALESCE_VOICE_WINDOW_MS=600       語音 / 車載：句界送出，時間窗為上限
+  STREAM_COALESCE_CLIENT_WINDOWS=owui:30,ios:15   依 client_id 覆寫時間窗（0 = 不合併）
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger("stream_coalescer")
+
+_PROTOCOL_PREFIXES = ("__XCG_EVENT__", "__XCG_META__", "\n__XCG_META__")
+
+# 片段結尾為句界（中英文終止符、換行；英文句點需後接空白）
+_SENTENCE_END = re.compile(r"(?:[。！？!?；;…\n]|\.\s)\s*$")
+
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def coalesce_enabled() -> bool:
+    return os.getenv("STREAM_COALESCE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+def _client_windows() -> Dict[str, int]:
+    raw = os.getenv("STREAM_COALESCE_CLIENT_WINDOWS", "")
+    out: Dict[str, int] = {}
+    for item in raw.split(","):
+        name, _, ms = item.partition(":")
+        try:
+            if name.strip():
+                out[name.strip().lower()] = max(0, int(ms))
+        except ValueError:
+            logger.warning(f"⚠️ STREAM_COALESCE_CLIENT_WINDOWS 格式錯誤: {item!r}")
+    return out
+
+
+@dataclass(frozen=True)
+class CoalescePolicy:
+    window_ms: int = 20
+    max_bytes: int = 512
+    sentence: bool = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0
+
+
+def coalesce_policy(*, client_id: str = "", voice: bool = False) -> CoalescePolicy:
+    """依 client / 語音模式決定合併策略；關閉時回傳 window_ms=0。"""
+    if not coalesce_enabled():
+        return CoalescePolicy(window_ms=0)
+    max_bytes = _env_int("STREAM_COALESCE_MAX_BYTES", 512, minimum=1)
+    if voice:
+        return CoalescePolicy(
+            window_ms=_env_int("STREAM_COALESCE_VOICE_WINDOW_MS", 600),
+            max_bytes=max_bytes,
+            sentence=True,
+        )
+    window = _client_windows().get((client_id or "").strip().lower())
+    if window is None:
+        window = _env_int("STREAM_COALESCE_WINDOW_MS", 20)
+    return CoalescePolicy(window_ms=window, max_bytes=max_bytes)
+
+
+def is_protocol_piece(piece: Any) -> bool:
+    """非字串（型別化事件）或 __XCG_* 標記片段 → 不合併、原樣送出。"""
+    return not isinstance(piece, str) or piece.startswith(_PROTOCOL_PREFIXES)
+
+
+async def coalesce_stream(
+    source: AsyncIterator[Any],
+    policy: CoalescePolicy,
+    *,
+    is_protocol: Callable[[Any], bool] = is_protocol_piece,
+) -> AsyncIterator[Any]:
+    """合併 source 的文字片段；policy.enabled=False 時原樣轉出。"""
+    if not policy.enabled:
+        async for piece in source:
+            yield piece
+        return
+
+    loop = asyncio.get_running_loop()
+    it = source.__aiter__()
+    window = policy.window_ms / 1000
+    buf: List[str] = []
+    size = 0
+    deadline = 0.0
+    first = True
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None and not buf:
+                # 緩衝區為空：直接等下一段，不需計時
+                try:
+                    piece = await it.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if pending is None:
+                    pending = asyncio.ensure_future(it.__anext__())
+                if buf:
+                    timeout = deadline - loop.time()
+                    if timeout > 0:
+                        await asyncio.wait({pending}, timeout=timeout)
+                    if not pending.done():
+                        # 時間窗到期：先送出，下一段繼續等同一個 pending
+                        yield "".join(buf)
+                        buf, size = [], 0
+                        continue
+                else:
+                    await asyncio.wait({pending})
+                done, pending = pending, None
+                try:
+                    piece = done.result()
+                except StopAsyncIteration:
+                    break
+
+            if not piece:
+                continue
+            if is_protocol(piece):
+                if buf:
+                    yield "".join(buf)
+                    buf, size = [], 0
+                yield piece
+                continue
+            if first:
+                first = False
+                yield piece
+                continue
+            if not buf:
+                deadline = loop.time() + window
+            buf.append(piece)
+            size += len(piece.encode("utf-8"))
+            if size >= policy.max_bytes or (
+                policy.sentence and _SENTENCE_END.search(piece)
+            ):
+                yield "".join(buf)
+                buf, size = [], 0
+        if buf:
+            yield "".join(buf)
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await pending
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            with suppress(Exception):
+                await aclose()
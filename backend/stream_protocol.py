@@ -0,0 +1,71 @@
+"""
+Chat 串流的型別化事件
+
+chat 串流內部只產生兩種項目：
+  - str：可見文字（token / 錯誤訊息）
+  - StreamEvent(type="tool_status" | "usage", data={...})
+
+出口各自編碼，不再互相解析文字：
+  - plain_frames()：前端 text/plain 協定（__XCG_EVENT__ 行、結尾 __XCG_META__）
+  - OpenAI 相容 SSE：openai_compat_router 從 EventStreamingResponse.typed_events()
+    直接取事件
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional, Union
+
+from fastapi.responses import StreamingResponse
+
+from backend.stream_coalescer import CoalescePolicy, coalesce_stream
+
+# 串流事件 / 用量 meta 標記（前端可解析）
+USAGE_META_PREFIX = "\n__XCG_META__"
+TOOL_EVENT_PREFIX = "__XCG_EVENT__"
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    type: str  # tool_status | usage
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+StreamItem = Union[str, StreamEvent]
+
+
+def encode_plain(item: StreamItem) -> str:
+    """單一項目 → text/plain 協定片段。"""
+    if isinstance(item, str):
+        return item
+    if item.type == "usage":
+        return USAGE_META_PREFIX + json.dumps(item.data, ensure_ascii=False)
+    return TOOL_EVENT_PREFIX + json.dumps(item.data, ensure_ascii=False) + "\n"
+
+
+async def plain_frames(source: AsyncIterator[StreamItem]) -> AsyncIterator[str]:
+    async for item in source:
+        yield encode_plain(item)
+
+
+class EventStreamingResponse(StreamingResponse):
+    """
+    text/plain 串流回應，同時保留型別化事件來源。
+    body 與 typed_events() 共用同一個來源，只能擇一消費。
+    """
+
+    def __init__(
+        self,
+        events: AsyncIterator[StreamItem],
+        *,
+        policy: Optional[CoalescePolicy] = None,
+        **kwargs: Any,
+    ):
+        self._events = events
+        self._policy = policy or CoalescePolicy(window_ms=0)
+        kwargs.setdefault("media_type", "text/plain; charset=utf-8")
+        super().__init__(plain_frames(coalesce_stream(events, self._policy)), **kwargs)
+
+    def typed_events(self) -> AsyncIterator[StreamItem]:
+        """合併後的型別化事件（不經 text/plain 編碼）。"""
+        return coalesce_stream(self._events, self._policy)
@@ -0,0 +1,449 @@
+"""
+工具對外 HTTP 共用層（Open-Meteo / DuckDuckGo / Tavily）
+
+- 每個 event loop 一個 httpx.AsyncClient：keep-alive 連線池，不再每次新開 TCP+TLS
+- DNS 快取：connect 前以 getaddrinfo 解析並快取 TOOL_HTTP_DNS_TTL_SECONDS 秒
+- 每個上游 host 的並行上限（TOOL_HTTP_MAX_PER_HOST），超過時排隊而非開新連線
+- 重試：連線錯誤 / 連線逾時 / 429 / 5xx，指數退避（尊重 Retry-After，上限 TOOL_HTTP_MAX_BACKOFF_SECONDS）
+- 每 host 延遲直方圖：tool_http_stats()
+
+逾時一律轉為 asyncio.TimeoutError，呼叫端沿用原本的逾時處理。
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import ipaddress
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger("tools.http")
+
+USER_AGENT = "XiaochenguangBot/1.0 (tools)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_int(name: str, default: int, minimum: int = 0) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+# ---------------------------------------------------------------------------
+# DNS 快取
+# ---------------------------------------------------------------------------
+
+_dns_lock = threading.Lock()
+_dns_cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+async def resolve_host(host: str, port: int) -> List[str]:
+    """host → IP 列表（快取 TOOL_HTTP_DNS_TTL_SECONDS；0 = 不快取）。"""
+    if _is_ip(host):
+        return [host]
+    ttl = _env_float("TOOL_HTTP_DNS_TTL_SECONDS", 300.0)
+    key = (host, port)
+    now = time.time()
+    with _dns_lock:
+        hit = _dns_cache.get(key)
+        if hit and hit[0] > now:
+            return list(hit[1])
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        host, port, type=socket.SOCK_STREAM
+    )
+    addrs: List[str] = []
+    for info in infos:
+        addr = info[4][0]
+        if addr not in addrs:
+            addrs.append(addr)
+    if ttl > 0 and addrs:
+        with _dns_lock:
+            _dns_cache[key] = (now + ttl, addrs)
+    return addrs
+
+
+def clear_dns_cache() -> None:
+    with _dns_lock:
+        _dns_cache.clear()
+
+
+try:
+    import httpcore
+
+    class _DNSCachingBackend(httpcore.AsyncNetworkBackend):
+        """httpcore backend：以快取的 IP 連線（TLS SNI 仍用原 host，由 httpcore 負責）。"""
+
+        def __init__(self):
+            self._inner = httpcore.AnyIOBackend()
+
+        async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+            try:
+                addrs = await resolve_host(host, port)
+            except OSError:
+                addrs = [host]
+            last: Optional[BaseException] = None
+            for addr in addrs or [host]:
+                try:
+                    return await self._inner.connect_tcp(
+                        addr,
+                        port,
+                        timeout=timeout,
+                        local_address=local_address,
+                        socket_options=socket_options,
+                    )
+                except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                    last = e
+            raise last  # type: ignore[misc]
+
+        async def connect_unix_socket(self, path, timeout=None, socket_options=None):  # pragma: no cover
+            return await self._inner.connect_unix_socket(
+                path, timeout=timeout, socket_options=socket_options
+            )
+
+        async def sleep(self, seconds: float) -> None:  # pragma: no cover
+            await self._inner.sleep(seconds)
+
+    # httpcore → httpx 例外（子類在前），讓 request() 的重試判斷不受 transport 影響
+    _HTTPCORE_ERRORS = (
+        (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+        (httpcore.ReadTimeout, httpx.ReadTimeout),
+        (httpcore.WriteTimeout, httpx.WriteTimeout),
+        (httpcore.PoolTimeout, httpx.PoolTimeout),
+        (httpcore.TimeoutException, httpx.TimeoutException),
+        (httpcore.ConnectError, httpx.ConnectError),
+        (httpcore.ReadError, httpx.ReadError),
+        (httpcore.WriteError, httpx.WriteError),
+        (httpcore.NetworkError, httpx.NetworkError),
+        (httpcore.ProxyError, httpx.ProxyError),
+        (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+        (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+        (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+        (httpcore.ProtocolError, httpx.ProtocolError),
+    )
+
+    @contextlib.contextmanager
+    def _map_httpcore_errors():
+        try:
+            yield
+        except Exception as e:
+            for core_exc, httpx_exc in _HTTPCORE_ERRORS:
+                if isinstance(e, core_exc):
+                    raise httpx_exc(str(e)) from e
+            raise
+
+    class _CoreResponseStream(httpx.AsyncByteStream):
+        def __init__(self, stream):
+            self._stream = stream
+
+        async def __aiter__(self):
+            with _map_httpcore_errors():
+                async for part in self._stream:
+                    yield part
+
+        async def aclose(self) -> None:
+            if hasattr(self._stream, "aclose"):
+                await self._stream.aclose()
+
+    class _DNSCachingTransport(httpx.AsyncBaseTransport):
+        """
+        httpx transport：自帶 httpcore 連線池並指定 _DNSCachingBackend。
+
+        只用 httpx / httpcore 的公開介面（AsyncBaseTransport、AsyncConnectionPool 的
+        network_backend），不再替換 AsyncHTTPTransport 的私有連線池。
+        """
+
+        def __init__(self, limits: httpx.Limits):
+            self._core = httpcore.AsyncConnectionPool(
+                ssl_context=httpx.create_ssl_context(),
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=limits.keepalive_expiry,
+                http1=True,
+                http2=False,
+                network_backend=_DNSCachingBackend(),
+            )
+
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            core_request = httpcore.Request(
+                method=request.method,
+                url=httpcore.URL(
+                    scheme=request.url.raw_scheme,
+                    host=request.url.raw_host,
+                    port=request.url.port,
+                    target=request.url.raw_path,
+                ),
+                headers=request.headers.raw,
+                content=request.stream,
+                extensions=request.extensions,
+            )
+            with _map_httpcore_errors():
+                core_response = await self._core.handle_async_request(core_request)
+            return httpx.Response(
+                status_code=core_response.status,
+                headers=core_response.headers,
+                stream=_CoreResponseStream(core_response.stream),
+                extensions=core_response.extensions,
+            )
+
+        async def aclose(self) -> None:
+            await self._core.aclose()
+
+except Exception:  # pragma: no cover - httpcore 版本不符時退回預設解析
+    _DNSCachingBackend = None  # type: ignore[assignment]
+    _DNSCachingTransport = None  # type: ignore[assignment]
+
+
+# ---------------------------------------------------------------------------
+# 延遲直方圖
+# ---------------------------------------------------------------------------
+
+
+class _HostStats:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float, ok: bool) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if not ok:
+            self.errors += 1
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["le_inf"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "histogram_ms": dict(zip(labels, self.buckets)),
+        }
+
+
+_stats_lock = threading.Lock()
+_host_stats: Dict[str, _HostStats] = {}
+
+
+def _observe(host: str, ms: float, ok: bool) -> None:
+    with _stats_lock:
+        _host_stats.setdefault(host, _HostStats()).observe(ms, ok)
+
+
+def _count_retry(host: str) -> None:
+    with _stats_lock:
+        _host_stats.setdefault(host, _HostStats()).retries += 1
+
+
+def tool_http_stats() -> Dict[str, Any]:
+    """每個上游 host 的請求數、錯誤、重試與延遲直方圖。"""
+    with _stats_lock:
+        return {host: s.snapshot() for host, s in sorted(_host_stats.items())}
+
+
+def reset_tool_http_stats() -> None:
+    with _stats_lock:
+        _host_stats.clear()
+
+
+# ---------------------------------------------------------------------------
+# Client / per-host 限流
+# ---------------------------------------------------------------------------
+
+_clients_lock = threading.Lock()
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_host_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _build_transport() -> httpx.AsyncBaseTransport:
+    limits = httpx.Limits(
+        max_connections=_env_int("TOOL_HTTP_MAX_CONNECTIONS", 50, minimum=1),
+        max_keepalive_connections=_env_int("TOOL_HTTP_MAX_KEEPALIVE", 10),
+        keepalive_expiry=_env_float("TOOL_HTTP_KEEPALIVE_EXPIRY_SECONDS", 60.0),
+    )
+    if _DNSCachingTransport is not None and _env_float("TOOL_HTTP_DNS_TTL_SECONDS", 300.0) > 0:
+        try:
+            return _DNSCachingTransport(limits)
+        except Exception as e:
+            logger.warning(f"⚠️ 工具 HTTP DNS 快取停用: {type(e).__name__}")
+    return httpx.AsyncHTTPTransport(limits=limits, retries=0)
+
+
+def get_tool_http_client() -> httpx.AsyncClient:
+    """目前 event loop 共用的 AsyncClient（延遲建立）。"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                transport=_build_transport(),
+                headers={"User-Agent": USER_AGENT},
+                follow_redirects=True,
+            )
+            _clients[loop] = client
+        return client
+
+
+def _host_semaphore(host: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        per_loop = _host_limits.setdefault(loop, {})
+        sem = per_loop.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(_env_int("TOOL_HTTP_MAX_PER_HOST", 8, minimum=1))
+            per_loop[host] = sem
+        return sem
+
+
+async def aclose_tool_http_clients() -> None:
+    """關閉目前 loop 的共用 client（lifespan shutdown）。"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    with _clients_lock:
+        client = _clients.pop(loop, None)
+        _host_limits.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+# ---------------------------------------------------------------------------
+# 請求
+# ---------------------------------------------------------------------------
+
+
+def _retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    if response is None:
+        return None
+    raw = response.headers.get("Retry-After")
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return None
+
+
+def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+    cap = _env_float("TOOL_HTTP_MAX_BACKOFF_SECONDS", 4.0)
+    if retry_after is not None:
+        return min(cap, retry_after)
+    base = _env_float("TOOL_HTTP_BACKOFF_BASE_SECONDS", 0.3)
+    delay = base * (2 ** attempt)
+    return min(cap, delay + random.uniform(0, delay / 2))
+
+
+async def request(
+    method: str,
+    url: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    json_body: Any = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: float = 10.0,
+    retries: Optional[int] = None,
+    retry_statuses: Iterable[int] = RETRY_STATUSES,
+) -> httpx.Response:
+    """
+    經共用 client 送出請求；連線錯誤 / 連線逾時 / retry_statuses 會退避重試。
+    最後仍非 2xx 時拋 httpx.HTTPStatusError；逾時拋 asyncio.TimeoutError。
+    """
+    attempts = 1 + (
+        _env_int("TOOL_HTTP_RETRIES", 1) if retries is None else max(0, retries)
+    )
+    host = httpx.URL(url).host or "unknown"
+    client = get_tool_http_client()
+    statuses = set(retry_statuses)
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        response: Optional[httpx.Response] = None
+        error: Optional[BaseException] = None
+        try:
+            async with _host_semaphore(host):
+                response = await client.request(
+                    method,
+                    url,
+                    params=params,
+                    json=json_body,
+                    headers=headers,
+                    timeout=timeout,
+                )
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            error = e
+        ms = (time.perf_counter() - started) * 1000
+        ok = response is not None and response.status_code < 400
+        _observe(host, ms, ok)
+
+        # 讀取逾時不重試（工具本身有總逾時）；連線失敗 / 連線逾時 / 可重試狀態碼才重試
+        retryable = (
+            isinstance(error, httpx.ConnectTimeout)
+            or (error is not None and not isinstance(error, httpx.TimeoutException))
+            or (response is not None and response.status_code in statuses)
+        )
+        if retryable and attempt + 1 < attempts:
+            _count_retry(host)
+            delay = _backoff(attempt, _retry_after_seconds(response))
+            logger.warning(
+                f"↻ 工具 HTTP 重試 {host} attempt={attempt + 1} "
+                f"{type(error).__name__ if error else response.status_code} "
+                f"sleep={delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+            continue
+        if isinstance(error, httpx.TimeoutException):
+            raise asyncio.TimeoutError(f"{host} timed out") from error
+        if error is not None:
+            raise error
+        response.raise_for_status()
+        return response
+    raise RuntimeError("unreachable")  # pragma: no cover
+
+
+async def get_json(url: str, **kwargs: Any) -> Any:
+    response = await request("GET", url, **kwargs)
+    return response.json()
+
+
+async def post_json(url: str, payload: Any, **kwargs: Any) -> Any:
+    response = await request("POST", url, json_body=payload, **kwargs)
+    return response.json()
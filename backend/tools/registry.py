@@ -4,6 +4,8 @@ Tool Use / Function Calling 框架
 - 工具註冊表（allowlist）
 - 安全控管：禁止危險工具、參數驗證、逾時、次數限制
 - 統一執行入口，供 chat_router 使用
+- 結果快取：(工具名, 正規化參數) → 內容，TTL 由 ToolSpec.cache_ttl_seconds 決定，
+  並以 single-flight 讓同時間相同的呼叫共用一次上游請求
 """
 from __future__ import annotations
 
@@ -13,8 +15,9 @@ import logging
 import os
 import re
 import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger("tools.registry")
 
@@ -58,6 +61,8 @@ class ToolSpec:
     display_name: str = ""
     icon: str = "🔧"
     retry: int = 0  # 暫時性錯誤重試次數
+    parallel_safe: bool = True  # False：同一輪內與其他非安全工具依序執行（有寫入副作用）
+    cache_ttl_seconds: float = 0.0  # >0 才快取成功結果；有副作用或時間相依的工具保持 0
 
 
 @dataclass
@@ -74,12 +79,126 @@ class ToolCallResult:
     icon: str = "🔧"
     index: int = 0
     total: int = 0
+    cached: bool = False  # 內容來自快取或共用同一次進行中的呼叫
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {str(k): _canonical_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(v) for v in value]
+    return value
+
+
+def tool_cache_key(name: str, arguments: Dict[str, Any]) -> str:
+    """(工具名, 正規化參數)；字串去頭尾、壓縮空白、不分大小寫。"""
+    canonical = json.dumps(
+        _canonical_value(arguments or {}),
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return f"{name}:{canonical}"
+
+
+class ToolResultCache:
+    """有界 LRU（含 TTL）+ single-flight；只存成功結果的 content。"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, content = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return content
+
+    def put(self, key: str, content: str, ttl: float) -> None:
+        self._entries[key] = (time.time() + ttl, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def inflight(self, key: str) -> Optional[asyncio.Future]:
+        """同一 event loop 上進行中的相同呼叫。"""
+        fut = self._inflight.get(key)
+        if fut is None or fut.done():
+            return None
+        try:
+            if fut.get_loop() is not asyncio.get_running_loop():
+                return None
+        except RuntimeError:
+            return None
+        return fut
+
+    def begin(self, key: str) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        return fut
+
+    def finish(self, key: str, fut: asyncio.Future, content: Optional[str]) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+        if not fut.done():
+            fut.set_result(content)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.coalesced = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+        }
+
+
+def _minify_text(text: Any) -> Any:
+    """描述文字收斂空白：減少每次請求送出的 prompt tokens。"""
+    if not isinstance(text, str):
+        return text
+    return " ".join(text.split())
+
+
+def _minify_schema(value: Any) -> Any:
+    """遞迴複製 JSON Schema，並精簡其中的 description。"""
+    if isinstance(value, dict):
+        return {
+            k: _minify_text(v) if k == "description" else _minify_schema(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_minify_schema(v) for v in value]
+    return value
+
+
+def _tool_cache_enabled() -> bool:
+    return os.getenv("TOOL_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
 
 
 class ToolRegistry:
     def __init__(self):
         self._tools: Dict[str, ToolSpec] = {}
+        self._defs_cache: Optional[Tuple[tuple, List[Dict[str, Any]]]] = None
         self.max_tools_per_turn = int(os.getenv("MAX_TOOLS_PER_TURN", "3"))
+        self.max_parallel_tools = max(1, int(os.getenv("MAX_PARALLEL_TOOLS", "3")))
+        self.cache = ToolResultCache(int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "512")))
         self.max_arg_json_len = int(os.getenv("MAX_TOOL_ARG_JSON_LEN", "2000"))
 
     def register(self, spec: ToolSpec) -> None:
@@ -99,24 +218,39 @@ class ToolRegistry:
     def list_enabled(self) -> List[ToolSpec]:
         return [t for t in self._tools.values() if t.enabled]
 
-    def openai_tool_definitions(self) -> List[Dict[str, Any]]:
-        """產生 OpenAI tools 陣列。"""
-        defs = []
-        for t in self.list_enabled():
-            if t.risk_level == "high":
-                # high risk 預設不暴露給模型
-                continue
-            defs.append(
-                {
-                    "type": "function",
-                    "function": {
-                        "name": t.name,
-                        "description": t.description,
-                        "parameters": t.parameters,
-                    },
-                }
-            )
-        return defs
+    def openai_tool_definitions(
+        self, names: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """產生 OpenAI tools 陣列（預編譯、精簡後快取）。
+
+        names 給定時只回傳其中的工具（依註冊順序）；None = 全部。
+        回傳的 dict 為共用快取，呼叫端勿就地修改。
+        """
+        signature = tuple(
+            (t.name, t.enabled, t.risk_level, id(t)) for t in self._tools.values()
+        )
+        if self._defs_cache is None or self._defs_cache[0] != signature:
+            defs = []
+            for t in self.list_enabled():
+                if t.risk_level == "high":
+                    # high risk 預設不暴露給模型
+                    continue
+                defs.append(
+                    {
+                        "type": "function",
+                        "function": {
+                            "name": t.name,
+                            "description": _minify_text(t.description),
+                            "parameters": _minify_schema(t.parameters),
+                        },
+                    }
+                )
+            self._defs_cache = (signature, defs)
+        defs = self._defs_cache[1]
+        if names is None:
+            return list(defs)
+        wanted = set(names)
+        return [d for d in defs if d["function"]["name"] in wanted]
 
     def is_allowed(self, name: str) -> Tuple[bool, str]:
         if not name:
@@ -285,6 +419,75 @@ class ToolRegistry:
             )
 
         call_args = self._coerce_and_filter_args(spec, args)
+        if spec.cache_ttl_seconds <= 0 or not _tool_cache_enabled():
+            return await self._invoke(
+                spec, call_args, args, tool_call_id, index, total, _fail
+            )
+
+        key = tool_cache_key(name, call_args)
+        started = time.perf_counter()
+
+        def _from_cache(content: str) -> ToolCallResult:
+            return ToolCallResult(
+                name=name,
+                tool_call_id=tool_call_id,
+                arguments=args,
+                ok=True,
+                content=content,
+                duration_ms=int((time.perf_counter() - started) * 1000),
+                display_name=display,
+                icon=icon,
+                index=index,
+                total=total,
+                cached=True,
+            )
+
+        content = self.cache.get(key)
+        if content is not None:
+            self.cache.hits += 1
+            logger.info(f"♻️ 工具快取命中 {name}")
+            return _from_cache(content)
+
+        flight = self.cache.inflight(key)
+        if flight is not None:
+            shared = await asyncio.shield(flight)
+            if shared is not None:
+                self.cache.coalesced += 1
+                logger.info(f"♻️ 工具共用進行中呼叫 {name}")
+                return _from_cache(shared)
+            # 領頭呼叫失敗：自行執行一次（不再合併）
+            return await self._invoke(
+                spec, call_args, args, tool_call_id, index, total, _fail
+            )
+
+        self.cache.misses += 1
+        flight = self.cache.begin(key)
+        content = None
+        try:
+            result = await self._invoke(
+                spec, call_args, args, tool_call_id, index, total, _fail
+            )
+            if result.ok:
+                content = result.content
+                self.cache.put(key, content, spec.cache_ttl_seconds)
+            return result
+        finally:
+            self.cache.finish(key, flight, content)
+
+    async def _invoke(
+        self,
+        spec: ToolSpec,
+        call_args: Dict[str, Any],
+        args: Dict[str, Any],
+        tool_call_id: str,
+        index: int,
+        total: int,
+        _fail: Callable[..., ToolCallResult],
+    ) -> ToolCallResult:
+        """實際呼叫 handler（逾時、暫態錯誤重試、輸出截斷）。"""
+        name = spec.name
+        display = spec.display_name or name
+        icon = spec.icon or "🔧"
         attempts = 1 + max(0, int(spec.retry or 0))
         started = time.perf_counter()
         last_err: Optional[Exception] = None
@@ -384,22 +587,54 @@ class ToolRegistry:
         tool_calls: list,
         context: Optional[Dict[str, Any]] = None,
     ) -> List[ToolCallResult]:
-        """執行 OpenAI tool_calls（批次，含安全截斷）。"""
+        """執行 OpenAI tool_calls（批次，含安全截斷）；結果依原始順序回傳。"""
         results: List[ToolCallResult] = []
         async for item in self.iter_openai_tool_calls(tool_calls, context=context):
             if item.get("type") == "result":
                 results.append(item["result"])
+        results.sort(key=lambda r: r.index)
         return results
 
+    def _parse_tool_call(self, tool_call, idx: int, total: int):
+        """tool_call → (name, args, None) 或解析失敗時 (name, None, ToolCallResult)。"""
+        try:
+            fn_name = tool_call.function.name
+            raw_args = tool_call.function.arguments or "{}"
+            args = (
+                json.loads(raw_args)
+                if isinstance(raw_args, str)
+                else dict(raw_args)
+            )
+            return fn_name, args, None
+        except Exception as e:
+            name = getattr(
+                getattr(tool_call, "function", None), "name", "unknown"
+            )
+            return name, None, ToolCallResult(
+                name=name,
+                tool_call_id=getattr(tool_call, "id", "unknown"),
+                arguments={},
+                ok=False,
+                content=self._friendly_error_content(name, "parse_error", str(e)),
+                duration_ms=0,
+                error=str(e),
+                error_code="parse_error",
+                display_name=name,
+                index=idx,
+                total=total,
+            )
+
     async def iter_openai_tool_calls(
         self,
         tool_calls: list,
         context: Optional[Dict[str, Any]] = None,
     ):
         """
-        逐步執行 tool_calls，yield 進度事件：
-          {"type":"start","index","total","name",...}
-          {"type":"result","result": ToolCallResult}
+        並行執行 tool_calls（上限 max_parallel_tools），yield 進度事件：
+          {"type":"start","index","total","name",...}   實際開始執行時
+          {"type":"result","result": ToolCallResult}    依完成順序
+        每個工具仍套用自己的 timeout_seconds；parallel_safe=False 的工具彼此依序執行。
+        呼叫端需依 result.index 還原原始順序再寫回 messages。
         """
         if not tool_calls:
             return
@@ -411,57 +646,84 @@ class ToolRegistry:
             )
 
         total = len(limited)
-        for idx, tool_call in enumerate(limited):
-            try:
-                fn_name = tool_call.function.name
-                raw_args = tool_call.function.arguments or "{}"
-                args = (
-                    json.loads(raw_args)
-                    if isinstance(raw_args, str)
-                    else dict(raw_args)
-                )
-            except Exception as e:
-                name = getattr(
-                    getattr(tool_call, "function", None), "name", "unknown"
-                )
-                result = ToolCallResult(
-                    name=name,
-                    tool_call_id=getattr(tool_call, "id", "unknown"),
-                    arguments={},
-                    ok=False,
-                    content=self._friendly_error_content(name, "parse_error", str(e)),
-                    duration_ms=0,
-                    error=str(e),
-                    error_code="parse_error",
-                    display_name=name,
-                    index=idx,
-                    total=total,
-                )
-                yield {"type": "start", "index": idx, "total": total, "name": name}
-                yield {"type": "result", "result": result}
-                continue
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_parallel_tools)
+        serial_lock = asyncio.Lock()
+        tasks: List[asyncio.Task] = []
 
+        async def _run(idx: int, tool_call, fn_name: str, args: Dict[str, Any]):
             tool_call_id = getattr(tool_call, "id", "unknown")
             spec = self._tools.get(fn_name)
-            yield {
-                "type": "start",
-                "index": idx,
-                "total": total,
-                "name": fn_name,
-                "display_name": (spec.display_name if spec else fn_name),
-                "icon": (spec.icon if spec else "🔧"),
-                "arguments": args,
-                "tool_call_id": tool_call_id,
-            }
-            result = await self.execute(
-                fn_name,
-                args,
-                tool_call_id=tool_call_id,
-                context=context,
-                index=idx,
-                total=total,
-            )
-            yield {"type": "result", "result": result}
+            lock = serial_lock if spec is not None and not spec.parallel_safe else None
+            async with semaphore:
+                if lock is not None:
+                    await lock.acquire()
+                try:
+                    queue.put_nowait(
+                        {
+                            "type": "start",
+                            "index": idx,
+                            "total": total,
+                            "name": fn_name,
+                            "display_name": (spec.display_name if spec else fn_name),
+                            "icon": (spec.icon if spec else "🔧"),
+                            "arguments": args,
+                            "tool_call_id": tool_call_id,
+                        }
+                    )
+                    try:
+                        result = await self.execute(
+                            fn_name,
+                            args,
+                            tool_call_id=tool_call_id,
+                            context=context,
+                            index=idx,
+                            total=total,
+                        )
+                    except Exception as e:
+                        logger.exception(f"❌ 工具執行失敗 {fn_name}: {e}")
+                        result = ToolCallResult(
+                            name=fn_name,
+                            tool_call_id=tool_call_id,
+                            arguments=args,
+                            ok=False,
+                            content=self._friendly_error_content(
+                                fn_name, "error", type(e).__name__
+                            ),
+                            duration_ms=0,
+                            error=str(e),
+                            error_code="error",
+                            display_name=(spec.display_name if spec else fn_name),
+                            icon=(spec.icon if spec else "🔧"),
+                            index=idx,
+                            total=total,
+                        )
+                finally:
+                    if lock is not None:
+                        lock.release()
+            queue.put_nowait({"type": "result", "result": result})
+
+        try:
+            for idx, tool_call in enumerate(limited):
+                fn_name, args, parse_err = self._parse_tool_call(tool_call, idx, total)
+                if parse_err is not None:
+                    queue.put_nowait(
+                        {"type": "start", "index": idx, "total": total, "name": fn_name}
+                    )
+                    queue.put_nowait({"type": "result", "result": parse_err})
+                    continue
+                tasks.append(asyncio.create_task(_run(idx, tool_call, fn_name, args)))
+
+            remaining = total
+            while remaining:
+                item = await queue.get()
+                if item.get("type") == "result":
+                    remaining -= 1
+                yield item
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
 
 
 _registry: Optional[ToolRegistry] = None
@@ -521,6 +783,7 @@ def _register_builtin_tools(registry: ToolRegistry) -> None:
             timeout_seconds=float(os.getenv("WEB_SEARCH_TIMEOUT", "12")),
             required=["query"],
             retry=1,
+            cache_ttl_seconds=float(os.getenv("TOOL_CACHE_TTL_WEB_SEARCH", "1800")),
         )
     )
 
@@ -609,6 +872,7 @@ def _register_builtin_tools(registry: ToolRegistry) -> None:
             timeout_seconds=12.0,
             required=["location"],
             retry=1,
+            cache_ttl_seconds=float(os.getenv("TOOL_CACHE_TTL_WEATHER", "600")),
         )
     )
 
@@ -652,6 +916,7 @@ def _register_builtin_tools(registry: ToolRegistry) -> None:
             risk_level="low",
             timeout_seconds=5.0,
             required=["action"],
+            parallel_safe=False,
         )
     )
 
@@ -685,9 +950,12 @@ def _register_builtin_tools(registry: ToolRegistry) -> None:
             risk_level="low",
             timeout_seconds=3.0,
             required=["value", "from_unit", "to_unit"],
+            cache_ttl_seconds=3600.0,
         )
     )
 
 
-def get_openai_tool_definitions() -> List[Dict[str, Any]]:
-    return get_tool_registry().openai_tool_definitions()
+def get_openai_tool_definitions(
+    names: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Any]]:
+    return get_tool_registry().openai_tool_definitions(names)
@@ -8,11 +8,11 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 import urllib.parse
-import urllib.request
-from typing import Any, Dict, Optional
+from typing import Any, Dict
+
+from backend.tools import http_client
 
 logger = logging.getLogger("tools.weather")
 
@@ -42,21 +42,9 @@ _WMO = {
 }
 
 
-def _http_get_json(url: str, timeout: float = 10.0) -> Dict[str, Any]:
-    req = urllib.request.Request(
-        url,
-        headers={"User-Agent": "XiaochenguangBot/1.0 (weather-tool)"},
-    )
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8", errors="replace"))
-
-
 async def _aget(url: str, timeout: float = 10.0) -> Dict[str, Any]:
-    loop = asyncio.get_event_loop()
-    return await asyncio.wait_for(
-        loop.run_in_executor(None, lambda: _http_get_json(url, timeout)),
-        timeout=timeout + 1,
-    )
+    """經工具共用 HTTP client（連線池、DNS 快取、重試）取 JSON。"""
+    return await http_client.get_json(url, timeout=timeout)
 
 
 async def get_weather(
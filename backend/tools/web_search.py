@@ -1,6 +1,7 @@
 """
 Web Search 工具
 優先 Tavily API（可靠、適合 AI agent）；可選 DuckDuckGo 備援。
+兩者皆經 backend.tools.http_client（共用連線池、每 host 限流、重試）。
 """
 from __future__ import annotations
 
@@ -11,6 +12,8 @@ import re
 from typing import Optional
 from urllib.parse import urlparse
 
+from backend.tools import http_client
+
 logger = logging.getLogger("tools.web_search")
 
 SEARCH_TIMEOUT_SECONDS = float(os.getenv("WEB_SEARCH_TIMEOUT", "12"))
@@ -66,25 +69,19 @@ def _format_results(answer: str, results: list, max_results: int) -> str:
     return "\n".join(parts)
 
 
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+
 async def _search_tavily(query: str, max_results: int, api_key: str) -> str:
-    try:
-        from tavily import TavilyClient
-    except ImportError:
-        logger.error("❌ tavily-python 套件未安裝")
-        return "[SEARCH_UNAVAILABLE] 搜尋套件未安裝"
-
-    client = TavilyClient(api_key=api_key)
-    loop = asyncio.get_event_loop()
-    response = await asyncio.wait_for(
-        loop.run_in_executor(
-            None,
-            lambda: client.search(
-                query=query,
-                search_depth="advanced",
-                max_results=max_results,
-                include_answer=True,
-            ),
-        ),
+    response = await http_client.post_json(
+        TAVILY_SEARCH_URL,
+        {
+            "query": query,
+            "search_depth": "advanced",
+            "max_results": max_results,
+            "include_answer": True,
+        },
+        headers={"Authorization": f"Bearer {api_key}"},
         timeout=SEARCH_TIMEOUT_SECONDS,
     )
 
@@ -104,31 +101,17 @@ async def _search_duckduckgo(query: str, max_results: int) -> str:
     備援：DuckDuckGo Instant Answer / HTML-less API（無 key）。
     僅作 Tavily 不可用時的降級。
     """
-    import urllib.parse
-    import urllib.request
-    import json
-
     # DuckDuckGo Instant Answer API
-    params = urllib.parse.urlencode(
-        {
+    data = await http_client.get_json(
+        "https://api.duckduckgo.com/",
+        params={
             "q": query,
             "format": "json",
             "no_html": 1,
             "skip_disambig": 1,
-        }
+        },
+        timeout=SEARCH_TIMEOUT_SECONDS,
     )
-    url = f"https://api.duckduckgo.com/?{params}"
-
-    def _fetch():
-        req = urllib.request.Request(
-            url,
-            headers={"User-Agent": "XiaochenguangBot/1.0"},
-        )
-        with urllib.request.urlopen(req, timeout=SEARCH_TIMEOUT_SECONDS) as resp:
-            return json.loads(resp.read().decode("utf-8", errors="replace"))
-
-    loop = asyncio.get_event_loop()
-    data = await asyncio.wait_for(loop.run_in_executor(None, _fetch), timeout=SEARCH_TIMEOUT_SECONDS)
 
     answer = (data.get("AbstractText") or data.get("Answer") or "").strip()
     results = []
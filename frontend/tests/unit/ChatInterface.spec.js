@@ -115,6 +115,16 @@ describe('ChatInterface', () => {
     expect(w.vm.toolStatusPhase).toBe('running')
   })
 
+  it('responding status does not show the tool bubble', async () => {
+    const w = mountChat()
+    await flushPromises()
+    w.vm.consumeStreamBuffer(
+      '__XCG_EVENT__{"type":"tool_status","status":"responding","message":"正在產生回覆…","tools":[]}\n',
+    )
+    expect(w.vm.toolStatusPhase).toBe('responding')
+    expect(w.vm.toolStatusVisible).toBe(false)
+  })
+
   it('sends voice_mode and car_mode in request body', async () => {
     const w = mountChat()
     await flushPromises()
@@ -102,8 +102,42 @@ async def lifespan(app: FastAPI):
             logger.error("❌ persistence root 不可寫 root=%s — identity/graph 寫入會失敗", _p.get("root"))
     except Exception as e:
         logger.warning(f"⚠️ persistence 啟動檢查略過: {e}")
+    # 預熱 OpenAI 共用連線池（TLS / HTTP/2 握手不算進首個請求的 TTFB）；背景執行不擋啟動
+    warmup_task = None
+    try:
+        import asyncio
+        from backend.openai_handler import warm_up_openai_clients
+
+        async def _warmup():
+            try:
+                info = await warm_up_openai_clients()
+                if not info.get("skipped"):
+                    logger.info(
+                        "🔥 OpenAI warm-up ok=%s http2=%s ms=%s errors=%s",
+                        info.get("ok"), info.get("http2"), info.get("ms"), info.get("errors"),
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️ OpenAI warm-up 失敗: {type(e).__name__}")
+
+        warmup_task = asyncio.create_task(_warmup())
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI warm-up 略過: {e}")
     yield
     logger.info("👋 小晨光 AI 系統關閉中...")
+    try:
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+        from backend.openai_handler import aclose_openai_clients
+
+        await aclose_openai_clients()
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI client 關閉略過: {e}")
+    try:
+        from backend.tools.http_client import aclose_tool_http_clients
+
+        await aclose_tool_http_clients()
+    except Exception as e:
+        logger.warning(f"⚠️ 工具 HTTP client 關閉略過: {e}")
 
 app = FastAPI(lifespan=lifespan)
 
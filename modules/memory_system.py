@@ -248,7 +248,7 @@ class MemorySystem:
                 self.supabase.table(self.memories_table).insert(data).execute()
 
             # 短期快取：最新一輪對話（含可選反思）
-            self._cache_short_term(
+            await self._acache_short_term(
                 conversation_id=conversation_id,
                 user_id=user_id,
                 user_input=user_input,
@@ -264,6 +264,38 @@ class MemorySystem:
         except Exception as e:
             print(f"❌ 儲存記憶失敗：{e}")
 
+    def _short_term_payload(
+        self,
+        user_id: Optional[str],
+        user_input: str,
+        bot_response: str,
+        reflection: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        from datetime import timezone as _tz
+
+        try:
+            from backend.modules.reflection_contract import normalize_reflection
+
+            refl = normalize_reflection(reflection) if reflection is not None else None
+        except Exception:
+            refl = reflection
+
+        now = datetime.now(_tz.utc).isoformat()
+        return {
+            "messages": [
+                {"role": "user", "content": user_input or ""},
+                {"role": "assistant", "content": bot_response or ""},
+            ],
+            "summary": (bot_response or user_input or "")[:200],
+            "reflection": refl,
+            "updated_at": now,
+            "user_id": user_id,
+            # legacy mirrors retained for older readers
+            "user_msg": user_input,
+            "assistant_msg": bot_response,
+            "timestamp": now,
+        }
+
     def _cache_short_term(
         self,
         conversation_id: str,
@@ -276,34 +308,32 @@ class MemorySystem:
         if not self.redis:
             return
         try:
-            from datetime import timezone as _tz
-
-            try:
-                from backend.modules.reflection_contract import normalize_reflection
-
-                refl = normalize_reflection(reflection) if reflection is not None else None
-            except Exception:
-                refl = reflection
-
-            now = datetime.now(_tz.utc).isoformat()
-            payload = {
-                "messages": [
-                    {"role": "user", "content": user_input or ""},
-                    {"role": "assistant", "content": bot_response or ""},
-                ],
-                "summary": (bot_response or user_input or "")[:200],
-                "reflection": refl,
-                "updated_at": now,
-                "user_id": user_id,
-                # legacy mirrors retained for older readers
-                "user_msg": user_input,
-                "assistant_msg": bot_response,
-                "timestamp": now,
-            }
+            payload = self._short_term_payload(user_id, user_input, bot_response, reflection)
             self.redis.store_short_term(conversation_id, payload)
         except Exception as e:
             print(f"⚠️ Redis 短期記憶寫入失敗（已略過）: {e}")
 
+    async def _acache_short_term(
+        self,
+        conversation_id: str,
+        user_id: Optional[str],
+        user_input: str,
+        bot_response: str,
+        reflection: Optional[Dict[str, Any]] = None,
+    ):
+        """同 _cache_short_term，但走 async Redis（不阻塞 event loop）"""
+        if not self.redis:
+            return
+        if not hasattr(self.redis, "astore_short_term"):
+            return self._cache_short_term(
+                conversation_id, user_id, user_input, bot_response, reflection
+            )
+        try:
+            payload = self._short_term_payload(user_id, user_input, bot_response, reflection)
+            await self.redis.astore_short_term(conversation_id, payload)
+        except Exception as e:
+            print(f"⚠️ Redis 短期記憶寫入失敗（已略過）: {e}")
+
     def get_recent_context(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         """從 Redis 讀取最近一輪對話上下文"""
         if not self.redis:
@@ -6,6 +6,11 @@ Usage:
   python scripts/check_memory_graph_integrity.py
   python scripts/check_memory_graph_integrity.py --user-id default_user
   python scripts/check_memory_graph_integrity.py --graph-file data/memory_graph.json
+  python scripts/check_memory_graph_integrity.py --all-users --from-db --incremental
+
+--from-db pages the user's memory ids from Supabase (keyset, --page-size per
+request) to report edges pointing at missing memories. --incremental checks
+only edges created since the previous run's watermark (hourly-safe).
 
 Exit code 0 if ok, 1 if issues found.
 """
@@ -13,6 +18,7 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
 import sys
 from pathlib import Path
 
@@ -21,6 +27,12 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from backend.modules.graph_integrity import (  # noqa: E402
+    ID_PAGE_SIZE,
+    SAMPLE_LIMIT,
+    GraphIntegrityChecker,
+    supabase_memory_id_pager,
+)
 from backend.modules.graph_manager import GraphManager  # noqa: E402
 
 
@@ -30,33 +42,69 @@ def main() -> int:
     parser.add_argument(
         "--graph-file",
         default=None,
-        help="Path to memory_graph.json (default: MEMORY_GRAPH_FILE or data/memory_graph.json)",
+        help=(
+            "Path to legacy memory_graph.json; per-user logs live in <stem>.d/ "
+            "(default: MEMORY_GRAPH_FILE or data/memory_graph.json)"
+        ),
     )
     parser.add_argument(
         "--all-users",
         action="store_true",
-        help="Scan all user keys in graph file",
+        help="Scan all users in the legacy graph file and per-user edge logs",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only check edges created after the last run's watermark",
+    )
+    parser.add_argument(
+        "--from-db",
+        action="store_true",
+        help="Check edge endpoints against Supabase memory ids (keyset-paginated)",
+    )
+    parser.add_argument("--page-size", type=int, default=ID_PAGE_SIZE)
+    parser.add_argument("--sample-limit", type=int, default=SAMPLE_LIMIT)
     args = parser.parse_args()
 
+    client = None
+    table = os.getenv("SUPABASE_MEMORIES_TABLE", "xiaochenguang_memories")
+    if args.from_db:
+        from backend.supabase_handler import get_supabase
+
+        client = get_supabase()
+
     storage = args.graph_file
     if storage is None:
         storage = str(ROOT / "data" / "memory_graph.json")
 
     results = []
-    if args.all_users and Path(storage).exists():
-        try:
-            raw = json.loads(Path(storage).read_text(encoding="utf-8"))
-            user_ids = list(raw.keys()) if isinstance(raw, dict) else [args.user_id]
-        except Exception:
-            user_ids = [args.user_id]
+    if args.all_users:
+        user_ids = []
+        if Path(storage).exists():
+            try:
+                raw = json.loads(Path(storage).read_text(encoding="utf-8"))
+                if isinstance(raw, dict):
+                    user_ids.extend(raw.keys())
+            except Exception:
+                pass
+        # per-user edge logs (file stem is the sanitized user id)
+        log_dir = GraphManager(user_id=args.user_id, storage_path=storage).log_dir
+        if log_dir.is_dir():
+            user_ids.extend(p.stem for p in sorted(log_dir.glob("*.jsonl")))
+        user_ids = list(dict.fromkeys(user_ids)) or [args.user_id]
     else:
         user_ids = [args.user_id]
 
     overall_ok = True
     for uid in user_ids:
         g = GraphManager(user_id=uid, storage_path=storage)
-        report = g.integrity_check()
+        checker = GraphIntegrityChecker(
+            g, sample_limit=args.sample_limit, page_size=args.page_size
+        )
+        report = checker.run(
+            id_pager=supabase_memory_id_pager(client, table, uid) if client else None,
+            incremental=args.incremental,
+        )
         results.append(report)
         if not report.get("ok"):
             overall_ok = False
@@ -0,0 +1,287 @@
+-- Conversation summaries projection (FORWARD)
+-- Idempotent / additive. Apply after 20260728_task006_core_data_contracts_forward.sql.
+--
+-- GET /api/history/conversations used to read up to 2000 raw memory rows and
+-- bucket them in Python. This adds a per-(user_id, conversation_id) projection
+-- maintained by statement-level triggers on xiaochenguang_memories (each
+-- touched conversation is refreshed once per statement), plus a keyset-paged
+-- RPC ordered by (last_at DESC, conversation_id DESC).
+
+BEGIN;
+
+-- ---------------------------------------------------------------------------
+-- 1) Projection table
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS public.conversation_summaries (
+  user_id TEXT NOT NULL,
+  conversation_id TEXT NOT NULL,
+  ai_id TEXT,
+  first_at TIMESTAMPTZ,
+  last_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  message_count INTEGER NOT NULL DEFAULT 0,
+  title TEXT NOT NULL DEFAULT '',
+  preview TEXT NOT NULL DEFAULT '',
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (user_id, conversation_id)
+);
+
+-- Keyset index: WHERE user_id = $1 AND (last_at, conversation_id) < ($2, $3)
+CREATE INDEX IF NOT EXISTS idx_conversation_summaries_user_last
+  ON public.conversation_summaries (user_id, last_at DESC, conversation_id DESC);
+
+ALTER TABLE public.conversation_summaries ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE public.conversation_summaries FROM PUBLIC;
+REVOKE ALL ON TABLE public.conversation_summaries FROM anon;
+REVOKE ALL ON TABLE public.conversation_summaries FROM authenticated;
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE public.conversation_summaries TO service_role;
+-- No anon/authenticated policy is created (intentionally). service_role bypasses RLS.
+
+-- ---------------------------------------------------------------------------
+-- 2) Title / preview — same rules as history_router._title_from_first /
+--    _preview_text (28 / 80 chars, newlines flattened, "…" when cut)
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.conversation_summary_clip(
+  t text, n integer, empty_text text
+)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT CASE
+    WHEN btrim(COALESCE(t, '')) = '' THEN empty_text
+    WHEN char_length(replace(btrim(t), E'\n', ' ')) > n
+      THEN left(replace(btrim(t), E'\n', ' '), n) || '…'
+    ELSE replace(btrim(t), E'\n', ' ')
+  END;
+$$;
+
+-- ---------------------------------------------------------------------------
+-- 3) Recompute one conversation (uses idx_memories_conversation_created).
+--    Recomputing instead of incrementing keeps UPDATE / DELETE / re-save of the
+--    same user_message (save_memory updates in place) correct. The per-
+--    conversation advisory lock serialises concurrent writers: under READ
+--    COMMITTED the second refresh waits for the first transaction to commit
+--    and then aggregates with its rows visible, so no count is lost.
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.refresh_conversation_summary(
+  p_user_id text, p_conversation_id text
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF p_user_id IS NULL OR p_conversation_id IS NULL THEN
+    RETURN;
+  END IF;
+
+  PERFORM pg_advisory_xact_lock(hashtext(p_user_id), hashtext(p_conversation_id));
+
+  WITH rows AS (
+    SELECT m.user_message, m.assistant_message, m.created_at, m.ai_id
+    FROM public.xiaochenguang_memories m
+    WHERE m.conversation_id = p_conversation_id
+      AND m.user_id = p_user_id
+      AND m.memory_type = 'conversation'
+  ),
+  agg AS (
+    SELECT count(*)::int AS n, min(created_at) AS first_at, max(created_at) AS last_at
+    FROM rows
+  ),
+  first_row AS (
+    SELECT user_message, assistant_message FROM rows ORDER BY created_at ASC LIMIT 1
+  ),
+  last_row AS (
+    SELECT user_message, assistant_message, ai_id FROM rows ORDER BY created_at DESC LIMIT 1
+  )
+  INSERT INTO public.conversation_summaries AS s (
+    user_id, conversation_id, ai_id, first_at, last_at, message_count,
+    title, preview, updated_at
+  )
+  SELECT
+    p_user_id,
+    p_conversation_id,
+    l.ai_id,
+    a.first_at,
+    COALESCE(a.last_at, NOW()),
+    a.n,
+    public.conversation_summary_clip(
+      COALESCE(NULLIF(btrim(f.user_message), ''), l.user_message, l.assistant_message),
+      28, '未命名對話'
+    ),
+    public.conversation_summary_clip(
+      COALESCE(NULLIF(btrim(l.user_message), ''), l.assistant_message), 80, '（無內容）'
+    ),
+    NOW()
+  FROM agg a, first_row f, last_row l
+  WHERE a.n > 0
+  ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+    ai_id = EXCLUDED.ai_id,
+    first_at = EXCLUDED.first_at,
+    last_at = EXCLUDED.last_at,
+    message_count = EXCLUDED.message_count,
+    title = EXCLUDED.title,
+    preview = EXCLUDED.preview,
+    updated_at = EXCLUDED.updated_at;
+
+  -- Conversation emptied (hard delete) → drop the projection row
+  DELETE FROM public.conversation_summaries s
+  WHERE s.user_id = p_user_id
+    AND s.conversation_id = p_conversation_id
+    AND NOT EXISTS (
+      SELECT 1 FROM public.xiaochenguang_memories m
+      WHERE m.conversation_id = p_conversation_id
+        AND m.user_id = p_user_id
+        AND m.memory_type = 'conversation'
+    );
+END;
+$$;
+
+-- Statement-level: a bulk INSERT / UPDATE / DELETE (e.g. hard-deleting an
+-- N-row conversation) refreshes each distinct (user_id, conversation_id) once
+-- instead of once per row. Keys are visited in a fixed order so concurrent
+-- statements take the advisory locks in the same order. UPDATEs that change
+-- none of the projected columns (access_count, embedding, ...) are skipped.
+CREATE OR REPLACE FUNCTION public.trg_conversation_summaries()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r record;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    FOR r IN
+      SELECT DISTINCT n.user_id, n.conversation_id
+      FROM new_rows n
+      WHERE n.memory_type = 'conversation'
+      ORDER BY 1, 2
+    LOOP
+      PERFORM public.refresh_conversation_summary(r.user_id, r.conversation_id);
+    END LOOP;
+  ELSIF TG_OP = 'DELETE' THEN
+    FOR r IN
+      SELECT DISTINCT o.user_id, o.conversation_id
+      FROM old_rows o
+      WHERE o.memory_type = 'conversation'
+      ORDER BY 1, 2
+    LOOP
+      PERFORM public.refresh_conversation_summary(r.user_id, r.conversation_id);
+    END LOOP;
+  ELSE
+    FOR r IN
+      WITH changed AS (
+        SELECT o.user_id AS o_user, o.conversation_id AS o_conv, o.memory_type AS o_type,
+               n.user_id AS n_user, n.conversation_id AS n_conv, n.memory_type AS n_type
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE (o.user_id, o.conversation_id, o.memory_type, o.user_message,
+               o.assistant_message, o.created_at, o.ai_id)
+          IS DISTINCT FROM
+              (n.user_id, n.conversation_id, n.memory_type, n.user_message,
+               n.assistant_message, n.created_at, n.ai_id)
+      )
+      SELECT DISTINCT k.user_id, k.conversation_id
+      FROM (
+        SELECT o_user AS user_id, o_conv AS conversation_id FROM changed
+        WHERE o_type = 'conversation'
+        UNION
+        SELECT n_user, n_conv FROM changed WHERE n_type = 'conversation'
+      ) k
+      ORDER BY 1, 2
+    LOOP
+      PERFORM public.refresh_conversation_summary(r.user_id, r.conversation_id);
+    END LOOP;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+-- Transition tables need one trigger per event (and no UPDATE column list).
+DROP TRIGGER IF EXISTS conversation_summaries_sync ON public.xiaochenguang_memories;
+DROP TRIGGER IF EXISTS conversation_summaries_sync_insert ON public.xiaochenguang_memories;
+DROP TRIGGER IF EXISTS conversation_summaries_sync_update ON public.xiaochenguang_memories;
+DROP TRIGGER IF EXISTS conversation_summaries_sync_delete ON public.xiaochenguang_memories;
+
+CREATE TRIGGER conversation_summaries_sync_insert
+  AFTER INSERT ON public.xiaochenguang_memories
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_conversation_summaries();
+
+CREATE TRIGGER conversation_summaries_sync_update
+  AFTER UPDATE ON public.xiaochenguang_memories
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_conversation_summaries();
+
+CREATE TRIGGER conversation_summaries_sync_delete
+  AFTER DELETE ON public.xiaochenguang_memories
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_conversation_summaries();
+
+-- ---------------------------------------------------------------------------
+-- 4) Backfill (idempotent)
+-- ---------------------------------------------------------------------------
+DO $$
+DECLARE r record;
+BEGIN
+  FOR r IN
+    SELECT DISTINCT user_id, conversation_id
+    FROM public.xiaochenguang_memories
+    WHERE memory_type = 'conversation'
+      AND user_id IS NOT NULL
+      AND conversation_id IS NOT NULL
+  LOOP
+    PERFORM public.refresh_conversation_summary(r.user_id, r.conversation_id);
+  END LOOP;
+END $$;
+
+-- ---------------------------------------------------------------------------
+-- 5) Keyset-paged listing RPC. Owner filter is REQUIRED (NULL/blank → 0 rows).
+--    Cursor = (last_at, conversation_id) of the last row of the previous page.
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.list_conversation_summaries(
+  p_user_id text,
+  p_limit integer DEFAULT 30,
+  p_cursor_last_at timestamptz DEFAULT NULL,
+  p_cursor_conversation_id text DEFAULT NULL,
+  p_offset integer DEFAULT 0
+)
+RETURNS TABLE (
+  conversation_id text,
+  user_id text,
+  message_count integer,
+  first_at timestamptz,
+  last_at timestamptz,
+  title text,
+  preview text,
+  total_count bigint
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT
+    s.conversation_id,
+    s.user_id,
+    s.message_count,
+    s.first_at,
+    s.last_at,
+    s.title,
+    s.preview,
+    (SELECT count(*) FROM public.conversation_summaries c WHERE c.user_id = p_user_id)
+  FROM public.conversation_summaries s
+  WHERE p_user_id IS NOT NULL
+    AND btrim(p_user_id) <> ''
+    AND s.user_id = p_user_id
+    AND (
+      p_cursor_last_at IS NULL
+      OR (s.last_at, s.conversation_id) < (p_cursor_last_at, COALESCE(p_cursor_conversation_id, ''))
+    )
+  ORDER BY s.last_at DESC, s.conversation_id DESC
+  LIMIT LEAST(GREATEST(COALESCE(p_limit, 30), 1), 201)
+  OFFSET GREATEST(COALESCE(p_offset, 0), 0);
+$$;
+
+REVOKE ALL ON FUNCTION public.list_conversation_summaries(text, integer, timestamptz, text, integer)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.list_conversation_summaries(text, integer, timestamptz, text, integer)
+  TO service_role;
+
+COMMIT;
@@ -0,0 +1,18 @@
+-- Conversation summaries projection (ROLLBACK)
+-- Drops ONLY the objects created by 20261018_conversation_summaries_forward.sql.
+-- xiaochenguang_memories rows are never touched; the backend falls back to the
+-- raw-row listing when list_conversation_summaries is missing.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS conversation_summaries_sync ON public.xiaochenguang_memories;
+DROP TRIGGER IF EXISTS conversation_summaries_sync_insert ON public.xiaochenguang_memories;
+DROP TRIGGER IF EXISTS conversation_summaries_sync_update ON public.xiaochenguang_memories;
+DROP TRIGGER IF EXISTS conversation_summaries_sync_delete ON public.xiaochenguang_memories;
+DROP FUNCTION IF EXISTS public.trg_conversation_summaries();
+DROP FUNCTION IF EXISTS public.list_conversation_summaries(text, integer, timestamptz, text, integer);
+DROP FUNCTION IF EXISTS public.refresh_conversation_summary(text, text);
+DROP FUNCTION IF EXISTS public.conversation_summary_clip(text, integer, text);
+DROP TABLE IF EXISTS public.conversation_summaries;
+
+COMMIT;
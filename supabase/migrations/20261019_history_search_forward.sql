@@ -0,0 +1,184 @@
+-- History full-text search (FORWARD)
+-- Idempotent / additive. Apply after 20261018_conversation_summaries_forward.sql.
+--
+-- GET /api/history/search used two unindexed ilike '%q%' scans. CJK text has
+-- no word boundaries, so instead of the text-search parser we index character
+-- n-grams directly: CJK runs → unigrams + bigrams, ASCII runs → lowercase
+-- words (same rules as backend/history_search.index_terms). array_to_tsvector
+-- bypasses the parser / locale, so CJK terms survive under any collation.
+-- Only CJK terms prefilter through the index: a whole-word ASCII lexeme cannot
+-- match a mid-word substring ("ython" in "python"), so every hit is rechecked
+-- with strpos on both fields to keep the old ilike '%q%' semantics.
+-- NOTE: adding a STORED generated column rewrites xiaochenguang_memories once.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+-- ---------------------------------------------------------------------------
+-- 1) Tokenizers
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.history_search_terms(t text)
+RETURNS text[]
+LANGUAGE plpgsql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+DECLARE
+  terms text[] := '{}';
+  tok text;
+  n integer;
+  i integer;
+BEGIN
+  FOR tok IN
+    SELECT (regexp_matches(
+      lower(COALESCE(t, '')),
+      '[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+|[a-z0-9]+',
+      'g'
+    ))[1]
+  LOOP
+    IF tok ~ '^[a-z0-9]+$' THEN
+      terms := terms || tok;
+    ELSE
+      n := char_length(tok);
+      FOR i IN 1..n LOOP
+        terms := terms || substr(tok, i, 1);
+      END LOOP;
+      FOR i IN 1..n - 1 LOOP
+        terms := terms || substr(tok, i, 2);
+      END LOOP;
+    END IF;
+  END LOOP;
+  RETURN terms;
+END;
+$$;
+
+-- Query side: single-char CJK → unigram, longer CJK → adjacent bigrams (AND).
+-- ASCII runs add no term; a query without CJK returns NULL (strpos decides).
+CREATE OR REPLACE FUNCTION public.history_search_query(q text)
+RETURNS tsquery
+LANGUAGE plpgsql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+DECLARE
+  terms text[] := '{}';
+  tok text;
+  i integer;
+BEGIN
+  FOR tok IN
+    SELECT (regexp_matches(
+      lower(COALESCE(q, '')),
+      '[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+|[a-z0-9]+',
+      'g'
+    ))[1]
+  LOOP
+    IF tok ~ '^[a-z0-9]+$' THEN
+      CONTINUE;
+    ELSIF char_length(tok) = 1 THEN
+      terms := terms || tok;
+    ELSE
+      FOR i IN 1..char_length(tok) - 1 LOOP
+        terms := terms || substr(tok, i, 2);
+      END LOOP;
+    END IF;
+  END LOOP;
+  IF array_length(terms, 1) IS NULL THEN
+    RETURN NULL;
+  END IF;
+  -- terms contain only CJK: safe to quote as tsquery lexemes
+  RETURN array_to_string(
+    ARRAY(SELECT DISTINCT '''' || x || '''' FROM unnest(terms) AS x), ' & '
+  )::tsquery;
+END;
+$$;
+
+-- ---------------------------------------------------------------------------
+-- 2) Generated search vector (user_message weight A, assistant_message B) + index
+-- ---------------------------------------------------------------------------
+ALTER TABLE public.xiaochenguang_memories
+  ADD COLUMN IF NOT EXISTS search_tsv tsvector
+  GENERATED ALWAYS AS (
+    setweight(array_to_tsvector(public.history_search_terms(user_message)), 'A')
+    || setweight(array_to_tsvector(public.history_search_terms(assistant_message)), 'B')
+  ) STORED;
+
+-- Owner-scoped: WHERE user_id = $1 AND search_tsv @@ $2 in one GIN scan
+CREATE INDEX IF NOT EXISTS idx_memories_user_search_tsv
+  ON public.xiaochenguang_memories USING GIN (user_id, search_tsv);
+
+-- ---------------------------------------------------------------------------
+-- 3) Search RPC. Owner filter is REQUIRED (NULL/blank → 0 rows).
+--    Ranked by ts_rank_cd (default weights: A=1.0, B=0.4); queries without a
+--    CJK term rank by the matched field's weight. Keyset cursor
+--    (rank, created_at, id) of the last row of the previous page.
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.search_conversation_memories(
+  p_user_id text,
+  p_query text,
+  p_limit integer DEFAULT 30,
+  p_cursor_rank double precision DEFAULT NULL,
+  p_cursor_created_at timestamptz DEFAULT NULL,
+  p_cursor_id bigint DEFAULT NULL
+)
+RETURNS TABLE (
+  id bigint,
+  conversation_id text,
+  user_message text,
+  assistant_message text,
+  created_at timestamptz,
+  rank double precision,
+  user_hit boolean
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH q AS (
+    SELECT public.history_search_query(p_query) AS tsq,
+           lower(btrim(COALESCE(p_query, ''))) AS needle
+  ),
+  matched AS (
+    SELECT
+      m.*,
+      q.tsq,
+      strpos(lower(COALESCE(m.user_message, '')), q.needle) > 0 AS user_hit
+    FROM public.xiaochenguang_memories m, q
+    WHERE p_user_id IS NOT NULL
+      AND btrim(p_user_id) <> ''
+      AND q.needle <> ''
+      AND m.user_id = p_user_id
+      AND m.memory_type = 'conversation'
+      AND (q.tsq IS NULL OR m.search_tsv @@ q.tsq)
+      AND (strpos(lower(COALESCE(m.user_message, '')), q.needle) > 0
+           OR strpos(lower(COALESCE(m.assistant_message, '')), q.needle) > 0)
+  ),
+  hits AS (
+    SELECT
+      x.id,
+      x.conversation_id,
+      x.user_message,
+      x.assistant_message,
+      x.created_at,
+      round(CASE
+        WHEN x.tsq IS NOT NULL THEN ts_rank_cd(x.search_tsv, x.tsq)::numeric
+        WHEN x.user_hit THEN 1.0
+        ELSE 0.4
+      END, 6)::double precision AS rank,
+      x.user_hit
+    FROM matched x
+  )
+  SELECT h.id, h.conversation_id, h.user_message, h.assistant_message,
+         h.created_at, h.rank, h.user_hit
+  FROM hits h
+  WHERE p_cursor_rank IS NULL
+     OR (h.rank, h.created_at, h.id) < (p_cursor_rank, p_cursor_created_at, p_cursor_id)
+  ORDER BY h.rank DESC, h.created_at DESC, h.id DESC
+  LIMIT LEAST(GREATEST(COALESCE(p_limit, 30), 1), 101);
+$$;
+
+REVOKE ALL ON FUNCTION public.search_conversation_memories(text, text, integer, double precision, timestamptz, bigint)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.search_conversation_memories(text, text, integer, double precision, timestamptz, bigint)
+  TO service_role;
+
+COMMIT;
@@ -0,0 +1,14 @@
+-- History full-text search (ROLLBACK)
+-- Drops ONLY the objects created by 20261019_history_search_forward.sql.
+-- The backend falls back to ilike + in-process bigram ranking when the RPC is
+-- missing. btree_gin is left installed (other objects may depend on it).
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS public.search_conversation_memories(text, text, integer, double precision, timestamptz, bigint);
+DROP INDEX IF EXISTS public.idx_memories_user_search_tsv;
+ALTER TABLE public.xiaochenguang_memories DROP COLUMN IF EXISTS search_tsv;
+DROP FUNCTION IF EXISTS public.history_search_query(text);
+DROP FUNCTION IF EXISTS public.history_search_terms(text);
+
+COMMIT;
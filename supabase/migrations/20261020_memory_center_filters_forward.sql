@@ -0,0 +1,161 @@
+-- Memory Center indexed filters + keyset pagination (FORWARD)
+-- Idempotent / additive. Apply after 20261019_history_search_forward.sql
+-- (reuses its search_tsv column and GIN (user_id, search_tsv) index).
+--
+-- GET /api/memory-center listed with .range(offset, ...) (cost grows with the
+-- offset) and searched by pulling the newest 200 owner rows and filtering them
+-- in Python. memory_center_page pushes every filter into one owner-scoped
+-- query, pages by (created_at, id) keyset and returns a capped count estimate
+-- on the first page instead of running a second full COUNT(*).
+
+BEGIN;
+
+-- ---------------------------------------------------------------------------
+-- 1) Owner-scoped ordering indexes (keyset scan, no sort)
+-- ---------------------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_memories_center_owner_created
+  ON public.xiaochenguang_memories (user_id, ai_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_memories_center_owner_type_created
+  ON public.xiaochenguang_memories (user_id, ai_id, memory_type, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_memories_center_owner_importance
+  ON public.xiaochenguang_memories (user_id, ai_id, importance_score DESC);
+
+-- ---------------------------------------------------------------------------
+-- 2) Text prefilter: CJK runs → adjacent bigrams (AND). ASCII runs add no
+--    term: search_tsv indexes whole [a-z0-9]+ tokens, so neither an exact nor
+--    a prefix lexeme can match a mid-word substring ("ython" in "python",
+--    "world" in "helloworld"). ASCII-only queries return NULL and are decided
+--    by the strpos recheck alone (still owner-scoped + keyset ordered).
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.memory_center_query(q text)
+RETURNS tsquery
+LANGUAGE plpgsql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+DECLARE
+  terms text[] := '{}';
+  tok text;
+  i integer;
+BEGIN
+  FOR tok IN
+    SELECT (regexp_matches(
+      lower(COALESCE(q, '')),
+      '[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+|[a-z0-9]+',
+      'g'
+    ))[1]
+  LOOP
+    IF tok ~ '^[a-z0-9]+$' THEN
+      CONTINUE;
+    ELSIF char_length(tok) = 1 THEN
+      terms := terms || ('''' || tok || '''');
+    ELSE
+      FOR i IN 1..char_length(tok) - 1 LOOP
+        terms := terms || ('''' || substr(tok, i, 2) || '''');
+      END LOOP;
+    END IF;
+  END LOOP;
+  IF array_length(terms, 1) IS NULL THEN
+    RETURN NULL;
+  END IF;
+  -- terms contain only CJK: safe to quote as tsquery lexemes
+  RETURN array_to_string(ARRAY(SELECT DISTINCT x FROM unnest(terms) AS x), ' & ')::tsquery;
+END;
+$$;
+
+-- ---------------------------------------------------------------------------
+-- 3) Page RPC. Owner filter is REQUIRED (user_id AND ai_id; NULL/blank → 0 rows).
+--    Only the predicates that are actually set are added to the statement, so
+--    each call is planned against the matching index instead of a generic
+--    "p IS NULL OR col = p" plan. All values are bound parameters.
+--    total_estimate: first page only, count of matches capped at p_count_cap.
+-- ---------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.memory_center_page(
+  p_user_id text,
+  p_ai_id text,
+  p_memory_type text DEFAULT NULL,
+  p_min_importance double precision DEFAULT NULL,
+  p_created_from timestamptz DEFAULT NULL,
+  p_created_to timestamptz DEFAULT NULL,
+  p_query text DEFAULT NULL,
+  p_limit integer DEFAULT 20,
+  p_cursor_created_at timestamptz DEFAULT NULL,
+  p_cursor_id bigint DEFAULT NULL,
+  p_count_cap integer DEFAULT 1000
+)
+RETURNS TABLE (
+  id bigint,
+  memory_type text,
+  created_at timestamptz,
+  conversation_id text,
+  user_message text,
+  assistant_message text,
+  importance_score double precision,
+  access_count integer,
+  total_estimate bigint
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  needle text := lower(btrim(COALESCE(p_query, '')));
+  tsq tsquery := public.memory_center_query(p_query);
+  lim integer := LEAST(GREATEST(COALESCE(p_limit, 20), 1), 51);
+  cap integer := LEAST(GREATEST(COALESCE(p_count_cap, 1000), 1), 10000);
+  preds text := 'm.user_id = $1 AND m.ai_id = $2';
+  total bigint;
+BEGIN
+  IF p_user_id IS NULL OR btrim(p_user_id) = '' OR p_ai_id IS NULL OR btrim(p_ai_id) = '' THEN
+    RETURN;
+  END IF;
+
+  IF p_memory_type IS NOT NULL THEN
+    preds := preds || ' AND m.memory_type = $3';
+  END IF;
+  IF p_min_importance IS NOT NULL THEN
+    preds := preds || ' AND m.importance_score >= $4';
+  END IF;
+  IF p_created_from IS NOT NULL THEN
+    preds := preds || ' AND m.created_at >= $5';
+  END IF;
+  IF p_created_to IS NOT NULL THEN
+    preds := preds || ' AND m.created_at <= $6';
+  END IF;
+  IF needle <> '' THEN
+    IF tsq IS NOT NULL THEN
+      preds := preds || ' AND m.search_tsv @@ $7';
+    END IF;
+    preds := preds
+      || ' AND strpos(lower(COALESCE(m.user_message, '''') || chr(10)'
+      || ' || COALESCE(m.assistant_message, '''')), $8) > 0';
+  END IF;
+
+  IF p_cursor_created_at IS NULL THEN
+    EXECUTE 'SELECT count(*) FROM (SELECT 1 FROM public.xiaochenguang_memories m WHERE '
+      || preds || ' LIMIT $9) c'
+      INTO total
+      USING p_user_id, p_ai_id, p_memory_type, p_min_importance, p_created_from,
+            p_created_to, tsq, needle, cap;
+  ELSE
+    preds := preds || ' AND (m.created_at, m.id) < ($10, $11)';
+  END IF;
+
+  RETURN QUERY EXECUTE
+    'SELECT m.id::bigint, m.memory_type::text, m.created_at, m.conversation_id::text,'
+    || ' m.user_message::text, m.assistant_message::text,'
+    || ' m.importance_score::double precision, m.access_count::integer, $13::bigint'
+    || ' FROM public.xiaochenguang_memories m WHERE ' || preds
+    || ' ORDER BY m.created_at DESC, m.id DESC LIMIT $12'
+    USING p_user_id, p_ai_id, p_memory_type, p_min_importance, p_created_from,
+          p_created_to, tsq, needle, cap, p_cursor_created_at, p_cursor_id, lim, total;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.memory_center_page(text, text, text, double precision, timestamptz, timestamptz, text, integer, timestamptz, bigint, integer)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.memory_center_page(text, text, text, double precision, timestamptz, timestamptz, text, integer, timestamptz, bigint, integer)
+  TO service_role;
+
+COMMIT;
@@ -0,0 +1,14 @@
+-- Memory Center indexed filters (ROLLBACK)
+-- Drops ONLY the objects created by 20261020_memory_center_filters_forward.sql.
+-- The backend falls back to the PostgREST range / bounded-scan path when the
+-- RPC is missing.
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS public.memory_center_page(text, text, text, double precision, timestamptz, timestamptz, text, integer, timestamptz, bigint, integer);
+DROP FUNCTION IF EXISTS public.memory_center_query(text);
+DROP INDEX IF EXISTS public.idx_memories_center_owner_importance;
+DROP INDEX IF EXISTS public.idx_memories_center_owner_type_created;
+DROP INDEX IF EXISTS public.idx_memories_center_owner_created;
+
+COMMIT;
@@ -0,0 +1,54 @@
+-- Rolling conversation summaries (FORWARD)
+-- Idempotent / additive. Apply after 20261020_memory_center_filters_forward.sql.
+--
+-- POST /api/history/summarize re-read the whole conversation and inserted a
+-- new conversation_summary row on every call. This table keeps ONE summary
+-- per (user_id, conversation_id, kind) together with its watermark (the last
+-- created_at already folded in), so later calls only summarize newer turns.
+-- kind separates consumers (e.g. 'report' = /history/summarize).
+-- Written by the backend (service_role) only; Redis holds the hot copy.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS public.conversation_rolling_summaries (
+  user_id TEXT NOT NULL,
+  conversation_id TEXT NOT NULL,
+  kind TEXT NOT NULL DEFAULT 'report',
+  summary TEXT NOT NULL DEFAULT '',
+  watermark TIMESTAMPTZ,
+  message_count INTEGER NOT NULL DEFAULT 0,
+  model TEXT,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (user_id, conversation_id, kind)
+);
+
+ALTER TABLE public.conversation_rolling_summaries ENABLE ROW LEVEL SECURITY;
+
+REVOKE ALL ON TABLE public.conversation_rolling_summaries FROM PUBLIC, anon, authenticated;
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE public.conversation_rolling_summaries TO service_role;
+
+-- Removing a conversation removes its rolling summaries (hard delete path)
+CREATE OR REPLACE FUNCTION public.conversation_rolling_summaries_cleanup()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF OLD.memory_type = 'conversation' AND NOT EXISTS (
+    SELECT 1 FROM public.xiaochenguang_memories m
+    WHERE m.user_id = OLD.user_id
+      AND m.conversation_id = OLD.conversation_id
+      AND m.memory_type = 'conversation'
+  ) THEN
+    DELETE FROM public.conversation_rolling_summaries s
+    WHERE s.user_id = OLD.user_id AND s.conversation_id = OLD.conversation_id;
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS conversation_rolling_summaries_cleanup ON public.xiaochenguang_memories;
+CREATE TRIGGER conversation_rolling_summaries_cleanup
+  AFTER DELETE ON public.xiaochenguang_memories
+  FOR EACH ROW EXECUTE FUNCTION public.conversation_rolling_summaries_cleanup();
+
+COMMIT;
@@ -0,0 +1,12 @@
+-- Rolling conversation summaries (ROLLBACK)
+-- Drops ONLY the objects created by 20261021_rolling_summaries_forward.sql.
+-- The backend keeps working from the Redis copy (or resummarizes) when the
+-- table is missing.
+
+BEGIN;
+
+DROP TRIGGER IF EXISTS conversation_rolling_summaries_cleanup ON public.xiaochenguang_memories;
+DROP FUNCTION IF EXISTS public.conversation_rolling_summaries_cleanup();
+DROP TABLE IF EXISTS public.conversation_rolling_summaries;
+
+COMMIT;
@@ -10,6 +10,7 @@ from __future__ import annotations
 
 import os
 import sys
+import tempfile
 from pathlib import Path
 
 import pytest
@@ -27,7 +28,23 @@ os.environ.setdefault("SUPABASE_KEY", "test-supabase-key")
 os.environ.setdefault("API_SECRET", "")
 os.environ.setdefault("DAILY_TOKEN_BUDGET_USD", "100.0")
 os.environ.setdefault("USER_DAILY_TOKEN_BUDGET_USD", "10.0")
-os.environ.setdefault("TOKEN_USAGE_LOG", str(ROOT / "data" / "test_token_usage.jsonl"))
+os.environ.setdefault("OPENAI_WARMUP_ENABLED", "false")
+os.environ.setdefault("AUX_TASK_CACHE_REDIS", "false")
+os.environ.setdefault("ROLLING_SUMMARY_REDIS", "false")
+# 測試產生的 token 紀錄 / 身份檔寫到暫存目錄，不弄髒 repo 的 data/
+_TEST_DATA = Path(tempfile.mkdtemp(prefix="xcg-test-data-"))
+os.environ.setdefault("TOKEN_USAGE_LOG", str(_TEST_DATA / "test_token_usage.jsonl"))
+os.environ.setdefault("TOKEN_LEDGER_PATH", str(_TEST_DATA / "token_ledger.jsonl"))
+os.environ.setdefault("IDENTITY_STORE_DIR", str(_TEST_DATA / "identity"))
+
+
+@pytest.fixture(autouse=True)
+def _clear_aux_task_cache():
+    """輔助任務回應快取為程序內全域：每個測試前清空，避免跨測試命中。"""
+    from backend.aux_task_cache import clear_aux_cache
+
+    clear_aux_cache()
+    yield
 
 
 @pytest.fixture
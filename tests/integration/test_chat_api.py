@@ -249,3 +249,28 @@ def test_secret_not_in_error_body(base_patches, mock_memory, mock_prompt_engine,
             r = client.post("/api/chat?stream=false", json=PAYLOAD)
     # 500 or handled — body must not contain the fake secret
     assert "sk-proj-SECRETVALUE" not in r.text
+
+
+@pytest.mark.integration
+def test_moderation_task_discarded_when_setup_fails(base_patches):
+    import asyncio
+
+    from backend import chat_router as cr
+
+    discarded = []
+
+    async def slow_mod(text, client=None):
+        await asyncio.sleep(5)
+
+    def record(task):
+        discarded.append(task.get_coro().__name__)
+        cr_discard(task)
+
+    cr_discard = cr.discard_task
+    with patch("backend.chat_router.moderate_text", new=slow_mod), patch(
+        "backend.chat_router.PromptEngine", side_effect=RuntimeError("prompt engine down")
+    ), patch("backend.chat_router.discard_task", side_effect=record):
+        with TestClient(_app(), raise_server_exceptions=False) as client:
+            r = client.post("/api/chat?stream=false&use_tools=false", json=PAYLOAD)
+    assert r.status_code == 500
+    assert discarded == ["slow_mod"]  # 審核 task 被取消，不會留下孤兒 task
@@ -57,6 +57,10 @@ class _FakeQuery:
         self.state["range"] = (start, end)
         return self
 
+    def or_(self, expr):
+        self.state.setdefault("filters", []).append(("or", expr))
+        return self
+
     def limit(self, n):
         self.state["limit"] = n
         return self
@@ -201,6 +205,22 @@ def test_pagination_echo_and_range(client):
     assert state.get("range") == (20, 29)
 
 
+def test_cursor_uses_keyset_instead_of_range(client):
+    from backend.history_search import encode_cursor
+
+    c, state, _ = client
+    state["data"] = []
+    cur = encode_cursor("2026-08-01T10:00:00+00:00", 42)
+    r = c.get(f"/api/memory-center?limit=10&cursor={cur}", headers=_auth())
+    assert r.status_code == 200
+    assert "range" not in state and state.get("limit") == 10
+    assert (
+        "or",
+        "created_at.lt.2026-08-01T10:00:00+00:00,"
+        "and(created_at.eq.2026-08-01T10:00:00+00:00,id.lt.42)",
+    ) in state["filters"]
+
+
 def test_limit_upper_bound_rejected(client):
     c, _, _ = client
     r = c.get("/api/memory-center?limit=999", headers=_auth())
@@ -133,6 +133,11 @@ def test_chat_api_still_works_with_v2_flag(monkeypatch):
             "model": "gpt-4o-mini",
         }
 
+    async def fake_stream(*a, **k):
+        # 非串流 + 輸出審核：最終回答內部走串流，邊生成邊審核
+        yield {"type": "content", "text": "你好呀"}
+        yield {"type": "usage", "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}
+
     app = FastAPI()
     app.include_router(chat_router, prefix="/api")
 
@@ -151,6 +156,8 @@ def test_chat_api_still_works_with_v2_flag(monkeypatch):
     ), patch("backend.chat_router.PromptEngine", return_value=pe), patch(
         "backend.chat_router.generate_response_with_tools", new=fake_tools
     ), patch("backend.chat_router.generate_response", new=fake_gen), patch(
+        "backend.chat_router.generate_response_stream", new=fake_stream
+    ), patch(
         "backend.chat_router.get_tool_registry"
     ) as reg, patch(
         "backend.chat_router.get_openai_tool_definitions", return_value=[]
@@ -183,6 +183,39 @@ def test_chat_completions_passes_chat_request_fields(client):
     assert captured["request"].user_id == "header-user"
 
 
+def test_chat_completions_builds_client_history(client):
+    captured = []
+
+    async def fake_chat(request, background_tasks, stream=True, use_tools=True):
+        captured.append(request)
+        return ChatResponse(
+            assistant_message="ok",
+            emotion_analysis={},
+            conversation_id=request.conversation_id,
+        )
+
+    messages = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "msg1"},
+        {"role": "assistant", "content": "a1\n__XCG_EVENT__{\"type\":\"tool_status\"}"},
+        {"role": "user", "content": "msg2"},
+    ]
+    with patch("backend.chat_router.chat", new=fake_chat):
+        client.post(
+            "/v1/chat/completions",
+            json={"messages": messages, "user": "user-42"},
+        )
+        # 無可信任身分 → ephemeral，不帶 client 歷史
+        client.post("/v1/chat/completions", json={"messages": messages})
+
+    assert captured[0].client_history == [
+        {"role": "user", "content": "msg1"},
+        {"role": "assistant", "content": "a1"},
+    ]
+    assert captured[1].suppress_memory is True
+    assert captured[1].client_history is None
+
+
 def test_chat_completions_stream_sse(client):
     async def plain_stream():
         yield "哈"
@@ -270,3 +303,45 @@ def test_v1_auth_when_secret_set(monkeypatch):
         ok = c.get("/v1/models", headers={"Authorization": "Bearer test-secret-xyz"})
         assert ok.status_code == 200
         assert ok.json()["data"][0]["id"] == MODEL_ID
+
+
+def test_chat_completions_stream_consumes_typed_events(client):
+    from backend.stream_protocol import EventStreamingResponse, StreamEvent
+
+    async def events():
+        yield StreamEvent("tool_status", {"type": "tool_status", "status": "skipped"})
+        yield "哈尼"
+        yield "\n你好"
+        yield StreamEvent(
+            "usage",
+            {"usage": {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10, "cost_usd": 0}},
+        )
+
+    async def fake_chat(*args, **kwargs):
+        return EventStreamingResponse(events())
+
+    with patch("backend.chat_router.chat", new=fake_chat):
+        with client.stream(
+            "POST",
+            "/v1/chat/completions",
+            json={
+                "model": "xiaochenguang",
+                "stream": True,
+                "messages": [{"role": "user", "content": "hi"}],
+            },
+        ) as r:
+            assert r.status_code == 200
+            body = "".join(list(r.iter_text()))
+
+    frames = [
+        json.loads(line[len("data: "):])
+        for line in body.split("\n\n")
+        if line.startswith("data: {")
+    ]
+    text = "".join(f["choices"][0]["delta"].get("content") or "" for f in frames)
+    assert text == "哈尼\n你好"
+    assert len({f["id"] for f in frames}) == 1
+    assert frames[-1]["choices"][0]["finish_reason"] == "stop"
+    assert frames[-1]["usage"] == {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}
+    assert "tool_status" not in body and "__XCG" not in body
+    assert body.rstrip().endswith("data: [DONE]")
@@ -138,7 +138,7 @@ def test_stream_midway_failure_marks_error(mock_memory, mock_prompt_engine, mock
 
 @pytest.mark.integration
 def test_tool_event_payload_formats():
-    for status in ("planning", "running", "progress", "done", "skipped", "error"):
+    for status in ("planning", "responding", "running", "progress", "done", "skipped", "error"):
         line = _tool_event_payload(status, message=f"m-{status}", tools=[])
         assert line.startswith(TOOL_EVENT_PREFIX)
         data = json.loads(line[len(TOOL_EVENT_PREFIX) :])
@@ -210,3 +210,53 @@ def test_parse_visible_text_excludes_meta_and_events():
     assert "哈尼～" in text
     assert meta["usage"]["total_tokens"] == 3
     assert events[0]["status"] == "planning"
+
+
+@pytest.mark.integration
+def test_streamed_tool_round_answers_without_second_call(
+    mock_memory, mock_prompt_engine, mock_tracker, monkeypatch
+):
+    """工具回合直接回答：token 立即送出，不再呼叫 generate_response_stream。"""
+    monkeypatch.setenv("MODERATION_CHECK_OUTPUT", "false")
+    calls = {"final": 0}
+
+    async def final_stream(*a, **k):
+        calls["final"] += 1
+        yield {"type": "content", "text": "不該出現"}
+
+    async def tool_round(messages, *, tools, model, temperature, max_tokens):
+        assert [t["function"]["name"] for t in tools] == ["calculate"]
+        for t in ["答", "案"]:
+            yield {"type": "content", "text": t}
+        yield {"type": "usage", "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}}
+
+    tools = [{"type": "function", "function": {"name": "calculate", "parameters": {}}}]
+    patches = _setup(mock_memory, mock_prompt_engine, mock_tracker, final_stream, tools=tools)
+    patches += (
+        patch("backend.chat_router.generate_response_stream_with_tools", new=tool_round),
+    )
+    for p in patches:
+        p.start()
+    try:
+        from backend import chat_router as cr
+
+        cr.redis_interface = MagicMock()
+        cr.redis_interface.redis = None
+        with TestClient(_app()) as client:
+            r = client.post(
+                "/api/chat?stream=true&use_tools=true",
+                json={**PAYLOAD, "user_message": "幫我算 1+1"},
+            )
+        assert r.status_code == 200
+        visible = "".join(
+            line for line in r.text.split("__XCG_META__")[0].split("\n")
+            if not line.startswith(TOOL_EVENT_PREFIX)
+        )
+        assert visible == "答案"
+        # 第一段文字可能只是工具前的開場白：送中性狀態，不宣告「無需使用工具」
+        assert '"status": "responding"' in r.text
+        assert '"status": "skipped"' not in r.text
+        assert calls["final"] == 0
+    finally:
+        for p in patches:
+            p.stop()
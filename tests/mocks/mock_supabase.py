@@ -1,10 +1,16 @@
 """Supabase 假客戶端（記憶體內表）。"""
 from __future__ import annotations
 
+import re
 from copy import deepcopy
 from typing import Any, Dict, List, Optional
 
 
+def _ilike(value: Any, pattern: str) -> bool:
+    regex = "".join(".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in pattern)
+    return re.fullmatch(regex, str(value or ""), flags=re.IGNORECASE | re.DOTALL) is not None
+
+
 class MockQuery:
     def __init__(self, table: "MockTable", action: str = "select"):
         self.table = table
@@ -35,6 +41,12 @@ class MockQuery:
         self._data = data
         return self
 
+    def upsert(self, data: Any, on_conflict: str = "id"):
+        self.action = "upsert"
+        self._data = data
+        self._conflict = [c.strip() for c in on_conflict.split(",") if c.strip()]
+        return self
+
     def delete(self):
         self.action = "delete"
         return self
@@ -43,6 +55,14 @@ class MockQuery:
         self._filters.append(("eq", key, value))
         return self
 
+    def gt(self, key: str, value: Any):
+        self._filters.append(("gt", key, value))
+        return self
+
+    def ilike(self, key: str, pattern: str):
+        self._filters.append(("ilike", key, pattern))
+        return self
+
     def is_(self, key: str, value: Any):
         # PostgREST-style .is_(col, "null") → IS NULL (row missing/None)
         if value in (None, "null", "NULL"):
@@ -68,6 +88,10 @@ class MockQuery:
                     return False
                 if op == "is_null" and row.get(k) is not None:
                     return False
+                if op == "gt" and (row.get(k) is None or not row.get(k) > v):
+                    return False
+                if op == "ilike" and not _ilike(row.get(k), v):
+                    return False
             return True
 
         matched = [r for r in rows if match(r)]
@@ -92,6 +116,23 @@ class MockQuery:
                 inserted.append(row)
             return MockResult(deepcopy(inserted))
 
+        if self.action == "upsert":
+            items = self._data if isinstance(self._data, list) else [self._data]
+            out = []
+            for item in items:
+                existing = next(
+                    (r for r in self.table.rows
+                     if all(r.get(k) == item.get(k) for k in self._conflict)),
+                    None,
+                )
+                if existing is None:
+                    existing = dict(item)
+                    self.table.rows.append(existing)
+                else:
+                    existing.update(item)
+                out.append(deepcopy(existing))
+            return MockResult(out)
+
         if self.action == "update":
             updated = []
             for row in matched:
@@ -136,6 +177,9 @@ class MockTable:
     def update(self, data: Dict[str, Any]):
         return MockQuery(self, "update").update(data)
 
+    def upsert(self, data: Any, on_conflict: str = "id"):
+        return MockQuery(self, "upsert").upsert(data, on_conflict=on_conflict)
+
     def delete(self):
         return MockQuery(self, "delete").delete()
 
@@ -220,6 +264,140 @@ class MockSupabase:
                             "ai_id": r.get("ai_id"),
                         })
                     return MockResult(out)
+                if name == "list_conversation_summaries":
+                    return MockResult(parent._list_conversation_summaries(params))
+                if name == "search_conversation_memories":
+                    return MockResult(parent._search_conversation_memories(params))
+                if name == "memory_center_page":
+                    return MockResult(parent._memory_center_page(params))
                 return MockResult([])
 
         return _Rpc()
+
+    def _list_conversation_summaries(self, params: dict) -> List[Dict[str, Any]]:
+        """模擬 trigger 維護的 conversation_summaries + keyset RPC（見 20261018 migration）。"""
+        user_id = params.get("p_user_id")
+        if not user_id or not str(user_id).strip():
+            return []
+        groups: Dict[str, List[dict]] = {}
+        for r in self.table("xiaochenguang_memories").rows:
+            if r.get("user_id") != user_id or r.get("memory_type", "conversation") != "conversation":
+                continue
+            groups.setdefault(r.get("conversation_id") or "", []).append(r)
+
+        def clip(t: Any, n: int, empty: str) -> str:
+            t = (t or "").strip().replace("\n", " ")
+            if not t:
+                return empty
+            return t[:n] + "…" if len(t) > n else t
+
+        summaries = []
+        for cid, rows in groups.items():
+            rows.sort(key=lambda r: r.get("created_at") or "")
+            first, last = rows[0], rows[-1]
+            summaries.append({
+                "conversation_id": cid,
+                "user_id": user_id,
+                "message_count": len(rows),
+                "first_at": first.get("created_at"),
+                "last_at": last.get("created_at"),
+                "title": clip(first.get("user_message") or last.get("user_message"), 28, "未命名對話"),
+                "preview": clip(last.get("user_message") or last.get("assistant_message"), 80, "（無內容）"),
+                "total_count": len(groups),
+            })
+        summaries.sort(key=lambda x: (x["last_at"] or "", x["conversation_id"]), reverse=True)
+        c_at = params.get("p_cursor_last_at")
+        if c_at is not None:
+            key = (c_at, params.get("p_cursor_conversation_id") or "")
+            summaries = [x for x in summaries if (x["last_at"] or "", x["conversation_id"]) < key]
+        offset = int(params.get("p_offset") or 0)
+        limit = int(params.get("p_limit") or 30)
+        return deepcopy(summaries[offset : offset + limit])
+
+    def _search_conversation_memories(self, params: dict) -> List[Dict[str, Any]]:
+        """模擬 search_tsv + search_conversation_memories（見 20261019 migration）。"""
+        from backend.history_search import BigramIndex, prefilter_terms, sort_key
+
+        user_id = params.get("p_user_id")
+        query = params.get("p_query") or ""
+        terms = prefilter_terms(query)
+        if not user_id or not str(user_id).strip() or not query.strip():
+            return []
+        rows = [
+            r for r in self.table("xiaochenguang_memories").rows
+            if r.get("user_id") == user_id and r.get("memory_type", "conversation") == "conversation"
+        ]
+        index = BigramIndex.from_rows(rows)
+        cursor = None
+        if params.get("p_cursor_rank") is not None:
+            cursor = sort_key(
+                params["p_cursor_rank"], params.get("p_cursor_created_at"), params.get("p_cursor_id")
+            )
+        out = []
+        # CJK term 走索引預篩（AND），英數 / 標點只靠子字串複查
+        candidates = [doc_id for _, doc_id in index.search(terms)] if terms else list(index.docs)
+        for doc_id in candidates:
+            hit = index.match(doc_id, query, terms)
+            if hit is None:
+                continue
+            score, field = hit
+            r = index.docs[doc_id]
+            key = sort_key(score, r.get("created_at"), r.get("id"))
+            if cursor and key >= cursor:
+                continue
+            out.append((key, {
+                "id": r.get("id"),
+                "conversation_id": r.get("conversation_id"),
+                "user_message": r.get("user_message"),
+                "assistant_message": r.get("assistant_message"),
+                "created_at": r.get("created_at"),
+                "rank": key[0],
+                "user_hit": field == "user_message",
+            }))
+        out.sort(key=lambda x: x[0], reverse=True)
+        return deepcopy([r for _, r in out[: int(params.get("p_limit") or 30)]])
+
+    def _memory_center_page(self, params: dict) -> List[Dict[str, Any]]:
+        """模擬 memory_center_page（見 20261020 migration）：owner 必填、keyset、有上限的計數。"""
+        from backend.history_search import index_terms, prefilter_terms
+
+        user_id, ai_id = params.get("p_user_id"), params.get("p_ai_id")
+        if not user_id or not str(user_id).strip() or not ai_id or not str(ai_id).strip():
+            return []
+        needle = (params.get("p_query") or "").strip().lower()
+        # memory_center_query：只有 CJK term 進 tsquery 預篩，英數交給 strpos 複查
+        cjk_terms = prefilter_terms(needle)
+
+        def keep(r: dict) -> bool:
+            if r.get("user_id") != user_id or r.get("ai_id") != ai_id:
+                return False
+            if params.get("p_memory_type") is not None and r.get("memory_type") != params["p_memory_type"]:
+                return False
+            if params.get("p_min_importance") is not None and (
+                r.get("importance_score") is None or r["importance_score"] < params["p_min_importance"]
+            ):
+                return False
+            created = r.get("created_at") or ""
+            if params.get("p_created_from") and created < params["p_created_from"]:
+                return False
+            if params.get("p_created_to") and created > params["p_created_to"]:
+                return False
+            text = ((r.get("user_message") or "") + "\n" + (r.get("assistant_message") or "")).lower()
+            if cjk_terms and not set(cjk_terms) <= set(index_terms(text)):
+                return False
+            return not needle or needle in text
+
+        rows = [r for r in self.table("xiaochenguang_memories").rows if keep(r)]
+        rows.sort(key=lambda r: (r.get("created_at") or "", r.get("id") or 0), reverse=True)
+        total = None
+        if params.get("p_cursor_created_at") is None:
+            total = min(len(rows), int(params.get("p_count_cap") or 1000))
+        else:
+            key = (params["p_cursor_created_at"], params.get("p_cursor_id") or 0)
+            rows = [r for r in rows if (r.get("created_at") or "", r.get("id") or 0) < key]
+        cols = ("id", "memory_type", "created_at", "conversation_id", "user_message",
+                "assistant_message", "importance_score", "access_count")
+        return [
+            {**{c: r.get(c) for c in cols}, "total_estimate": total}
+            for r in rows[: int(params.get("p_limit") or 20)]
+        ]
@@ -0,0 +1,103 @@
+"""Open WebUI 輔助任務回應快取：內容定址 key / TTL / single-flight / 不快取失敗"""
+import asyncio
+import json
+
+import pytest
+from fastapi.responses import JSONResponse
+
+import backend.chat_router as chat_router
+import backend.openai_compat_router as compat
+from backend.aux_task_cache import aux_cache_key, aux_cache_stats, get_aux_cache
+from tests.unit.test_openai_compat_owui import _FakeBackgroundTasks, _FakeRequest, _body
+
+
+def test_key_normalizes_whitespace_and_separates_task_model():
+    a = aux_cache_key("title_generation", "m", [("user", "你好  世界")])
+    assert a == aux_cache_key("Title_Generation", "m", [("USER", " 你好 世界 ")])
+    assert a != aux_cache_key("tags_generation", "m", [("user", "你好 世界")])
+    assert a != aux_cache_key("title_generation", "m2", [("user", "你好 世界")])
+
+
+@pytest.mark.asyncio
+async def test_single_flight_and_ttl(monkeypatch):
+    cache, calls = get_aux_cache(), []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "標題"
+
+    results = await asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(5)])
+    assert [t for t, _ in results] == ["標題"] * 5
+    assert len(calls) == 1 and aux_cache_stats()["coalesced"] == 4
+
+    monkeypatch.setenv("AUX_TASK_CACHE_TTL_SECONDS", "0")
+    cache.clear()
+    await cache.get_or_compute("k", compute)
+    await cache.get_or_compute("k", compute)
+    assert len(calls) == 3  # TTL=0 → 不快取
+
+
+@pytest.mark.asyncio
+async def test_failed_or_empty_results_not_cached():
+    cache, calls = get_aux_cache(), []
+
+    async def compute():
+        calls.append(1)
+        return None
+
+    assert await cache.get_or_compute("k", compute) == (None, False)
+    await cache.get_or_compute("k", compute)
+    assert len(calls) == 2
+
+
+def _aux_call(monkeypatch, result, stream=False):
+    calls = []
+
+    async def fake_chat(*, request, background_tasks, stream, use_tools):
+        calls.append((stream, use_tools))
+        return result
+
+    monkeypatch.setattr(chat_router, "chat", fake_chat)
+    req = _FakeRequest({"X-OpenWebUI-User-Id": "alice", "X-OpenWebUI-Task": "title_generation"})
+    out = asyncio.run(
+        compat.chat_completions(
+            body=_body(user="alice", stream=stream),
+            http_request=req,
+            background_tasks=_FakeBackgroundTasks(),
+        )
+    )
+    return calls, out
+
+
+def test_repeated_title_request_served_from_cache(monkeypatch):
+    result = {"assistant_message": "晚安聊天", "usage": {"total_tokens": 30}}
+    calls, first = _aux_call(monkeypatch, result)
+    assert calls == [(False, False)] and first["usage"]["total_tokens"] == 30
+    calls, second = _aux_call(monkeypatch, result)
+    assert calls == []
+    assert second["choices"][0]["message"]["content"] == "晚安聊天"
+    assert second["usage"]["total_tokens"] == 0
+
+
+def test_cached_title_streams_as_one_shot_sse(monkeypatch):
+    _aux_call(monkeypatch, {"assistant_message": "晚安聊天"})
+    calls, resp = _aux_call(monkeypatch, {"assistant_message": "x"}, stream=True)
+
+    async def body():
+        return [c async for c in resp.body_iterator]
+
+    frames = asyncio.run(body())
+    contents = [
+        json.loads(f[len("data: "):])["choices"][0]["delta"].get("content")
+        for f in frames
+        if f.strip() != "data: [DONE]"
+    ]
+    assert calls == [] and "晚安聊天" in contents
+
+
+def test_blocked_aux_response_is_not_cached(monkeypatch):
+    blocked = JSONResponse(status_code=200, content={"message": "blocked"})
+    _aux_call(monkeypatch, blocked)
+    calls, _ = _aux_call(monkeypatch, blocked)
+    assert calls == [(False, False)]
@@ -0,0 +1,111 @@
+"""OpenAI 相容入口的 client 歷史：裁切 / 格式 / Redis 補差異 / 跳過 Supabase"""
+import pytest
+
+from backend import chat_router
+from backend.ai_kernel.kernel import AIKernel
+from backend.ai_kernel.models import KernelRequest
+from backend.client_history import (
+    aresolve_client_history,
+    bound_messages,
+    format_history,
+    reconcile_latest,
+)
+from tests.unit.test_kernel_shadow_and_stream import _deps
+
+
+def test_bound_messages_keeps_last_turns_and_truncates():
+    raw = [
+        ("system", "sys"),
+        ("user", "q1"),
+        ("assistant", "a1"),
+        ("tool", "{}"),
+        ("user", "q2"),
+        ("assistant", "x" * 50),
+        ("user", "q3"),
+        ("assistant", ""),
+    ]
+    out = bound_messages(raw, max_turns=2, max_chars=10)
+    assert [m["role"] for m in out] == ["user", "assistant", "user"]
+    assert out[0]["content"] == "q2"
+    assert out[1]["content"] == "x" * 10 + "…"
+    assert format_history(out).splitlines()[0] == "用戶: q2"
+
+
+def test_reconcile_appends_missing_latest_turn_only():
+    msgs = [{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}]
+    latest = {"user_msg": "q2", "assistant_msg": "a2"}
+    merged = reconcile_latest(msgs, latest, current_message="q3")
+    assert merged[-2:] == [
+        {"role": "user", "content": "q2"},
+        {"role": "assistant", "content": "a2"},
+    ]
+    # 已在 client 歷史中 / regenerate 同一則訊息 → 不補
+    assert reconcile_latest(msgs, {"user_msg": "q1", "assistant_msg": "a1"}) == msgs
+    assert reconcile_latest(msgs, latest, current_message="q2") == msgs
+
+
+class _Redis:
+    def __init__(self, latest=None, fail=False):
+        self.latest, self.fail, self.calls = latest, fail, 0
+
+    async def aload_recent_context(self, conversation_id):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("down")
+        return self.latest
+
+
+@pytest.mark.asyncio
+async def test_resolve_is_fail_open_on_redis_error():
+    msgs = [{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}]
+    redis = _Redis(fail=True)
+    assert await aresolve_client_history("c", msgs, redis) == "用戶: q1\n小宸光: a1"
+    assert redis.calls == 1
+
+
+class _MemorySystem:
+    def __init__(self):
+        self.history_calls = 0
+
+    async def recall_memories(self, *a, **k):
+        return ""
+
+    def get_conversation_history(self, *a, **k):
+        self.history_calls += 1
+        return "用戶: from-db"
+
+
+@pytest.mark.asyncio
+async def test_legacy_context_skips_supabase_history(monkeypatch):
+    ms = _MemorySystem()
+    monkeypatch.setattr(chat_router.redis_interface, "redis", None)
+    req = chat_router.ChatRequest(
+        user_message="q2",
+        conversation_id="c",
+        client_history=[{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}],
+    )
+    _, history, _ = await chat_router._load_chat_context(req, ms, None)
+    assert history == "用戶: q1\n小宸光: a1" and ms.history_calls == 0
+
+    req.client_history = None
+    _, history, _ = await chat_router._load_chat_context(req, ms, None)
+    assert history == "用戶: from-db" and ms.history_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_kernel_sources_use_client_history():
+    deps, _ = _deps()
+
+    def _no_db(*a, **k):
+        raise AssertionError("history() should not be called")
+
+    deps.memory.history = _no_db
+    kernel = AIKernel(deps)
+    sources = await kernel._load_sources(
+        KernelRequest(
+            user_message="q2",
+            conversation_id="c",
+            client_history=[{"role": "user", "content": "q1"}],
+        )
+    )
+    assert sources["conversation_history"] == "用戶: q1"
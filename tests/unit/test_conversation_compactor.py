@@ -0,0 +1,156 @@
+"""對話滾動壓縮：視窗外輪次併入摘要、batch 觸發、「摘要 + 最近 2 輪」在 token 預算內"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import backend.history_router as history
+from backend.ai_kernel.adapters import MemoryAdapter
+from backend.conversation_compactor import acompact, acompacted_history, format_compacted
+from tests.mocks.mock_supabase import MockSupabase
+
+TABLE = "xiaochenguang_memories"
+
+
+def _add(sb, start, n, body=""):
+    for i in range(start, start + n):
+        sb.table(TABLE).rows.append({
+            "conversation_id": "c1", "user_id": "u1", "memory_type": "conversation",
+            "user_message": f"問{i}{body}", "assistant_message": f"答{i}{body}",
+            "created_at": f"2026-01-01T10:{i:02d}:00",
+        })
+
+
+class _Complete:
+    def __init__(self):
+        self.prompts = []
+
+    async def __call__(self, messages):
+        self.prompts.append(messages[-1]["content"])
+        return f"摘要v{len(self.prompts)}", {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+
+def _state(sb):
+    rows = [r for r in sb.table("conversation_rolling_summaries").rows if r["kind"] == "compaction"]
+    return rows[0] if rows else None
+
+
+@pytest.mark.asyncio
+async def test_compacts_turns_outside_recent_window_in_batches():
+    sb, complete = MockSupabase(), _Complete()
+    _add(sb, 0, 5)
+    assert await acompact(sb, TABLE, "c1", "u1", complete=complete) is False  # 短對話不壓縮
+
+    _add(sb, 5, 3)  # 共 8 輪 → 前 6 輪進摘要、最後 2 輪保留原文
+    assert await acompact(sb, TABLE, "c1", "u1", complete=complete) is True
+    assert "問5" in complete.prompts[-1] and "問6" not in complete.prompts[-1]
+    assert _state(sb)["watermark"] == "2026-01-01T10:05:00" and _state(sb)["message_count"] == 6
+
+    _add(sb, 8, 1)  # 視窗外只多 1 輪 < batch(2) → 不呼叫 LLM
+    assert await acompact(sb, TABLE, "c1", "u1", complete=complete) is False
+    _add(sb, 9, 1)
+    assert await acompact(sb, TABLE, "c1", "u1", complete=complete) is True
+    prompt = complete.prompts[-1]
+    assert "摘要v1" in prompt and "問7" in prompt and "問5" not in prompt
+    assert _state(sb)["summary"] == "摘要v2" and _state(sb)["message_count"] == 8
+
+
+@pytest.mark.asyncio
+async def test_history_is_summary_plus_recent_turns_within_budget(monkeypatch):
+    sb, complete = MockSupabase(), _Complete()
+    body = "很長的內容" * 60
+    _add(sb, 0, 8, body)
+    assert await acompacted_history(sb, TABLE, "c1", "u1") is None  # 尚無摘要 → 呼叫端用原文
+
+    await acompact(sb, TABLE, "c1", "u1", complete=complete)
+    _add(sb, 8, 1, body)  # 摘要尚未涵蓋的輪次仍以原文出現
+    monkeypatch.setenv("CONVERSATION_COMPACTION_TOKEN_BUDGET", "400")
+    text = await acompacted_history(sb, TABLE, "c1", "u1")
+    assert text.startswith("【先前對話摘要】\n摘要v1")
+    assert len(text) <= 800 and text.endswith(f"小宸光: 答8{body}")
+
+    # 舊作法：最近 5 輪原文
+    last5 = sb.table(TABLE).rows[-5:]
+    raw = "\n".join(f"用戶: {r['user_message']}\n小宸光: {r['assistant_message']}" for r in last5)
+    assert len(text) * 3 < len(raw)
+
+
+@pytest.mark.asyncio
+async def test_overlong_summary_keeps_newest_tail(monkeypatch):
+    monkeypatch.setenv("CONVERSATION_COMPACTION_MAX_SUMMARY_CHARS", "100")
+    sb = MockSupabase()
+    _add(sb, 0, 8)
+
+    async def complete(messages):
+        return "舊" * 300 + "最新的事實", {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+    assert await acompact(sb, TABLE, "c1", "u1", complete=complete) is True
+    summary = _state(sb)["summary"]
+    assert len(summary) == 200 and summary.endswith("最新的事實")
+
+
+@pytest.mark.asyncio
+async def test_compaction_does_not_resurrect_deleted_conversation(monkeypatch):
+    monkeypatch.setenv("ROLLING_SUMMARY_REDIS", "false")
+    sb = MockSupabase()
+    _add(sb, 0, 8)
+
+    async def complete(messages):
+        # 摘要期間（別的 worker）刪除了這段對話
+        sb.table(TABLE).rows[:] = [r for r in sb.table(TABLE).rows if r["conversation_id"] != "c1"]
+        return "摘要", {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+    assert await acompact(sb, TABLE, "c1", "u1", complete=complete) is False
+    assert _state(sb) is None
+
+
+@pytest.mark.asyncio
+async def test_delete_waits_for_inflight_compaction(monkeypatch):
+    monkeypatch.setenv("ROLLING_SUMMARY_REDIS", "false")
+    sb, order, release = MockSupabase(), [], asyncio.Event()
+    _add(sb, 0, 8)
+    monkeypatch.setattr(history, "_supabase", lambda: sb)
+    monkeypatch.setattr(history, "redis_interface", SimpleNamespace(redis=None))
+
+    async def clear(self, user_id, conversation_id):
+        order.append(f"clear:{self.kind}")
+
+    monkeypatch.setattr(history.RollingSummaryStore, "clear", clear)
+
+    async def complete(messages):
+        await release.wait()
+        order.append("summarized")
+        return "摘要", {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+    compaction = asyncio.create_task(acompact(sb, TABLE, "c1", "u1", complete=complete))
+    await asyncio.sleep(0)
+    deletion = asyncio.create_task(history.delete_conversation("c1", user_id="u1", hard=True))
+    await asyncio.sleep(0.01)
+    assert not deletion.done() and len(sb.table(TABLE).rows) == 8  # 等壓縮寫完才刪
+
+    release.set()
+    assert await compaction is True
+    assert (await deletion).deleted_count == 8
+    assert order == ["summarized", "clear:report", "clear:compaction"]
+    assert not sb.table(TABLE).rows
+
+
+def test_format_trims_old_summary_before_recent_turns():
+    turns = [{"user_message": "近況", "assistant_message": "收到"}]
+    out = format_compacted("舊" * 500 + "新", turns, 150)
+    assert out.endswith("用戶: 近況\n小宸光: 收到")
+    assert "…" in out and "新" in out and len(out) <= 300
+
+
+@pytest.mark.asyncio
+async def test_adapter_falls_back_to_raw_history_without_summary():
+    sb = MockSupabase()
+    _add(sb, 0, 3)
+
+    class MS:
+        supabase, memories_table = sb, TABLE
+
+        def get_conversation_history(self, conversation_id, limit):
+            return f"raw:{limit}"
+
+    assert await MemoryAdapter(MS()).compacted_history("c1", "u1") == "raw:5"
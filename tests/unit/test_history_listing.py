@@ -0,0 +1,97 @@
+"""對話列表：conversation_summaries 投影 + (last_at, conversation_id) keyset 分頁"""
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+import backend.history_router as history
+from tests.mocks.mock_supabase import MockSupabase
+
+ROOT = Path(__file__).resolve().parents[2]
+FWD = ROOT / "supabase" / "migrations" / "20261018_conversation_summaries_forward.sql"
+RBACK = ROOT / "supabase" / "migrations" / "20261018_conversation_summaries_rollback.sql"
+
+
+def _seed(sb, user="u1"):
+    rows = sb.table("xiaochenguang_memories").rows
+    # c0..c4：每段兩輪；c2 / c3 最後時間相同，以 conversation_id 決定順序
+    stamps = {
+        "c0": "2026-01-01T10:00:00",
+        "c1": "2026-01-02T10:00:00",
+        "c2": "2026-01-03T10:00:00",
+        "c3": "2026-01-03T10:00:00",
+        "c4": "2026-01-04T10:00:00",
+    }
+    for cid, last in stamps.items():
+        rows.append({"conversation_id": cid, "user_id": user, "memory_type": "conversation",
+                     "user_message": f"{cid} 開頭", "assistant_message": "嗨",
+                     "created_at": "2025-12-31T00:00:00"})
+        rows.append({"conversation_id": cid, "user_id": user, "memory_type": "conversation",
+                     "user_message": f"{cid} 最新", "assistant_message": "好",
+                     "created_at": last})
+    rows.append({"conversation_id": "other", "user_id": "u2", "memory_type": "conversation",
+                 "user_message": "別人的", "assistant_message": "x", "created_at": "2026-02-01"})
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    sb = MockSupabase()
+    _seed(sb)
+    monkeypatch.setattr(history, "_supabase", lambda: sb)
+    return sb
+
+
+async def _pages(limit):
+    out, cursor = [], None
+    while True:
+        page = await history.list_conversations(user_id="u1", limit=limit, offset=0, cursor=cursor)
+        out.append(page)
+        cursor = page["next_cursor"]
+        if not cursor:
+            return out
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_all_conversations_in_order(sb):
+    pages = await _pages(limit=2)
+    ids = [c["conversation_id"] for p in pages for c in p["conversations"]]
+    assert ids == ["c4", "c3", "c2", "c1", "c0"]
+    assert [len(p["conversations"]) for p in pages] == [2, 2, 1]
+    first = pages[0]["conversations"][0]
+    assert pages[0]["total"] == 5
+    assert first["message_count"] == 2 and first["title"] == "c4 開頭"
+    assert first["preview"] == "c4 最新"
+
+
+@pytest.mark.asyncio
+async def test_fallback_to_row_scan_keeps_same_pages(sb, monkeypatch):
+    def boom(*a, **k):
+        raise RuntimeError("function list_conversation_summaries does not exist")
+
+    monkeypatch.setattr(sb, "rpc", boom)
+    pages = await _pages(limit=2)
+    ids = [c["conversation_id"] for p in pages for c in p["conversations"]]
+    assert ids == ["c4", "c3", "c2", "c1", "c0"]
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_400(sb):
+    with pytest.raises(HTTPException) as exc:
+        await history.list_conversations(user_id="u1", limit=2, offset=0, cursor="!!bad")
+    assert exc.value.status_code == 400
+
+
+def test_migration_has_trigger_keyset_index_and_rollback():
+    text = FWD.read_text(encoding="utf-8")
+    assert "CREATE TABLE IF NOT EXISTS public.conversation_summaries" in text
+    assert "(user_id, last_at DESC, conversation_id DESC)" in text
+    assert "CREATE TRIGGER conversation_summaries_sync" in text
+    # 逐句觸發：每段對話每個 statement 只重算一次，並以 advisory lock 串行化
+    assert "FOR EACH ROW" not in text
+    assert text.count("FOR EACH STATEMENT") == 3
+    assert "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows" in text
+    assert "pg_advisory_xact_lock(hashtext(p_user_id), hashtext(p_conversation_id))" in text
+    assert "(s.last_at, s.conversation_id) < (p_cursor_last_at" in text
+    rb = RBACK.read_text(encoding="utf-8")
+    assert "DROP TABLE IF EXISTS public.conversation_summaries" in rb
+    assert "DROP TRIGGER IF EXISTS conversation_summaries_sync_delete" in rb
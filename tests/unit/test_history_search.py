@@ -0,0 +1,123 @@
+"""歷史搜尋：CJK bigram term、排序、highlight 片段、游標分頁、owner 範圍、本地索引回退"""
+from pathlib import Path
+
+import pytest
+
+import backend.history_router as history
+from backend.history_search import build_snippet, index_terms, prefilter_terms, query_terms
+from tests.mocks.mock_supabase import MockSupabase
+
+ROOT = Path(__file__).resolve().parents[2]
+FWD = ROOT / "supabase" / "migrations" / "20261019_history_search_forward.sql"
+
+
+def test_terms_cjk_bigrams_and_ascii_words():
+    assert index_terms("看星星 OK2") == ["看", "星", "星", "看星", "星星", "ok2"]
+    assert query_terms("星星 hello") == ["星星", "hello"]
+    assert query_terms("光") == ["光"]
+    assert query_terms("！？") == []
+    assert prefilter_terms("星星 hello") == ["星星"]  # 英數不進索引預篩
+
+
+def test_snippet_highlights_are_relative_to_snippet():
+    text = "很久很久以前，" * 5 + "我們一起看星星，聊了整晚"
+    snippet, marks = build_snippet(text, "星星", query_terms("星星"))
+    assert snippet.startswith("…")
+    (s, e), = marks
+    assert snippet[s:e] == "星星"
+
+
+def _seed(sb):
+    rows = sb.table("xiaochenguang_memories").rows
+    data = [
+        (1, "c1", "今天想看星星", "好啊", "2026-01-01T10:00:00"),
+        (2, "c1", "晚安", "星星很美，看星星吧", "2026-01-02T10:00:00"),
+        (3, "c2", "明天天氣", "晴天適合看星星", "2026-01-03T10:00:00"),
+        (4, "c2", "星期一要上班", "加油", "2026-01-04T10:00:00"),
+        (5, "c3", "我們去看星星好嗎？星星", "好", "2026-01-05T10:00:00"),
+    ]
+    for i, cid, um, am, ts in data:
+        rows.append({"id": i, "conversation_id": cid, "user_id": "u1", "memory_type": "conversation",
+                     "user_message": um, "assistant_message": am, "created_at": ts})
+    rows.append({"id": 99, "conversation_id": "x", "user_id": "u2", "memory_type": "conversation",
+                 "user_message": "別人的星星", "assistant_message": "", "created_at": "2026-02-01"})
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    sb = MockSupabase()
+    _seed(sb)
+    monkeypatch.setattr(history, "_supabase", lambda: sb)
+    return sb
+
+
+async def _all_pages(q, limit=2):
+    out, cursor = [], None
+    while True:
+        page = await history.search_history(user_id="u1", q=q, limit=limit, cursor=cursor)
+        out.extend(page["hits"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return out
+
+
+@pytest.mark.asyncio
+async def test_ranked_single_query_across_both_fields(sb):
+    hits = await _all_pages("星星")
+    ids = [h["created_at"] for h in hits]
+    assert len(hits) == 4 and len(set(ids)) == 4  # 不含「星期」、不含他人資料
+    assert hits[0]["conversation_id"] == "c3"  # user_message 命中兩次 → 最高分
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+    by_conv = {h["created_at"]: h for h in hits}
+    assert by_conv["2026-01-03T10:00:00"]["matched_field"] == "assistant_message"
+    top = hits[0]
+    s, e = top["highlights"][0]
+    assert top["snippet"][s:e] == "星星"
+
+
+@pytest.mark.asyncio
+async def test_local_index_fallback_matches_rpc_order(sb, monkeypatch):
+    rpc_hits = await _all_pages("星星")
+
+    def boom(*a, **k):
+        raise RuntimeError("function search_conversation_memories does not exist")
+
+    monkeypatch.setattr(sb, "rpc", boom)
+    local_hits = await _all_pages("星星")
+    assert [h["created_at"] for h in local_hits] == [h["created_at"] for h in rpc_hits]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rpc", [True, False])
+@pytest.mark.parametrize("q", ["ython", "thon", "WORLD", "1019", "星星py"])
+async def test_ascii_query_matches_mid_word_substrings(sb, monkeypatch, rpc, q):
+    sb.table("xiaochenguang_memories").rows.append({
+        "id": 6, "conversation_id": "c4", "user_id": "u1", "memory_type": "conversation",
+        "user_message": "看星星python", "assistant_message": "helloworld 10192",
+        "created_at": "2026-01-06T10:00:00",
+    })
+    if not rpc:
+        monkeypatch.setenv("HISTORY_SEARCH_RPC_ENABLED", "false")
+    hits = await _all_pages(q)
+    assert [h["conversation_id"] for h in hits] == ["c4"]
+    s, e = hits[0]["highlights"][0]
+    assert hits[0]["snippet"][s:e].lower() == q.lower()
+
+
+@pytest.mark.asyncio
+async def test_punctuation_query_uses_substring_match(sb):
+    page = await history.search_history(user_id="u1", q="？", limit=5, cursor=None)
+    assert [h["conversation_id"] for h in page["hits"]] == ["c3"]
+    page = await history.search_history(user_id="u1", q="？？", limit=5, cursor=None)
+    assert page["hits"] == [] and page["next_cursor"] is None
+
+
+def test_migration_indexes_owner_scoped_bigram_vector():
+    text = FWD.read_text(encoding="utf-8")
+    assert "array_to_tsvector(public.history_search_terms(user_message)), 'A'" in text
+    assert "USING GIN (user_id, search_tsv)" in text
+    assert "AND m.user_id = p_user_id" in text
+    # 英數不產生 lexeme；命中一律以 strpos 複查兩個欄位
+    assert "tok ~ '^[a-z0-9]+$' THEN\n      CONTINUE;" in text
+    assert "(q.tsq IS NULL OR m.search_tsv @@ q.tsq)" in text
+    assert "strpos(lower(COALESCE(m.assistant_message, '')), q.needle) > 0" in text
@@ -0,0 +1,119 @@
+"""/history/summarize：watermark 增量摘要、rolling update、map-reduce、無變化直接回快取"""
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import backend.history_router as history
+from backend.rolling_summary import chunk_turns, rolling_summarize
+from tests.mocks.mock_supabase import MockSupabase
+
+ROOT = Path(__file__).resolve().parents[2]
+FWD = ROOT / "supabase" / "migrations" / "20261021_rolling_summaries_forward.sql"
+
+
+class _Client:
+    """假 OpenAI：記錄每次 prompt，回傳固定格式文字。"""
+
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kw):
+        prompt = kw["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        text = "重點#%d" % len(self.prompts) if "條列重點" in prompt else "摘要#%d" % len(self.prompts)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+
+def _add_turns(sb, start, n, cid="c1", user="u1"):
+    rows = sb.table("xiaochenguang_memories").rows
+    for i in range(start, start + n):
+        rows.append({"conversation_id": cid, "user_id": user, "memory_type": "conversation",
+                     "user_message": f"第{i}輪問題", "assistant_message": f"第{i}輪回答",
+                     "created_at": f"2026-01-01T10:{i:02d}:00"})
+
+
+@pytest.fixture
+def env(monkeypatch):
+    sb = MockSupabase()
+    client = _Client()
+    monkeypatch.setattr(history, "_supabase", lambda: sb)
+    monkeypatch.setattr(history, "get_openai_client", lambda: client)
+    monkeypatch.setenv("ROLLING_SUMMARY_REDIS", "false")
+    return sb, client
+
+
+def _req(**kw):
+    return history.SummarizeRequest(conversation_id="c1", user_id="u1", **kw)
+
+
+def test_chunk_turns_respects_turn_and_char_limits():
+    turns = ["a" * 10] * 5
+    assert [c.count("a" * 10) for c in chunk_turns(turns, 2, 1000)] == [2, 2, 1]
+    assert len(chunk_turns(turns, 10, 25)) == 3
+    assert chunk_turns(["x" * 50], 5, 20) == ["x" * 20]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_keeps_transcript_end():
+    seen = []
+
+    async def complete(messages):
+        seen.append(messages[-1]["content"])
+        return f"n{len(seen)}", {"total_tokens": 1}
+
+    turns = [f"turn-{i}" + "字" * 30 for i in range(12)]
+    summary, usage, calls = await rolling_summarize(
+        complete, turns, prior="",
+        final_messages=lambda prior, m: [{"role": "user", "content": "FINAL " + m}],
+        note_messages=lambda t: [{"role": "user", "content": "NOTE " + t}],
+        max_turns=3, max_chars=200,
+    )
+    notes = [p for p in seen if p.startswith("NOTE")]
+    assert len(notes) == 4 and any("turn-11" in p for p in notes)  # 結尾不被截掉
+    assert seen[-1].startswith("FINAL") and calls == 5 and usage["total_tokens"] == 5
+
+
+@pytest.mark.asyncio
+async def test_incremental_summary_and_cached_fast_path(env):
+    sb, client = env
+    _add_turns(sb, 0, 4)
+
+    first = await history.summarize_conversation(_req())
+    assert first["cached"] is False and first["message_count"] == 4 and first["llm_calls"] == 1
+    assert "第3輪回答" in client.prompts[-1]
+
+    again = await history.summarize_conversation(_req())
+    assert again["cached"] is True and again["summary"] == first["summary"]
+    assert len(client.prompts) == 1  # 無新輪次 → 不呼叫 LLM
+
+    _add_turns(sb, 4, 2)
+    upd = await history.summarize_conversation(_req())
+    prompt = client.prompts[-1]
+    assert upd["new_messages"] == 2 and upd["message_count"] == 6
+    assert first["summary"] in prompt and "第5輪問題" in prompt and "第0輪問題" not in prompt
+    assert upd["watermark"] == "2026-01-01T10:05:00"
+
+    memo = [r for r in sb.table("xiaochenguang_memories").rows if r["memory_type"] == "conversation_summary"]
+    assert len(memo) == 1 and memo[0]["assistant_message"] == upd["summary"]
+    state = sb.table("conversation_rolling_summaries").rows
+    assert len(state) == 1 and state[0]["kind"] == "report" and state[0]["message_count"] == 6
+
+
+@pytest.mark.asyncio
+async def test_long_first_summary_uses_map_reduce(env, monkeypatch):
+    sb, client = env
+    _add_turns(sb, 0, 12)
+    out = await history.summarize_conversation(_req(max_messages=5))
+    notes = [p for p in client.prompts if "條列重點" in p]
+    assert len(notes) == 3 and out["llm_calls"] == 4
+    assert "重點#" in client.prompts[-1] and out["message_count"] == 12
+
+
+def test_migration_keys_summary_per_conversation_and_kind():
+    text = FWD.read_text(encoding="utf-8")
+    assert "PRIMARY KEY (user_id, conversation_id, kind)" in text
+    assert "watermark TIMESTAMPTZ" in text
+    assert "TO service_role" in text
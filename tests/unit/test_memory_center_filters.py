@@ -0,0 +1,150 @@
+"""記憶中心：memory_center_page 索引篩選、(created_at, id) keyset 游標、有上限的筆數估計"""
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+import backend.memory_router as mem
+from backend.history_search import encode_cursor
+from tests.mocks.mock_supabase import MockSupabase
+
+ROOT = Path(__file__).resolve().parents[2]
+FWD = ROOT / "supabase" / "migrations" / "20261020_memory_center_filters_forward.sql"
+RBACK = ROOT / "supabase" / "migrations" / "20261020_memory_center_filters_rollback.sql"
+
+AI = "xiaochenguang_v1"
+
+
+def _seed(sb):
+    rows = sb.table("xiaochenguang_memories").rows
+    for i in range(1, 8):
+        rows.append({
+            "id": i, "user_id": "u1", "ai_id": AI,
+            "memory_type": "preference" if i % 2 else "conversation",
+            "created_at": f"2026-08-0{i}T10:00:00+00:00" if i != 7 else "2026-08-06T10:00:00+00:00",
+            "conversation_id": "c1", "user_message": f"第{i}則：喜歡看海" if i in (2, 3, 6) else f"第{i}則",
+            "assistant_message": "好", "importance_score": i / 10, "access_count": 0,
+        })
+    rows.append({"id": 50, "user_id": "u2", "ai_id": AI, "memory_type": "conversation",
+                 "created_at": "2026-08-09T00:00:00+00:00", "user_message": "別人的海",
+                 "assistant_message": "", "importance_score": 0.9})
+    rows.append({"id": 51, "user_id": "u1", "ai_id": "other_ai", "memory_type": "conversation",
+                 "created_at": "2026-08-09T00:00:00+00:00", "user_message": "其他 AI 的海",
+                 "assistant_message": "", "importance_score": 0.9})
+
+
+@pytest.fixture
+def sb(monkeypatch):
+    sb = MockSupabase()
+    _seed(sb)
+    monkeypatch.setattr(mem, "supabase", sb)
+    monkeypatch.setenv("AI_ID", AI)
+    return sb
+
+
+async def _call(**kw):
+    args = dict(principal="u1", memory_type=None, created_from=None, created_to=None, q=None,
+                min_importance=None, limit=20, offset=0, cursor=None)
+    args.update(kw)
+    return await mem.memory_center(**args)
+
+
+async def _all_pages(limit=2, **kw):
+    pages, cursor = [], None
+    while True:
+        page = await _call(limit=limit, cursor=cursor, **kw)
+        pages.append(page)
+        cursor = page.next_cursor
+        if not cursor:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_are_owner_scoped_and_tie_stable(sb):
+    pages = await _all_pages(limit=2)
+    ids = [it.id for p in pages for it in p.items]
+    assert ids == [7, 6, 5, 4, 3, 2, 1]  # 6 / 7 同時間 → 以 id 決定順序
+    assert pages[0].total_estimate == 7 and pages[0].total_exact is True
+    assert all(p.total_estimate is None for p in pages[1:])
+    assert pages[0].search_scope is None
+
+
+@pytest.mark.asyncio
+async def test_filters_combine_in_single_query(sb):
+    pages = await _all_pages(limit=1, memory_type="conversation", q="看海", min_importance=0.3,
+                             created_from="2026-08-02")
+    assert [it.id for p in pages for it in p.items] == [6]
+    assert pages[0].total_estimate == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("q", ["ython", "1019", "world", "PYTHON 1", "喜歡py"])
+async def test_ascii_query_matches_mid_word_substrings(sb, q):
+    sb.table("xiaochenguang_memories").rows.append({
+        "id": 60, "user_id": "u1", "ai_id": AI, "memory_type": "conversation",
+        "created_at": "2026-08-10T00:00:00+00:00", "user_message": "我喜歡python 10192 helloworld",
+        "assistant_message": "", "importance_score": 0.5,
+    })
+    page = await _call(q=q)
+    assert [it.id for it in page.items] == [60]
+
+
+@pytest.mark.asyncio
+async def test_count_estimate_is_capped(sb, monkeypatch):
+    monkeypatch.setenv("MEMORY_CENTER_COUNT_CAP", "3")
+    page = await _call(limit=2)
+    assert page.total_estimate == 3 and page.total_exact is False
+
+
+@pytest.mark.asyncio
+async def test_rpc_unavailable_falls_back_to_table_query(sb, monkeypatch):
+    calls = []
+
+    def boom(*a, **k):
+        calls.append(a)
+        raise RuntimeError("function memory_center_page does not exist")
+
+    class _Table:
+        def __init__(self):
+            self.filters = []
+
+        def __getattr__(self, name):
+            def chain(*a, **k):
+                self.filters.append((name, a))
+                return self
+            return chain
+
+        def execute(self):
+            return type("R", (), {"data": [{"id": 9, "created_at": "2026-08-01T00:00:00+00:00"}]})()
+
+    table = _Table()
+    monkeypatch.setattr(sb, "rpc", boom)
+    monkeypatch.setattr(sb, "table", lambda name: table)
+    page = await _call(limit=1, min_importance=0.5)
+    assert calls and [it.id for it in page.items] == [9]
+    assert ("gte", ("importance_score", 0.5)) in table.filters
+    assert page.next_cursor == encode_cursor("2026-08-01T00:00:00+00:00", 9)
+    assert page.total_estimate is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("bad", ["!!bad", encode_cursor("2026-08-01,id.gt.0", 1), encode_cursor("x", "1")])
+async def test_invalid_cursor_is_422(sb, bad):
+    with pytest.raises(HTTPException) as exc:
+        await _call(cursor=bad)
+    assert exc.value.status_code == 422
+
+
+def test_migration_indexes_and_owner_required_rpc():
+    text = FWD.read_text(encoding="utf-8")
+    assert "(user_id, ai_id, created_at DESC, id DESC)" in text
+    assert "(user_id, ai_id, memory_type, created_at DESC, id DESC)" in text
+    assert "p_ai_id IS NULL OR btrim(p_ai_id) = ''" in text
+    assert "(m.created_at, m.id) < ($10, $11)" in text
+    assert "LIMIT $9) c" in text
+    assert "TO service_role" in text
+    # 英數不產生 tsquery term（整詞 / 前綴 lexeme 都會漏掉字中子字串）
+    assert ":*" not in text
+    assert "tok ~ '^[a-z0-9]+$' THEN\n      CONTINUE;" in text
+    rb = RBACK.read_text(encoding="utf-8")
+    assert "DROP FUNCTION IF EXISTS public.memory_center_page" in rb
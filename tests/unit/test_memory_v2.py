@@ -1,6 +1,7 @@
 """Memory System V2 — unit tests (classifier, graph, manager, retrieval, night growth)."""
 from __future__ import annotations
 
+import json
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -436,8 +437,11 @@ def test_graph_redis_and_file_paths(tmp_path):
     )
     edges = g.list_edges()
     assert edges
-    g.add_edge("x", "y", "updates")
-    redis_if.redis.set.assert_called()
+    e = g.add_edge("x", "y", "updates")
+    # per-edge hash field, not a monolithic JSON string
+    redis_if.redis.hset.assert_called()
+    assert list(redis_if.redis.hset.call_args.kwargs["mapping"]) == [e["id"]]
+    redis_if.redis.set.assert_not_called()
     # corrupt file load
     bad = tmp_path / "bad.json"
     bad.write_text("{not json", encoding="utf-8")
@@ -559,10 +563,36 @@ async def test_night_growth_attention_and_graph_fail(v1_ms, tmp_path):
         raise RuntimeError("edge fail")
 
     g.add_edge = boom
+    g.add_edges = boom
     rep = await ng.run_once(user_id="u1", recent_turns=turns, dry_run=False)
     assert rep["steps"]["attention_update"]["status"] == "ok"
 
 
+@pytest.mark.asyncio
+async def test_night_growth_archived_memory_has_no_live_edges(v1_ms, tmp_path):
+    from backend.modules.decision_engine import GrowthDecision
+    from backend.modules.identity_engine import IdentityEngine
+    from backend.modules.night_growth_safety import NightGrowthExecutionStore
+
+    g = GraphManager(user_id="u1", storage_path=str(tmp_path / "nga.json"))
+    mgr = MemoryManager(v1_ms, graph=g)
+    ng = NightGrowth(
+        mgr,
+        identity_engine=IdentityEngine(user_id="u1", base_dir=str(tmp_path / "id3")),
+        execution_store=NightGrowthExecutionStore(base_dir=str(tmp_path / "ng_store3")),
+    )
+    ng.decisions.decide = lambda **kw: GrowthDecision(
+        save=True, update_attention=True, archive=True
+    )
+    turns = [{"user_message": "今天天氣還可以", "assistant_message": "嗯嗯"}]
+    rep = await ng.run_once(user_id="u1", recent_turns=turns, dry_run=False)
+    assert rep["steps"]["graph_update"]["edges"] == 1
+    assert len(rep["archived_ids"]) == 1
+    archived = str(rep["archived_ids"][0])
+    assert g.get_neighbors(archived) == []
+    assert len(g.list_edges(include_archived=True)) == 1
+
+
 @pytest.mark.asyncio
 async def test_night_growth_load_fail():
     v1 = MagicMock()
@@ -615,6 +645,154 @@ def test_graph_apply_invalid_relation_skipped(graph):
     assert len(created) == 1
 
 
+def test_graph_append_only_log_replay(tmp_path):
+    path = tmp_path / "al.json"
+    g = GraphManager(user_id="u1", storage_path=str(path))
+    e1 = g.add_edge("m1", "m2", "supports")
+    g.add_edge("m2", "m3", "causes")
+    g.archive_edges_for_memory("m3")
+    log = g.log_dir / "u1.jsonl"
+    ops = [json.loads(line)["op"] for line in log.read_text(encoding="utf-8").splitlines()]
+    assert ops == ["add", "add", "archive"]
+    # legacy monolithic file is no longer rewritten
+    assert not path.exists()
+    fresh = GraphManager(user_id="u1", storage_path=str(path))
+    assert [e["id"] for e in fresh.list_edges()] == [e1["id"]]
+    assert len(fresh.list_edges(include_archived=True)) == 2
+
+
+def test_graph_concurrent_writers_keep_both_edges(tmp_path):
+    path = str(tmp_path / "cw.json")
+    a = GraphManager(user_id="u1", storage_path=path)
+    b = GraphManager(user_id="u1", storage_path=path)
+    a.list_edges()
+    b.list_edges()
+    a.add_edge("m1", "m2", "supports")
+    b.add_edge("m3", "m4", "supports")
+    # b saw a's append before writing; duplicates across writers are suppressed
+    assert b.add_edge("m1", "m2", "supports")["source_memory_id"] == "m1"
+    assert len(b.list_edges()) == 2
+    assert len(GraphManager(user_id="u1", storage_path=path).list_edges()) == 2
+
+
+def test_graph_partial_trailing_line_not_glued_to_next_op(tmp_path):
+    path = str(tmp_path / "pt.json")
+    g = GraphManager(user_id="u1", storage_path=path)
+    e1 = g.add_edge("m1", "m2", "supports")
+    log = g.log_dir / "u1.jsonl"
+    # writer crashed mid-line
+    with log.open("ab") as fh:
+        fh.write(b'{"op":"add","edge":{"source_memory_id":"x"')
+    fresh = GraphManager(user_id="u1", storage_path=path)
+    e2 = fresh.add_edge("m3", "m4", "supports")
+    lines = log.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["op"] for line in lines] == ["add", "add"]
+    replay = GraphManager(user_id="u1", storage_path=path)
+    assert [e["id"] for e in replay.list_edges()] == [e1["id"], e2["id"]]
+
+
+def test_graph_compaction_atomic_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEMORY_GRAPH_COMPACT_MIN_OPS", "10")
+    g = GraphManager(user_id="u1", storage_path=str(tmp_path / "cp.json"))
+    for i in range(8):
+        g.add_edge(f"m{i}", f"n{i}", "supports")
+    for i in range(6):
+        g.remove_edges_for_memory(f"m{i}")
+    log = g.log_dir / "u1.jsonl"
+    # threshold compaction ran mid-way: fewer lines than the 14 ops issued
+    assert len(log.read_text(encoding="utf-8").splitlines()) < 14
+    g.compact()
+    assert len(log.read_text(encoding="utf-8").splitlines()) == 2
+    assert not list(g.log_dir.glob("*.tmp"))
+    fresh = GraphManager(user_id="u1", storage_path=str(tmp_path / "cp.json"))
+    assert sorted(e["source_memory_id"] for e in fresh.list_edges()) == ["m6", "m7"]
+
+
+def test_graph_legacy_file_migrates_and_user_switch(tmp_path):
+    path = tmp_path / "lg.json"
+    path.write_text(
+        '{"u1": [{"id":"e1","source_id":"a","target_id":"b","relation":"supports"}],'
+        ' "u2": [{"id":"e2","source_id":"c","target_id":"d","relation":"causes"}]}',
+        encoding="utf-8",
+    )
+    g = GraphManager(user_id="u1", storage_path=str(path))
+    assert [e["id"] for e in g.list_edges()] == ["e1"]
+    assert (g.log_dir / "u1.jsonl").exists()
+    g.user_id = "u2"
+    assert [e["id"] for e in g.list_edges()] == ["e2"]
+
+
+def test_graph_redis_edge_hash_roundtrip(tmp_path):
+    from backend.redis_interface import RedisInterface
+    from backend.redis_mock import RedisMock
+
+    mock = RedisMock()
+    mock.flushall()
+    iface = RedisInterface(redis_client=mock)
+    g = GraphManager(redis_interface=iface, user_id="ur", storage_path=str(tmp_path / "a.json"))
+    e = g.add_edge("m1", "m2", "supports")
+    g.add_edge("m2", "m3", "causes")
+    g.remove_edges_for_memory("m3")
+    assert list(mock.hgetall("memory_graph:ur:edge_map")) == [e["id"]]
+    # no local log (fresh volume) → rebuilt from the Redis hash
+    other = GraphManager(redis_interface=iface, user_id="ur", storage_path=str(tmp_path / "b.json"))
+    assert [x["id"] for x in other.list_edges()] == [e["id"]]
+    mock.flushall()
+
+
+def test_graph_add_edges_batch_single_persist(tmp_path):
+    redis_if = MagicMock()
+    redis_if.redis = MagicMock()
+    redis_if.redis.hgetall.return_value = {}
+    redis_if.redis.get.return_value = None
+    g = GraphManager(redis_interface=redis_if, user_id="u1", storage_path=str(tmp_path / "b.json"))
+    first = g.add_edge("m1", "m2", "supports")
+    redis_if.redis.hset.reset_mock()
+    out = g.add_edges(
+        [
+            {"source_memory_id": "m1", "target_memory_id": "m2", "relation": "supports"},
+            {"source_id": "m2", "target_id": "m3", "relation": "causes", "confidence": 0.9},
+            {"source_memory_id": "m2", "target_memory_id": "m3", "relation": "causes"},
+        ]
+    )
+    assert out[0]["id"] == first["id"]
+    assert out[1]["id"] == out[2]["id"]
+    assert out[1]["confidence"] == 0.9
+    assert redis_if.redis.hset.call_count == 1
+    assert len(g.list_edges()) == 2
+    # all-or-nothing validation unless skip_invalid
+    with pytest.raises(ValueError):
+        g.add_edges(
+            [
+                {"source_memory_id": "m4", "target_memory_id": "m5", "relation": "supports"},
+                {"source_memory_id": "m4", "target_memory_id": "m5", "relation": "bogus"},
+            ]
+        )
+    assert len(g.list_edges()) == 2
+    kept = g.add_edges(
+        [
+            {"source_memory_id": "m4", "target_memory_id": "m5", "relation": "supports"},
+            {"source_memory_id": "reflection", "target_memory_id": "m5", "relation": "supports"},
+        ],
+        skip_invalid=True,
+    )
+    assert [e["source_memory_id"] for e in kept] == ["m4"]
+    assert g.add_edges([]) == []
+
+
+def test_graph_apply_classification_persists_once(graph):
+    calls = []
+    original = graph._commit
+    graph._commit = lambda fh, ops, **kw: (calls.append(len(ops)), original(fh, ops, **kw))
+    created = graph.apply_classification_relations(
+        "m1",
+        [{"relation": "causes"}, {"relation": "supports"}, {"relation": "updates"}],
+        related_memory_ids=["m1", "m2", "m3"],
+    )
+    assert len(created) == 6
+    assert calls == [6]
+
+
 @pytest.mark.asyncio
 async def test_legacy_recall_falls_back_items(v1_ms, tmp_path):
     mgr = MemoryManager(
@@ -321,6 +321,54 @@ def test_graph_integrity_and_no_orphan_on_archive(tmp_path):
     assert rep2["total_edges"] == 0
 
 
+def test_graph_integrity_engine_counts_and_bounded_samples(tmp_path):
+    from backend.modules.graph_integrity import GraphIntegrityChecker
+
+    g = GraphManager(user_id="u-gi", storage_path=str(tmp_path / "gi.json"))
+    log = g.log_dir / "u-gi.jsonl"
+    log.parent.mkdir(parents=True)
+    bad = [
+        {"id": f"b{i}", "source_memory_id": "reflection", "target_memory_id": str(i), "relation": "supports"}
+        for i in range(5)
+    ] + [
+        {"id": "r1", "source_memory_id": "1", "target_memory_id": "2", "relation": "bogus"},
+        {"id": "d1", "source_memory_id": "1", "target_memory_id": "2", "relation": "supports"},
+        {"id": "d2", "source_memory_id": "1", "target_memory_id": "2", "relation": "supports"},
+    ]
+    log.write_text(
+        "".join(json.dumps({"op": "add", "edge": e}) + "\n" for e in bad), encoding="utf-8"
+    )
+    rep = GraphIntegrityChecker(g, sample_limit=2).run(commit_watermark=False)
+    assert rep["total_edges"] == 8
+    assert rep["invalid_node_count"] == 5 and len(rep["invalid_nodes"]) == 2
+    assert rep["invalid_relation_count"] == 1
+    assert rep["duplicate_edges"] == [{"key": "1|2|supports", "count": 2}]
+    assert rep["ok"] is False
+
+
+def test_graph_integrity_keyset_pages_and_incremental(tmp_path):
+    from backend.modules.graph_integrity import GraphIntegrityChecker, supabase_memory_id_pager
+
+    sb = MockSupabase()
+    for i in range(1, 8):
+        sb.table("mem").insert({"id": i * 10, "user_id": "u-gp"}).execute()
+    sb.table("mem").insert({"id": 999, "user_id": "other"}).execute()
+    g = GraphManager(user_id="u-gp", storage_path=str(tmp_path / "gp.json"))
+    g.add_edge("10", "20", "supports")
+    pager = supabase_memory_id_pager(sb, "mem", "u-gp")
+    checker = GraphIntegrityChecker(g, page_size=2)
+    first = checker.run(id_pager=pager)
+    # every endpoint found on the first page → no further pages
+    assert first["missing_memory_id_count"] == 0 and first["id_pages_fetched"] == 1
+    g.add_edge("50", "999", "causes")
+    inc = checker.run(id_pager=pager, incremental=True)
+    assert inc["mode"] == "incremental" and inc["edges_checked"] == 1
+    assert inc["missing_memory_ids"] == ["999"]
+    assert inc["id_pages_fetched"] == 4
+    # watermark advanced: nothing new to check
+    assert checker.run(id_pager=pager, incremental=True)["edges_checked"] == 0
+
+
 # ---------------------------------------------------------------------------
 # Task C — Retrieval ranking + isolation
 # ---------------------------------------------------------------------------
@@ -146,6 +146,94 @@ def test_graph_requires_memory_ids(tmp_path):
     assert len(created2) >= 1
 
 
+def test_graph_proximity_two_hop_and_incremental(tmp_path):
+    g = GraphManager(user_id="u", storage_path=str(tmp_path / "p.json"))
+    g.add_edge("a", "b", "supports", confidence=0.8)
+    g.add_edge("b", "c", "causes", confidence=0.6)
+    rel = {r["memory_id"]: r for r in g.related_for_seeds(["a"])}
+    assert rel["b"]["hops"] == 1 and rel["b"]["score"] == pytest.approx(0.8)
+    assert rel["c"]["hops"] == 2 and rel["c"]["score"] == pytest.approx(0.24)
+    assert rel["c"]["relation"] == "supports"
+    # incremental: table already built, new edge patched into neighbours' rows
+    g.add_edge("c", "d", "supports", confidence=1.0)
+    assert "d" in {r["memory_id"] for r in g.related_for_seeds(["b"])}
+    g.remove_edges_for_memory("c")
+    assert {r["memory_id"] for r in g.related_for_seeds(["a"])} == {"b"}
+    assert g.build_proximity() == {"nodes": 2, "entries": 2}
+
+
+def test_graph_proximity_noisy_or_across_seeds(tmp_path):
+    g = GraphManager(user_id="u", storage_path=str(tmp_path / "p2.json"))
+    g.add_edges(
+        [
+            {"source_memory_id": "s1", "target_memory_id": "x", "relation": "supports", "confidence": 0.5},
+            {"source_memory_id": "s2", "target_memory_id": "x", "relation": "supports", "confidence": 0.5},
+            {"source_memory_id": "s1", "target_memory_id": "y", "relation": "supports", "confidence": 0.6},
+        ]
+    )
+    out = g.related_for_seeds(["s1", "s2"])
+    assert out[0]["memory_id"] == "x" and out[0]["score"] == pytest.approx(0.75)
+    assert "s2" not in {r["memory_id"] for r in out}
+    linked = g.related_for_seeds(["s1", "x"], exclude_seeds=False)
+    assert "x" in {r["memory_id"] for r in linked}
+
+
+@pytest.mark.asyncio
+async def test_retrieval_graph_uses_proximity_lookup(v1_ms, tmp_path):
+    emb = v1_ms.openai_client.embeddings.create(model="text-embedding-3-small", input="茶")
+    v1_ms.supabase.table("xiaochenguang_memories").insert(
+        {
+            "id": "p1",
+            "user_message": "我喜歡綠茶",
+            "assistant_message": "ok",
+            "memory_type": "semantic",
+            "user_id": "u1",
+            "embedding": emb.data[0].embedding,
+            "importance_score": 0.8,
+        }
+    ).execute()
+    v1_ms.supabase.table("xiaochenguang_memories").insert(
+        {"id": "p3", "user_message": "二跳關聯：烏龍茶", "assistant_message": "ok",
+         "memory_type": "episodic", "user_id": "u1", "importance_score": 0.6}
+    ).execute()
+    g = GraphManager(user_id="u1", storage_path=str(tmp_path / "rp.json"))
+    g.add_edge("p1", "p2", "supports", confidence=0.9)
+    g.add_edge("p2", "p3", "supports", confidence=0.9)
+    g.get_neighbors = MagicMock(side_effect=AssertionError("per-seed scan"))
+    eng = RetrievalEngine(v1_ms, graph_manager=g)
+    out = await eng.retrieve(
+        "綠茶", conversation_id="c", user_id="u1",
+        memory_types=["semantic"], include_v1_conversation=False,
+    )
+    assert any(e.get("hops") == 2 for e in out["graph_edges"])
+    assert any(it.get("id") == "p3" and it.get("via_graph") for it in out["items"])
+
+
+@pytest.mark.asyncio
+async def test_retrieval_graph_proximity_failure_falls_back_to_neighbors(v1_ms, tmp_path):
+    emb = v1_ms.openai_client.embeddings.create(model="text-embedding-3-small", input="茶")
+    v1_ms.supabase.table("xiaochenguang_memories").insert(
+        {
+            "id": "f1",
+            "user_message": "我喜歡綠茶",
+            "assistant_message": "ok",
+            "memory_type": "semantic",
+            "user_id": "u1",
+            "embedding": emb.data[0].embedding,
+            "importance_score": 0.8,
+        }
+    ).execute()
+    g = GraphManager(user_id="u1", storage_path=str(tmp_path / "rf.json"))
+    g.add_edge("f1", "f2", "supports", confidence=0.9)
+    g.related_for_seeds = MagicMock(side_effect=RuntimeError("proximity down"))
+    eng = RetrievalEngine(v1_ms, graph_manager=g)
+    out = await eng.retrieve(
+        "綠茶", conversation_id="c", user_id="u1",
+        memory_types=["semantic"], include_v1_conversation=False,
+    )
+    assert any(e.get("target_memory_id") == "f2" for e in out["graph_edges"])
+
+
 @pytest.mark.asyncio
 async def test_retrieval_embedding_path(v1_ms, tmp_path):
     # seed typed row with embedding from fake client
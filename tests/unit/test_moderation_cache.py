@@ -0,0 +1,138 @@
+"""審核判定快取 + 審核與讀取並行（Kernel）"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend import moderation
+from backend.ai_kernel.errors import ModerationBlockedError
+from backend.ai_kernel.kernel import AIKernel
+from backend.ai_kernel.feature_flags import KernelFlags
+from backend.ai_kernel.models import KernelRequest
+from tests.unit.test_ai_kernel_run import Mem, _deps
+
+
+class CountingClient:
+    def __init__(self, categories=None, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.categories = categories or {}
+        self.moderations = SimpleNamespace(create=self._create)
+
+    def _create(self, model, input):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("boom")
+        item = SimpleNamespace(
+            flagged=any(self.categories.values()),
+            categories=dict(self.categories),
+            category_scores={k: 0.9 if v else 0.0 for k, v in self.categories.items()},
+        )
+        return SimpleNamespace(results=[item])
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch):
+    monkeypatch.setenv("MODERATION_ENABLED", "true")
+    monkeypatch.setenv("MODERATION_CACHE_REDIS", "false")
+    monkeypatch.delenv("MODERATION_BLOCK_CATEGORIES", raising=False)
+    moderation.clear_verdict_cache()
+    yield
+    moderation.clear_verdict_cache()
+
+
+@pytest.mark.asyncio
+async def test_repeated_short_message_hits_cache():
+    client = CountingClient()
+    first = await moderation.moderate_text("嗯", client=client)
+    second = await moderation.moderate_text("  嗯 ", client=client)
+    assert client.calls == 1
+    assert first["blocked"] is False and "cached" not in first
+    assert second["cached"] is True
+    assert moderation.verdict_cache_stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    client = CountingClient(fail=True)
+    await moderation.moderate_text("好", client=client)
+    await moderation.moderate_text("好", client=client)
+    assert client.calls == 2
+    assert moderation.verdict_cache_stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_blocked_recomputed_from_current_categories(monkeypatch):
+    client = CountingClient(categories={"violence": True})
+    assert (await moderation.moderate_text("x", client=client))["blocked"] is True
+    monkeypatch.setenv("MODERATION_BLOCK_CATEGORIES", "hate")
+    again = await moderation.moderate_text("x", client=client)
+    assert again["cached"] is True and again["blocked"] is False
+    assert client.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_is_bounded(monkeypatch):
+    monkeypatch.setenv("MODERATION_CACHE_SIZE", "2")
+    client = CountingClient()
+    for text in ("a", "b", "c"):
+        await moderation.moderate_text(text, client=client)
+    assert moderation.verdict_cache_stats()["size"] == 2
+    await moderation.moderate_text("a", client=client)
+    assert client.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_shared_across_processes(monkeypatch):
+    store = {}
+
+    class FakeRI:
+        redis = True
+
+        async def acall(self, command, *args):
+            if command == "get":
+                return store.get(args[0])
+            store[args[0]] = args[2]
+
+    monkeypatch.setenv("MODERATION_CACHE_REDIS", "true")
+    monkeypatch.setattr(moderation, "_shared_redis", lambda: FakeRI())
+    client = CountingClient()
+    await moderation.moderate_text("謝謝", client=client)
+    assert any(k.startswith(moderation.REDIS_KEY_PREFIX) for k in store)
+    moderation.clear_verdict_cache()  # 模擬另一個 worker
+    out = await moderation.moderate_text("謝謝", client=client)
+    assert out["cached"] is True and client.calls == 1
+    assert moderation.verdict_cache_stats()["redis_hits"] == 1
+
+
+class SlowMem(Mem):
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def recall(self, *a, **k):
+        self.started.set()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return ""
+
+
+@pytest.mark.asyncio
+async def test_kernel_recall_overlaps_moderation_and_is_cancelled_when_blocked():
+    mem = SlowMem()
+
+    class BlockingMod:
+        async def check(self, text):
+            await asyncio.wait_for(mem.started.wait(), timeout=1)
+            return {"blocked": True, "flagged": True, "flagged_categories": ["hate"]}
+
+    deps = _deps(mem=mem)
+    deps.moderation = BlockingMod()
+    k = AIKernel(deps, flags=KernelFlags(enabled=True))
+    with pytest.raises(ModerationBlockedError):
+        await k.run(KernelRequest(user_message="x", conversation_id="c1", user_id="u1"))
+    await asyncio.sleep(0)
+    assert mem.cancelled is True
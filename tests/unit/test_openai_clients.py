@@ -0,0 +1,123 @@
+"""Shared pooled OpenAI clients, async routing of non-stream calls, warm-up."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import backend.openai_handler as oh
+
+
+@pytest.fixture(autouse=True)
+def _fresh_clients():
+    oh._sync_clients.clear()
+    oh._async_clients.clear()
+    oh._loopless_async_clients.clear()
+    yield
+    oh._sync_clients.clear()
+    oh._async_clients.clear()
+    oh._loopless_async_clients.clear()
+
+
+@pytest.mark.unit
+def test_sync_client_is_shared_and_pooled(monkeypatch):
+    monkeypatch.setenv("OPENAI_MAX_CONNECTIONS", "7")
+    a = oh.get_openai_client()
+    b = oh.get_openai_client()
+    assert a is b
+    pool = a._client._transport._pool
+    assert pool._max_connections == 7
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_async_client_shared_per_loop():
+    a = oh.get_async_openai_client()
+    assert oh.get_async_openai_client() is a
+    # sync client credentials map onto the same async client
+    sync = oh.get_openai_client()
+    key = oh._client_key(sync.api_key, sync.organization, sync.base_url)
+    assert oh._async_clients[asyncio.get_running_loop()][key] is a
+
+    other = {}
+
+    def in_other_loop():
+        async def grab():
+            return oh.get_async_openai_client()
+
+        other["c"] = asyncio.run(grab())
+
+    t = threading.Thread(target=in_other_loop)
+    t.start()
+    t.join()
+    assert other["c"] is not a
+
+
+@pytest.mark.unit
+def test_async_clients_released_with_closed_loops_and_cached_without_loop():
+    assert oh.get_async_openai_client() is oh.get_async_openai_client()  # 無 running loop 也快取
+
+    async def grab():
+        return oh.get_async_openai_client()
+
+    loop1, loop2 = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        c1 = loop1.run_until_complete(grab())
+        loop1.close()
+        c2 = loop2.run_until_complete(grab())
+        assert c2 is not c1
+        assert loop1 not in oh._async_clients and loop2 in oh._async_clients
+        loop2.run_until_complete(oh.aclose_openai_clients())
+        assert not oh._async_clients and not oh._loopless_async_clients
+    finally:
+        loop2.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_sync_openai_client_routed_to_async(monkeypatch):
+    calls = []
+
+    async def fake_create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="hi"))], usage=None
+        )
+
+    fake_async = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fake_create)))
+    monkeypatch.setattr(oh, "get_async_openai_client", lambda **k: fake_async)
+    out = await oh.generate_response(oh.get_openai_client(), [{"role": "user", "content": "x"}], return_usage=True)
+    assert out["content"] == "hi"
+    assert calls and calls[0]["model"] == "gpt-4o-mini"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_sync_double_does_not_block_loop():
+    def slow_create(**kwargs):
+        time.sleep(0.2)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=slow_create)))
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    reply, _ = await asyncio.gather(oh.generate_response(client, []), ticker())
+    assert reply == "ok"
+    assert ticks == 10
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_warm_up_disabled_is_noop(monkeypatch):
+    monkeypatch.setenv("OPENAI_WARMUP_ENABLED", "false")
+    assert (await oh.warm_up_openai_clients())["skipped"] is True
+    assert not oh._async_clients and not oh._sync_clients
@@ -0,0 +1,181 @@
+"""輸出端增量審核：背景審核切斷串流、非串流邊生成邊審核"""
+import asyncio
+
+import pytest
+
+from backend.ai_kernel.feature_flags import KernelFlags
+from backend.ai_kernel.kernel import AIKernel
+from backend.ai_kernel.models import KernelRequest
+from backend.ai_kernel.post_process import clear_idempotency_for_tests
+from backend.output_moderation import (
+    OUTPUT_BLOCK_MESSAGE,
+    IncrementalModerator,
+)
+from tests.unit.test_kernel_shadow_and_stream import StreamModel, _deps
+
+
+class WordMod:
+    def __init__(self, word="BAD"):
+        self.word = word
+        self.windows = []
+
+    async def check(self, text):
+        self.windows.append(text)
+        return {"blocked": self.word in text, "flagged_categories": ["violence"]}
+
+
+@pytest.mark.asyncio
+async def test_incremental_moderator_does_not_block_feed():
+    gate = asyncio.Event()
+
+    async def slow_check(text):
+        await gate.wait()
+        return {"blocked": False}
+
+    m = IncrementalModerator(slow_check, window_chars=5, overlap_chars=0, max_inflight=1)
+    m.feed("一二三四五。")
+    m.feed("六七八九十。")  # 進行中已滿：併入下一個視窗，不等待
+    assert m.windows_sent == 1
+    gate.set()
+    assert await m.finish() is None
+    assert m.windows_sent == 2
+
+
+class SentenceModel(StreamModel):
+    def __init__(self, sentences):
+        super().__init__()
+        self.sentences = sentences
+
+    async def complete_with_tools(self, messages, tools, *, model, temperature, max_tokens):
+        return {"content": "", "tool_calls": [], "finish_reason": "stop", "usage": {}}
+
+    async def complete(self, messages, *, model, temperature, max_tokens):
+        return {"content": "".join(self.sentences), "usage": {}}
+
+    async def stream(self, messages, *, model, temperature, max_tokens):
+        for s in self.sentences:
+            self.streamed.append(s)
+            yield {"type": "content", "text": s}
+            await asyncio.sleep(0.01)
+        yield {"type": "usage", "usage": {}}
+
+
+@pytest.mark.asyncio
+async def test_kernel_stream_cut_when_window_flagged(monkeypatch):
+    monkeypatch.setenv("OUTPUT_MODERATION_WINDOW_CHARS", "4")
+    monkeypatch.setenv("MODERATION_CHECK_OUTPUT", "true")
+    clear_idempotency_for_tests()
+    sentences = ["好的。", "BAD!", "後續一。", "後續二。", "後續三。", "後續四。"]
+    deps, model = _deps(model=SentenceModel(sentences))
+    deps.moderation = WordMod()
+    k = AIKernel(deps, flags=KernelFlags(enabled=True))
+    chunks, usage = [], None
+    async for ev in k.run_stream(
+        KernelRequest(user_message="hi", conversation_id="c", use_tools=False, request_id="om1")
+    ):
+        if ev.type == "content":
+            chunks.append(ev.text)
+        elif ev.type == "usage":
+            usage = ev.data
+    assert chunks[-1].endswith(OUTPUT_BLOCK_MESSAGE)
+    assert "後續四。" not in chunks
+    assert usage["blocked"] is True
+
+
+@pytest.mark.asyncio
+async def test_kernel_non_stream_replaces_blocked_output(monkeypatch):
+    monkeypatch.setenv("MODERATION_CHECK_OUTPUT", "true")
+    clear_idempotency_for_tests()
+    deps, _ = _deps(model=SentenceModel(["好的。", "BAD!"]))
+    deps.moderation = WordMod()
+    k = AIKernel(deps, flags=KernelFlags(enabled=True))
+    r = await k.run(
+        KernelRequest(user_message="hi", conversation_id="c", use_tools=False, request_id="om2")
+    )
+    assert r.assistant_message == OUTPUT_BLOCK_MESSAGE
+    assert r.blocked is True
+
+
+@pytest.mark.asyncio
+async def test_kernel_non_stream_moderates_while_generating(monkeypatch):
+    monkeypatch.setenv("OUTPUT_MODERATION_WINDOW_CHARS", "4")
+    monkeypatch.setenv("MODERATION_CHECK_OUTPUT", "true")
+    clear_idempotency_for_tests()
+    sentences = ["好的。", "BAD!", "後續一。", "後續二。", "後續三。", "後續四。"]
+    model = SentenceModel(sentences)
+    deps, _ = _deps(model=model)
+    deps.moderation = WordMod()
+    k = AIKernel(deps, flags=KernelFlags(enabled=True))
+    r = await k.run(
+        KernelRequest(user_message="hi", conversation_id="c", use_tools=False, request_id="om3")
+    )
+    assert r.assistant_message == OUTPUT_BLOCK_MESSAGE
+    # 視窗在生成途中已攔截：不等全文生成完
+    assert "後續四。" not in model.streamed
+
+
+class DirectAnswerModel(SentenceModel):
+    async def complete_with_tools(self, messages, tools, *, model, temperature, max_tokens):
+        return {
+            "content": "".join(self.sentences),
+            "tool_calls": [],
+            "finish_reason": "stop",
+            "usage": {},
+        }
+
+
+@pytest.mark.asyncio
+async def test_kernel_non_stream_existing_answer_single_check(monkeypatch):
+    monkeypatch.setenv("OUTPUT_MODERATION_WINDOW_CHARS", "4")
+    monkeypatch.setenv("MODERATION_CHECK_OUTPUT", "true")
+    clear_idempotency_for_tests()
+    deps, model = _deps(model=DirectAnswerModel(["第一句。", "第二句。", "第三句。"]))
+    deps.moderation = WordMod()
+    k = AIKernel(deps, flags=KernelFlags(enabled=True))
+    r = await k.run(
+        KernelRequest(user_message="計算 1+1", conversation_id="c", request_id="om4")
+    )
+    assert r.assistant_message == "第一句。第二句。第三句。"
+    # 輸入審核一次 + 輸出全文一次（不切窗）
+    assert deps.moderation.windows == ["計算 1+1", "第一句。第二句。第三句。"]
+    assert model.streamed == []
+
+
+@pytest.mark.asyncio
+async def test_chat_non_stream_generation_feeds_moderator(monkeypatch):
+    from backend import chat_router
+
+    streamed = []
+
+    async def fake_stream(messages, model, temperature, max_tokens):
+        for s in ["好的。", "BAD!", "後續一。", "後續二。"]:
+            streamed.append(s)
+            yield {"type": "content", "text": s}
+            await asyncio.sleep(0.01)
+        yield {"type": "usage", "usage": {"total_tokens": 3}}
+
+    monkeypatch.setattr(chat_router, "generate_response_stream", fake_stream)
+    mod = WordMod()
+    m = IncrementalModerator(mod.check, window_chars=3, overlap_chars=0)
+    out = await chat_router._generate_non_stream(
+        None, [], model="m", max_tokens=10, temperature=0.5, moderator=m
+    )
+    assert await m.finish() is not None
+    assert "後續二。" not in streamed
+    assert out["content"].startswith("好的。")
+
+
+@pytest.mark.asyncio
+async def test_chat_non_stream_error_event_raises(monkeypatch):
+    from backend import chat_router
+
+    async def broken_stream(messages, model, temperature, max_tokens):
+        yield {"type": "content", "text": "[ERROR] boom"}
+        yield {"type": "usage", "usage": {}}
+
+    monkeypatch.setattr(chat_router, "generate_response_stream", broken_stream)
+    m = IncrementalModerator(WordMod().check)
+    with pytest.raises(RuntimeError):
+        await chat_router._generate_non_stream(
+            None, [], model="m", max_tokens=10, temperature=0.5, moderator=m
+        )
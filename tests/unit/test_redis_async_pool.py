@@ -0,0 +1,200 @@
+"""Async Redis mode: bounded pool, pipelined writes, in-place reconnect."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import backend.redis_interface as ri
+from backend.redis_interface import RedisInterface, create_async_redis_client
+from backend.redis_mock import RedisMock
+from backend.modules.reflection_storage import ReflectionStorage
+
+
+class FakePipeline:
+    def __init__(self, owner, transaction):
+        self.owner = owner
+        self.transaction = transaction
+        self.ops = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.ops.append((name, *args))
+            return self
+
+        return queue
+
+    def execute(self):
+        self.owner.executed.append((self.transaction, list(self.ops)))
+        return [True] * len(self.ops)
+
+
+class FakeSyncClient:
+    def __init__(self):
+        self.executed = []
+        self.sets = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, transaction)
+
+    def set(self, key, value, ex=None):
+        self.sets.append((key, ex))
+        return True
+
+
+class FakeAsyncPipeline(FakePipeline):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self):
+        return FakePipeline.execute(self)
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.store = {}
+        self.executed = []
+        self.calls = []
+
+    async def set(self, key, value, ex=None):
+        self.calls.append(("set", key, ex))
+        self.store[key] = value
+        return True
+
+    async def get(self, key):
+        self.calls.append(("get", key))
+        return self.store.get(key)
+
+    async def scan_iter(self, match=None, count=None):
+        for k in list(self.store):
+            if k.startswith(match.rstrip("*")):
+                yield k
+
+    def pipeline(self, transaction=True):
+        return FakeAsyncPipeline(self, transaction)
+
+
+@pytest.mark.unit
+def test_async_pool_is_bounded(monkeypatch):
+    monkeypatch.setenv("REDIS_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("REDIS_POOL_TIMEOUT_SECONDS", "0.5")
+    client = create_async_redis_client(
+        {"url": "redis://localhost:6379/0", "decode_responses": True}
+    )
+    pool = client.connection_pool
+    assert type(pool).__name__ == "BlockingConnectionPool"
+    assert pool.max_connections == 7
+    assert pool.timeout == 0.5
+
+
+@pytest.mark.unit
+def test_async_disabled_or_no_spec(monkeypatch):
+    assert create_async_redis_client(None) is None
+    monkeypatch.setenv("REDIS_ASYNC_ENABLED", "false")
+    assert create_async_redis_client({"url": "redis://localhost:6379/0"}) is None
+
+
+@pytest.mark.unit
+def test_store_short_term_single_command():
+    client = FakeSyncClient()
+    iface = RedisInterface(client, mode="real")
+    assert iface.store_short_term("c1", {"messages": []}) is True
+    assert client.sets == [("conv:c1:latest", iface.ttl_seconds)]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_async_client_used_and_swapped_in_place():
+    sync_a, sync_b = FakeSyncClient(), FakeSyncClient()
+    ri._async_specs[sync_a] = {"url": "redis://a"}
+    ri._async_specs[sync_b] = {"url": "redis://b"}
+    built = []
+
+    def fake_build(spec):
+        c = FakeAsyncClient()
+        built.append((spec["url"], c))
+        return c
+
+    with patch.object(ri, "create_async_redis_client", side_effect=fake_build):
+        iface = RedisInterface(sync_a, mode="real")
+        holder = iface
+        assert await iface.astore_short_term("c1", {"messages": []}) is True
+        assert built[0][1].calls[0] == ("set", "conv:c1:latest", iface.ttl_seconds)
+        loaded = await iface.aload_recent_context("c1")
+        assert loaded is not None and loaded["messages"] == []
+        # pooled client reused, not rebuilt per call
+        assert len(built) == 1
+
+        iface.adopt_backend(sync_b, "real")
+        assert holder is iface
+        assert await holder.astore_short_term("c2", {"messages": []}) is True
+        assert [u for u, _ in built] == ["redis://a", "redis://b"]
+        assert "conv:c2:latest" in built[1][1].store
+
+        # mock mode drops the async twin entirely
+        iface.adopt_backend(RedisMock(), "mock")
+        assert await iface.get_async_client() is None
+        assert await iface.astore_short_term("c3", {"messages": []}) is True
+        assert (await iface.aload_recent_context("c3")) is not None
+
+
+@pytest.mark.unit
+def test_async_client_per_loop_and_closed_loops_released():
+    sync = FakeSyncClient()
+    ri._async_specs[sync] = {"url": "redis://a"}
+    built = []
+
+    def fake_build(spec):
+        c = FakeAsyncClient()
+        built.append(c)
+        return c
+
+    async def grab():
+        return await iface.get_async_client(), await iface.get_async_client()
+
+    with patch.object(ri, "create_async_redis_client", side_effect=fake_build):
+        iface = RedisInterface(sync, mode="real")
+        loop1, loop2 = asyncio.new_event_loop(), asyncio.new_event_loop()
+        try:
+            first, again = loop1.run_until_complete(grab())
+            assert first is again
+            loop1.close()
+            second, _ = loop2.run_until_complete(grab())
+            assert second is not first and len(built) == 2
+            # loop1 is closed (still referenced here): its client is released
+            assert list(iface._async_clients.values()) == [second]
+        finally:
+            loop2.close()
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_reflection_cache_write_is_one_pipeline():
+    client = FakeSyncClient()
+    iface = RedisInterface(client, mode="real")  # no async spec → worker thread
+    storage = ReflectionStorage(redis_interface=iface)
+    ok = await storage._store_to_redis(
+        {"reflection_key": "k", "user_id": "u", "ai_id": "a", "reflection": {"summary": "s"}},
+        "conv",
+    )
+    assert ok is True
+    assert len(client.executed) == 1
+    transaction, ops = client.executed[0]
+    assert transaction is True
+    assert [op[0] for op in ops] == ["lpush", "ltrim", "expire"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_pipeline_falls_back_without_pipeline_support():
+    iface = RedisInterface(RedisMock(), mode="mock")
+    res = await iface.aexecute_pipeline(
+        [("lpush", "l", "x"), ("ltrim", "l", 0, 0), ("expire", "l", 10)]
+    )
+    assert len(res) == 3
+    assert await iface.acall("lrange", "l", 0, -1) == ["x"]
+    assert await iface.ascan_keys("l*") == ["l"]
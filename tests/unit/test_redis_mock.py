@@ -0,0 +1,139 @@
+"""RedisMock fidelity: cursor SCAN, active expiry, pipelines, sorted sets, latency."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from backend.redis_mock import RedisMock
+
+
+@pytest.fixture
+def r():
+    mock = RedisMock()
+    mock.flushall()
+    RedisMock.configure_latency()
+    RedisMock.reset_stats()
+    yield mock
+    RedisMock.configure_latency()
+    mock.flushall()
+
+
+@pytest.mark.unit
+def test_scan_is_cursor_based_and_complete(r):
+    for i in range(95):
+        r.set(f"upload:c1:{i:03d}", "x")
+    r.set("other:1", "y")
+    cursor, batch = r.scan(0, match="upload:c1:*", count=10)
+    assert cursor != 0 and len(batch) <= 10
+    seen = list(batch)
+    calls = 1
+    while cursor != 0:
+        cursor, batch = r.scan(cursor, match="upload:c1:*", count=10)
+        seen.extend(batch)
+        calls += 1
+    assert calls >= 10
+    assert len(seen) == len(set(seen)) == 95
+
+
+@pytest.mark.unit
+def test_scan_survives_mutation_mid_iteration(r):
+    for i in range(30):
+        r.set(f"k:{i}", "v")
+    cursor, seen = r.scan(0, match="k:*", count=5)
+    seen = set(seen)
+    r.delete("k:29")
+    r.set("k:0", "overwritten")  # overwrite keeps its position
+    while cursor != 0:
+        cursor, batch = r.scan(cursor, match="k:?", count=5)
+        seen.update(batch)
+    assert {f"k:{i}" for i in range(10)} <= seen
+    assert "k:29" not in seen
+    assert sorted(r.scan_iter(match="k:1?")) == [f"k:1{i}" for i in range(10)]
+
+
+@pytest.mark.unit
+def test_active_expiry_without_reads(r):
+    for i in range(10):
+        r.set(f"tmp:{i}", "v", px=5)
+    r.set("keep", "v", ex=60)
+    assert len(RedisMock._storage) == 11
+    time.sleep(0.02)
+    r.ping()  # any command runs an expiry cycle
+    assert list(RedisMock._storage) == ["keep"]
+    assert r.ttl("keep") > 0
+    r.expire("keep", 0)
+    assert r.get("keep") is None
+
+
+@pytest.mark.unit
+def test_pipeline_is_one_round_trip(r):
+    with r.pipeline() as p:
+        p.lpush("l", "a").lpush("l", "b").ltrim("l", 0, 0).expire("l", 30)
+        assert len(p) == 4
+        res = p.execute()
+    assert res == [1, 2, True, 1]
+    assert r.lrange("l", 0, -1) == ["b"]
+    stats = RedisMock.stats()
+    assert stats["commands"] == 5 and stats["round_trips"] == 2
+
+
+@pytest.mark.unit
+def test_transaction_with_watch(r):
+    r.set("counter", "1")
+
+    def bump(pipe):
+        current = int(pipe.get("counter"))  # immediate after watch
+        pipe.multi()
+        pipe.set("counter", str(current + 1))
+
+    assert r.transaction(bump, "counter") == [True]
+    assert r.get("counter") == "2"
+
+
+@pytest.mark.unit
+def test_sorted_sets(r):
+    r.zadd("z", {"a": 1, "b": 2, "c": 3})
+    assert r.zadd("z", {"a": 5}, nx=True) == 0
+    assert r.zrevrange("z", 0, 0) == ["c"]
+    assert r.zrange("z", 0, -1, withscores=True) == [("a", 1.0), ("b", 2.0), ("c", 3.0)]
+    assert r.zrangebyscore("z", "(1", "+inf") == ["b", "c"]
+    assert r.zincrby("z", 10, "a") == 11.0
+    assert r.zremrangebyscore("z", "-inf", 2) == 1
+    assert r.zscore("z", "c") == 3.0
+    assert r.zcard("z") == 2
+    assert r.get("missing") is None and r.zrange("missing", 0, -1) == []
+
+
+@pytest.mark.unit
+def test_latency_injection_per_round_trip(r):
+    RedisMock.configure_latency(base_ms=15, per_command={"ping": 0})
+    t0 = time.perf_counter()
+    r.ping()
+    assert time.perf_counter() - t0 < 0.015
+    t0 = time.perf_counter()
+    r.set("a", "1")
+    assert time.perf_counter() - t0 >= 0.015
+    t0 = time.perf_counter()
+    pipe = r.pipeline()
+    for i in range(5):
+        pipe.set(f"p{i}", "v")
+    pipe.execute()
+    assert 0.015 <= time.perf_counter() - t0 < 0.015 * 5
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_latency_injection_does_not_block_event_loop(r):
+    from backend.redis_interface import RedisInterface
+
+    iface = RedisInterface(r, mode="mock")
+    RedisMock.configure_latency(base_ms=50)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(iface.acall("set", f"k{i}", "v") for i in range(5)))
+    # concurrent round trips overlap instead of serializing on the loop
+    assert time.perf_counter() - t0 < 0.05 * 5
+    assert r.get("k4") == "v"
+    RedisMock.configure_latency()
+    assert RedisMock.latency_injected() is False
@@ -142,3 +142,84 @@ def test_real_client_ping_fail_mocked(monkeypatch):
     # after failed recovery we surface mock (honest) or ping_fail — not silent ok
     assert st["status"] in ("ping_fail", "mock")
     assert st.get("error_type") or st.get("previous_error_type")
+
+
+def test_upload_index_returns_most_recent_not_last_name():
+    iface = RedisInterface(RedisMock(), mode="mock")
+    iface.store_upload("c-up", "zeta.txt", {"content": "old"})
+    iface.store_upload("c-up", "alpha.txt", {"content": "new"})
+    key, raw = iface.latest_upload("c-up")
+    assert key == "upload:c-up:alpha.txt"
+    assert '"new"' in raw
+    assert iface.redis.ttl("upload_index:c-up") > 0
+    # re-upload of an older name moves it back to the top
+    iface.store_upload("c-up", "zeta.txt", {"content": "again"})
+    assert iface.latest_upload("c-up")[0] == "upload:c-up:zeta.txt"
+    assert iface.latest_upload("c-none") == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_upload_index_async_and_clear():
+    from backend.ai_kernel.adapters import FileContextAdapter
+
+    iface = RedisInterface(RedisMock(), mode="mock")
+    await iface.astore_upload(
+        "c-up2", "b.png", {"vision_analysis": "a cat", "is_image": True, "file_name": "b.png"}
+    )
+    key, _raw = await iface.alatest_upload("c-up2")
+    assert key == "upload:c-up2:b.png"
+    text = await FileContextAdapter(iface).aget_file_content("c-up2")
+    assert "a cat" in text and "b.png" in text
+    assert FileContextAdapter(iface).get_file_content("c-up2") == text
+    # written before the index existed: only reachable by SCAN
+    iface.redis.set("upload:c-up2:legacy.txt", "{}")
+    assert await iface.aclear_uploads("c-up2") == 3
+    assert iface.redis.get("upload:c-up2:b.png") is None
+    assert iface.redis.get("upload:c-up2:legacy.txt") is None
+    assert await iface.alatest_upload("c-up2") == (None, None)
+
+
+def test_short_term_codec_compact_roundtrip(monkeypatch):
+    import json
+
+    iface = RedisInterface(RedisMock(), mode="mock")
+    reply = "這是一段很長的助理回覆。" * 200
+    data = {
+        "messages": [
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": reply},
+        ],
+        "user_id": "u1",
+        "reflection": {"summary": "s", "causes": [], "lessons": [], "confidence": 0.5},
+    }
+    assert iface.store_short_term("conv-codec", data)
+    stored = iface.redis.get("conv:conv-codec:latest")
+    legacy = json.dumps(iface.normalize_latest_payload(data), ensure_ascii=False)
+    assert stored.startswith("~2z")
+    assert len(stored.encode("utf-8")) * 5 < len(legacy.encode("utf-8"))
+    loaded = iface.load_recent_context("conv-codec")
+    assert loaded["assistant_msg"] == reply and loaded["user_msg"] == "hi"
+    assert loaded["summary"] == reply[:200]
+    assert loaded["reflection"]["summary"] == "s"
+    assert loaded["user_id"] == "u1"
+    assert iface.normalize_latest_payload(stored)["messages"] == loaded["messages"]
+
+    iface.store_short_term("conv-small", {"messages": [{"role": "user", "content": "yo"}]})
+    assert iface.redis.get("conv:conv-small:latest").startswith("~2j")
+
+
+def test_short_term_codec_reads_legacy_and_can_roll_back(monkeypatch):
+    import json
+
+    iface = RedisInterface(RedisMock(), mode="mock")
+    iface.redis.set(
+        "conv:conv-old:latest",
+        json.dumps({"user_msg": "舊問", "assistant_msg": "舊答", "timestamp": "2024-01-01T00:00:00+00:00"}),
+    )
+    old = iface.load_recent_context("conv-old")
+    assert [m["content"] for m in old["messages"]] == ["舊問", "舊答"]
+    assert old["updated_at"] == "2024-01-01T00:00:00+00:00"
+
+    monkeypatch.setenv("REDIS_SHORT_TERM_CODEC", "json")
+    iface.store_short_term("conv-rb", {"messages": [{"role": "user", "content": "x"}]})
+    assert json.loads(iface.redis.get("conv:conv-rb:latest"))["user_msg"] == "x"
@@ -0,0 +1,110 @@
+"""串流輸出合併：首段立即、時間窗 / 位元組 / 句界 flush、協定片段、SSE 轉換"""
+import asyncio
+import json
+
+import pytest
+from fastapi.responses import StreamingResponse
+
+from backend.openai_compat_router import openai_sse_from_xcg_stream
+from backend.stream_coalescer import CoalescePolicy, coalesce_policy, coalesce_stream
+
+
+async def _source(pieces, delay=0.0):
+    for p in pieces:
+        if delay:
+            await asyncio.sleep(delay)
+        yield p
+
+
+async def _collect(gen):
+    return [x async for x in gen]
+
+
+@pytest.mark.asyncio
+async def test_first_piece_immediate_rest_coalesced():
+    out = await _collect(
+        coalesce_stream(_source(list("你好呀今天過得好嗎")), CoalescePolicy(window_ms=50))
+    )
+    assert out[0] == "你"
+    assert "".join(out) == "你好呀今天過得好嗎"
+    assert len(out) == 2
+
+
+@pytest.mark.asyncio
+async def test_window_elapsed_flushes_without_next_piece():
+    async def slow():
+        yield "a"
+        yield "b"
+        await asyncio.sleep(0.2)
+        yield "c"
+
+    loop = asyncio.get_running_loop()
+    stamps = []
+    async for piece in coalesce_stream(slow(), CoalescePolicy(window_ms=10)):
+        stamps.append((piece, loop.time()))
+    assert [p for p, _ in stamps] == ["a", "b", "c"]
+    # "b" 在時間窗到期時送出，而不是等到 "c"
+    assert stamps[2][1] - stamps[1][1] > 0.1
+
+
+@pytest.mark.asyncio
+async def test_byte_threshold_and_protocol_pieces():
+    event = '__XCG_EVENT__{"type":"tool_status"}\n'
+    out = await _collect(
+        coalesce_stream(
+            _source(["x", "aa", "bb", event, "cc", "\n__XCG_META__{}"]),
+            CoalescePolicy(window_ms=1000, max_bytes=4),
+        )
+    )
+    assert out == ["x", "aabb", event, "cc", "\n__XCG_META__{}"]
+
+
+@pytest.mark.asyncio
+async def test_voice_policy_flushes_on_sentence_end(monkeypatch):
+    monkeypatch.setenv("STREAM_COALESCE_VOICE_WINDOW_MS", "5000")
+    policy = coalesce_policy(voice=True)
+    assert policy.sentence is True
+    out = await _collect(
+        coalesce_stream(_source(["嗨", "今天", "很好。", "明天", "見！", "尾"]), policy)
+    )
+    assert out == ["嗨", "今天很好。", "明天見！", "尾"]
+
+
+def test_policy_per_client_and_disable(monkeypatch):
+    monkeypatch.setenv("STREAM_COALESCE_CLIENT_WINDOWS", "owui:30, ios:0")
+    assert coalesce_policy(client_id="OWUI").window_ms == 30
+    assert coalesce_policy(client_id="ios").enabled is False
+    assert coalesce_policy(client_id="web").window_ms == 20
+    monkeypatch.setenv("STREAM_COALESCE_ENABLED", "false")
+    assert coalesce_policy(client_id="owui").enabled is False
+
+
+@pytest.mark.asyncio
+async def test_disabled_policy_passes_through():
+    out = await _collect(coalesce_stream(_source(list("abc")), CoalescePolicy(window_ms=0)))
+    assert out == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_sse_forwards_partial_lines_and_strips_markers():
+    pieces = [
+        "哈",
+        "尼\n",
+        '__XCG_EVENT__{"type":"tool_status"}\n',
+        "你好",
+        "\n\n第二段",
+        "__XC",
+        'G_META__{"usage":{}}',
+    ]
+    resp = StreamingResponse(_source(pieces), media_type="text/plain")
+    frames = await _collect(openai_sse_from_xcg_stream(resp))
+    contents = []
+    for f in frames:
+        body = f[len("data: ") :].strip()
+        if body == "[DONE]":
+            continue
+        delta = json.loads(body)["choices"][0]["delta"]
+        if delta.get("content"):
+            contents.append(delta["content"])
+    assert contents[0] == "哈"  # 未完成的行立即送出
+    assert "".join(contents) == "哈尼\n你好\n\n第二段"
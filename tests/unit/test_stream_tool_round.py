@@ -0,0 +1,177 @@
+"""串流工具回合：無工具回答即時串流、tool_calls 累積後執行再續"""
+from types import SimpleNamespace
+
+import pytest
+
+from backend import openai_handler
+from backend.ai_kernel.feature_flags import KernelFlags
+from backend.ai_kernel.kernel import AIKernel
+from backend.ai_kernel.model_gateway.openai_gateway import OpenAIModelGateway
+from backend.ai_kernel.models import KernelRequest
+from backend.ai_kernel.post_process import clear_idempotency_for_tests
+from tests.unit.test_kernel_shadow_and_stream import StreamModel, Tools, _deps
+
+
+def _chunk(content=None, tool_calls=None, finish=None, usage=None):
+    choices = []
+    if content is not None or tool_calls is not None or finish is not None:
+        choices = [
+            SimpleNamespace(
+                delta=SimpleNamespace(content=content, tool_calls=tool_calls),
+                finish_reason=finish,
+            )
+        ]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def _tc_delta(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(
+        index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments)
+    )
+
+
+class FakeAsyncClient:
+    def __init__(self, chunks):
+        self.kwargs = None
+        self.chunks = chunks
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.kwargs = kwargs
+
+        async def gen():
+            for c in self.chunks:
+                yield c
+
+        return gen()
+
+
+async def _collect(chunks, monkeypatch):
+    client = FakeAsyncClient(chunks)
+    monkeypatch.setattr(openai_handler, "OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(openai_handler, "get_async_openai_client", lambda: client)
+    events = [
+        ev
+        async for ev in openai_handler.generate_response_stream_with_tools(
+            [{"role": "user", "content": "hi"}], tools=[{"type": "function"}]
+        )
+    ]
+    return client, events
+
+
+@pytest.mark.asyncio
+async def test_handler_forwards_content_deltas(monkeypatch):
+    client, events = await _collect(
+        [_chunk("你"), _chunk("好", finish="stop"), _chunk(usage=None)], monkeypatch
+    )
+    assert client.kwargs["stream"] is True and client.kwargs["tool_choice"] == "auto"
+    assert [e["text"] for e in events if e["type"] == "content"] == ["你", "好"]
+    assert events[-1]["type"] == "usage" and events[-1]["finish_reason"] == "stop"
+
+
+@pytest.mark.asyncio
+async def test_handler_accumulates_tool_call_deltas(monkeypatch):
+    _, events = await _collect(
+        [
+            _chunk(tool_calls=[_tc_delta(0, "c1", "calculate", '{"expr')]),
+            _chunk(tool_calls=[_tc_delta(0, arguments='ession": "1+1"}')]),
+            _chunk(tool_calls=[_tc_delta(1, "c2", "get_current_time", "{}")]),
+            _chunk(finish="tool_calls"),
+        ],
+        monkeypatch,
+    )
+    (tool_ev,) = [e for e in events if e["type"] == "tool_calls"]
+    calls = tool_ev["tool_calls"]
+    assert [c.function.name for c in calls] == ["calculate", "get_current_time"]
+    assert calls[0].function.arguments == '{"expression": "1+1"}'
+    assert tool_ev["raw_message"]["tool_calls"][1]["id"] == "c2"
+    assert events[-1]["finish_reason"] == "tool_calls"
+
+
+class StreamToolsModel(StreamModel):
+    """第一輪依 with_tool 決定回 tool_calls 或直接回答。"""
+
+    def __init__(self, with_tool, preamble=""):
+        super().__init__()
+        self.with_tool = with_tool
+        self.preamble = preamble
+        self.tool_rounds = 0
+
+    async def stream_with_tools(self, messages, tools, *, model, temperature, max_tokens):
+        self.tool_rounds += 1
+        if self.with_tool and self.tool_rounds == 1:
+            if self.preamble:
+                yield {"type": "content", "text": self.preamble}
+            call = SimpleNamespace(
+                id="t1", function=SimpleNamespace(name="calculate", arguments="{}")
+            )
+            yield {
+                "type": "tool_calls",
+                "tool_calls": [call],
+                "raw_message": {"role": "assistant", "content": None, "tool_calls": []},
+            }
+        else:
+            for t in ["直", "接"]:
+                yield {"type": "content", "text": t}
+        yield {"type": "usage", "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}
+
+
+def _kernel(model, tools=None):
+    deps, _ = _deps(model=model, tools=tools)
+    deps.model = OpenAIModelGateway(
+        complete_fn=model.complete,
+        complete_tools_fn=model.complete_with_tools,
+        stream_fn=model.stream,
+        stream_tools_fn=model.stream_with_tools,
+    )
+    return AIKernel(deps, flags=KernelFlags(enabled=True))
+
+
+async def _run(kernel, message, rid):
+    clear_idempotency_for_tests()
+    chunks, statuses = [], []
+    async for ev in kernel.run_stream(
+        KernelRequest(user_message=message, conversation_id="c", request_id=rid)
+    ):
+        if ev.type == "content":
+            chunks.append(ev.text)
+        elif ev.type == "tool_status":
+            statuses.append(ev.status)
+    return chunks, statuses
+
+
+@pytest.mark.asyncio
+async def test_kernel_no_tool_answer_streams_in_single_call():
+    model = StreamToolsModel(with_tool=False)
+    chunks, statuses = await _run(_kernel(model), "幫我算 1+1", "st1")
+    assert chunks == ["直", "接"]
+    assert model.tool_rounds == 1 and model.streamed == [] and model.n == 0
+    assert statuses == ["planning", "responding"]
+
+
+@pytest.mark.asyncio
+async def test_kernel_tool_calls_then_streamed_answer():
+    model, tools = StreamToolsModel(with_tool=True), Tools()
+    chunks, _ = await _run(_kernel(model, tools), "幫我算 1+1", "st2")
+    assert tools.execs == 1
+    assert chunks == ["直", "接"] and model.tool_rounds == 2
+    assert model.streamed == []  # 不再另外呼叫 model.stream
+
+
+@pytest.mark.asyncio
+async def test_kernel_preamble_before_tool_calls_not_reported_as_skipped():
+    model, tools = StreamToolsModel(with_tool=True, preamble="我算一下。"), Tools()
+    _, statuses = await _run(_kernel(model, tools), "幫我算 1+1", "st4")
+    assert tools.execs == 1
+    assert "skipped" not in statuses
+    assert statuses[:2] == ["planning", "responding"]
+
+
+@pytest.mark.asyncio
+async def test_kernel_flag_off_uses_nonstream_tool_round():
+    model = StreamToolsModel(with_tool=False)
+    kernel = _kernel(model)
+    kernel.flags = KernelFlags(enabled=True, stream_tool_round=False)
+    chunks, _ = await _run(kernel, "幫我算 1+1", "st3")
+    assert model.tool_rounds == 0 and model.n >= 1
+    assert "".join(chunks) == "工具後串流"
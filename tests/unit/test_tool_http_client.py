@@ -0,0 +1,125 @@
+"""工具共用 HTTP 層：連線重用、DNS 快取、每 host 限流、重試與延遲直方圖（本機 server）"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.tools import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = {"flaky": 0}
+    peers = set()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        if status == 503:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        type(self).peers.add(self.client_address)
+        if self.path.startswith("/flaky"):
+            type(self).hits["flaky"] += 1
+            if type(self).hits["flaky"] == 1:
+                return self._send(503, {"error": "busy"})
+        if self.path.startswith("/missing"):
+            return self._send(404, {"error": "nope"})
+        self._send(200, {"path": self.path})
+
+    def do_POST(self):
+        type(self).peers.add(self.client_address)
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self._send(200, {"echo": payload, "auth": self.headers.get("Authorization")})
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("TOOL_HTTP_BACKOFF_BASE_SECONDS", "0")
+    _Handler.hits = {"flaky": 0}
+    _Handler.peers = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    http_client.reset_tool_http_stats()
+    http_client.clear_dns_cache()
+    yield f"http://localhost:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused_and_dns_cached(server):
+    for _ in range(3):
+        data = await http_client.get_json(f"{server}/ok", params={"q": "台北"})
+        assert data["path"].startswith("/ok?q=")
+    assert len(_Handler.peers) == 1  # 同一條 keep-alive 連線
+    assert any(host == "localhost" for host, _ in http_client._dns_cache)
+    stats = http_client.tool_http_stats()["localhost"]
+    assert stats["count"] == 3 and stats["errors"] == 0
+    assert sum(stats["histogram_ms"].values()) == 3
+    await http_client.aclose_tool_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_retry_on_503_then_success(server):
+    data = await http_client.get_json(f"{server}/flaky", retries=1)
+    assert data["path"] == "/flaky"
+    stats = http_client.tool_http_stats()["localhost"]
+    assert stats["retries"] == 1 and stats["errors"] == 1
+    await http_client.aclose_tool_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_status_raises(server):
+    import httpx
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await http_client.get_json(f"{server}/missing")
+    assert http_client.tool_http_stats()["localhost"]["retries"] == 0
+    await http_client.aclose_tool_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_post_json_and_per_host_limit(server, monkeypatch):
+    monkeypatch.setenv("TOOL_HTTP_MAX_PER_HOST", "1")
+    await http_client.aclose_tool_http_clients()
+    results = await asyncio.gather(
+        *(
+            http_client.post_json(f"{server}/post", {"i": i}, headers={"Authorization": "Bearer k"})
+            for i in range(3)
+        )
+    )
+    assert [r["echo"]["i"] for r in results] == [0, 1, 2]
+    assert results[0]["auth"] == "Bearer k"
+    assert len(_Handler.peers) == 1  # 限流 1 → 只需一條連線
+    await http_client.aclose_tool_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_connect_error_is_retried_as_httpx_error(monkeypatch):
+    import socket
+
+    import httpx
+
+    monkeypatch.setenv("TOOL_HTTP_BACKOFF_BASE_SECONDS", "0")
+    http_client.reset_tool_http_stats()
+    with socket.socket() as s:  # 取一個沒人 listen 的埠
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    assert isinstance(http_client._build_transport(), http_client._DNSCachingTransport)
+    with pytest.raises(httpx.ConnectError):
+        await http_client.get_json(f"http://localhost:{port}/x", retries=1)
+    assert http_client.tool_http_stats()["localhost"]["retries"] == 1
+    await http_client.aclose_tool_http_clients()
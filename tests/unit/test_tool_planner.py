@@ -0,0 +1,130 @@
+"""Planner 工具相關性預測：裁剪 tools 陣列 / 跳過 tool round / trace 記錄"""
+import pytest
+
+from backend.ai_kernel.feature_flags import KernelFlags
+from backend.ai_kernel.models import (
+    KernelContext,
+    KernelRequest,
+    ModelConfig,
+    PlanAction,
+    ResponseStrategy,
+)
+from backend.ai_kernel.planner import plan_request, predict_tools, select_tool_definitions
+from backend.ai_kernel.tool_policy import AgentLoop, ToolPolicy
+from backend.ai_kernel.tracing import KernelTrace
+from backend.tools.registry import ToolRegistry, ToolSpec
+from tests.unit.test_ai_kernel_loop import FakeModel
+
+
+def _def(name):
+    return {"type": "function", "function": {"name": name, "parameters": {"type": "object"}}}
+
+
+class ManyTools:
+    names = ["web_search", "get_current_time", "calculate", "get_weather"]
+
+    def openai_definitions(self):
+        return [_def(n) for n in self.names]
+
+    async def execute_calls(self, tool_calls, *, context=None, max_calls=5):
+        return [{"name": "calculate", "ok": True, "tool_call_id": "1", "content": "2"}]
+
+
+class RecordingModel(FakeModel):
+    def __init__(self):
+        super().__init__()
+        self.exposed = []
+
+    async def complete_with_tools(self, messages, tools, **kw):
+        self.exposed.append([t["function"]["name"] for t in tools])
+        return await super().complete_with_tools(messages, tools, **kw)
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("今天好累，想找人說說話", []),
+        ("台北明天會下雨嗎", ["get_weather"]),
+        ("幫我算 12*7", ["calculate"]),
+        ("現在幾點", ["get_current_time"]),
+        ("搜尋最新的新聞", ["web_search"]),
+        ("5 公里是幾英里", ["convert_units"]),
+        ("明早八點提醒我開會", ["manage_reminder"]),
+    ],
+)
+def test_predict_tools(message, expected):
+    assert sorted(predict_tools(message)) == sorted(expected)
+
+
+def test_plan_carries_predicted_subset():
+    p = plan_request(KernelRequest(user_message="台北天氣如何", conversation_id="c"))
+    assert p.action == PlanAction.USE_TOOLS and p.tools == ["get_weather"]
+    chat = plan_request(KernelRequest(user_message="抱抱我", conversation_id="c"))
+    assert chat.allow_tools is False and chat.tools == []
+
+
+def test_planner_flag_off_keeps_all_tools(monkeypatch):
+    monkeypatch.setenv("TOOL_PLANNER_ENABLED", "false")
+    p = plan_request(KernelRequest(user_message="台北天氣如何", conversation_id="c"))
+    assert p.allow_tools is True and p.tools is None
+    defs = [_def("a"), _def("b")]
+    assert select_tool_definitions(defs, p.tools) == defs
+
+
+def _ctx(message):
+    req = KernelRequest(user_message=message, conversation_id="c")
+    return req, KernelContext(
+        request=req,
+        messages=[{"role": "user", "content": message}],
+        plan=plan_request(req),
+        model_config_obj=ModelConfig(),
+        strategy=ResponseStrategy(max_tokens=100),
+    )
+
+
+@pytest.mark.asyncio
+async def test_agent_loop_exposes_only_predicted_tools():
+    model, trace = RecordingModel(), KernelTrace(enabled=True)
+    loop = AgentLoop(model, ManyTools(), ToolPolicy(KernelFlags()), trace=trace)
+    req, ctx = _ctx("幫我算 1+1")
+    await loop.run_tool_rounds(ctx, user_id="u", request=req)
+    assert model.exposed[0] == ["calculate"]
+    span = next(s for s in trace.spans if s.stage == "tool_schema")
+    assert span.counts["available"] == 4 and span.counts["exposed"] == 1
+    assert span.counts["pruned"] == 3 and span.counts["prompt_tokens_saved"] > 0
+
+
+@pytest.mark.asyncio
+async def test_agent_loop_skips_round_for_chitchat():
+    model, trace = RecordingModel(), KernelTrace(enabled=True)
+    loop = AgentLoop(model, ManyTools(), ToolPolicy(KernelFlags()), trace=trace)
+    req, ctx = _ctx("今天心情不太好")
+    out = await loop.run_tool_rounds(ctx, user_id="u", request=req)
+    assert model.exposed == [] and out["needs_final_generation"] is True
+    span = next(s for s in trace.spans if s.stage == "tool_schema")
+    assert span.status == "skipped" and span.counts["exposed"] == 0
+
+
+def test_trace_annotate_merges_into_span():
+    trace = KernelTrace(enabled=True)
+    trace.start("plan")
+    trace.annotate("plan", counts={"predicted_tools": 1}, detail={"action": "use_tools"})
+    trace.end("plan")
+    d = trace.to_dict()["spans"][0]
+    assert d["counts"] == {"predicted_tools": 1}
+    assert d["detail"] == {"action": "use_tools"}
+
+
+def test_registry_definitions_are_cached_minified_and_filterable():
+    async def _h(**kw):
+        return ""
+
+    reg = ToolRegistry()
+    reg.register(ToolSpec(name="aa", description="  line one\n   line two ", parameters={}, handler=_h))
+    reg.register(ToolSpec(name="bb", description="b", parameters={}, handler=_h))
+    first = reg.openai_tool_definitions()
+    assert first[0]["function"]["description"] == "line one line two"
+    assert reg.openai_tool_definitions()[0] is first[0]  # 預編譯重用
+    assert [d["function"]["name"] for d in reg.openai_tool_definitions(["bb"])] == ["bb"]
+    reg.get("bb").enabled = False
+    assert [d["function"]["name"] for d in reg.openai_tool_definitions()] == ["aa"]
@@ -259,3 +259,116 @@ async def test_successful_execute(empty_registry: ToolRegistry):
     assert result.ok is True
     assert result.content == "echo:hi"
     assert result.error_code is None
+
+
+def _call(i: int, name: str = "nap_tool", text: str = ""):
+    return SimpleNamespace(
+        id=f"call_{i}",
+        function=SimpleNamespace(name=name, arguments=json.dumps({"text": text or str(i)})),
+    )
+
+
+class _Nap:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, text: str = "") -> str:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        # 較小的 index 睡較久 → 完成順序與原始順序相反
+        await asyncio.sleep(0.05 * (3 - int(text)))
+        self.running -= 1
+        return f"nap:{text}"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_parallel_tool_calls_keep_original_order(empty_registry: ToolRegistry):
+    nap = _Nap()
+    empty_registry.register(_make_calc_spec(handler=nap, name="nap_tool"))
+    events = [e async for e in empty_registry.iter_openai_tool_calls([_call(i) for i in range(3)])]
+    completion = [e["result"].index for e in events if e["type"] == "result"]
+    assert completion == [2, 1, 0]
+    assert nap.peak == 3
+
+    results = await empty_registry.execute_openai_tool_calls([_call(i) for i in range(3)])
+    assert [r.tool_call_id for r in results] == ["call_0", "call_1", "call_2"]
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_parallel_cap_and_serial_tools(empty_registry: ToolRegistry):
+    nap = _Nap()
+    empty_registry.max_parallel_tools = 2
+    empty_registry.register(_make_calc_spec(handler=nap, name="nap_tool"))
+    await empty_registry.execute_openai_tool_calls([_call(i) for i in range(3)])
+    assert nap.peak == 2
+
+    serial = _Nap()
+    empty_registry.max_parallel_tools = 3
+    empty_registry.register(_make_calc_spec(handler=serial, name="serial_tool", parallel_safe=False))
+    await empty_registry.execute_openai_tool_calls(
+        [_call(i, name="serial_tool") for i in range(3)]
+    )
+    assert serial.peak == 1
+
+
+class _Counter:
+    def __init__(self, delay: float = 0.0, content: str = "sunny"):
+        self.calls = 0
+        self.delay = delay
+        self.content = content
+
+    async def __call__(self, text: str = "") -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.content
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_tool_cache_hit_with_canonical_args(empty_registry: ToolRegistry):
+    counter = _Counter()
+    empty_registry.register(
+        _make_calc_spec(handler=counter, name="cached_tool", cache_ttl_seconds=60)
+    )
+    first = await empty_registry.execute("cached_tool", {"text": "台北 "})
+    second = await empty_registry.execute("cached_tool", {"text": "  台北"}, tool_call_id="c2")
+    assert counter.calls == 1
+    assert first.cached is False and second.cached is True
+    assert second.tool_call_id == "c2" and second.content == "sunny"
+    assert empty_registry.cache.stats()["hits"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_tool_cache_single_flight(empty_registry: ToolRegistry):
+    counter = _Counter(delay=0.05)
+    empty_registry.register(
+        _make_calc_spec(handler=counter, name="cached_tool", cache_ttl_seconds=60)
+    )
+    results = await asyncio.gather(
+        *(empty_registry.execute("cached_tool", {"text": "taipei"}) for _ in range(4))
+    )
+    assert counter.calls == 1
+    assert sum(r.cached for r in results) == 3
+    assert empty_registry.cache.stats()["coalesced"] == 3
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_tool_cache_skips_failures_and_uncached_specs(empty_registry: ToolRegistry):
+    failing = _Counter(content="[WEATHER_ERROR] down")
+    empty_registry.register(
+        _make_calc_spec(handler=failing, name="flaky_tool", cache_ttl_seconds=60)
+    )
+    await empty_registry.execute("flaky_tool", {"text": "x"})
+    await empty_registry.execute("flaky_tool", {"text": "x"})
+    assert failing.calls == 2
+
+    plain = _Counter()
+    empty_registry.register(_make_calc_spec(handler=plain, name="plain_tool"))
+    await empty_registry.execute("plain_tool", {"text": "x"})
+    await empty_registry.execute("plain_tool", {"text": "x"})
+    assert plain.calls == 2